@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Geospatial Index Benchmark for ProtoDB
+
+This script benchmarks ProtoDB's GeoIndex against a full scan of the records.
+It measures the index build time and the query latency for:
+- bounding-box queries (WithinBox)
+- radius queries (WithinRadius)
+- k-nearest-point queries
+
+Points are spread over a few dense clusters plus a uniform background, as real
+location data usually is. It emits a JSON report with timings and configuration.
+Full-scan baselines run on a sample of the queries only, as they read every point.
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+# Ensure parent directory is on path to import proto_db when running from examples
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proto_db.geo_index import GeoIndex, distance_m, in_box
+
+
+class Place:
+    __slots__ = ('id', 'location')
+
+    def __init__(self, id: int, location: Tuple[float, float]):
+        self.id = id
+        self.location = location
+
+
+def make_dataset(n: int, clusters: int = 50, seed: int = 42) -> List[Place]:
+    rng = random.Random(seed)
+    centers = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(clusters)]
+    places = []
+    for i in range(n):
+        if rng.random() < 0.8:
+            lat, lon = rng.choice(centers)
+            lat = max(-90.0, min(90.0, rng.gauss(lat, 0.5)))
+            lon = (rng.gauss(lon, 0.5) + 180.0) % 360.0 - 180.0
+        else:
+            lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        places.append(Place(i, (lat, lon)))
+    return places
+
+
+def make_queries(places: List[Place], n_queries: int, seed: int = 7) -> List[Tuple[float, float]]:
+    # Query around existing points, so queries hit populated areas
+    rng = random.Random(seed)
+    return [rng.choice(places).location for _ in range(n_queries)]
+
+
+def _latency_stats(latencies: List[float]) -> dict:
+    if not latencies:
+        return {"avg_ms": None, "p50_ms": None, "p95_ms": None}
+    ms = sorted(t * 1000.0 for t in latencies)
+    return {
+        "avg_ms": sum(ms) / len(ms),
+        "p50_ms": ms[int(0.50 * (len(ms) - 1))],
+        "p95_ms": ms[int(0.95 * (len(ms) - 1))],
+    }
+
+
+def _timed(queries, run) -> Tuple[dict, List[int]]:
+    times, sizes = [], []
+    for query in queries:
+        t0 = time.time()
+        sizes.append(run(query))
+        times.append(time.time() - t0)
+    stats = _latency_stats(times)
+    stats["avg_results"] = (sum(sizes) / len(sizes)) if sizes else None
+    return stats, sizes
+
+
+def _box(center: Tuple[float, float], half_deg: float) -> Tuple[float, float, float, float]:
+    lat, lon = center
+    return (max(-90.0, lat - half_deg), max(-180.0, lon - half_deg),
+            min(90.0, lat + half_deg), min(180.0, lon + half_deg))
+
+
+def run_benchmark(n: int, n_queries: int, scan_queries: int, box_deg: float, radius_m: float, k: int) -> dict:
+    places = make_dataset(n)
+    queries = make_queries(places, n_queries)
+    scanned = queries[:scan_queries]
+
+    results = {"config": {"n": n, "n_queries": n_queries, "scan_queries": len(scanned),
+                          "box_half_deg": box_deg, "radius_m": radius_m, "k": k}}
+
+    t0 = time.time()
+    index = GeoIndex.from_records('location', places)
+    results["build_seconds"] = time.time() - t0
+
+    box_stats, box_sizes = _timed(queries, lambda q: sum(1 for _ in index.records_in_box(*_box(q, box_deg))))
+    radius_stats, radius_sizes = _timed(queries, lambda q: sum(1 for _ in index.records_within(q[0], q[1], radius_m)))
+    knn_stats, _ = _timed(queries, lambda q: len(index.nearest(q[0], q[1], k)))
+
+    scan_box_stats, scan_box_sizes = _timed(
+        scanned, lambda q: sum(1 for p in places if in_box(p.location, _box(q, box_deg))))
+    scan_radius_stats, scan_radius_sizes = _timed(
+        scanned, lambda q: sum(1 for p in places if distance_m(q[0], q[1], *p.location) <= radius_m))
+    scan_knn_stats, _ = _timed(
+        scanned, lambda q: len(heapq.nsmallest(k, (distance_m(q[0], q[1], *p.location) for p in places))))
+
+    results["queries"] = [
+        {"label": "geo_index_box", **box_stats},
+        {"label": "full_scan_box", **scan_box_stats},
+        {"label": "geo_index_radius", **radius_stats},
+        {"label": "full_scan_radius", **scan_radius_stats},
+        {"label": "geo_index_knn", **knn_stats},
+        {"label": "full_scan_knn", **scan_knn_stats},
+    ]
+    # The index must find exactly what the scan finds
+    results["metrics"] = {
+        "box_results_match": box_sizes[:len(scanned)] == scan_box_sizes,
+        "radius_results_match": radius_sizes[:len(scanned)] == scan_radius_sizes,
+    }
+    for label in ("box", "radius", "knn"):
+        indexed = next(q for q in results["queries"] if q["label"] == f"geo_index_{label}")["avg_ms"]
+        scan = next(q for q in results["queries"] if q["label"] == f"full_scan_{label}")["avg_ms"]
+        results["metrics"][f"speedup_{label}"] = (scan / indexed) if indexed and scan else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ProtoDB geospatial index benchmark")
+    parser.add_argument("--points", type=int, default=10_000_000, help="number of indexed points")
+    parser.add_argument("--queries", type=int, default=200, help="number of queries of each kind")
+    parser.add_argument("--scan-queries", type=int, default=5, help="queries also answered by a full scan")
+    parser.add_argument("--box-deg", type=float, default=0.05, help="half side of the query boxes, in degrees")
+    parser.add_argument("--radius", type=float, default=5000.0, help="radius of the radius queries, in meters")
+    parser.add_argument("--k", type=int, default=10, help="neighbours of the nearest-point queries")
+    parser.add_argument("--out", type=str, default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.points, args.queries, args.scan_queries, args.box_deg, args.radius, args.k)
+    report = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
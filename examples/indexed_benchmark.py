@@ -179,28 +179,69 @@ def run_benchmark(n_items=1000, n_queries=50, out_path="examples/benchmark_resul
     pb_indexed_stats = time_queries(lambda: pb_indexed_query_once(), n=n_queries, warmup=warmup)
     pb_indexed_pk_stats = time_queries(lambda: pb_indexed_query_single_item(), n=n_queries, warmup=warmup)
 
+    # Composite path: one index keyed by (category, status, value) answers the whole filter
+    # with a single range scan instead of intersecting three single-field plans
+    composite = IndexedQueryPlan(based_on=base_indexed_plan, transaction=tr).add_composite_index(
+        ['r.category', 'r.status', 'r.value'])
+
+    def pb_composite_query_once():
+        cat = random.choice(CATEGORIES)
+        st = random.choice(STATUSES)
+        lo = random.randint(1, max(2, 100000 - window - 1))
+        hi = lo + window
+        flt = Expression.compile(['&', ['r.category', '==', cat], ['r.status', '==', st], ['r.value', 'between()', lo, hi]])
+        plan = WherePlan(filter=flt, based_on=composite, transaction=tr)
+        plan = plan.optimize()
+        list(plan.execute())
+
+    pb_composite_stats = time_queries(lambda: pb_composite_query_once(), n=n_queries, warmup=warmup)
+
+    # Unique index path: r.id maps straight to its record and the planner resolves the
+    # equality with a PrimaryKeyLookupPlan (no bucket Sets, intersections or result Lists)
+    from proto_db.dictionaries import UniqueIndex
+    pk_index = UniqueIndex(transaction=tr)
+    for rec in wrapped_records:
+        pk_index = pk_index.set_at(rec.r['id'], rec)
+    unique_indexed = IndexedQueryPlan(indexes=Dictionary(transaction=tr).set_at('r.id', pk_index),
+                                      based_on=base_indexed_plan, transaction=tr)
+
+    def pb_unique_query_single_item():
+        target_id = data[random.randrange(n_items)].get('id') if data else None
+        flt = Expression.compile(['r.id', '==', target_id])
+        plan = WherePlan(filter=flt, based_on=unique_indexed, transaction=tr)
+        plan = plan.optimize()
+        list(plan.execute())
+
+    pb_unique_pk_stats = time_queries(lambda: pb_unique_query_single_item(), n=n_queries, warmup=warmup)
+
     results = {
         "config": {"n_items": n_items, "n_queries": n_queries, "window": window, "warmup": warmup},
         "timings_seconds": {
             "python_list_baseline": py_stats['total_seconds'],
             "protodb_linear_where": pb_linear_stats['total_seconds'],
             "protodb_indexed_where": pb_indexed_stats['total_seconds'],
+            "protodb_composite_where": pb_composite_stats['total_seconds'],
             "python_list_pk_lookup": py_pk_stats['total_seconds'],
             "protodb_linear_pk_lookup": pb_linear_pk_stats['total_seconds'],
             "protodb_indexed_pk_lookup": pb_indexed_pk_stats['total_seconds'],
+            "protodb_unique_pk_lookup": pb_unique_pk_stats['total_seconds'],
         },
         "latency_ms": {
             "python_list_baseline": {k: v for k, v in py_stats.items() if k != 'total_seconds'},
             "protodb_linear_where": {k: v for k, v in pb_linear_stats.items() if k != 'total_seconds'},
             "protodb_indexed_where": {k: v for k, v in pb_indexed_stats.items() if k != 'total_seconds'},
+            "protodb_composite_where": {k: v for k, v in pb_composite_stats.items() if k != 'total_seconds'},
             "python_list_pk_lookup": {k: v for k, v in py_pk_stats.items() if k != 'total_seconds'},
             "protodb_linear_pk_lookup": {k: v for k, v in pb_linear_pk_stats.items() if k != 'total_seconds'},
             "protodb_indexed_pk_lookup": {k: v for k, v in pb_indexed_pk_stats.items() if k != 'total_seconds'},
+            "protodb_unique_pk_lookup": {k: v for k, v in pb_unique_pk_stats.items() if k != 'total_seconds'},
         },
         "speedups": {
             "indexed_over_linear": (pb_linear_stats['total_seconds'] / pb_indexed_stats['total_seconds']) if pb_indexed_stats['total_seconds'] > 0 else None,
             "indexed_over_python": (py_stats['total_seconds'] / pb_indexed_stats['total_seconds']) if pb_indexed_stats['total_seconds'] > 0 else None,
+            "composite_over_indexed": (pb_indexed_stats['total_seconds'] / pb_composite_stats['total_seconds']) if pb_composite_stats['total_seconds'] > 0 else None,
             "indexed_pk_over_linear": (pb_linear_pk_stats['total_seconds'] / pb_indexed_pk_stats['total_seconds']) if pb_indexed_pk_stats['total_seconds'] > 0 else None,
+            "unique_pk_over_indexed_pk": (pb_indexed_pk_stats['total_seconds'] / pb_unique_pk_stats['total_seconds']) if pb_unique_pk_stats['total_seconds'] > 0 else None,
         },
     }
 
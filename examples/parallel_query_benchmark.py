@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Parallel Query Benchmark for ProtoDB
+
+This script measures how WherePlan, SelectPlan and GroupByPlan scale with the number of
+workers when they run partitioned (see ParallelConfig and QueryPlan.partitions):
+- where: a filter over the whole collection
+- select: a projection of the filtered records
+- group_by: sum, average and count per group of the filtered records
+
+Each query runs sequentially and then with 1, 2, 4, 8 and 16 workers by default. Workers
+are threads: they only run Python code at the same time on a free-threaded CPython build,
+so the report records whether the GIL was enabled. It emits a JSON report with timings
+and the speedup of every run over the sequential one.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, List, Optional
+
+# Ensure parent directory is on path to import proto_db when running from examples
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proto_db.parallel import ParallelConfig
+from proto_db.queries import (
+    AgreggatorSpec, AvgAggregator, CountAggregator, GroupByPlan, ListPlan, SelectPlan, SumAgreggator, WherePlan
+)
+
+
+class Row:
+    def __init__(self, id: int, group: str, amount: float, active: bool):
+        self.id = id
+        self.group = group
+        self.amount = amount
+        self.active = active
+
+
+def make_dataset(n: int, groups: int = 100, seed: int = 42) -> List[Row]:
+    rng = random.Random(seed)
+    return [Row(i, f'g{rng.randrange(groups)}', rng.uniform(0, 1000), rng.random() < 0.7) for i in range(n)]
+
+
+def build_queries(rows: List[Row], parallel: Optional[ParallelConfig]) -> dict:
+    base = ListPlan(base_list=rows)
+    spec = ['&', ['active', '?T'], ['amount', 'between[)', 100.0, 900.0]]
+
+    def where():
+        return WherePlan(filter_spec=spec, based_on=base, parallel=parallel)
+
+    aggregates = {
+        'total': AgreggatorSpec(SumAgreggator(), 'amount', 'total'),
+        'average': AgreggatorSpec(AvgAggregator(), 'amount', 'average'),
+        'n': AgreggatorSpec(CountAggregator(), 'amount', 'n'),
+    }
+    return {
+        "where": lambda: sum(1 for _ in where().execute()),
+        "select": lambda: sum(1 for _ in SelectPlan(fields={'id': lambda r: r.id, 'net': lambda r: r.amount * 0.79},
+                                                    based_on=where(), parallel=parallel).execute()),
+        "group_by": lambda: sum(1 for _ in GroupByPlan(['group'], aggregates, based_on=where(),
+                                                       parallel=parallel).execute()),
+    }
+
+
+def _best_seconds(run: Callable[[], int], runs: int) -> tuple[float, int]:
+    best, produced = None, 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        produced = run()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, produced
+
+
+def run_benchmark(n: int, workers: List[int], runs: int) -> dict:
+    rows = make_dataset(n)
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    results = {"config": {"n": n, "workers": workers, "runs": runs, "cpus": os.cpu_count(),
+                          "gil_enabled": is_gil_enabled() if is_gil_enabled else True},
+               "queries": []}
+    sequential = {label: _best_seconds(run, runs) for label, run in build_queries(rows, None).items()}
+    for label, (seconds, produced) in sequential.items():
+        results["queries"].append({"label": label, "workers": 0, "seconds": seconds, "rows_out": produced,
+                                   "rows_per_s": n / seconds, "speedup": 1.0})
+    for count in workers:
+        queries = build_queries(rows, ParallelConfig(max_workers=count))
+        for label, run in queries.items():
+            seconds, produced = _best_seconds(run, runs)
+            results["queries"].append({
+                "label": label,
+                "workers": count,
+                "seconds": seconds,
+                "rows_out": produced,
+                "results_match": produced == sequential[label][1],
+                "rows_per_s": n / seconds,
+                "speedup": sequential[label][0] / seconds,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ProtoDB parallel query benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="number of scanned records")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="worker counts to run")
+    parser.add_argument("--runs", type=int, default=3, help="runs per measure (the best one is kept)")
+    parser.add_argument("--out", type=str, default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.workers, args.runs)
+    report = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
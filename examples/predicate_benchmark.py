@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Filter Predicate Benchmark for ProtoDB
+
+This script measures linear-scan row throughput of filters, evaluated two ways:
+- interpreted: Expression.match(), walking the expression tree for every record
+- compiled: Expression.predicate(), the function generated once per filter
+
+and the throughput of a WherePlan scan (which uses the compiled predicate). Several
+filter shapes are measured: a single comparison, an AND with a range, and an OR with
+a negation. It emits a JSON report with rows per second and the speedup per filter.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, List
+
+# Ensure parent directory is on path to import proto_db when running from examples
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proto_db.queries import Expression, ListPlan, WherePlan
+
+FILTERS = {
+    "comparison": ['r.age', '>', 50],
+    "and_range": ['&', ['r.age', 'between[)', 20, 60], ['r.city', '==', 'Madrid']],
+    "or_not": ['|', ['r.name', 'startswith', 'Car'], ['!', ['r.age', '<', 90]]],
+    "nested_path": ['&', ['r.address.zip', 'in', [28001, 28002, 28003]], ['r.active', '?T']],
+}
+
+
+class Row:
+    __slots__ = ('r',)
+
+    def __init__(self, r: dict):
+        self.r = r
+
+
+def make_dataset(n: int, seed: int = 42) -> List[Row]:
+    rng = random.Random(seed)
+    names = ['Ann', 'Bob', 'Carl', 'Carla', 'Dora', 'Eve']
+    cities = ['Madrid', 'Bilbao', 'Malaga']
+    return [Row({'id': i, 'age': rng.randrange(100), 'name': rng.choice(names), 'city': rng.choice(cities),
+                 'active': rng.random() < 0.5, 'address': {'zip': 28000 + rng.randrange(10)}})
+            for i in range(n)]
+
+
+def _rows_per_second(rows: List[Row], runs: int, scan: Callable[[], int]) -> tuple[float, int]:
+    best, matched = None, 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        matched = scan()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return len(rows) / best if best else float('inf'), matched
+
+
+def run_benchmark(n: int, runs: int) -> dict:
+    rows = make_dataset(n)
+    base = ListPlan(base_list=rows)
+    results = {"config": {"n": n, "runs": runs}, "filters": []}
+    for label, spec in FILTERS.items():
+        expression = Expression.compile(spec)
+        match = expression.match
+        predicate = expression.predicate()
+        interpreted, expected = _rows_per_second(rows, runs, lambda: sum(1 for row in rows if match(row)))
+        compiled, found = _rows_per_second(rows, runs, lambda: sum(1 for row in rows if predicate(row)))
+        where = WherePlan(filter=expression, based_on=base)
+        planned, planned_found = _rows_per_second(rows, runs, lambda: sum(1 for _ in where.execute()))
+        results["filters"].append({
+            "label": label,
+            "matched": expected,
+            "results_match": expected == found == planned_found,
+            "interpreted_rows_per_s": interpreted,
+            "compiled_rows_per_s": compiled,
+            "where_plan_rows_per_s": planned,
+            "speedup": compiled / interpreted if interpreted else None,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ProtoDB filter predicate benchmark")
+    parser.add_argument("--rows", type=int, default=500_000, help="number of scanned records")
+    parser.add_argument("--runs", type=int, default=3, help="runs per measure (the best one is kept)")
+    parser.add_argument("--out", type=str, default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.runs)
+    report = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ __version__ = "0.1.0"
 
 # Optional: expose storage backends if dependencies are available, otherwise keep None to avoid ImportError
 from .exceptions import ProtoBaseException, ProtoUserException, ProtoCorruptionException, \
-    ProtoValidationException, ProtoNotSupportedException, ProtoNotAuthorizedException
+    ProtoValidationException, ProtoNotSupportedException, ProtoNotAuthorizedException, \
+    ProtoUniqueConstraintException
 from . import common
 from . import dictionaries
 from . import exceptions
@@ -18,8 +19,9 @@ from .db_access import ObjectSpace, Database, ObjectTransaction, BytesAtom
 from .fsm import Timer, FSM
 from .hash_dictionaries import HashDictionary
 from .lists import List
-from .dictionaries import Dictionary, RepeatedKeysDictionary
+from .dictionaries import Dictionary, RepeatedKeysDictionary, CompositeIndex, UniqueIndex, CoveringIndex
 from .sets import Set
+from .btrees import BTreeList, BTreeDictionary
 from .file_block_provider import FileBlockProvider
 from .memory_storage import MemoryStorage
 from .queries import FromPlan, WherePlan, ListPlan, SelectPlan
@@ -0,0 +1,549 @@
+from __future__ import annotations
+
+import base64
+import struct
+import sys
+import uuid
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Optional
+
+from .common import Atom, AtomPointer, AbstractTransaction, Literal
+from .dictionaries import Dictionary, _field_value, _record_ref, _stored_ref
+from .hash_dictionaries import HashDictionary
+from .queries import QueryableIndex, QueryContext, Term, Equal, NotEqual, BitmapScanPlan
+
+try:
+    import numpy as _np  # optional: vectorized container decoding and intersections
+except Exception:  # pragma: no cover - optional dependency
+    _np = None  # type: ignore
+
+# A chunk holds 2^16 ordinals; it is stored as a sorted array of its low 16 bits while it has
+# at most ARRAY_LIMIT members, and as a 65536-bit bitset (a Python int) above that
+ARRAY_LIMIT = 4096
+_CHUNK_BITS = 16
+_LOW_MASK = (1 << _CHUNK_BITS) - 1
+_BITSET_BYTES = (1 << _CHUNK_BITS) // 8
+_KIND_ARRAY = 0
+_KIND_BITSET = 1
+_HEADER = struct.Struct('<IBI')
+
+# Positions of the set bits of every byte value, to decode bitsets a byte at a time
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+
+
+def _bitset_of(values) -> int:
+    bits = bytearray(_BITSET_BYTES)
+    for value in values:
+        bits[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _members_of(bitset: int) -> array:
+    data = bitset.to_bytes(_BITSET_BYTES, 'little')
+    if _np is not None:
+        positions = _np.flatnonzero(_np.unpackbits(_np.frombuffer(data, dtype=_np.uint8), bitorder='little'))
+        return array('H', positions.astype(_np.uint16).tobytes())
+    members = array('H')
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset << 3
+            members.extend(base + bit for bit in _BYTE_BITS[byte])
+    return members
+
+
+def _container_len(container) -> int:
+    return container.bit_count() if isinstance(container, int) else len(container)
+
+
+def _normalized(container):
+    """
+    Container in its compact form (array when sparse, bitset when dense), or None when empty.
+    """
+    if isinstance(container, int):
+        size = container.bit_count()
+        if size == 0:
+            return None
+        return _members_of(container) if size <= ARRAY_LIMIT else container
+    if not container:
+        return None
+    return _bitset_of(container) if len(container) > ARRAY_LIMIT else container
+
+
+def _array_and(left: array, right: array) -> array:
+    if _np is not None and len(left) + len(right) > 256:
+        both = _np.intersect1d(_np.frombuffer(left, dtype=_np.uint16), _np.frombuffer(right, dtype=_np.uint16),
+                               assume_unique=True)
+        return array('H', both.tobytes())
+    if len(left) > len(right):
+        left, right = right, left
+    members = set(right)
+    return array('H', [value for value in left if value in members])
+
+
+def _container_and(left, right):
+    if isinstance(left, int) and isinstance(right, int):
+        return _normalized(left & right)
+    if isinstance(left, int):
+        left, right = right, left
+    if isinstance(right, int):
+        return _normalized(array('H', [value for value in left if right >> value & 1]))
+    return _normalized(_array_and(left, right))
+
+
+def _container_or(left, right):
+    if isinstance(left, int) or isinstance(right, int):
+        left = left if isinstance(left, int) else _bitset_of(left)
+        right = right if isinstance(right, int) else _bitset_of(right)
+        return _normalized(left | right)
+    return _normalized(array('H', sorted(set(left).union(right))))
+
+
+def _container_andnot(left, right):
+    if isinstance(left, int):
+        right = right if isinstance(right, int) else _bitset_of(right)
+        return _normalized(left & ~right)
+    if isinstance(right, int):
+        return _normalized(array('H', [value for value in left if not right >> value & 1]))
+    removed = set(right)
+    return _normalized(array('H', [value for value in left if value not in removed]))
+
+
+class RoaringBitmap:
+    """
+    Immutable compressed set of non-negative integers (row ordinals), roaring style.
+
+    Ordinals are grouped in chunks by their high bits; each chunk is a sorted uint16 array while
+    sparse and a 65536-bit bitset once it has more than ARRAY_LIMIT members. AND/OR/ANDNOT work
+    chunk by chunk, and unchanged chunks are shared between bitmaps. NumPy, when installed,
+    speeds up decoding dense chunks and intersecting large arrays.
+    """
+    __slots__ = ('_keys', '_containers', '_size')
+
+    def __init__(self, values: Iterable[int] = ()):
+        chunks: dict[int, list[int]] = {}
+        for value in values:
+            chunks.setdefault(value >> _CHUNK_BITS, []).append(value & _LOW_MASK)
+        keys = sorted(chunks)
+        containers = [_normalized(array('H', sorted(set(chunks[key])))) for key in keys]
+        self._set_parts(keys, containers)
+
+    def _set_parts(self, keys: list[int], containers: list):
+        self._keys = keys
+        self._containers = containers
+        self._size = sum(_container_len(container) for container in containers)
+
+    @classmethod
+    def _from_parts(cls, keys: list[int], containers: list) -> RoaringBitmap:
+        bitmap = cls.__new__(cls)
+        bitmap._set_parts(keys, containers)
+        return bitmap
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __iter__(self) -> Iterator[int]:
+        for key, container in zip(self._keys, self._containers):
+            base = key << _CHUNK_BITS
+            for low in (_members_of(container) if isinstance(container, int) else container):
+                yield base + low
+
+    def __contains__(self, value: int) -> bool:
+        key = value >> _CHUNK_BITS
+        position = bisect_left(self._keys, key)
+        if position == len(self._keys) or self._keys[position] != key:
+            return False
+        container = self._containers[position]
+        low = value & _LOW_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        index = bisect_left(container, low)
+        return index < len(container) and container[index] == low
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RoaringBitmap):
+            return NotImplemented
+        return self._keys == other._keys and all(
+            (a == b) if isinstance(a, int) == isinstance(b, int) else False
+            for a, b in zip(self._containers, other._containers))
+
+    def __hash__(self):
+        return hash((tuple(self._keys), self._size))
+
+    def __repr__(self):
+        return f'RoaringBitmap({self._size} ordinals in {len(self._keys)} chunks)'
+
+    def _merge(self, other: RoaringBitmap, operation, keep_left: bool, keep_right: bool) -> RoaringBitmap:
+        keys: list[int] = []
+        containers: list = []
+        left_keys, right_keys = self._keys, other._keys
+        i = j = 0
+        while i < len(left_keys) or j < len(right_keys):
+            if j == len(right_keys) or (i < len(left_keys) and left_keys[i] < right_keys[j]):
+                if keep_left:
+                    keys.append(left_keys[i])
+                    containers.append(self._containers[i])
+                i += 1
+            elif i == len(left_keys) or right_keys[j] < left_keys[i]:
+                if keep_right:
+                    keys.append(right_keys[j])
+                    containers.append(other._containers[j])
+                j += 1
+            else:
+                container = operation(self._containers[i], other._containers[j])
+                if container is not None:
+                    keys.append(left_keys[i])
+                    containers.append(container)
+                i += 1
+                j += 1
+        return RoaringBitmap._from_parts(keys, containers)
+
+    def __and__(self, other: RoaringBitmap) -> RoaringBitmap:
+        return self._merge(other, _container_and, False, False)
+
+    def __or__(self, other: RoaringBitmap) -> RoaringBitmap:
+        return self._merge(other, _container_or, True, True)
+
+    def __sub__(self, other: RoaringBitmap) -> RoaringBitmap:
+        """
+        ANDNOT: ordinals of self that are not in other.
+        """
+        return self._merge(other, _container_andnot, True, False)
+
+    def add(self, value: int) -> RoaringBitmap:
+        if value in self:
+            return self
+        return self | RoaringBitmap((value,))
+
+    def discard(self, value: int) -> RoaringBitmap:
+        if value not in self:
+            return self
+        return self - RoaringBitmap((value,))
+
+    @staticmethod
+    def union_all(bitmaps: Iterable[RoaringBitmap]) -> RoaringBitmap:
+        result = RoaringBitmap()
+        for bitmap in bitmaps:
+            result = result | bitmap
+        return result
+
+    @staticmethod
+    def intersect_all(bitmaps: list[RoaringBitmap]) -> RoaringBitmap:
+        if not bitmaps:
+            return RoaringBitmap()
+        # Smallest first, so intermediate results stay small
+        ordered = sorted(bitmaps, key=len)
+        result = ordered[0]
+        for bitmap in ordered[1:]:
+            if not result:
+                break
+            result = result & bitmap
+        return result
+
+    def to_bytes(self) -> bytes:
+        parts = []
+        for key, container in zip(self._keys, self._containers):
+            if isinstance(container, int):
+                payload = container.to_bytes(_BITSET_BYTES, 'little')
+                parts.append(_HEADER.pack(key, _KIND_BITSET, len(payload)))
+            else:
+                payload = array('H', container)
+                if sys.byteorder != 'little':  # pragma: no cover
+                    payload.byteswap()
+                payload = payload.tobytes()
+                parts.append(_HEADER.pack(key, _KIND_ARRAY, len(payload)))
+            parts.append(payload)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> RoaringBitmap:
+        keys: list[int] = []
+        containers: list = []
+        offset = 0
+        while offset < len(data):
+            key, kind, length = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            payload = data[offset:offset + length]
+            offset += length
+            if kind == _KIND_BITSET:
+                containers.append(int.from_bytes(payload, 'little'))
+            else:
+                members = array('H')
+                members.frombytes(payload)
+                if sys.byteorder != 'little':  # pragma: no cover
+                    members.byteswap()
+                containers.append(members)
+            keys.append(key)
+        return cls._from_parts(keys, containers)
+
+
+class StoredBitmap(Atom):
+    """
+    Persistent holder of a RoaringBitmap; the serialized form is only produced when saved.
+    """
+    encoded: str
+
+    def __init__(self, bitmap: RoaringBitmap = None, encoded: str = None,
+                 transaction: AbstractTransaction = None, atom_pointer: AtomPointer = None, **kwargs):
+        super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.encoded = encoded
+        self._bitmap = bitmap
+
+    def after_load(self):
+        encoded = self.__dict__.get('encoded')
+        if isinstance(encoded, Literal):
+            object.__setattr__(self, 'encoded', encoded.string)
+
+    @property
+    def bitmap(self) -> RoaringBitmap:
+        bitmap = self.__dict__.get('_bitmap')
+        if bitmap is None:
+            self._load()
+            bitmap = RoaringBitmap.from_bytes(base64.b64decode(self.encoded or ''))
+            object.__setattr__(self, '_bitmap', bitmap)
+        return bitmap
+
+    def _save(self):
+        if self.__dict__.get('encoded') is None:
+            object.__setattr__(self, 'encoded', base64.b64encode(self.bitmap.to_bytes()).decode('ascii'))
+        super()._save()
+
+
+class BitmapIndex(QueryableIndex):
+    """
+    Index for low-cardinality fields (status, country, flags): maps every value to a compressed
+    bitmap of row ordinals.
+
+    Every indexed record gets a row ordinal, whether it has a value for the field or not.
+    Ordinals are never reused, so bitmap indexes sharing a row space (same `space_id`, see
+    IndexedQueryPlan.add_bitmap_index) and updated with the same records stay aligned, and
+    their bitmaps can be combined with AND/OR/ANDNOT directly (see AndMerge/OrMerge).
+
+    - bitmaps: Dictionary value -> StoredBitmap
+    - live: StoredBitmap of the ordinals of all indexed records
+    - rows: HashDictionary ordinal -> record
+    - ordinals: HashDictionary record reference -> ordinal
+
+    Records indexed before they are saved are referenced by identity (see _record_ref) and
+    listed in `_new_records`; their ordinals are keyed by AtomPointer hash when the index is saved.
+    """
+    field_name: str
+    space_id: str
+    next_ordinal: int
+    bitmaps: Dictionary
+    live: StoredBitmap
+    rows: HashDictionary
+    ordinals: HashDictionary
+    # Records referenced by identity until the index is saved: identity -> record (not persisted)
+    _new_records: HashDictionary = None
+
+    def __init__(
+            self,
+            field_name: str = None,
+            space_id: str = None,
+            next_ordinal: int = 0,
+            bitmaps: Dictionary = None,
+            live: StoredBitmap = None,
+            rows: HashDictionary = None,
+            ordinals: HashDictionary = None,
+            new_records: HashDictionary = None,
+            transaction: AbstractTransaction = None,
+            atom_pointer: AtomPointer = None,
+            **kwargs):
+        super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.field_name = field_name
+        self.space_id = space_id or str(uuid.uuid4())
+        self.next_ordinal = next_ordinal
+        self.bitmaps = bitmaps if bitmaps is not None else Dictionary(transaction=transaction)
+        self.live = live if live is not None else StoredBitmap(bitmap=RoaringBitmap(), transaction=transaction)
+        self.rows = rows if rows is not None else HashDictionary(transaction=transaction)
+        self.ordinals = ordinals if ordinals is not None else HashDictionary(transaction=transaction)
+        self._new_records = new_records if new_records is not None else HashDictionary(transaction=transaction)
+        self.count = self.rows.count
+
+    def after_load(self):
+        # Names are stored as Literals
+        for name in ('field_name', 'space_id'):
+            value = self.__dict__.get(name)
+            if isinstance(value, Literal):
+                object.__setattr__(self, name, value.string)
+
+    def sharing_rows(self, field_name: str) -> BitmapIndex:
+        """
+        Bitmap index on field_name over the same records and row ordinals as this one.
+        """
+        self._load()
+        bitmaps: dict[object, list[int]] = {}
+        for ordinal, record in self.rows.as_iterable():
+            value = _field_value(record, field_name)
+            if value is not None:
+                bitmaps.setdefault(value, []).append(ordinal)
+        stored = Dictionary(transaction=self.transaction)
+        for value, members in bitmaps.items():
+            stored = stored.set_at(value, StoredBitmap(bitmap=RoaringBitmap(members), transaction=self.transaction))
+        return BitmapIndex(
+            field_name=field_name,
+            space_id=self.space_id,
+            next_ordinal=self.next_ordinal,
+            bitmaps=stored,
+            live=self.live,
+            rows=self.rows,
+            ordinals=self.ordinals,
+            new_records=self._new_records,
+            transaction=self.transaction
+        )
+
+    def aligned_with(self, other: BitmapIndex) -> bool:
+        """
+        Whether ordinals of both indexes refer to the same records.
+        """
+        return isinstance(other, BitmapIndex) and other.space_id == self.space_id and \
+            other.next_ordinal == self.next_ordinal and other.rows.count == self.rows.count
+
+    def _with(self, next_ordinal: int, bitmaps: Dictionary, live: RoaringBitmap, rows: HashDictionary,
+              ordinals: HashDictionary, new_records: HashDictionary) -> BitmapIndex:
+        return BitmapIndex(
+            field_name=self.field_name,
+            space_id=self.space_id,
+            next_ordinal=next_ordinal,
+            bitmaps=bitmaps,
+            live=StoredBitmap(bitmap=live, transaction=self.transaction),
+            rows=rows,
+            ordinals=ordinals,
+            new_records=new_records,
+            transaction=self.transaction
+        )
+
+    def bitmap_at(self, value: object) -> RoaringBitmap:
+        """
+        Ordinals of the records whose field equals value.
+        """
+        stored = self.bitmaps.get_at(value.string if isinstance(value, Literal) else value)
+        return stored.bitmap if stored is not None else RoaringBitmap()
+
+    def all_rows(self) -> RoaringBitmap:
+        return self.live.bitmap
+
+    def add_record(self, record: object, field_name: str = None) -> BitmapIndex:
+        return self.add_records([record])
+
+    def add_records(self, records) -> BitmapIndex:
+        """
+        Give each new record the next row ordinal and set it in the bitmap of its value. Every
+        bitmap is rewritten once per batch.
+        """
+        self._load()
+        next_ordinal = self.next_ordinal
+        rows = self.rows
+        ordinals = self.ordinals
+        additions: dict[object, list[int]] = {}
+        added: list[int] = []
+        new_records = self._new_records
+        for record in records:
+            ref = _record_ref(record)
+            if ordinals.has(ref):
+                continue
+            if isinstance(record, Atom) and not record.__dict__.get('atom_pointer'):
+                new_records = new_records.set_at(ref, record)
+            ordinal = next_ordinal
+            next_ordinal += 1
+            rows = rows.set_at(ordinal, record)
+            ordinals = ordinals.set_at(ref, ordinal)
+            added.append(ordinal)
+            value = _field_value(record, self.field_name)
+            if value is not None:
+                additions.setdefault(value, []).append(ordinal)
+        if not added:
+            return self
+
+        bitmaps = self.bitmaps
+        for value, members in additions.items():
+            bitmap = self.bitmap_at(value) | RoaringBitmap(members)
+            bitmaps = bitmaps.set_at(value, StoredBitmap(bitmap=bitmap, transaction=self.transaction))
+        return self._with(next_ordinal, bitmaps, self.all_rows() | RoaringBitmap(added), rows, ordinals,
+                          new_records)
+
+    def remove_record(self, record: object, field_name: str = None) -> BitmapIndex:
+        """
+        Drop record and clear its ordinal; the ordinal is not reused.
+        """
+        self._load()
+        ref = _record_ref(record)
+        ordinal = self.ordinals.get_at(ref)
+        if ordinal is None:
+            return self
+        bitmaps = self.bitmaps
+        value = _field_value(self.rows.get_at(ordinal), self.field_name)
+        if value is not None:
+            bitmap = self.bitmap_at(value).discard(ordinal)
+            bitmaps = bitmaps.set_at(value, StoredBitmap(bitmap=bitmap, transaction=self.transaction)) if bitmap \
+                else bitmaps.remove_at(value)
+        return self._with(self.next_ordinal, bitmaps, self.all_rows().discard(ordinal),
+                          self.rows.remove_at(ordinal), self.ordinals.remove_at(ref), self._new_records.remove_at(ref))
+
+    def _save(self):
+        if not self._saved and not self.__dict__.get('atom_pointer') and self._new_records.count:
+            # Key the ordinals of records indexed by identity by their AtomPointer hash, now that they are stored
+            ordinals = self.ordinals
+            for ref, record in self._new_records.as_iterable():
+                ordinal = ordinals.get_at(ref)
+                if ordinal is not None:
+                    ordinals = ordinals.remove_at(ref).set_at(_stored_ref(record, self.transaction), ordinal)
+            object.__setattr__(self, 'ordinals', ordinals)
+            self._new_records = HashDictionary(transaction=self.transaction)
+        super()._save()
+
+    def index_add(self, item, field_name: str = None) -> BitmapIndex:
+        return self.add_record(item)
+
+    def index_remove(self, item, field_name: str = None) -> BitmapIndex:
+        return self.remove_record(item)
+
+    def records_of(self, bitmap: RoaringBitmap):
+        """
+        Records behind the ordinals of bitmap, in ordinal order.
+        """
+        rows = self.rows
+        for ordinal in bitmap:
+            record = rows.get_at(ordinal)
+            if record is not None:
+                yield record
+
+    def build_query_plan(self, term: Term, context: QueryContext) -> Optional[BitmapScanPlan]:
+        """
+        Any comparison is answered by checking it once per distinct value. When records without a
+        value also match (e.g. `!=`), the plan is the complement of the non-matching values.
+        """
+        if not isinstance(term, Term):
+            return None
+        op = term.operation
+        expected = term.value.string if isinstance(term.value, Literal) else term.value
+        if isinstance(op, Equal):
+            return BitmapScanPlan(index=self, values=[expected], transaction=context.transaction)
+        if isinstance(op, NotEqual):
+            return BitmapScanPlan(index=self, values=[expected], negated=True, transaction=context.transaction)
+
+        def _matches(value) -> bool:
+            try:
+                return bool(op.match(value, expected))
+            except Exception:
+                return False
+
+        matching, others = [], []
+        for value, _ in self.bitmaps.as_iterable():
+            (matching if _matches(value) else others).append(value)
+        if _matches(None):
+            return BitmapScanPlan(index=self, values=others, negated=True, transaction=context.transaction)
+        return BitmapScanPlan(index=self, values=matching, transaction=context.transaction)
+
+    def as_iterable(self):
+        self._load()
+        for _, record in self.rows.as_iterable():
+            yield record
+
+    def as_query_plan(self):
+        from .queries import ListPlan as _ListPlan
+        return _ListPlan(base_list=list(self.as_iterable()), transaction=self.transaction)
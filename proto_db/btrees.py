@@ -0,0 +1,674 @@
+"""
+Wide-fanout persistent B+tree collections.
+
+List, Dictionary and HashDictionary spend one Atom per element (binary AVL nodes), so a
+point lookup over N elements touches about log2(N) atoms, each one a storage read, a
+decode and a Python object. The collections in this module keep up to `fanout` entries
+(32-256 recommended, 64 by default) in every node, so the same lookup touches about
+log_fanout(N) atoms: 3-4 reads for tens of millions of entries.
+
+Nodes are immutable and updated copy-on-write: an update copies the nodes on the path
+from the root to the touched leaf and shares every other node with the previous version.
+Scans walk the leaves in order with an explicit path stack, reading each leaf (up to
+`fanout` entries) with a single atom read. Leaves are not linked to their siblings: with
+copy-on-write, a sibling link would force rewriting every leaf in front of an updated one.
+
+- BTreeList: positional sequence, addressed by offset (subtree counts in internal nodes).
+- BTreeDictionary: ordered map, addressed by key (same key ordering as Dictionary).
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+from itertools import accumulate
+from typing import cast
+
+from .common import Atom, DBCollections, QueryPlan, AbstractTransaction, AtomPointer
+from .exceptions import ProtoValidationException
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_FANOUT = 64
+MIN_FANOUT = 4
+MAX_FANOUT = 1024
+
+
+def _check_fanout(fanout: int) -> int:
+    fanout = int(fanout)
+    if fanout < MIN_FANOUT or fanout > MAX_FANOUT:
+        raise ProtoValidationException(
+            message=f'B+tree fanout must be between {MIN_FANOUT} and {MAX_FANOUT} (got {fanout})'
+        )
+    return fanout
+
+
+_dictionary_order_key = None
+
+
+def _order_key(key: object):
+    # Same deterministic mixed-type ordering as Dictionary (imported lazily to avoid cycles)
+    global _dictionary_order_key
+    if _dictionary_order_key is None:
+        from .dictionaries import DictionaryItem
+        _dictionary_order_key = DictionaryItem._order_key
+    return _dictionary_order_key(key)
+
+
+class BTreeNode(Atom):
+    """
+    A B+tree node. Leaves hold the entries (keys are only present in keyed trees); internal
+    nodes hold their children, the entry count of every child and, in keyed trees, the
+    smallest key of every child.
+
+    The entry lists are kept in private attributes and encoded into the public (persisted)
+    ones when the node is saved.
+    """
+    leaf: bool = True
+    keys: list = None
+    values: list = None
+    children: list = None
+    counts: list = None
+    count: int = 0
+
+    def __init__(self,
+                 leaf: bool = True,
+                 keys: list = None,
+                 values: list = None,
+                 children: list = None,
+                 counts: list = None,
+                 transaction: AbstractTransaction = None,
+                 atom_pointer: AtomPointer = None,
+                 **kwargs):
+        super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.leaf = leaf
+        self._keys = list(keys) if keys else []
+        self._values = list(values) if values else []
+        self._children = list(children) if children else []
+        self._counts = list(counts) if counts else []
+        self._oks = None
+        self._prefix = None
+        self.count = len(self._values) if leaf else sum(self._counts)
+
+    def _load(self):
+        if not self._loaded:
+            super()._load()
+            if self.atom_pointer:
+                self._keys = self._decode(self.keys)
+                self._values = self._decode(self.values)
+                self._children = self._decode(self.children)
+                self._counts = list(self.counts or [])
+                self._oks = None
+                self._prefix = None
+            self._loaded = True
+
+    def _save(self):
+        self._load()
+        if not self._saved and not self.atom_pointer:
+            self.keys = self._encode(self._keys) if self._keys else None
+            self.values = self._encode(self._values) if self.leaf and self._values else None
+            self.children = self._encode(self._children) if not self.leaf else None
+            self.counts = list(self._counts) if not self.leaf else None
+            super()._save()
+
+    def _encode(self, items: list) -> list:
+        encoded = []
+        for item in items:
+            if isinstance(item, Atom) and not item.transaction:
+                item.transaction = self.transaction
+            encoded.append(self._dict_to_json({'v': item}).get('v', {'className': 'None'}))
+        return encoded
+
+    def _decode(self, encoded: list | None) -> list:
+        if not encoded:
+            return []
+        return [self._json_to_dict({'v': item})['v'] for item in encoded]
+
+    def size(self) -> int:
+        return len(self._values) if self.leaf else len(self._children)
+
+    def child(self, index: int) -> BTreeNode:
+        node = cast(BTreeNode, self._children[index])
+        node._load()
+        return node
+
+    def first_key(self) -> object:
+        return self._keys[0] if self._keys else None
+
+    def order_keys(self) -> list:
+        if self._oks is None:
+            self._oks = [_order_key(k) for k in self._keys]
+        return self._oks
+
+    def child_for_key(self, ok) -> int:
+        index = bisect.bisect_right(self.order_keys(), ok) - 1
+        return index if index > 0 else 0
+
+    def child_for_offset(self, offset: int) -> tuple[int, int]:
+        if self._prefix is None:
+            self._prefix = list(accumulate(self._counts))
+        index = bisect.bisect_right(self._prefix, offset)
+        if index >= len(self._children):
+            # Only reachable when inserting at the very end
+            index = len(self._children) - 1
+        return index, offset - (self._prefix[index - 1] if index > 0 else 0)
+
+
+def _build(leaf: bool, keyed: bool, fanout: int, transaction: AbstractTransaction,
+           keys: list, values: list, children: list, counts: list) -> list[BTreeNode]:
+    """
+    Build the node(s) holding the given entries, splitting evenly when they exceed fanout.
+    """
+    size = len(values) if leaf else len(children)
+    pieces = max(1, -(-size // fanout))
+    nodes = []
+    for piece in range(pieces):
+        lo = size * piece // pieces
+        hi = size * (piece + 1) // pieces
+        if leaf:
+            nodes.append(BTreeNode(leaf=True,
+                                   keys=keys[lo:hi] if keyed else None,
+                                   values=values[lo:hi],
+                                   transaction=transaction))
+        else:
+            nodes.append(BTreeNode(leaf=False,
+                                   keys=keys[lo:hi] if keyed else None,
+                                   children=children[lo:hi],
+                                   counts=counts[lo:hi],
+                                   transaction=transaction))
+    return nodes
+
+
+def _replace_children(node: BTreeNode, index: int, width: int, parts: list[BTreeNode],
+                      keyed: bool, fanout: int) -> list[BTreeNode]:
+    """
+    Copy of an internal node where children[index:index + width] are replaced by parts.
+    """
+    children = node._children[:index] + parts + node._children[index + width:]
+    counts = node._counts[:index] + [p.count for p in parts] + node._counts[index + width:]
+    keys = []
+    if keyed:
+        keys = node._keys[:index] + [p.first_key() for p in parts] + node._keys[index + width:]
+    return _build(False, keyed, fanout, node.transaction, keys, [], children, counts)
+
+
+def _merge(left: BTreeNode, right: BTreeNode, keyed: bool, fanout: int) -> list[BTreeNode]:
+    """
+    Merge two adjacent siblings, re-splitting evenly when they do not fit in one node.
+    """
+    if left.leaf:
+        return _build(True, keyed, fanout, left.transaction,
+                      left._keys + right._keys, left._values + right._values, [], [])
+    return _build(False, keyed, fanout, left.transaction,
+                  left._keys + right._keys, [], left._children + right._children,
+                  left._counts + right._counts)
+
+
+def _rebalanced(node: BTreeNode, index: int, new_child: BTreeNode, keyed: bool, fanout: int) -> list[BTreeNode]:
+    """
+    Copy of an internal node after its child at index shrank to new_child.
+    Empty children are dropped (the node itself may become empty, and is then dropped by
+    its own parent) and underfull ones are merged with a sibling, so all leaves stay at
+    the same depth.
+    """
+    if new_child.size() == 0:
+        return _replace_children(node, index, 1, [], keyed, fanout)
+    if new_child.size() < fanout // 2 and len(node._children) > 1:
+        if index > 0:
+            merged = _merge(node.child(index - 1), new_child, keyed, fanout)
+            return _replace_children(node, index - 1, 2, merged, keyed, fanout)
+        merged = _merge(new_child, node.child(index + 1), keyed, fanout)
+        return _replace_children(node, index, 2, merged, keyed, fanout)
+    return _replace_children(node, index, 1, [new_child], keyed, fanout)
+
+
+def _new_root(parts: list[BTreeNode], keyed: bool, fanout: int, transaction: AbstractTransaction) -> BTreeNode:
+    while len(parts) > 1:
+        parts = _build(False, keyed, fanout, transaction,
+                       [p.first_key() for p in parts] if keyed else [],
+                       [], parts, [p.count for p in parts])
+    root = parts[0]
+    # Collapse internal roots left with a single child
+    while not root.leaf and len(root._children) == 1:
+        root = root.child(0)
+    return root
+
+
+def _scan(root: BTreeNode, choose, start_in_leaf):
+    """
+    Yield (leaf, position) pairs in order, starting at the entry located by choose (for
+    internal nodes) and start_in_leaf (for the first leaf), using an explicit path stack.
+    """
+    stack = []
+    node = root
+    while not node.leaf:
+        index = choose(node)
+        stack.append((node, index))
+        node = node.child(index)
+    position = start_in_leaf(node)
+    while True:
+        for i in range(position, len(node._values)):
+            yield node, i
+        while stack:
+            parent, index = stack.pop()
+            if index + 1 < len(parent._children):
+                stack.append((parent, index + 1))
+                node = parent.child(index + 1)
+                while not node.leaf:
+                    stack.append((node, 0))
+                    node = node.child(0)
+                position = 0
+                break
+        else:
+            return
+
+
+class _RecordsView:
+    """
+    Read-only view over the values of a BTreeDictionary, so plans consuming execute()
+    results (as_iterable/count) can scan it without materializing a copy.
+    """
+
+    def __init__(self, base: BTreeDictionary):
+        self.base = base
+        self.count = base.count
+
+    def as_iterable(self):
+        return self.base.records()
+
+    def __iter__(self):
+        return iter(self.base.records())
+
+
+class BTreeQueryPlan(QueryPlan):
+    """
+    Full scan of a B+tree collection, leaf by leaf.
+    """
+    base: DBCollections
+
+    def __init__(self,
+                 base: DBCollections = None,
+                 transaction: AbstractTransaction = None,
+                 atom_pointer: AtomPointer = None,
+                 **kwargs):
+        super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.base = base
+
+    def execute(self):
+        return self.base.records_view()
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return self
+
+    def get_cardinality_estimate(self) -> int:
+        return self.base.count
+
+    def explain(self) -> dict:
+        return {
+            'plan_type': type(self).__name__,
+            'collection': type(self.base).__name__,
+            'count': self.base.count,
+            'fanout': getattr(self.base, 'fanout', None),
+        }
+
+
+class _BTreeCollection(DBCollections):
+    root: BTreeNode
+    fanout: int
+
+    def __init__(self,
+                 root: BTreeNode = None,
+                 fanout: int = DEFAULT_FANOUT,
+                 indexes: DBCollections = None,
+                 transaction: AbstractTransaction = None,
+                 atom_pointer: AtomPointer = None,
+                 **kwargs):
+        super().__init__(indexes=indexes, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.fanout = _check_fanout(fanout)
+        self.root = root
+        self.count = root.count if root is not None else 0
+
+    def _load(self):
+        if not self._loaded:
+            super()._load()
+            self._loaded = True
+
+    def _save(self):
+        self._load()
+        if not self._saved:
+            if self.root is not None:
+                self.root.transaction = self.transaction
+                self.root._save()
+            super()._save()
+            self._saved = True
+
+    def _root(self) -> BTreeNode | None:
+        self._load()
+        root = self.root
+        if root is not None:
+            if not root.transaction:
+                root.transaction = self.transaction
+            root._load()
+        return root
+
+    def height(self) -> int:
+        """
+        Number of node levels, i.e. the atoms read by a point lookup.
+        """
+        node = self._root()
+        levels = 0
+        while node is not None:
+            levels += 1
+            node = None if node.leaf else node.child(0)
+        return levels
+
+    def _with_root(self, root: BTreeNode | None, indexes: DBCollections = None):
+        """
+        Collection with root as its tree, and indexes (by default, the current ones).
+        """
+        if root is not None and root.count == 0:
+            root = None
+        return type(self)(root=root, fanout=self.fanout, indexes=indexes if indexes is not None else self.indexes,
+                          transaction=self.transaction)
+
+    def _replaced_in_indexes(self, old_value: object, value: object) -> DBCollections:
+        """
+        Indexes with old_value replaced by value.
+        """
+        return self.add2indexes(value, self.remove_from_indexes(old_value))
+
+    def as_query_plan(self) -> QueryPlan:
+        plan = BTreeQueryPlan(base=self, transaction=self.transaction)
+        if self.indexes:
+            from .queries import IndexedQueryPlan
+            return IndexedQueryPlan(based_on=plan, indexes=self.indexes, transaction=self.transaction)
+        return plan
+
+
+class BTreeList(_BTreeCollection):
+    """
+    Durable positional sequence backed by a wide-fanout B+tree.
+
+    Offers the List API (get_at, set_at, insert_at, remove_at, append_first, append_last,
+    as_iterable, iter_from) with O(log_fanout n) atom reads per operation.
+    """
+
+    def get_at(self, offset: int) -> object | None:
+        node = self._root()
+        if node is None:
+            return None
+        if offset < 0:
+            offset = self.count + offset
+        if offset < 0 or offset >= self.count:
+            return None
+        while not node.leaf:
+            index, offset = node.child_for_offset(offset)
+            node = node.child(index)
+        value = node._values[offset]
+        if isinstance(value, Atom):
+            value._load()
+        return value
+
+    def set_at(self, offset: int, value: object) -> BTreeList:
+        """
+        Replaces the value at offset. Negative offsets count from the end; offset == count
+        appends. Any other offset outside [0, count-1] raises IndexError.
+        """
+        if offset < 0:
+            offset = self.count + offset
+        if offset == self.count:
+            return self.insert_at(offset, value)
+        if offset < 0 or offset > self.count:
+            raise IndexError('Offset out of range')
+
+        def assign(node: BTreeNode, offset: int) -> BTreeNode:
+            if node.leaf:
+                values = list(node._values)
+                values[offset] = value
+                return BTreeNode(leaf=True, values=values, transaction=self.transaction)
+            index, sub_offset = node.child_for_offset(offset)
+            return _replace_children(node, index, 1, [assign(node.child(index), sub_offset)],
+                                     False, self.fanout)[0]
+
+        indexes = self._replaced_in_indexes(self.get_at(offset), value) if self.indexes else None
+        return self._with_root(assign(self._root(), offset), indexes)
+
+    def insert_at(self, offset: int, value: object) -> BTreeList:
+        """
+        Inserts value at offset; followers shift by one. Offsets are clamped to [0, count].
+        """
+        self._load()
+        if offset < 0:
+            offset = max(0, self.count + offset)
+        offset = min(offset, self.count)
+        root = self._root()
+        indexes = self.add2indexes(value) if self.indexes else None
+        if root is None:
+            return self._with_root(BTreeNode(leaf=True, values=[value], transaction=self.transaction), indexes)
+
+        def insert(node: BTreeNode, offset: int) -> list[BTreeNode]:
+            if node.leaf:
+                values = list(node._values)
+                values.insert(offset, value)
+                return _build(True, False, self.fanout, self.transaction, [], values, [], [])
+            index, sub_offset = node.child_for_offset(offset)
+            return _replace_children(node, index, 1, insert(node.child(index), sub_offset),
+                                     False, self.fanout)
+
+        return self._with_root(_new_root(insert(root, offset), False, self.fanout, self.transaction), indexes)
+
+    def remove_at(self, offset: int) -> BTreeList:
+        self._load()
+        if offset < 0:
+            offset = self.count + offset
+        if offset < 0 or offset >= self.count:
+            return self
+
+        def remove(node: BTreeNode, offset: int) -> list[BTreeNode]:
+            if node.leaf:
+                values = list(node._values)
+                del values[offset]
+                return [BTreeNode(leaf=True, values=values, transaction=self.transaction)]
+            index, sub_offset = node.child_for_offset(offset)
+            parts = remove(node.child(index), sub_offset)
+            if len(parts) == 1:
+                return _rebalanced(node, index, parts[0], False, self.fanout)
+            return _replace_children(node, index, 1, parts, False, self.fanout)
+
+        indexes = self.remove_from_indexes(self.get_at(offset)) if self.indexes else None
+        return self._with_root(_new_root(remove(self._root(), offset), False, self.fanout, self.transaction),
+                               indexes)
+
+    def append_first(self, item: object) -> BTreeList:
+        return self.insert_at(0, item)
+
+    def append_last(self, item: object) -> BTreeList:
+        self._load()
+        return self.insert_at(self.count, item)
+
+    def extend(self, items) -> BTreeList:
+        result = self
+        for item in items:
+            result = result.append_last(item)
+        return result
+
+    def iter_from(self, offset: int = 0):
+        """
+        Yields the items in order starting at offset, one leaf read per `fanout` items.
+        """
+        root = self._root()
+        if root is None:
+            return
+        if offset < 0:
+            offset = max(0, self.count + offset)
+        if offset >= self.count:
+            return
+        remaining = [offset]
+
+        def choose(node: BTreeNode) -> int:
+            index, remaining[0] = node.child_for_offset(remaining[0])
+            return index
+
+        for leaf, position in _scan(root, choose, lambda leaf: remaining[0]):
+            value = leaf._values[position]
+            if isinstance(value, Atom):
+                value._load()
+            yield value
+
+    def as_iterable(self):
+        return self.iter_from(0)
+
+    def records(self):
+        return self.iter_from(0)
+
+    def records_view(self) -> BTreeList:
+        return self
+
+
+class BTreeDictionary(_BTreeCollection):
+    """
+    Durable ordered mapping backed by a wide-fanout B+tree.
+
+    Offers the Dictionary API (get_at, set_at, remove_at, has, as_iterable) with native-type
+    keys ordered as in Dictionary, plus ordered range scans with iter_range.
+    """
+
+    @staticmethod
+    def _locate(node: BTreeNode, ok, key: object) -> list[int] | None:
+        """
+        Child indexes down to key, ending with its position in the leaf, or None. Distinct
+        keys may share an order key (e.g. objects ordered by their text): their run is
+        searched for key itself, in every child it may extend over.
+        """
+        oks = node.order_keys()
+        if node.leaf:
+            for position in range(bisect.bisect_left(oks, ok), bisect.bisect_right(oks, ok)):
+                if node._keys[position] == key:
+                    return [position]
+            return None
+        for index in range(max(0, bisect.bisect_left(oks, ok) - 1), node.child_for_key(ok) + 1):
+            path = BTreeDictionary._locate(node.child(index), ok, key)
+            if path is not None:
+                return [index] + path
+        return None
+
+    def _find(self, key: object) -> tuple[BTreeNode | None, int, bool]:
+        node = self._root()
+        if node is None:
+            return None, 0, False
+        path = self._locate(node, _order_key(key), key)
+        if path is None:
+            return None, 0, False
+        for index in path[:-1]:
+            node = node.child(index)
+        return node, path[-1], True
+
+    def get_at(self, key: object) -> object | None:
+        node, position, found = self._find(key)
+        if not found:
+            return None
+        value = node._values[position]
+        if isinstance(value, Atom):
+            value._load()
+        return value
+
+    def has(self, key: object) -> bool:
+        return self._find(key)[2]
+
+    def set_at(self, key: object, value: object) -> BTreeDictionary:
+        self._load()
+        ok = _order_key(key)
+        root = self._root()
+        if root is None:
+            return self._with_root(BTreeNode(leaf=True, keys=[key], values=[value], transaction=self.transaction),
+                                   self.add2indexes(value) if self.indexes else None)
+
+        # The entry of key is replaced where it is; a new key goes after the keys it ties with
+        path = self._locate(root, ok, key)
+        indexes = None
+        if self.indexes:
+            indexes = self._replaced_in_indexes(self.get_at(key), value) if path is not None else \
+                self.add2indexes(value)
+
+        def put(node: BTreeNode, depth: int) -> list[BTreeNode]:
+            if node.leaf:
+                keys = list(node._keys)
+                values = list(node._values)
+                if path is not None:
+                    keys[path[depth]] = key
+                    values[path[depth]] = value
+                else:
+                    position = bisect.bisect_right(node.order_keys(), ok)
+                    keys.insert(position, key)
+                    values.insert(position, value)
+                return _build(True, True, self.fanout, self.transaction, keys, values, [], [])
+            index = path[depth] if path is not None else node.child_for_key(ok)
+            return _replace_children(node, index, 1, put(node.child(index), depth + 1), True, self.fanout)
+
+        return self._with_root(_new_root(put(root, 0), True, self.fanout, self.transaction), indexes)
+
+    def remove_at(self, key: object) -> BTreeDictionary:
+        root = self._root()
+        path = self._locate(root, _order_key(key), key) if root is not None else None
+        if path is None:
+            return self
+
+        def remove(node: BTreeNode, depth: int) -> list[BTreeNode]:
+            if node.leaf:
+                keys = list(node._keys)
+                values = list(node._values)
+                del keys[path[depth]]
+                del values[path[depth]]
+                return [BTreeNode(leaf=True, keys=keys, values=values, transaction=self.transaction)]
+            index = path[depth]
+            parts = remove(node.child(index), depth + 1)
+            if len(parts) == 1:
+                return _rebalanced(node, index, parts[0], True, self.fanout)
+            return _replace_children(node, index, 1, parts, True, self.fanout)
+
+        indexes = self.remove_from_indexes(self.get_at(key)) if self.indexes else None
+        return self._with_root(_new_root(remove(root, 0), True, self.fanout, self.transaction), indexes)
+
+    def iter_range(self, lo: object = None, hi: object = None,
+                   include_lower: bool = True, include_upper: bool = True):
+        """
+        Yields (key, value) pairs with lo <= key <= hi in key order (None leaves a side open),
+        descending once to the first leaf and then reading leaves sequentially.
+        """
+        root = self._root()
+        if root is None:
+            return
+        lo_ok = _order_key(lo) if lo is not None else None
+        hi_ok = _order_key(hi) if hi is not None else None
+
+        def choose(node: BTreeNode) -> int:
+            return node.child_for_key(lo_ok) if lo_ok is not None else 0
+
+        def start_in_leaf(leaf: BTreeNode) -> int:
+            if lo_ok is None:
+                return 0
+            oks = leaf.order_keys()
+            return bisect.bisect_left(oks, lo_ok) if include_lower else bisect.bisect_right(oks, lo_ok)
+
+        for leaf, position in _scan(root, choose, start_in_leaf):
+            key_ok = leaf.order_keys()[position]
+            if lo_ok is not None and (key_ok < lo_ok or (key_ok == lo_ok and not include_lower)):
+                continue
+            if hi_ok is not None and (key_ok > hi_ok or (key_ok == hi_ok and not include_upper)):
+                return
+            value = leaf._values[position]
+            if isinstance(value, Atom):
+                value._load()
+            yield leaf._keys[position], value
+
+    def as_iterable(self):
+        """
+        Yields (key, value) pairs in key order.
+        """
+        return self.iter_range()
+
+    def records(self):
+        for _, value in self.iter_range():
+            yield value
+
+    def records_view(self) -> _RecordsView:
+        return _RecordsView(self)
@@ -5,6 +5,8 @@ from __future__ import annotations
 
 import configparser
 import datetime
+import functools
+import hashlib
 import io
 import uuid
 import logging
@@ -347,7 +349,11 @@ class Atom(metaclass=CombinedMeta):
                         ap = None
                 if ap and getattr(ap, 'transaction_id', None):
                     atom_pointer = ap
-                    loaded_atom = transaction.storage.get_atom(atom_pointer).result()
+                    # Reuse the read issued by _prefetch, if any
+                    pending = self.__dict__.pop('_pending_load', None)
+                    if pending is None:
+                        pending = transaction.storage.get_atom(atom_pointer)
+                    loaded_atom = pending.result()
                     loaded_dict = self._json_to_dict(loaded_atom)
                     for attribute_name, attribute_value in loaded_dict.items():
                         # Use object.__setattr__ to bypass potential recursion in __setattr__
@@ -359,6 +365,23 @@ class Atom(metaclass=CombinedMeta):
             object.__setattr__(self, '_loaded', True)
             self.after_load()
 
+    def _prefetch(self):
+        """
+        Issue the storage read for this atom without waiting for it. A later _load consumes
+        the pending read instead of asking the storage again.
+        """
+        state = self.__dict__
+        if state.get('_loaded') or '_pending_load' in state:
+            return
+        transaction = state.get('transaction')
+        ap = state.get('atom_pointer')
+        if transaction and isinstance(ap, AtomPointer):
+            try:
+                state['_pending_load'] = transaction.storage.get_atom(ap)
+            except Exception:
+                # Prefetching is an optimization only; _load will retry synchronously
+                pass
+
     def after_load(self):
         """
         Perform any additional operations after the object is loaded in memory from storage.
@@ -799,9 +822,13 @@ class DBObject(Atom):
             )
 
     def set_at(self, name: str, value: object) -> DBObject:
+        # The new version is a new atom: copy the fields, not the pointer to the stored version
+        # (it would be reloaded from there, losing the change)
+        if self.__dict__.get('atom_pointer') is not None:
+            self._load()
         new_object = DBObject(transaction=self.transaction)
         for attr_name, attr_value in self.__dict__.items():
-            if attr_name != '_loaded':  # Skip _loaded flag to avoid recursion
+            if attr_name not in ('_loaded', '_saved', 'atom_pointer'):
                 object.__setattr__(new_object, attr_name, attr_value)
         object.__setattr__(new_object, name, value)
         return new_object
@@ -898,6 +925,137 @@ class MutableObject(Atom):
         return self.hash()
 
 
+def subtree_stats(node: Atom | None) -> tuple[int, int]:
+    """
+    Return (count, height) of a binary tree child (List/HashDictionary node).
+
+    Tree nodes keep the count and height of their children in their own header, and
+    stamp them on the (still unloaded) children when they are loaded. The child is only
+    read from storage when neither source is available, i.e. for nodes written before
+    the header fields existed.
+    """
+    if node is None:
+        return 0, 0
+    state = node.__dict__
+    if not state.get('_loaded') and state.get('atom_pointer') and not state.get('_stats_known'):
+        node._load()
+    return node.count, node.height
+
+
+def stamp_subtree_stats(node: Atom | None, count: int | None, height: int | None):
+    """
+    Record the count and height of an unloaded child, as read from its parent's header.
+    """
+    if node is None or count is None or height is None:
+        return
+    if node.__dict__.get('_loaded'):
+        return
+    object.__setattr__(node, 'count', count)
+    object.__setattr__(node, 'height', height)
+    object.__setattr__(node, '_stats_known', True)
+
+
+def value_weight(value: object) -> int | None:
+    """
+    Weight of a value held by a List node: the number of rows it stands for (see List.total).
+    Values weigh 1 unless their type defines list_weight(), which may answer None when the
+    weight is unknown.
+    """
+    list_weight = getattr(type(value), 'list_weight', None)
+    return list_weight(value) if callable(list_weight) else 1
+
+
+def subtree_total(node: Atom | None) -> int | None:
+    """
+    Return the total weight of the values of a List child (None when unknown, for nodes
+    written before totals were kept). Like subtree_stats, the total is read from the header
+    of the parent when it was stamped on the child, and the child is only loaded otherwise.
+    """
+    if node is None:
+        return 0
+    state = node.__dict__
+    if not state.get('_loaded') and state.get('atom_pointer') and not state.get('_total_known'):
+        node._load()
+    return node.total
+
+
+def stamp_subtree_total(node: Atom | None, total: int | None):
+    """
+    Record the total weight of an unloaded List child, as read from its parent's header.
+    """
+    if node is None or total is None or node.__dict__.get('_loaded'):
+        return
+    object.__setattr__(node, 'total', total)
+    object.__setattr__(node, '_total_known', True)
+
+
+def _default_prefetch_depth() -> int:
+    import os as _os
+    try:
+        return max(0, int(_os.environ.get('PB_SCAN_PREFETCH_DEPTH', '8')))
+    except Exception:
+        return 8
+
+
+# Number of reads a tree scan keeps in flight ahead of its cursor (PB_SCAN_PREFETCH_DEPTH)
+DEFAULT_PREFETCH_DEPTH: int = _default_prefetch_depth()
+
+
+def iter_tree_nodes(root: Atom | None, prefetch_depth: int | None = None):
+    """
+    In-order walk over a binary tree of List/HashDictionary nodes, using an explicit stack.
+
+    Before each node is yielded, reads are issued for the nodes (and their values) the cursor
+    will visit next, up to prefetch_depth of them, so a cold scan overlaps storage latency
+    instead of waiting for one node at a time. With prefetch_depth 0 every node is loaded
+    synchronously. Empty placeholder nodes are yielded too; callers skip them.
+    """
+    if prefetch_depth is None:
+        prefetch_depth = DEFAULT_PREFETCH_DEPTH
+    stack = []
+    node = root
+    while True:
+        while node is not None:
+            node._load()
+            stack.append(node)
+            node = node.previous
+        if not stack:
+            return
+        if prefetch_depth:
+            _prefetch_ahead(stack, prefetch_depth)
+        node = stack.pop()
+        yield node
+        node = node.next
+
+
+def _prefetch_ahead(stack: list, window: int):
+    # The top of the stack is visited first: its value, then its right subtree, then the next entry
+    issued = 0
+    for position in range(len(stack) - 1, -1, -1):
+        entry = stack[position]
+        for upcoming in (entry.value, entry.next):
+            if isinstance(upcoming, Atom) and not upcoming.__dict__.get('_loaded'):
+                upcoming._prefetch()
+                issued += 1
+                if issued >= window:
+                    return
+
+
+def _indexed_field(index_name: str, index: object) -> str:
+    # Indexes are registered under their field name, unless they tell otherwise (partial indexes)
+    indexed_field = getattr(type(index), 'indexed_field', None)
+    field_name = indexed_field(index) if callable(indexed_field) else None
+    return field_name if field_name is not None else index_name
+
+
+def _has_field(item: object, field_name: str) -> bool:
+    try:
+        return field_name in item  # DBObject supports 'in' for fields
+    except Exception:
+        # Fallback for plain objects/dicts
+        return hasattr(item, field_name) or (isinstance(item, dict) and field_name in item)
+
+
 class DBCollections(Atom):
     """
     DBCollections provides an abstraction layer for database collections.
@@ -921,69 +1079,58 @@ class DBCollections(Atom):
         self.indexes = indexes
         super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
 
-    def index_add(self, item) -> DBCollections:
+    def index_add(self, item, field_name: str = None) -> DBCollections:
         """
         When the DBCollection represents an index, add an element to the index.
         On other collections, no change is made
 
         :param item:
+        :param field_name: name the index is registered under in the collection
         :return: the new modified collection
         """
         return self
 
-    def index_remove(self, item) -> DBCollections:
+    def index_remove(self, item, field_name: str = None) -> DBCollections:
         """
         When the DBCollection represents an index, remove an element from the index.
         On other collections, no change is made
 
         :param item:
+        :param field_name: name the index is registered under in the collection
         :return: the new modified collection
         """
         return self
 
-    def add2indexes(self, item):
+    def add2indexes(self, item, indexes=None):
         """
             Add an element to the indexes.
         :param item:
-        :return:
+        :param indexes: indexes to update instead of self.indexes, to chain several updates
+        :return: the updated indexes (self.indexes is not modified)
         """
-        if not self.indexes:
-            return
-        for index_name, index in self.indexes.as_iterable():
-            try:
-                has_field = False
-                try:
-                    has_field = (index_name in item)  # DBObject supports 'in' for fields
-                except Exception:
-                    # Fallback for plain objects/dicts
-                    has_field = hasattr(item, index_name) or (isinstance(item, dict) and index_name in item)
-                if has_field:
-                    new_bucket = self.indexes.get_at(index_name).index_add(item)
-                    # Use Dictionary API to set updated bucket
-                    self.indexes = self.indexes.set_at(index_name, new_bucket)
-            except Exception:
-                continue
+        new_indexes = indexes if indexes is not None else self.indexes
+        if not new_indexes:
+            return new_indexes
+        for index_name, index in new_indexes.as_iterable():
+            if _has_field(item, _indexed_field(index_name, index)):
+                # Errors of the index (e.g. a duplicate key in a unique index) reject the item
+                new_indexes = new_indexes.set_at(index_name, index.index_add(item, index_name))
+        return new_indexes
 
-    def remove_from_indexes(self, item):
+    def remove_from_indexes(self, item, indexes=None):
         """
             Remove an element from the indexes.
         :param item:
-        :return:
+        :param indexes: indexes to update instead of self.indexes, to chain several updates
+        :return: the updated indexes (self.indexes is not modified)
         """
-        if not self.indexes:
-            return
-        for index_name, index in self.indexes.as_iterable():
-            try:
-                has_field = False
-                try:
-                    has_field = (index_name in item)
-                except Exception:
-                    has_field = hasattr(item, index_name) or (isinstance(item, dict) and index_name in item)
-                if has_field:
-                    new_bucket = self.indexes.get_at(index_name).index_remove(item)
-                    self.indexes = self.indexes.set_at(index_name, new_bucket)
-            except Exception:
-                continue
+        new_indexes = indexes if indexes is not None else self.indexes
+        if not new_indexes:
+            return new_indexes
+        for index_name, index in new_indexes.as_iterable():
+            if _has_field(item, _indexed_field(index_name, index)):
+                new_indexes = new_indexes.set_at(index_name, index.index_remove(item, index_name))
+        return new_indexes
 
     def __iter__(self):
         try:
@@ -1098,6 +1245,25 @@ class QueryPlan(Atom):
             # Last resort
             return sum(1 for _ in self.execute().as_iterable())
 
+    def partitions(self, count: int, min_rows: int = 1) -> list | None:
+        """
+        Split the records of execute() into up to count disjoint parts, to be processed in
+        parallel: a list of callables, each returning an iterator over one part, in the order
+        of execute(). Parts are cut from the underlying collection, none smaller than min_rows
+        of its records. None when the plan can not be split (the default).
+        """
+        return None
+
+    def exists(self) -> bool:
+        """
+        Whether this plan yields any record. Stops at the first one; plans that can tell
+        from their indexes override it.
+        """
+        result = self.execute()
+        for _ in (result.as_iterable() if hasattr(result, 'as_iterable') else result):
+            return True
+        return False
+
     def explain(self) -> dict:
         """
         Structured recursive explanation of this plan node.
@@ -1119,6 +1285,35 @@ class QueryPlan(Atom):
             pass
         return node
 
+    def _explain_children(self) -> list[tuple[str, list[QueryPlan]]]:
+        """
+        Child plans by the explain() key they are described under.
+        """
+        if getattr(self, 'based_on', None) is not None:
+            return [('source_plan', [self.based_on])]
+        return []
+
+    def explain_analyze(self) -> dict:
+        """
+        explain(), with the estimated and the actual rows of every node. The plan (and each
+        of its children) is executed to count the actual rows.
+        """
+        node = self.explain()
+        try:
+            node['estimated_rows'] = int(self.get_cardinality_estimate())
+        except Exception:
+            node['estimated_rows'] = None
+        result = self.execute()
+        rows = result.as_iterable() if hasattr(result, 'as_iterable') else result
+        node['actual_rows'] = sum(1 for _ in rows)
+        for key, children in self._explain_children():
+            described = node.get(key)
+            if isinstance(described, list) and len(described) == len(children):
+                node[key] = [child.explain_analyze() for child in children]
+            elif isinstance(described, dict) and len(children) == 1:
+                node[key] = children[0].explain_analyze()
+        return node
+
 
 class Literal(Atom):
     """
@@ -1337,6 +1532,52 @@ class SharedStorage(AbstractSharedStorage):
         """
 
 
+# Version of the element hashes used as Set/CountedSet keys. Version 1 (legacy, no field stored)
+# used a SHA-256 over a typed string; version 2 uses stable_hash.
+HASH_VERSION: int = 2
+
+_STABLE_HASH_PERSON = b'protobase-hash'
+
+
+def stable_hash(value: object) -> int:
+    """
+    Stable 64-bit hash of a plain value (str, int, float, bool, bytes or any object with a
+    repr), identical across processes and platforms.
+
+    The value is encoded with a type tag, so equal looking values of different types
+    (1, 1.0, True, '1') get different hashes, and digested with a personalized 8 byte
+    BLAKE2b. The result is a small int, so keys built from it compare quickly. Digests of
+    plain values are memoized, since the same keys tend to be hashed over and over by
+    membership tests.
+    """
+    if type(value) in _MEMOIZED_HASH_TYPES:
+        return _memoized_stable_hash(value)
+    return _stable_hash(value)
+
+
+def _stable_hash(value: object) -> int:
+    cls = type(value)
+    if cls is str:
+        data = b's' + value.encode('utf-8')
+    elif cls is int:
+        data = b'i' + str(value).encode('ascii')
+    elif cls is bool:
+        data = b'b1' if value else b'b0'
+    elif cls is float:
+        data = b'f' + repr(value).encode('ascii')
+    elif cls is bytes:
+        data = b'y' + value
+    else:
+        data = b'r' + f"{cls.__name__}:{value!r}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8, person=_STABLE_HASH_PERSON).digest(), 'big')
+
+
+_MEMOIZED_HASH_TYPES = frozenset((str, int, float, bool, bytes))
+
+# typed=True keeps 1, 1.0 and True apart, as their hashes differ
+_memoized_stable_hash = functools.lru_cache(maxsize=1 << 16, typed=True)(_stable_hash)
+
+
 # Canonical identity hash helper exposed publicly
 # Prefer AtomPointer.hash() for Atoms; otherwise fall back to built-in hash
 
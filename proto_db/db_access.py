@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import datetime
-import hashlib
 import logging
 from threading import Lock
 from threading import RLock
@@ -10,9 +9,11 @@ from typing import cast
 from . import ProtoCorruptionException
 from .common import Atom, \
     AbstractObjectSpace, AbstractDatabase, AbstractTransaction, \
-    SharedStorage, RootObject, Literal, atom_class_registry, AtomPointer, ConcurrentOptimized
+    SharedStorage, RootObject, Literal, atom_class_registry, AtomPointer, ConcurrentOptimized, stable_hash
+from .btrees import BTreeList, BTreeDictionary, DEFAULT_FANOUT
 from .dictionaries import Dictionary
-from .exceptions import ProtoValidationException, ProtoLockingException, ProtoUnexpectedException
+from .exceptions import ProtoValidationException, ProtoLockingException, ProtoUnexpectedException, \
+    ProtoUniqueConstraintException
 from .hash_dictionaries import HashDictionary
 from .lists import List
 from .sets import Set
@@ -20,6 +21,86 @@ from .sets import Set
 logger = logging.getLogger(__name__)
 
 
+class LiteralInternTable:
+    """
+    Process-wide interning table mapping strings to the pointers of their persisted Literals.
+
+    Literals are immutable once pushed to storage, so a pointer obtained in one transaction
+    remains valid for every later transaction over the same storage. Entries are kept per
+    storage (weakly referenced, so closing a storage drops its table) and bounded with an
+    LRU policy. The limit can be tuned with the PB_LITERAL_INTERN_MAX environment variable.
+    """
+
+    def __init__(self, max_entries: int | None = None):
+        import os as _os
+        import weakref as _weakref
+        if max_entries is None:
+            try:
+                max_entries = int(_os.environ.get('PB_LITERAL_INTERN_MAX', '100000'))
+            except Exception:
+                max_entries = 100000
+        self.max_entries = max(0, max_entries)
+        self._lock = Lock()
+        self._tables = _weakref.WeakKeyDictionary()
+        self._fallback_tables = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _table_for(self, storage, create: bool):
+        from collections import OrderedDict
+        try:
+            table = self._tables.get(storage)
+            if table is None and create:
+                table = OrderedDict()
+                self._tables[storage] = table
+        except TypeError:
+            # Storage not weak-referenceable: key by identity
+            table = self._fallback_tables.get(id(storage))
+            if table is None and create:
+                table = OrderedDict()
+                self._fallback_tables[id(storage)] = table
+        return table
+
+    def lookup(self, storage, string: str) -> AtomPointer | None:
+        if storage is None or self.max_entries == 0:
+            return None
+        with self._lock:
+            table = self._table_for(storage, create=False)
+            pointer = table.get(string) if table is not None else None
+            if pointer is None:
+                self.misses += 1
+                return None
+            table.move_to_end(string)
+            self.hits += 1
+            return pointer
+
+    def register(self, storage, string: str, pointer: AtomPointer):
+        if storage is None or pointer is None or self.max_entries == 0:
+            return
+        with self._lock:
+            table = self._table_for(storage, create=True)
+            table[string] = pointer
+            table.move_to_end(string)
+            while len(table) > self.max_entries:
+                table.popitem(last=False)
+
+    def clear(self, storage=None):
+        with self._lock:
+            if storage is None:
+                self._tables.clear()
+                self._fallback_tables.clear()
+            else:
+                try:
+                    self._tables.pop(storage, None)
+                except TypeError:
+                    self._fallback_tables.pop(id(storage), None)
+            self.hits = 0
+            self.misses = 0
+
+
+literal_intern_table = LiteralInternTable()
+
+
 class ObjectSpace(AbstractObjectSpace):
     storage: SharedStorage
     state: str
@@ -343,7 +424,7 @@ class ObjectSpace(AbstractObjectSpace):
             pass
 
     def get_literals(self, literals: Dictionary) -> dict[str, Literal]:
-        update_tr = ObjectTransaction(None, storage=self.storage)
+        update_tr = ObjectTransaction(None, object_space=self, storage=self.storage)
 
         with self._lock:
             root = self.get_space_root()
@@ -352,65 +433,51 @@ class ObjectSpace(AbstractObjectSpace):
             result = dict()
             new_literals = dict()
             for literal_string, literal in literals.as_iterable():
-                if literal.atom_pointer:
+                # Staged literals are already saved: only interning or the catalog resolves them
+                interned = literal_intern_table.lookup(self.storage, literal_string)
+                if interned is not None:
+                    literal.atom_pointer = interned
                     result[literal_string] = literal
-                elif literal_catalog.has(literal_string):
-                    existing_literal = literal_catalog.get_at(literal_string)
-                    new_literals[literal_string] = existing_literal
+                    continue
+                # A single search: get_at already answers membership with None
+                existing_literal = literal_catalog.get_at(literal_string)
+                if existing_literal is not None:
+                    literal_intern_table.register(self.storage, literal_string, existing_literal.atom_pointer)
                     result[literal_string] = existing_literal
                 else:
-                    new_literals[literal_string] = literal_catalog.get_at(literal_string)
+                    new_literals[literal_string] = literal
 
             if new_literals:
-                # There are non resolved literals still
-
+                # There are non resolved literals still: they are cataloged by a single space
+                # root write, made under the provider lock over the freshest root
                 with self._space_context():
+                    current_history = self.get_space_history()
                     root = self.get_space_root()
                     literal_catalog: Dictionary = root.literal_root
                     literal_catalog.transaction = update_tr
-                    update_catalog = False
+                    cataloged = dict()
                     for literal_string, literal in new_literals.items():
-                        if not literal_catalog.has(literal_string):
+                        existing_literal = literal_catalog.get_at(literal_string)
+                        if existing_literal is None:
                             literal_catalog = literal_catalog.set_at(literal.string, literal)
                             result[literal_string] = literal
-                            update_catalog = True
+                            cataloged[literal_string] = literal
                         else:
-                            existing_literal = literal_catalog.get_at(literal.string)
-                            result[literal_string] = literal
+                            result[literal_string] = existing_literal
 
-                    if update_catalog:
+                    if cataloged:
                         literal_catalog._save()
-                        # Persist only the literal_root under the provider lock, preserving the freshest object_root
-                        try:
-                            # Re-enter provider root context to serialize with other root updates
-                            with self._space_context():
-                                locked_tr = ObjectTransaction(None, object_space=self, storage=self.storage)
-                                # Read the freshest space history and root under the lock
-                                current_hist = self.get_space_history()
-                                fresh_root = self.get_space_root()
-                                current_object_root = fresh_root.object_root if fresh_root and fresh_root.object_root else root.object_root
-                                # Build and save a new RootObject with the updated literal_root and current object_root
-                                locked_root = RootObject(
-                                    object_root=current_object_root,
-                                    literal_root=literal_catalog,
-                                    transaction=locked_tr
-                                )
-                                locked_root._save()
-                                # Write using locked history to avoid re-reads and prevent overwrites of object_root
-                                self.set_space_root_locked(locked_root, current_hist)
-                        except Exception:
-                            # As a last resort, fall back to non-locked update but still preserve object_root from the freshest head
-                            try:
-                                fresh_space_root = self.get_space_root()
-                                current_object_root = fresh_space_root.object_root if fresh_space_root and fresh_space_root.object_root else root.object_root
-                            except Exception:
-                                current_object_root = root.object_root
-                            root = RootObject(
-                                object_root=current_object_root,
-                                literal_root=literal_catalog,
-                                transaction=update_tr
-                            )
-                            self.set_space_root(root)
+                        locked_tr = ObjectTransaction(None, object_space=self, storage=self.storage)
+                        new_root = RootObject(
+                            object_root=root.object_root,
+                            literal_root=literal_catalog,
+                            transaction=locked_tr
+                        )
+                        new_root._save()
+                        self.set_space_root_locked(new_root, current_history)
+                        # Interned only once the catalog holding them is the current root
+                        for literal_string, literal in cataloged.items():
+                            literal_intern_table.register(self.storage, literal_string, literal.atom_pointer)
 
             return new_literals
 
@@ -621,13 +688,38 @@ class Database(AbstractDatabase):
         self.object_space.set_space_root(new_space_root)
         update_tr.abort()
 
-    def set_db_root_locked(self, new_db_root: Dictionary):
+    def _fold_new_literals(self, literal_root: Dictionary, new_literals: dict | None,
+                           transaction: ObjectTransaction) -> Dictionary:
+        """
+        Add the literals created (and already saved) by a committing transaction to the
+        literal catalog, so the catalog update travels in the same RootObject write as the
+        new database root instead of requiring a separate space-root write.
+        """
+        if literal_root is None:
+            literal_root = Dictionary(transaction=transaction)
+        if not new_literals:
+            return literal_root
+        literal_root.transaction = transaction
+        changed = False
+        for literal_string, literal in new_literals.items():
+            if not getattr(literal, 'atom_pointer', None):
+                continue
+            if literal_root.get_at(literal_string) is None:
+                literal_root = literal_root.set_at(literal_string, literal)
+                changed = True
+        if changed:
+            literal_root.transaction = transaction
+            literal_root._save()
+        return literal_root
+
+    def set_db_root_locked(self, new_db_root: Dictionary, new_literals: dict | None = None):
         """
         Same as set_db_root(), but intended to be called while already holding
         the storage root lock via RootContextManager. Avoids any nested attempts
         to (re)acquire the provider lock, preventing deadlocks on non-reentrant locks.
         If RootContextManager captured the current space root/history for this
         transaction, use them to avoid re-reading anything under the lock.
+        Literals in new_literals are folded into the literal catalog of the same write.
         """
         update_tr = ObjectTransaction(self)
 
@@ -662,7 +754,7 @@ class Database(AbstractDatabase):
             # Persist the provided new_db_root directly without a second merge to avoid lost updates.
             new_space_root = RootObject(
                 object_root=base_root.object_root.set_at(self.database_name, new_db_root),
-                literal_root=base_root.literal_root,
+                literal_root=self._fold_new_literals(base_root.literal_root, new_literals, update_tr),
                 transaction=update_tr
             )
             # Ensure the updated object_root is persisted before saving the RootObject
@@ -699,7 +791,7 @@ class Database(AbstractDatabase):
 
         new_space_root = RootObject(
             object_root=initial_root.object_root.set_at(self.database_name, new_db_root),
-            literal_root=initial_root.literal_root,
+            literal_root=self._fold_new_literals(initial_root.literal_root, new_literals, update_tr),
             transaction=update_tr
         )
         new_space_root._save()
@@ -708,7 +800,8 @@ class Database(AbstractDatabase):
         self.object_space.set_space_root(new_space_root)
         update_tr.abort()
 
-    def set_db_root_with_locked_context(self, new_db_root: Dictionary, locked_space_root: RootObject, locked_space_history: "List"):
+    def set_db_root_with_locked_context(self, new_db_root: Dictionary, locked_space_root: RootObject,
+                                        locked_space_history: "List", new_literals: dict | None = None):
         import os as _os
         def _rk_metrics(root_obj):
             try:
@@ -737,7 +830,8 @@ class Database(AbstractDatabase):
         Persist a new DB root using the space_root and space_history captured by RootContextManager
         upon entering the commit critical section. This avoids any re-reads and guarantees we are
         updating exactly the history we observed under the same provider root lock.
-        Must be called while the provider root lock is held.
+        Must be called while the provider root lock is held. Literals in new_literals are
+        folded into the literal catalog of the same RootObject write.
         """
         update_tr = ObjectTransaction(self)
         # Build from provided locked space_root
@@ -782,7 +876,7 @@ class Database(AbstractDatabase):
             pass
         new_space_root = RootObject(
             object_root=updated_catalog,
-            literal_root=base_root.literal_root,
+            literal_root=self._fold_new_literals(base_root.literal_root, new_literals, update_tr),
             transaction=update_tr
         )
         new_space_root._save()
@@ -987,8 +1081,29 @@ class ObjectTransaction(AbstractTransaction):
         self.mutable_objects = HashDictionary()
         # Ensure per-transaction read cache; avoid class-level shared state
         self.read_objects = HashDictionary()
-        self.literals = self.database.object_space.get_space_root().literal_root if self.database else \
-            self.new_dictionary()
+        # Literals saved by this transaction but not yet present in the space literal catalog.
+        # They are added to the catalog in the same root write that publishes the commit.
+        self._uncataloged_literals = dict()
+        # The literal catalog is read lazily: most transactions resolve their strings through
+        # the process-wide intern table and never need it
+        self._literals = None
+
+    @property
+    def literals(self) -> Dictionary:
+        if self._literals is None:
+            literal_root = None
+            if self.database:
+                try:
+                    space_root = self.object_space.get_space_root()
+                    literal_root = space_root.literal_root if space_root else None
+                except Exception:
+                    literal_root = None
+            self._literals = literal_root if literal_root is not None else Dictionary(transaction=self)
+        return self._literals
+
+    @literals.setter
+    def literals(self, value: Dictionary):
+        self._literals = value
 
     def __enter(self):
         return self
@@ -1015,16 +1130,26 @@ class ObjectTransaction(AbstractTransaction):
             return atom
 
     def get_literal(self, string: str):
-        if self.new_literals.has(string):
-            return self.new_literals.get_at(string)
-        else:
-            existing_literal = self.literals.get_at(string)
-            if existing_literal:
-                return existing_literal
-            else:
-                new_literal = Literal(transaction=self, string=string)
-                self.new_literals = self.new_literals.set_at(string, new_literal)
-                return new_literal
+        staged_literal = self.new_literals.get_at(string)
+        if staged_literal is None:
+            staged_literal = self._uncataloged_literals.get(string)
+        if staged_literal is not None:
+            return staged_literal
+
+        interned = literal_intern_table.lookup(self.storage, string)
+        if interned is not None:
+            literal = Literal(transaction=self, atom_pointer=interned, string=string)
+            object.__setattr__(literal, '_loaded', True)
+            return literal
+
+        existing_literal = self.literals.get_at(string)
+        if existing_literal:
+            literal_intern_table.register(self.storage, string, existing_literal.atom_pointer)
+            return existing_literal
+
+        new_literal = Literal(transaction=self, string=string)
+        self.new_literals = self.new_literals.set_at(string, new_literal)
+        return new_literal
 
     def get_root_object(self, name: str) -> object | None:
         """
@@ -1179,23 +1304,27 @@ class ObjectTransaction(AbstractTransaction):
                 )
 
     def _update_created_literals(self, transaction: ObjectTransaction, literal_root: Dictionary) -> Dictionary:
-        literal_update_tr = ObjectTransaction(transaction.database, object_space=transaction.object_space,
-                                              storage=self.storage)
-        space_root = transaction.object_space.get_space_root()
-        current_literal_root = space_root.literal_root
+        """
+        Save, as one batch, every literal created so far in this transaction.
+
+        get_literal() only creates a literal after missing both the intern table and the
+        catalog, so no catalog search is repeated here. Saved literals are kept aside until
+        commit, where they are folded into the literal catalog of the commit's own root write.
+        They are interned once that write succeeds: an aborted transaction leaves no pointer
+        to an uncataloged literal in the intern table.
+        """
         if self.new_literals.count > 0:
             for key, value in self.new_literals.as_iterable():
-                if value.atom_pointer:
-                    continue
-                if not current_literal_root.has(key):
+                if not value.atom_pointer:
+                    interned = literal_intern_table.lookup(self.storage, key)
+                    if interned is not None:
+                        value.atom_pointer = interned
+                        continue
                     value._save()
-                    current_literal_root = current_literal_root.set_at(key, value)
-                elif not value.atom_pointer:
-                    new_literal = current_literal_root.get_at(key)
-                    value.atom_pointer = new_literal.atom_pointer
+                self._uncataloged_literals[key] = value
 
         self.new_literals = Dictionary(transaction=self)
-        return current_literal_root
+        return literal_root
 
     def _update_mutable_indexes(self, current_db_root: Dictionary) -> Dictionary:
         # It is assumed all updated mutables were previously saved
@@ -1306,6 +1435,9 @@ class ObjectTransaction(AbstractTransaction):
                         except Exception:
                             pass
                         continue
+                    except ProtoUniqueConstraintException:
+                        # Unique keys taken by a concurrent commit cannot be merged
+                        raise
                     except Exception:
                         # On any failure, fall back to last-writer-wins and let retry logic resolve
                         pass
@@ -1339,7 +1471,8 @@ class ObjectTransaction(AbstractTransaction):
             if not self.enclosing_transaction:
                 # It's a base transaction, it should commit changes to db
 
-                if self.new_roots.count != 0 or self.modified_mutable_objects.count != 0 or self.new_literals.count != 0:
+                if self.new_roots.count != 0 or self.modified_mutable_objects.count != 0 or \
+                        self.new_literals.count != 0 or self._uncataloged_literals:
                     # Debug staged roots before commit
                     try:
                         import os as _os
@@ -1448,7 +1581,8 @@ class ObjectTransaction(AbstractTransaction):
                                         logger.debug("[TRACE] persist locked tx=%s thr=%s start", id(self), _th.get_ident())
                                 except Exception:
                                     pass
-                                self.database.set_db_root_with_locked_context(db_root, lsr, lsh)
+                                self.database.set_db_root_with_locked_context(
+                                    db_root, lsr, lsh, new_literals=self._uncataloged_literals)
                             else:
                                 try:
                                     import os as _os, threading as _th
@@ -1456,9 +1590,13 @@ class ObjectTransaction(AbstractTransaction):
                                         logger.debug("[TRACE] persist unlocked tx=%s thr=%s start", id(self), _th.get_ident())
                                 except Exception:
                                     pass
-                                self.database.set_db_root_locked(db_root)
+                                self.database.set_db_root_locked(db_root, new_literals=self._uncataloged_literals)
                         except Exception:
-                            self.database.set_db_root_locked(db_root)
+                            self.database.set_db_root_locked(db_root, new_literals=self._uncataloged_literals)
+                        # The literals are cataloged by the root just written: intern them
+                        for literal_string, literal in self._uncataloged_literals.items():
+                            literal_intern_table.register(self.storage, literal_string, literal.atom_pointer)
+                        self._uncataloged_literals = dict()
 
                         try:
                             import os as _os, threading as _th
@@ -1567,6 +1705,8 @@ class ObjectTransaction(AbstractTransaction):
                     if enclosing_tr.state == 'Running':
                         if self.new_literals.count > 0:
                             enclosing_tr.new_literals = enclosing_tr.new_literals.merge(self.new_literals)
+                        if self._uncataloged_literals:
+                            enclosing_tr._uncataloged_literals.update(self._uncataloged_literals)
                         if self.modified_mutable_objects.count > 0:
                             enclosing_tr.modified_mutable_objects = enclosing_tr.modified_mutable_objects.merge(
                                 self.modified_mutable_objects)
@@ -1596,11 +1736,9 @@ class ObjectTransaction(AbstractTransaction):
         """
 
         :param string:
-        :return: a hash based in db persisted strings
+        :return: a stable 64-bit hash of the string (see common.stable_hash)
         """
-        hash_obj = hashlib.sha256(string.encode('utf-8'))
-        hash_int = int(hash_obj.hexdigest(), 16)
-        return hash_int
+        return stable_hash(string)
 
     def get_mutable(self, key: int):
         with self.lock:
@@ -1643,6 +1781,20 @@ class ObjectTransaction(AbstractTransaction):
         """
         return List(transaction=self)
 
+    def new_btree_list(self, fanout: int = DEFAULT_FANOUT) -> BTreeList:
+        """
+        Return a new BTreeList (wide-fanout B+tree sequence) connected to this transaction
+        :return:
+        """
+        return BTreeList(fanout=fanout, transaction=self)
+
+    def new_btree_dictionary(self, fanout: int = DEFAULT_FANOUT) -> BTreeDictionary:
+        """
+        Return a new BTreeDictionary (wide-fanout B+tree ordered map) connected to this transaction
+        :return:
+        """
+        return BTreeDictionary(fanout=fanout, transaction=self)
+
     def new_hash_set(self) -> Set:
         """
         Return a new Set connected to this transaction
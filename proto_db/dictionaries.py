@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 import logging
-from typing import cast
+from typing import Iterable, cast
 
 from .common import Atom, DBCollections, QueryPlan, Literal, AbstractTransaction, AtomPointer, ConcurrentOptimized
-from .exceptions import ProtoNotSupportedException
+from .exceptions import ProtoNotSupportedException, ProtoUniqueConstraintException, ProtoValidationException
 from .lists import List
-from .queries import IndexedQueryPlan, QueryableIndex, QueryContext, Term, Equal, Between, Greater, GreaterOrEqual, Lower, LowerOrEqual, IndexedSearchPlan, IndexedRangeSearchPlan
+from .queries import IndexedQueryPlan, QueryableIndex, QueryContext, Expression, Term, canonical_value, evaluate_value, expression_implies, parse_value, predicate_spec, prefix_successor, with_attributes, Equal, Between, StartsWith, Greater, GreaterOrEqual, Lower, LowerOrEqual, IndexedSearchPlan, IndexedRangeSearchPlan, CompositeIndexScanPlan, PrimaryKeyLookupPlan
+from .hash_dictionaries import HashDictionary
 from .sets import Set, CountedSet
+from .statistics import ColumnStatistics
 
 _logger = logging.getLogger(__name__)
 
@@ -16,23 +18,43 @@ class DictionaryItem(Atom):
     # Represents a key-value pair in a Dictionary, both durable and transaction-safe.
     key: object
     value: object
+    weight: int | None = None  # Rows under the key, for the bucket of an index (see list_weight)
 
     def __init__(
             self,
             key: object = None,  # The key for the dictionary item (native type; no string coercion).
             value: object = None,  # The value associated with the key.
+            weight: int = None,  # Number of records in value, when it is an index bucket.
             transaction: AbstractTransaction = None,  # The associated transaction.
             atom_pointer: AtomPointer = None,  # Pointer to the atom for durability/consistency.
             **kwargs):  # Additional keyword arguments.
         super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
         self.key = key
         self.value = value
+        if weight is not None:
+            self.weight = weight
+
+    def list_weight(self) -> int | None:
+        """
+        Weight of this item in the content tree of its Dictionary: the size of its bucket in
+        an index, 1 otherwise. Bucket items written before weights were kept are unknown.
+        """
+        cached = self.__dict__.get('_list_weight')
+        if cached is not None:
+            return cached
+        self._load()
+        if self.weight is not None:
+            return self.weight
+        return None if isinstance(self.value, Set) else 1
 
     def _load(self):
         if not self._loaded:
             super()._load()
             if isinstance(self.key, Literal):
                 self.key = self.key.string
+            elif isinstance(self.key, list):
+                # Tuple keys (composite indexes) are stored as lists
+                self.key = tuple(self.key)
             self._loaded = True
 
     # Provide deterministic ordering across mixed key types for AVL ordering
@@ -48,16 +70,28 @@ class DictionaryItem(Atom):
                 return ("str", val)
             if t is bytes:
                 return ("bytes", val)
+            if t is tuple or t is list:
+                # Composite keys order field by field, so keys sharing a prefix are contiguous
+                return ("tuple", tuple(DictionaryItem._order_key(v) for v in val))
             # Fallback: type name + string representation
             return (t.__name__, str(val))
         except Exception:
             return (t.__name__, str(val))
 
+    def _key_order(self):
+        # Order key of this item, computed once per loaded item (items are immutable)
+        cached = self.__dict__.get('_ok_cache')
+        if cached is None:
+            self._load()
+            cached = self._order_key(self.key)
+            object.__setattr__(self, '_ok_cache', cached)
+        return cached
+
     def __lt__(self, other: "DictionaryItem") -> bool:
-        return self._order_key(self.key) < self._order_key(other.key)
+        return self._key_order() < other._key_order()
 
     def __gt__(self, other: "DictionaryItem") -> bool:
-        return self._order_key(self.key) > self._order_key(other.key)
+        return self._key_order() > other._key_order()
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, DictionaryItem):
@@ -111,6 +145,7 @@ class Dictionary(DBCollections, ConcurrentOptimized):
 
         :return: A generator yielding tuples of (key, value).
         """
+        self._load()
         for item in self.content.as_iterable():  # Iterate through the content.
             item = (cast(DictionaryItem, item))  # Cast item to a DictionaryItem type.
             item._load()  # Ensure the item is loaded into memory.
@@ -132,39 +167,133 @@ class Dictionary(DBCollections, ConcurrentOptimized):
         """
         Gets the element associated with the given key in the dictionary.
 
-        Uses binary search to find the key efficiently, using native-type key comparisons
+        Descends the key-ordered content tree once, using native-type key comparisons
         with a deterministic ordering for mixed types (see DictionaryItem._order_key).
 
         :param key: The key to be searched.
         :return: The value stored at key or None if not found
         """
-        self._load()
-        self.content._load()
-
-        def _ok(v):
-            return DictionaryItem._order_key(v)
+        _, item = self._locate(key)
+        if item is None:
+            return None
+        if isinstance(item.value, Atom):
+            item.value._load()
+        return item.value
 
-        left = 0
-        right = self.content.count - 1
-        target_ok = _ok(key)
+    def _locate(self, key: object) -> tuple[int, DictionaryItem | None]:
+        """
+        Find key with a single root-to-leaf descent of the content tree.
 
-        while left <= right:
-            center = (left + right) // 2
+        Content nodes are kept in key order and each one carries its DictionaryItem, so the
+        tree can be descended by comparing keys directly, tracking the in-order offset from
+        the left subtree counts on the way down. The target order key is computed once.
 
-            item = cast(DictionaryItem, self.content.get_at(center))
-            if item is None:
+        :param key: The key to be searched.
+        :return: (offset, item) when found; otherwise (insertion offset, None)
+        """
+        self._load()
+        node = self.content
+        target_ok = DictionaryItem._order_key(key)
+        base = 0
+        while node is not None:
+            node._load()
+            if node.empty:
                 break
-            item_ok = _ok(item.key)
+            previous = node.previous
+            if previous:
+                previous._load()
+                left_count = previous.count
+            else:
+                left_count = 0
+            item = cast(DictionaryItem, node.value)
+            item_ok = item._key_order()
             if item_ok == target_ok and item.key == key:
-                if isinstance(item.value, Atom):
-                    item.value._load()
-                return item.value
-
+                return base + left_count, item
             if item_ok >= target_ok:
-                right = center - 1
+                node = previous
+            else:
+                base += left_count + 1
+                node = node.next
+        return base, None
+
+    def lower_bound(self, key: object) -> int:
+        """
+        Offset of the first item whose key orders at or after key (count if there is none).
+        """
+        return self.position_of(DictionaryItem._order_key(key))
+
+    def position_of(self, target_ok: tuple) -> int:
+        """
+        Offset of the first item whose order key (see DictionaryItem._order_key) is at or after
+        target_ok, in one descent. The difference of two positions is the number of keys
+        between them.
+        """
+        self._load()
+        node = self.content
+        base = 0
+        while node is not None:
+            node._load()
+            if node.empty:
+                break
+            previous = node.previous
+            if previous:
+                previous._load()
+                left_count = previous.count
+            else:
+                left_count = 0
+            if cast(DictionaryItem, node.value)._key_order() >= target_ok:
+                node = previous
             else:
-                left = center + 1
+                base += left_count + 1
+                node = node.next
+        return base
 
+    def rows_before(self, target_ok: tuple) -> int | None:
+        """
+        Total weight (see DictionaryItem.list_weight) of the items whose order key is before
+        target_ok, in one descent: for an index, the number of records under those keys. None
+        when the content tree has no totals (nodes written before they were kept).
+        """
+        self._load()
+        node = self.content
+        rows = 0
+        while node is not None:
+            node._load()
+            if node.empty:
+                break
+            if node.total is None:
+                return None
+            if cast(DictionaryItem, node.value)._key_order() >= target_ok:
+                node = node.previous
+            else:
+                # The left subtree and this item
+                rows += node.total - node.next_total
+                node = node.next
+        return rows
+
+    def items_from(self, offset: int = 0):
+        """
+        Yield DictionaryItems in key order starting at offset.
+
+        One descent positions an explicit stack on the first item; every following item is
+        reached in amortized O(1), instead of a fresh descent per offset.
+        """
+        self._load()
+        yield from self.content.iter_from(offset)
+
+    def items_reversed(self, offset: int | None = None):
+        """
+        Yield DictionaryItems in descending key order, starting at offset (the last item by
+        default).
+        """
+        self._load()
+        yield from self.content.iter_reversed(offset)
+
+    def _item_weight(self, value: object) -> int | None:
+        """
+        Weight recorded on the item holding value (see DictionaryItem.list_weight); indexes
+        record the size of their buckets.
+        """
         return None
 
     def set_at(self, key: str, value: object) -> Dictionary:
@@ -196,43 +325,26 @@ class Dictionary(DBCollections, ConcurrentOptimized):
         except Exception:
             pass
 
-        def _ok(v):
-            return DictionaryItem._order_key(v)
-
-        left = 0
-        right = self.content.count - 1
-        new_content = self.content
         old_value = None
-        target_ok = _ok(key)
-
-        while left <= right:
-            center = (left + right) // 2
-
-            item = cast(DictionaryItem, self.content.get_at(center))
-            if item is None:
-                break
-            item_ok = _ok(item.key)
-            if item_ok == target_ok and item.key == key:  # Check if the key already exists.
-                old_value = item.value
-                new_content = new_content.set_at(
-                    center,
-                    DictionaryItem(
-                        key=key,
-                        value=value,
-                        transaction=self.transaction
-                    )
+        offset, item = self._locate(key)
+        if item is not None:  # The key already exists.
+            old_value = item.value
+            new_content = self.content.set_at(
+                offset,
+                DictionaryItem(
+                    key=key,
+                    value=value,
+                    weight=self._item_weight(value),
+                    transaction=self.transaction
                 )
-                break
-            if item_ok >= target_ok:
-                right = center - 1
-            else:
-                left = center + 1
+            )
         else:
-            new_content = new_content.insert_at(
-                left,
+            new_content = self.content.insert_at(
+                offset,
                 DictionaryItem(
                     key=key,
                     value=value,
+                    weight=self._item_weight(value),
                     transaction=self.transaction
                 )
             )
@@ -243,7 +355,7 @@ class Dictionary(DBCollections, ConcurrentOptimized):
         if self.indexes:
             if old_value:
                 new_indexes = self.remove_from_indexes(old_value)
-            new_indexes = self.add2indexes(value)
+            new_indexes = self.add2indexes(value, new_indexes)
 
         return Dictionary(
             content=new_content,
@@ -262,81 +374,36 @@ class Dictionary(DBCollections, ConcurrentOptimized):
         :param key: The string key of the item to be removed.
         :return: A new instance of Dictionary reflecting the removal.
         """
-        self._load()
-
-        def _ok(v):
-            return DictionaryItem._order_key(v)
-
-        left = 0
-        right = self.content.count - 1
-        target_ok = _ok(key)
-
-        while left <= right:
-            center = (left + right) // 2
-
-            item = cast(DictionaryItem, self.content.get_at(center))
-            if item is None:
-                break
-            item_ok = _ok(item.key)
-            if item_ok == target_ok and item.key == key:
-                # Found existing value to remove
-                new_content = self.content.remove_at(center)
-                if new_content is None:
-                    # If the content is None, create an empty dictionary
-                    new_content = List(transaction=self.transaction)
-                new_op_log = self._op_log + [('remove', key, None)]
-                new_indexes = self.indexes
-                if self.indexes:
-                    new_indexes = self.remove_from_indexes(item.value)
-                return Dictionary(
-                    content=new_content,
-                    transaction=self.transaction,
-                    op_log=new_op_log,
-                    indexes=new_indexes
-                )
-
-            if item_ok >= target_ok:
-                right = center - 1
-            else:
-                left = center + 1
+        offset, item = self._locate(key)
+        if item is None:
+            # Not found, nothing is changed
+            return self
 
-        # Not found, nothing is changed
-        return self
+        new_content = self.content.remove_at(offset)
+        if new_content is None:
+            # If the content is None, create an empty dictionary
+            new_content = List(transaction=self.transaction)
+        new_op_log = self._op_log + [('remove', key, None)]
+        new_indexes = self.indexes
+        if self.indexes:
+            new_indexes = self.remove_from_indexes(item.value)
+        return Dictionary(
+            content=new_content,
+            transaction=self.transaction,
+            op_log=new_op_log,
+            indexes=new_indexes
+        )
 
     def has(self, key: str) -> bool:
         """
         Checks whether a given key exists in the dictionary.
 
-        Uses binary search to find the key efficiently with native-type comparisons.
+        Descends the key-ordered content tree once, with native-type comparisons.
 
         :param key: The key to be searched.
         :return: True if the key is found; otherwise, False.
         """
-        self._load()
-
-        def _ok(v):
-            return DictionaryItem._order_key(v)
-
-        left = 0
-        right = self.content.count - 1
-        target_ok = _ok(key)
-
-        while left <= right:
-            center = (left + right) // 2
-
-            item = cast(DictionaryItem, self.content.get_at(center))
-            if item is None:
-                break
-            item_ok = _ok(item.key)
-            if item_ok == target_ok and item.key == key:
-                return True
-
-            if item_ok >= target_ok:
-                right = center - 1
-            else:
-                left = center + 1
-
-        return False
+        return self._locate(key)[1] is not None
 
     def _rebase_on_concurrent_update(self, current_db_object: Atom) -> Atom:
         if not isinstance(current_db_object, Dictionary):
@@ -384,6 +451,8 @@ class Dictionary(DBCollections, ConcurrentOptimized):
                         merged = value._rebase_on_concurrent_update(current_val)
                         rebased_dict = rebased_dict.set_at(key, merged)
                         continue
+                    except ProtoUniqueConstraintException:
+                        raise
                     except Exception:
                         # If child-level rebase fails, fall through to last-writer-wins
                         pass
@@ -394,6 +463,8 @@ class Dictionary(DBCollections, ConcurrentOptimized):
                     equal = False
                 if not equal:
                     rebased_dict = rebased_dict.set_at(key, value)
+        except ProtoUniqueConstraintException:
+            raise
         except Exception:
             # On any failure, fallback to replaying op_log if available; otherwise last-writer-wins
             for op_type, key, value in self._op_log:
@@ -417,7 +488,12 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
     functionality for handling repeated keys, updating, and removing
     associated records. Duplicate values in the list associated with a key
     are allowed.
+
+    Used as an index, it keeps ColumnStatistics of its keys up to date on every change. Once
+    they drift too far they are stale, and they are rebuilt from the buckets by analyze, or
+    when the index is saved at commit.
     """
+    statistics: ColumnStatistics
 
     def __init__(
             self,
@@ -426,10 +502,102 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
             transaction: AbstractTransaction = None,
             atom_pointer: AtomPointer = None,
             op_log: list = None,
+            statistics: ColumnStatistics = None,
             **kwargs):
         super().__init__(content=content, transaction=transaction, atom_pointer=atom_pointer, op_log=op_log, **kwargs)
         # Indexes are optional; keep None when not provided to avoid instantiating abstract base classes.
         self.indexes = indexes
+        if statistics is None and content is None and atom_pointer is None:
+            # Only a new, empty index is known to match empty statistics
+            statistics = ColumnStatistics(transaction=transaction)
+        self.statistics = statistics
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[tuple[object, Atom]],
+                   transaction: AbstractTransaction = None) -> RepeatedKeysDictionary:
+        """
+        Index of the given (key, record) pairs, built at once: pairs are sorted by key, each
+        bucket is filled in one pass, the key tree is built balanced in linear time and the
+        statistics are taken from the bucket sizes. Much cheaper than one set_at per record,
+        which copies a path of the key tree for every record.
+
+        :param pairs: (key, record) pairs, in any order. None keys are skipped.
+        :param transaction: The transaction of the new index.
+        :return: The new index.
+        """
+        ordered = sorted(_sort_entries(pairs), key=lambda entry: entry[0])
+        return cls.from_sorted_entries(ordered, transaction=transaction)
+
+    @classmethod
+    def from_sorted_entries(cls, entries: Iterable[tuple[tuple, object, Atom]],
+                            transaction: AbstractTransaction = None) -> RepeatedKeysDictionary:
+        """
+        Index of a stream of (order key, key, record) entries already sorted by order key (see
+        _sort_entries), e.g. a merge of sorted runs. Entries are consumed one at a time: only
+        the key tree items are kept, one per distinct key.
+
+        :param entries: (DictionaryItem._order_key(key), key, record) entries, in order.
+        :param transaction: The transaction of the new index.
+        :return: The new index.
+        """
+        items = []
+        key_rows = []
+        current_order = bucket = current_key = None
+        for key_order, key, record in entries:
+            if bucket is None or key_order != current_order:
+                if bucket is not None:
+                    items.append(DictionaryItem(key=current_key, value=bucket, weight=bucket.count,
+                                                transaction=transaction))
+                    key_rows.append((current_key, bucket.count))
+                current_order, current_key = key_order, key
+                bucket = CountedSet(transaction=transaction)
+            bucket = bucket.add(record)
+        if bucket is not None:
+            items.append(DictionaryItem(key=current_key, value=bucket, weight=bucket.count, transaction=transaction))
+            key_rows.append((current_key, bucket.count))
+
+        return RepeatedKeysDictionary(
+            content=List.from_values(items, transaction=transaction),
+            transaction=transaction,
+            statistics=ColumnStatistics.from_counts(key_rows, transaction=transaction)
+        )
+
+    def _load(self):
+        if not self._loaded:
+            super()._load()
+            if self.statistics is not None:
+                self.statistics._load()
+
+    def _item_weight(self, value: object) -> int | None:
+        # Buckets are built in memory by the update, so their size is at hand
+        return value.count if isinstance(value, Set) else None
+
+    def _with_statistics(self, statistics: ColumnStatistics) -> RepeatedKeysDictionary:
+        return RepeatedKeysDictionary(
+            content=self.content,
+            transaction=self.transaction,
+            op_log=self._op_log,
+            indexes=self.indexes,
+            statistics=statistics
+        )
+
+    def _save(self):
+        # Statistics that drifted too far since the last analyze are rebuilt when the index is
+        # written at commit, not on the update that made them stale. Until then the index is
+        # private to its transaction, so it is still free to take them.
+        if not self._saved and not self.__dict__.get('atom_pointer') and \
+                self.statistics is not None and self.statistics.stale:
+            object.__setattr__(self, 'statistics', ColumnStatistics.from_index(self))
+        super()._save()
+
+    def analyze(self) -> RepeatedKeysDictionary:
+        """
+        Rebuild the statistics of this index from the size of its buckets.
+
+        :return: the index with fresh statistics
+        """
+        self._load()
+        return self._with_statistics(ColumnStatistics.from_index(self))
 
     def get_at(self, key: str) -> Set | None:
         """
@@ -478,11 +646,15 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
         if self.indexes and not previously_present:
             # Update indexes only on the 0 -> 1 transition for this value within the bucket
             new_indexes = self.add2indexes(value)
+        statistics = self.statistics
+        if statistics is not None and not previously_present:
+            statistics = statistics.with_added(key, bucket.count)
         return RepeatedKeysDictionary(
             content=new_content,
             transaction=self.transaction,
             op_log=new_op_log,
-            indexes=new_indexes
+            indexes=new_indexes,
+            statistics=statistics
         )
 
     def remove_at(self, key: str) -> RepeatedKeysDictionary:
@@ -496,7 +668,7 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
             value_set = cast(Set, super().get_at(key))
             new_indexes = self.indexes
             for value in value_set.as_iterable():
-                new_indexes = self.remove_from_indexes(value)
+                new_indexes = self.remove_from_indexes(value, new_indexes)
 
             result = super(RepeatedKeysDictionary, self).remove_at(key)
             if result is None:
@@ -505,12 +677,16 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
             else:
                 new_content = result.content
             new_op_log = self._op_log + [('remove', key, None)]
+            statistics = self.statistics
+            if statistics is not None:
+                statistics = statistics.with_removed(key, 0, removed=value_set.count)
 
             return RepeatedKeysDictionary(
                 content=new_content,
                 transaction=self.transaction,
                 op_log=new_op_log,
-                indexes=new_indexes
+                indexes=new_indexes,
+                statistics=statistics
             )
         else:
             return self
@@ -530,7 +706,7 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
                 updated_set = record_set.remove_at(record)
                 # Remove the entire key if the bucket becomes empty
                 if updated_set.count == 0:
-                    new_content = new_content.remove_at(key)
+                    new_content = super(RepeatedKeysDictionary, self).remove_at(key).content
                 else:
                     # Update the key with the reduced set
                     new_content = super(RepeatedKeysDictionary, self).set_at(key, updated_set).content
@@ -539,16 +715,31 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
 
                 # Update indexes only when the record is no longer present in the bucket (last removal)
                 new_indexes = self.indexes
-                if self.indexes and not updated_set.has(record):
-                    new_indexes = self.remove_from_indexes(record)
+                statistics = self.statistics
+                if not updated_set.has(record):
+                    if self.indexes:
+                        new_indexes = self.remove_from_indexes(record)
+                    if statistics is not None:
+                        statistics = statistics.with_removed(key, updated_set.count)
                 return RepeatedKeysDictionary(
                     content=new_content,
                     transaction=self.transaction,
                     op_log=new_op_log,
-                    indexes=new_indexes
+                    indexes=new_indexes,
+                    statistics=statistics
                 )
 
-            return self
+        # The record is not under key
+        return self
+
+    def index_add(self, item, field_name: str = None) -> RepeatedKeysDictionary:
+        """
+        Index item under its value of the field this index is registered under in a collection.
+        """
+        return self.add_record(item, field_name)
+
+    def index_remove(self, item, field_name: str = None) -> RepeatedKeysDictionary:
+        return self.remove_record(item, field_name)
 
     def build_query_plan(self, term: Term, context: QueryContext) -> QueryPlan | None:
         """
@@ -594,7 +785,7 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
                 return IndexedRangeSearchPlan(
                     field_to_scan=field,
                     lo=term.value,
-                    hi=float('inf'),
+                    hi=None,
                     include_lower=False,
                     include_upper=True,
                     indexes=idxs,
@@ -605,7 +796,7 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
                 return IndexedRangeSearchPlan(
                     field_to_scan=field,
                     lo=term.value,
-                    hi=float('inf'),
+                    hi=None,
                     include_lower=True,
                     include_upper=True,
                     indexes=idxs,
@@ -615,7 +806,7 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
             if isinstance(op, Lower):
                 return IndexedRangeSearchPlan(
                     field_to_scan=field,
-                    lo=float('-inf'),
+                    lo=None,
                     hi=term.value,
                     include_lower=True,
                     include_upper=False,
@@ -623,10 +814,22 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
                     based_on=None,
                     transaction=tx,
                 )
+            if isinstance(op, StartsWith) and isinstance(term.value, str):
+                # Texts starting with the prefix are those in [prefix, successor)
+                return IndexedRangeSearchPlan(
+                    field_to_scan=field,
+                    lo=term.value,
+                    hi=prefix_successor(term.value),
+                    include_lower=True,
+                    include_upper=False,
+                    indexes=idxs,
+                    based_on=None,
+                    transaction=tx,
+                )
             if isinstance(op, LowerOrEqual):
                 return IndexedRangeSearchPlan(
                     field_to_scan=field,
-                    lo=float('-inf'),
+                    lo=None,
                     hi=term.value,
                     include_lower=True,
                     include_upper=True,
@@ -664,3 +867,716 @@ class RepeatedKeysDictionary(Dictionary, QueryableIndex):
                 )
 
         return rebased_dict
+
+
+class UniqueIndex(Dictionary, QueryableIndex):
+    """
+    Unique (primary key) index: every key maps to exactly one record, stored directly as the
+    value, with no bucket Set in between.
+
+    Adding a second record under an existing key raises ProtoUniqueConstraintException. Keys
+    taken by transactions committed concurrently are detected at commit time, when this
+    index is rebased on the current database state, and the commit fails with the same
+    exception.
+
+    When `field_name` is given, collections holding this index keep it up to date through
+    index_add and index_remove, and a duplicate value of the field is rejected as soon as
+    the record is added.
+    """
+    field_name: str
+
+    def __init__(
+            self,
+            field_name: str = None,
+            content: List = None,
+            indexes: DBCollections = None,
+            transaction: AbstractTransaction = None,
+            atom_pointer: AtomPointer = None,
+            op_log: list = None,
+            **kwargs):
+        super().__init__(content=content, transaction=transaction, atom_pointer=atom_pointer, op_log=op_log, **kwargs)
+        self.indexes = indexes
+        self.field_name = field_name
+
+    def after_load(self):
+        # The field name is stored as a Literal
+        if isinstance(self.__dict__.get('field_name'), Literal):
+            object.__setattr__(self, 'field_name', self.field_name.string)
+
+    def _with_content(self, updated: Dictionary) -> UniqueIndex:
+        if updated is self:
+            return self
+        return UniqueIndex(
+            field_name=self.field_name,
+            content=updated.content,
+            transaction=self.transaction,
+            op_log=updated._op_log,
+            indexes=updated.indexes
+        )
+
+    def set_at(self, key: object, value: Atom) -> UniqueIndex:
+        """
+        Map key to value.
+
+        :param key: The unique key
+        :param value: The record stored under key
+        :return: A new UniqueIndex (or this one, if key already maps to value)
+        :raises ProtoUniqueConstraintException: if key already maps to another record
+        """
+        current = super().get_at(key)
+        if current is not None:
+            if current == value:
+                return self
+            raise ProtoUniqueConstraintException(
+                message=f'Duplicate key {key!r} in unique index!'
+            )
+        return self._with_content(super().set_at(key, value))
+
+    def remove_at(self, key: object) -> UniqueIndex:
+        return self._with_content(super().remove_at(key))
+
+    def remove_record_at(self, key: object, record: Atom) -> UniqueIndex:
+        """
+        Remove key only while it still maps to record.
+        """
+        current = super().get_at(key)
+        if current is None or current != record:
+            return self
+        return self.remove_at(key)
+
+    def index_add(self, item, field_name: str = None) -> UniqueIndex:
+        """
+        Index item under its value of field_name.
+
+        :raises ProtoUniqueConstraintException: if another record already has that value
+        """
+        self._load()
+        key = _field_value(item, self.field_name) if self.field_name else None
+        return self if key is None else self.set_at(key, item)
+
+    def index_remove(self, item, field_name: str = None) -> UniqueIndex:
+        self._load()
+        key = _field_value(item, self.field_name) if self.field_name else None
+        return self if key is None else self.remove_record_at(key, item)
+
+    def indexed_field(self) -> str | None:
+        self._load()
+        return self.field_name
+
+    def build_query_plan(self, term: Term, context: QueryContext) -> QueryPlan | None:
+        """
+        Equality terms become a PrimaryKeyLookupPlan; other operations are left to the planner.
+        """
+        if not isinstance(term, Term) or not isinstance(term.operation, Equal):
+            return None
+        tx = context.transaction or self.transaction
+        idxs = Dictionary(transaction=tx).set_at(term.target_attribute, self)
+        return PrimaryKeyLookupPlan(
+            field_to_scan=term.target_attribute,
+            value=_raw_value(term.value),
+            indexes=idxs,
+            transaction=tx,
+        )
+
+    def _rebase_on_concurrent_update(self, current_db_object: Atom) -> Atom:
+        """
+        Replay this transaction's operations on the current database state. A key added here
+        and, concurrently, by another committed transaction for a different record raises
+        ProtoUniqueConstraintException, failing the commit.
+        """
+        if not isinstance(current_db_object, UniqueIndex):
+            raise ProtoNotSupportedException(
+                "Cannot rebase onto a different object type."
+            )
+
+        rebased_index = cast(UniqueIndex, current_db_object)
+        rebased_index._op_log = []
+
+        for op_type, key, value in self._op_log:
+            if op_type == 'set':
+                rebased_index = rebased_index.set_at(key, value)
+            elif op_type == 'remove':
+                rebased_index = rebased_index.remove_at(key)
+            else:
+                raise ProtoNotSupportedException(
+                    f"Unknown operation '{op_type}' during rebase."
+                )
+
+        return rebased_index
+
+
+class CompositeIndex(RepeatedKeysDictionary):
+    """
+    Ordered index over several fields at once.
+
+    Keys are tuples holding the value of each of `fields`, in order, so records sharing the
+    values of a prefix of the fields are stored next to each other. A query with equality
+    terms on a prefix of the fields, optionally followed by a range term on the next field,
+    is answered with a single range scan over this index, with no intersection of
+    per-field results.
+    """
+    fields: tuple
+
+    def __init__(
+            self,
+            fields: tuple | list = None,
+            content: List = None,
+            indexes: DBCollections = None,
+            transaction: AbstractTransaction = None,
+            atom_pointer: AtomPointer = None,
+            op_log: list = None,
+            **kwargs):
+        super().__init__(content=content, indexes=indexes, transaction=transaction, atom_pointer=atom_pointer,
+                         op_log=op_log, **kwargs)
+        self.fields = tuple(fields) if fields else tuple()
+
+    def after_load(self):
+        # Field names are stored as a list
+        object.__setattr__(self, 'fields', tuple(self.fields or ()))
+
+    def key_of(self, record: object) -> tuple | None:
+        """
+        Composite key of record, or None when any of the fields is missing.
+        """
+        values = []
+        for field in self.fields:
+            value = _field_value(record, field)
+            if value is None:
+                return None
+            values.append(value)
+        return tuple(values)
+
+    def add_record(self, record: Atom, field_name: str = None) -> CompositeIndex:
+        key = self.key_of(record)
+        return self if key is None else self.set_at(key, record)
+
+    def remove_record(self, record: Atom, field_name: str = None) -> CompositeIndex:
+        key = self.key_of(record)
+        return self if key is None else self.remove_record_at(key, record)
+
+    def _with_content(self, updated: RepeatedKeysDictionary | None) -> CompositeIndex:
+        if updated is None or updated is self:
+            return self
+        return CompositeIndex(
+            fields=self.fields,
+            content=updated.content,
+            transaction=self.transaction,
+            op_log=updated._op_log,
+            indexes=updated.indexes,
+            statistics=updated.statistics
+        )
+
+    def _with_statistics(self, statistics: ColumnStatistics) -> CompositeIndex:
+        return CompositeIndex(
+            fields=self.fields,
+            content=self.content,
+            transaction=self.transaction,
+            op_log=self._op_log,
+            indexes=self.indexes,
+            statistics=statistics
+        )
+
+    def set_at(self, key: tuple, value: Atom) -> CompositeIndex:
+        return self._with_content(super().set_at(tuple(key), value))
+
+    def remove_at(self, key: tuple) -> CompositeIndex:
+        return self._with_content(super().remove_at(tuple(key)))
+
+    def remove_record_at(self, key: tuple, record: Atom) -> CompositeIndex:
+        return self._with_content(super().remove_record_at(tuple(key), record))
+
+    def build_prefix_plan(self, index_name: str, terms: list, context: QueryContext) \
+            -> tuple[CompositeIndexScanPlan, list[Term]] | None:
+        """
+        Match terms against this index: equality terms on a prefix of the fields and an
+        optional range term on the next one.
+
+        :param index_name: name this index is registered under
+        :param terms: candidate terms of a conjunction
+        :param context: planning context
+        :return: (scan plan, terms answered by the plan), or None when no term can be used
+        """
+        equalities: dict[str, Term] = {}
+        ranges: dict[str, Term] = {}
+        for term in terms:
+            if not isinstance(term, Term):
+                continue
+            if isinstance(term.operation, Equal):
+                equalities.setdefault(term.target_attribute, term)
+            elif isinstance(term.operation, (Between, Greater, GreaterOrEqual, Lower, LowerOrEqual, StartsWith)):
+                ranges.setdefault(term.target_attribute, term)
+
+        prefix = []
+        used: list[Term] = []
+        for field in self.fields:
+            term = equalities.get(field)
+            if term is None:
+                break
+            prefix.append(_raw_value(term.value))
+            used.append(term)
+
+        lo = hi = None
+        include_lower = include_upper = True
+        if len(prefix) < len(self.fields) and self.fields[len(prefix)] in ranges:
+            term = ranges[self.fields[len(prefix)]]
+            bounds = _range_bounds(term)
+            if bounds is not None:
+                lo, hi, include_lower, include_upper = bounds
+                used.append(term)
+
+        if not used:
+            return None
+        idxs = Dictionary(transaction=context.transaction or self.transaction).set_at(index_name, self)
+        plan = CompositeIndexScanPlan(
+            index_name=index_name,
+            prefix=tuple(prefix),
+            lo=lo,
+            hi=hi,
+            include_lower=include_lower,
+            include_upper=include_upper,
+            indexes=idxs,
+            transaction=context.transaction or self.transaction,
+        )
+        return plan, used
+
+    def build_query_plan(self, term: Term, context: QueryContext) -> QueryPlan | None:
+        """
+        A single term can only be answered when it targets the first field of the index.
+        """
+        if not isinstance(term, Term) or not self.fields or term.target_attribute != self.fields[0]:
+            return None
+        built = self.build_prefix_plan(self.fields[0], [term], context)
+        return built[0] if built else None
+
+
+class CoveringIndex(RepeatedKeysDictionary):
+    """
+    Secondary index that also stores the values of `covered_fields` of every indexed record,
+    next to its entry.
+
+    Queries whose projection, count or aggregates only reference covered fields (or the
+    indexed key itself) are answered from the index alone, without loading the records.
+    Projections are kept in `projections`: key -> HashDictionary[record reference -> tuple of
+    covered values, in covered_fields order]. Records indexed before they are saved are
+    referenced by identity and listed in `_new_records`; their projections are keyed by
+    AtomPointer hash when the index is saved.
+    """
+    covered_fields: tuple
+    projections: Dictionary
+    # Records referenced by identity until the index is saved: identity -> (record, keys) (not persisted)
+    _new_records: HashDictionary = None
+
+    def __init__(
+            self,
+            covered_fields: tuple | list = None,
+            projections: Dictionary = None,
+            new_records: HashDictionary = None,
+            content: List = None,
+            indexes: DBCollections = None,
+            transaction: AbstractTransaction = None,
+            atom_pointer: AtomPointer = None,
+            op_log: list = None,
+            **kwargs):
+        super().__init__(content=content, indexes=indexes, transaction=transaction, atom_pointer=atom_pointer,
+                         op_log=op_log, **kwargs)
+        self.covered_fields = tuple(covered_fields) if covered_fields else tuple()
+        self.projections = projections if projections is not None else Dictionary(transaction=transaction)
+        self._new_records = new_records if new_records is not None else HashDictionary(transaction=transaction)
+
+    def after_load(self):
+        # Field names are stored as a list
+        object.__setattr__(self, 'covered_fields', tuple(self.covered_fields or ()))
+
+    def projections_at(self, key: object) -> HashDictionary | None:
+        """
+        Covered values of the records under key, by record reference.
+        """
+        return self.projections.get_at(key)
+
+    def _with_content(self, updated: RepeatedKeysDictionary | None, projections: Dictionary,
+                      new_records: HashDictionary = None) -> CoveringIndex:
+        if updated is None or updated is self:
+            return self
+        return CoveringIndex(
+            covered_fields=self.covered_fields,
+            projections=projections,
+            new_records=new_records if new_records is not None else self._new_records,
+            content=updated.content,
+            transaction=self.transaction,
+            op_log=updated._op_log,
+            indexes=updated.indexes,
+            statistics=updated.statistics
+        )
+
+    def _with_statistics(self, statistics: ColumnStatistics) -> CoveringIndex:
+        return CoveringIndex(
+            covered_fields=self.covered_fields,
+            projections=self.projections,
+            new_records=self._new_records,
+            content=self.content,
+            transaction=self.transaction,
+            op_log=self._op_log,
+            indexes=self.indexes,
+            statistics=statistics
+        )
+
+    def _save(self):
+        if not self._saved and not self.__dict__.get('atom_pointer') and self._new_records.count:
+            # Key the projections of the records indexed by identity by their AtomPointer hash,
+            # now that they are stored
+            projections = self.projections
+            for ref, (record, keys) in self._new_records.as_iterable():
+                new_ref = _stored_ref(record, self.transaction)
+                for key in keys:
+                    bucket = projections.get_at(key)
+                    if bucket is None or not bucket.has(ref):
+                        continue
+                    projections = projections.set_at(key, bucket.remove_at(ref).set_at(new_ref, bucket.get_at(ref)))
+            object.__setattr__(self, 'projections', projections)
+            self._new_records = HashDictionary(transaction=self.transaction)
+        super()._save()
+
+    def set_at(self, key: object, value: Atom) -> CoveringIndex:
+        updated = super().set_at(key, value)
+        bucket = self.projections.get_at(key) or HashDictionary(transaction=self.transaction)
+        covered = tuple(_field_value(value, field) for field in self.covered_fields)
+        ref = _record_ref(value)
+        bucket = bucket.set_at(ref, covered)
+        new_records = self._new_records
+        if isinstance(value, Atom) and not value.__dict__.get('atom_pointer'):
+            pending = new_records.get_at(ref)
+            new_records = new_records.set_at(ref, (value, (pending[1] if pending else ()) + (key,)))
+        return self._with_content(updated, self.projections.set_at(key, bucket), new_records)
+
+    def remove_at(self, key: object) -> CoveringIndex:
+        return self._with_content(super().remove_at(key), self.projections.remove_at(key))
+
+    def remove_record_at(self, key: object, record: Atom) -> CoveringIndex:
+        updated = super().remove_record_at(key, record)
+        if updated is None or updated is self:
+            return self
+        projections = self.projections
+        if not RepeatedKeysDictionary.get_at(updated, key).has(record):
+            # Last reference to record under key
+            bucket = projections.get_at(key)
+            if bucket is not None:
+                bucket = bucket.remove_at(_record_ref(record))
+                projections = projections.set_at(key, bucket) if bucket.count else projections.remove_at(key)
+        return self._with_content(updated, projections)
+
+
+class PartialIndex(RepeatedKeysDictionary):
+    """
+    Ordered index over `field_name` that only holds the records matching `predicate`, for
+    queries that target a small subset of a collection (e.g. status == 'open').
+
+    The predicate is kept as an Expression.compile token list, so it is stored with the index.
+    The planner only answers a term on field_name with this index when the filter of the
+    query implies the predicate (see applies_to). add_record, remove_record and
+    update_record move records in and out of the index as they start or stop matching.
+    """
+    field_name: str
+    predicate: list
+
+    def __init__(
+            self,
+            field_name: str = None,
+            predicate: object = None,
+            content: List = None,
+            indexes: DBCollections = None,
+            transaction: AbstractTransaction = None,
+            atom_pointer: AtomPointer = None,
+            op_log: list = None,
+            **kwargs):
+        super().__init__(content=content, indexes=indexes, transaction=transaction, atom_pointer=atom_pointer,
+                         op_log=op_log, **kwargs)
+        self.field_name = field_name
+        self.predicate = predicate_spec(predicate) if predicate is not None else []
+
+    def after_load(self):
+        # The field name is stored as a Literal
+        if isinstance(self.__dict__.get('field_name'), Literal):
+            object.__setattr__(self, 'field_name', self.field_name.string)
+
+    def predicate_expression(self, alias: str = '') -> Expression:
+        """
+        The predicate of this index, with its fields prefixed by alias.
+        """
+        self._load()
+        expression = self.__dict__.get('_predicate_cache')
+        if expression is None:
+            expression = Expression.compile(list(self.predicate))
+            object.__setattr__(self, '_predicate_cache', expression)
+        if alias:
+            expression = with_attributes(expression, lambda attribute: alias + attribute)
+        return expression
+
+    def matches(self, record: object) -> bool:
+        """
+        Whether record belongs in this index: it matches the predicate and has a key.
+        """
+        self._load()
+        try:
+            return _field_value(record, self.field_name) is not None and self.predicate_expression().match(record)
+        except Exception:
+            return False
+
+    def applies_to(self, attribute: str, condition: Expression) -> bool:
+        """
+        Whether a term on attribute, within a query filtered by condition, can be answered by
+        this index: attribute is the indexed field (possibly behind an alias such as 'r.')
+        and condition implies the predicate.
+        """
+        self._load()
+        if attribute == self.field_name:
+            alias = ''
+        elif attribute.endswith('.' + self.field_name):
+            alias = attribute[:-len(self.field_name)]
+        else:
+            return False
+        return expression_implies(condition, self.predicate_expression(alias))
+
+    def add_record(self, record: Atom, field_name: str = None) -> PartialIndex:
+        if not self.matches(record):
+            return self
+        return self.set_at(_field_value(record, self.field_name), record)
+
+    def remove_record(self, record: Atom, field_name: str = None) -> PartialIndex:
+        if not self.matches(record):
+            return self
+        return self.remove_record_at(_field_value(record, self.field_name), record)
+
+    def update_record(self, old_record: Atom, new_record: Atom) -> PartialIndex:
+        """
+        Index after old_record was replaced by new_record: it leaves, enters or moves within
+        the index depending on whether each version matches the predicate.
+        """
+        return self.remove_record(old_record).add_record(new_record)
+
+    def index_add(self, item, field_name: str = None) -> PartialIndex:
+        return self.add_record(item)
+
+    def index_remove(self, item, field_name: str = None) -> PartialIndex:
+        return self.remove_record(item)
+
+    def indexed_field(self) -> str:
+        self._load()
+        return self.field_name
+
+    def _with_content(self, updated: RepeatedKeysDictionary | None) -> PartialIndex:
+        if updated is None or updated is self:
+            return self
+        return PartialIndex(
+            field_name=self.field_name,
+            predicate=self.predicate,
+            content=updated.content,
+            transaction=self.transaction,
+            op_log=updated._op_log,
+            indexes=updated.indexes,
+            statistics=updated.statistics
+        )
+
+    def _with_statistics(self, statistics: ColumnStatistics) -> PartialIndex:
+        return PartialIndex(
+            field_name=self.field_name,
+            predicate=self.predicate,
+            content=self.content,
+            transaction=self.transaction,
+            op_log=self._op_log,
+            indexes=self.indexes,
+            statistics=statistics
+        )
+
+    def set_at(self, key: object, value: Atom) -> PartialIndex:
+        return self._with_content(super().set_at(key, value))
+
+    def remove_at(self, key: object) -> PartialIndex:
+        return self._with_content(super().remove_at(key))
+
+    def remove_record_at(self, key: object, record: Atom) -> PartialIndex:
+        return self._with_content(super().remove_record_at(key, record))
+
+
+class ExpressionIndex(RepeatedKeysDictionary):
+    """
+    Ordered index keyed by a value derived from each record, such as lower(email) or
+    mul(price, 2) (see queries.value_fingerprint), or a function registered with
+    register_value_function.
+
+    The expression is kept as its fingerprint text, so it is stored with the index. Terms are
+    answered by the index only when they name the identical expression, possibly behind an
+    alias (a query on lower(r.email) uses an index on lower(email)).
+    """
+    expression: str
+
+    def __init__(
+            self,
+            expression: str = None,
+            content: List = None,
+            indexes: DBCollections = None,
+            transaction: AbstractTransaction = None,
+            atom_pointer: AtomPointer = None,
+            op_log: list = None,
+            **kwargs):
+        super().__init__(content=content, indexes=indexes, transaction=transaction, atom_pointer=atom_pointer,
+                         op_log=op_log, **kwargs)
+        if expression is not None and not isinstance(expression, Literal):
+            if parse_value(expression) is None:
+                raise ProtoValidationException(message=f'{expression!r} is not a derived value expression')
+            expression = canonical_value(expression)
+        self.expression = expression
+
+    def after_load(self):
+        # The expression is stored as a Literal
+        if isinstance(self.__dict__.get('expression'), Literal):
+            object.__setattr__(self, 'expression', self.expression.string)
+
+    def key_of(self, record: object) -> object:
+        """
+        Key of record in this index: the value of the expression, None when it has none.
+        """
+        self._load()
+        return evaluate_value(record, self.expression)
+
+    def applies_to(self, attribute: str, condition: Expression = None) -> bool:
+        """
+        Whether a term on attribute names the expression of this index (possibly with its
+        path behind an alias such as 'r.').
+        """
+        self._load()
+        parsed = parse_value(attribute) if isinstance(attribute, str) else None
+        if parsed is None:
+            return False
+        path, transforms = parsed
+        own_path, own_transforms = parse_value(self.expression)
+        return transforms == own_transforms and (path == own_path or path.endswith('.' + own_path))
+
+    def add_record(self, record: Atom, field_name: str = None) -> ExpressionIndex:
+        key = self.key_of(record)
+        return self if key is None else self.set_at(key, record)
+
+    def remove_record(self, record: Atom, field_name: str = None) -> ExpressionIndex:
+        key = self.key_of(record)
+        return self if key is None else self.remove_record_at(key, record)
+
+    def index_add(self, item, field_name: str = None) -> ExpressionIndex:
+        return self.add_record(item)
+
+    def index_remove(self, item, field_name: str = None) -> ExpressionIndex:
+        return self.remove_record(item)
+
+    def indexed_field(self) -> str:
+        self._load()
+        return parse_value(self.expression)[0].split('.')[0]
+
+    def _with_content(self, updated: RepeatedKeysDictionary | None) -> ExpressionIndex:
+        if updated is None or updated is self:
+            return self
+        return ExpressionIndex(
+            expression=self.expression,
+            content=updated.content,
+            transaction=self.transaction,
+            op_log=updated._op_log,
+            indexes=updated.indexes,
+            statistics=updated.statistics
+        )
+
+    def _with_statistics(self, statistics: ColumnStatistics) -> ExpressionIndex:
+        return ExpressionIndex(
+            expression=self.expression,
+            content=self.content,
+            transaction=self.transaction,
+            op_log=self._op_log,
+            indexes=self.indexes,
+            statistics=statistics
+        )
+
+    def set_at(self, key: object, value: Atom) -> ExpressionIndex:
+        return self._with_content(super().set_at(key, value))
+
+    def remove_at(self, key: object) -> ExpressionIndex:
+        return self._with_content(super().remove_at(key))
+
+    def remove_record_at(self, key: object, record: Atom) -> ExpressionIndex:
+        return self._with_content(super().remove_record_at(key, record))
+
+
+def _field_value(record: object, field: str) -> object:
+    """
+    Value of a dotted field path of record (dicts or attributes); Literals are unwrapped.
+    """
+    value = record
+    for part in field.split('.'):
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            value = value.get(part)
+        else:
+            value = getattr(value, part, None)
+    if isinstance(value, Literal):
+        value = value.string
+    return value
+
+
+def _sort_entries(pairs: Iterable[tuple[object, object]]):
+    """
+    (order key, key, value) entries of (key, value) pairs, skipping None keys, to be sorted on
+    their first element (see RepeatedKeysDictionary.from_sorted_entries).
+    """
+    order = DictionaryItem._order_key
+    for key, value in pairs:
+        if key is not None:
+            yield order(key), key, value
+
+
+def _record_ref(record: object) -> int:
+    """
+    Stable reference of record: its AtomPointer hash when persisted, otherwise its identity.
+    """
+    if isinstance(record, Atom):
+        ap = record.__dict__.get('atom_pointer')
+        if ap:
+            return ap.hash()
+        return id(record)
+    return hash(record)
+
+
+def _stored_ref(record: object, transaction: AbstractTransaction) -> int:
+    """
+    Reference of record once it is stored with an index being saved in transaction. An
+    unsaved Atom is saved first, so the reference is its AtomPointer hash.
+    """
+    if isinstance(record, Atom) and not record.__dict__.get('atom_pointer'):
+        if not record.transaction:
+            object.__setattr__(record, 'transaction', transaction)
+        record._save()
+    return _record_ref(record)
+
+
+def _raw_value(value: object) -> object:
+    return value.string if isinstance(value, Literal) else value
+
+
+def _range_bounds(term: Term) -> tuple | None:
+    """
+    (lo, hi, include_lower, include_upper) for a range term; an open side is None.
+    """
+    op = term.operation
+    value = term.value
+    if isinstance(op, Between):
+        if not isinstance(value, tuple) or len(value) != 2 or value[0] is None or value[1] is None:
+            return None
+        return _raw_value(value[0]), _raw_value(value[1]), op.include_lower, op.include_upper
+    if isinstance(op, Greater):
+        return _raw_value(value), None, False, True
+    if isinstance(op, GreaterOrEqual):
+        return _raw_value(value), None, True, True
+    if isinstance(op, Lower):
+        return None, _raw_value(value), True, False
+    if isinstance(op, LowerOrEqual):
+        return None, _raw_value(value), True, True
+    if isinstance(op, StartsWith):
+        value = _raw_value(value)
+        successor = prefix_successor(value) if isinstance(value, str) else None
+        return (value, successor, True, False) if successor is not None else None
+    return None
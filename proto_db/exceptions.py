@@ -36,6 +36,15 @@ class ProtoValidationException(ProtoBaseException):
         )
 
 
+class ProtoUniqueConstraintException(ProtoValidationException):
+    def __init__(self, code: int = VALIDATION_ERROR, exception_type: str = None, message: str = None):
+        super().__init__(
+            code if code else VALIDATION_ERROR,
+            exception_type if exception_type else 'UniqueConstraintException',
+            message
+        )
+
+
 class ProtoUserException(ProtoBaseException):
     def __init__(self, code: int = USER_ERROR, exception_type: str = None, message: str = None):
         super().__init__(
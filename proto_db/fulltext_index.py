@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import unicodedata
+from typing import Callable, Optional
+
+from .common import Atom, AtomPointer, AbstractTransaction, Literal
+from .dictionaries import Dictionary, _field_value, _record_ref, _stored_ref
+from .exceptions import ProtoValidationException
+from .hash_dictionaries import HashDictionary
+from .queries import QueryableIndex, QueryContext, Term, MatchesText, FullTextMatchPlan, FullTextSearchPlan
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _word_tokenizer(text: str) -> list[str]:
+    return _WORD_RE.findall(text)
+
+
+def _whitespace_tokenizer(text: str) -> list[str]:
+    return text.split()
+
+
+def _casefold_normalizer(token: str) -> str:
+    return token.casefold()
+
+
+def _accent_fold_normalizer(token: str) -> str:
+    decomposed = unicodedata.normalize('NFKD', token.casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _identity_normalizer(token: str) -> str:
+    return token
+
+
+# Tokenizers and normalizers are referenced by name, so persisted indexes can find them again
+_TOKENIZERS: dict[str, Callable[[str], list[str]]] = {
+    'word': _word_tokenizer,
+    'whitespace': _whitespace_tokenizer,
+}
+_NORMALIZERS: dict[str, Callable[[str], str]] = {
+    'casefold': _casefold_normalizer,
+    'accent_fold': _accent_fold_normalizer,
+    'none': _identity_normalizer,
+}
+
+
+def register_tokenizer(name: str, tokenizer: Callable[[str], list[str]]) -> None:
+    """
+    Make tokenizer (text -> list of tokens) available to full-text indexes as name.
+    """
+    _TOKENIZERS[name] = tokenizer
+
+
+def register_normalizer(name: str, normalizer: Callable[[str], str]) -> None:
+    """
+    Make normalizer (token -> normalized token; empty to drop it) available to full-text
+    indexes as name.
+    """
+    _NORMALIZERS[name] = normalizer
+
+
+class FullTextIndex(QueryableIndex):
+    """
+    Inverted index over the text of one field.
+
+    Text is split by a named tokenizer and every token passed through a named normalizer (see
+    register_tokenizer/register_normalizer). The index keeps:
+
+    - postings: Dictionary term -> HashDictionary[record reference -> term frequency]
+    - documents: HashDictionary[record reference -> record]
+    - lengths: HashDictionary[record reference -> number of tokens]
+
+    Records indexed before they are saved are referenced by identity (see _record_ref) and
+    listed in `_new_records`; they are keyed by their AtomPointer hash when the index is saved.
+
+    `matches` terms (MatchesText) on the field are planned as posting-list intersections (a
+    record matches when its text has every token of the searched value), and `search` ranks
+    records by BM25. `contains` terms stay exact substring tests and are not answered here.
+    Like the other indexes, updates return a new index.
+    """
+    field_name: str
+    tokenizer: str
+    normalizer: str
+    postings: Dictionary
+    documents: HashDictionary
+    lengths: HashDictionary
+    total_length: int
+    # Records referenced by identity until the index is saved: identity -> record (not persisted)
+    _new_records: HashDictionary = None
+
+    def __init__(
+            self,
+            field_name: str = None,
+            tokenizer: str = 'word',
+            normalizer: str = 'casefold',
+            postings: Dictionary = None,
+            documents: HashDictionary = None,
+            lengths: HashDictionary = None,
+            total_length: int = 0,
+            new_records: HashDictionary = None,
+            transaction: AbstractTransaction = None,
+            atom_pointer: AtomPointer = None,
+            **kwargs):
+        super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        if tokenizer not in _TOKENIZERS:
+            raise ProtoValidationException(message=f'Unknown tokenizer {tokenizer}!')
+        if normalizer not in _NORMALIZERS:
+            raise ProtoValidationException(message=f'Unknown normalizer {normalizer}!')
+        self.field_name = field_name
+        self.tokenizer = tokenizer
+        self.normalizer = normalizer
+        self.postings = postings if postings is not None else Dictionary(transaction=transaction)
+        self.documents = documents if documents is not None else HashDictionary(transaction=transaction)
+        self.lengths = lengths if lengths is not None else HashDictionary(transaction=transaction)
+        self.total_length = total_length
+        self._new_records = new_records if new_records is not None else HashDictionary(transaction=transaction)
+        self.count = self.documents.count
+
+    def after_load(self):
+        # Names are stored as Literals
+        for name in ('field_name', 'tokenizer', 'normalizer'):
+            value = self.__dict__.get(name)
+            if isinstance(value, Literal):
+                object.__setattr__(self, name, value.string)
+
+    def tokens(self, text: object) -> list[str]:
+        """
+        Normalized tokens of text, in order. Lists of strings are tokenized element by element.
+        """
+        if text is None:
+            return []
+        if isinstance(text, Literal):
+            text = text.string
+        if isinstance(text, (list, tuple)):
+            return [token for part in text for token in self.tokens(part)]
+        tokenize = _TOKENIZERS[self.tokenizer]
+        normalize = _NORMALIZERS[self.normalizer]
+        result = []
+        for token in tokenize(str(text)):
+            token = normalize(token)
+            if token:
+                result.append(token)
+        return result
+
+    def _term_frequencies(self, record: object) -> tuple[dict[str, int], int]:
+        frequencies: dict[str, int] = {}
+        tokens = self.tokens(_field_value(record, self.field_name))
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        return frequencies, len(tokens)
+
+    def _with(self, postings: Dictionary, documents: HashDictionary, lengths: HashDictionary,
+              total_length: int, new_records: HashDictionary) -> FullTextIndex:
+        return FullTextIndex(
+            field_name=self.field_name,
+            tokenizer=self.tokenizer,
+            normalizer=self.normalizer,
+            postings=postings,
+            documents=documents,
+            lengths=lengths,
+            total_length=total_length,
+            new_records=new_records,
+            transaction=self.transaction
+        )
+
+    def add_record(self, record: object, field_name: str = None) -> FullTextIndex:
+        """
+        Index the text of record; records already indexed are reindexed.
+        """
+        return self.add_records([record])
+
+    def add_records(self, records) -> FullTextIndex:
+        """
+        Index the text of a batch of records. Every posting list is updated once for the whole
+        batch, which makes bulk builds much cheaper than adding records one by one.
+        """
+        self._load()
+        batch: dict[int, object] = {}
+        for record in records:
+            batch[_record_ref(record)] = record
+        if not batch:
+            return self
+
+        base = self
+        for ref, record in batch.items():
+            if base.documents.has(ref):
+                base = base.remove_record(record)
+
+        additions: dict[str, list[tuple[int, int]]] = {}
+        documents = base.documents
+        lengths = base.lengths
+        total_length = base.total_length
+        new_records = base._new_records
+        for ref, record in batch.items():
+            if isinstance(record, Atom) and not record.__dict__.get('atom_pointer'):
+                new_records = new_records.set_at(ref, record)
+            frequencies, length = self._term_frequencies(record)
+            for token, frequency in frequencies.items():
+                additions.setdefault(token, []).append((ref, frequency))
+            documents = documents.set_at(ref, record)
+            lengths = lengths.set_at(ref, length)
+            total_length += length
+
+        postings = base.postings
+        for token, entries in additions.items():
+            posting = postings.get_at(token) or HashDictionary(transaction=self.transaction)
+            for ref, frequency in entries:
+                posting = posting.set_at(ref, frequency)
+            postings = postings.set_at(token, posting)
+        return base._with(postings, documents, lengths, total_length, new_records)
+
+    def remove_record(self, record: object, field_name: str = None) -> FullTextIndex:
+        """
+        Drop record from the index; unknown records leave it unchanged.
+        """
+        self._load()
+        ref = _record_ref(record)
+        if not self.documents.has(ref):
+            return self
+        # Postings are found from the indexed version of the record
+        frequencies, _ = self._term_frequencies(self.documents.get_at(ref))
+        postings = self.postings
+        for token in frequencies:
+            posting = postings.get_at(token)
+            if posting is None:
+                continue
+            posting = posting.remove_at(ref)
+            postings = postings.set_at(token, posting) if posting.count else postings.remove_at(token)
+        return self._with(
+            postings,
+            self.documents.remove_at(ref),
+            self.lengths.remove_at(ref),
+            self.total_length - (self.lengths.get_at(ref) or 0),
+            self._new_records.remove_at(ref)
+        )
+
+    def _save(self):
+        if not self._saved and not self.__dict__.get('atom_pointer') and self._new_records.count:
+            # Key the records indexed by identity by their AtomPointer hash, now that they are stored
+            postings, documents, lengths = self.postings, self.documents, self.lengths
+            for ref, record in self._new_records.as_iterable():
+                if not documents.has(ref):
+                    continue
+                new_ref = _stored_ref(record, self.transaction)
+                frequencies, _ = self._term_frequencies(record)
+                for token in frequencies:
+                    posting = postings.get_at(token)
+                    postings = postings.set_at(token, posting.remove_at(ref).set_at(new_ref, posting.get_at(ref)))
+                documents = documents.remove_at(ref).set_at(new_ref, record)
+                lengths = lengths.remove_at(ref).set_at(new_ref, lengths.get_at(ref))
+            object.__setattr__(self, 'postings', postings)
+            object.__setattr__(self, 'documents', documents)
+            object.__setattr__(self, 'lengths', lengths)
+            self._new_records = HashDictionary(transaction=self.transaction)
+        super()._save()
+
+    def index_add(self, item, field_name: str = None) -> FullTextIndex:
+        return self.add_record(item)
+
+    def index_remove(self, item, field_name: str = None) -> FullTextIndex:
+        return self.remove_record(item)
+
+    def matching_references(self, text: object) -> list[int]:
+        """
+        References of the records whose text has every token of text (none for an empty text).
+        """
+        self._load()
+        postings = []
+        for token in set(self.tokens(text)):
+            posting = self.postings.get_at(token)
+            if posting is None:
+                return []
+            postings.append(posting)
+        if not postings:
+            return []
+        # Walk the shortest posting list and probe the others
+        postings.sort(key=lambda p: p.count)
+        shortest, others = postings[0], postings[1:]
+        return [ref for ref, _ in shortest.as_iterable() if all(p.has(ref) for p in others)]
+
+    def match(self, text: object) -> list:
+        """
+        Records whose text has every token of text.
+        """
+        return [self.documents.get_at(ref) for ref in self.matching_references(text)]
+
+    def search(self, text: object, k: int = 10, k1: float = 1.2, b: float = 0.75) -> list[tuple[object, float]]:
+        """
+        Top k records for text ranked by BM25, as (record, score) pairs, best first. Records
+        with any of the tokens of text are candidates.
+        """
+        self._load()
+        total = self.documents.count
+        if total == 0 or k <= 0:
+            return []
+        average_length = (self.total_length / total) or 1.0
+        scores: dict[int, float] = {}
+        lengths: dict[int, int] = {}
+        for token in set(self.tokens(text)):
+            posting = self.postings.get_at(token)
+            if posting is None:
+                continue
+            frequency_of_docs = posting.count
+            idf = math.log(1.0 + (total - frequency_of_docs + 0.5) / (frequency_of_docs + 0.5))
+            for ref, frequency in posting.as_iterable():
+                length = lengths.get(ref)
+                if length is None:
+                    length = lengths[ref] = self.lengths.get_at(ref) or 0
+                norm = k1 * (1.0 - b + b * length / average_length)
+                scores[ref] = scores.get(ref, 0.0) + idf * frequency * (k1 + 1.0) / (frequency + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda entry: entry[1])
+        return [(self.documents.get_at(ref), score) for ref, score in best]
+
+    def build_query_plan(self, term: Term, context: QueryContext) -> Optional[FullTextMatchPlan]:
+        if not isinstance(term.operation, MatchesText):
+            return None
+        value = term.value.string if isinstance(term.value, Literal) else term.value
+        if not isinstance(value, str) or not self.tokens(value):
+            return None
+        return FullTextMatchPlan(index=self, text=value, transaction=context.transaction)
+
+    def search_plan(self, text: str, k: int = 10) -> FullTextSearchPlan:
+        """
+        Plan yielding the BM25 top k records for text, best first.
+        """
+        return FullTextSearchPlan(index=self, text=text, k=k, transaction=self.transaction)
+
+    def as_iterable(self):
+        self._load()
+        for _, record in self.documents.as_iterable():
+            yield record
+
+    def as_query_plan(self):
+        from .queries import ListPlan as _ListPlan
+        return _ListPlan(base_list=list(self.as_iterable()), transaction=self.transaction)
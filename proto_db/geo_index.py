@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import heapq
+import math
+from typing import Iterator, Optional
+
+from .common import Atom, AtomPointer, AbstractTransaction, Literal, DBCollections
+from .dictionaries import RepeatedKeysDictionary, _field_value
+from .lists import List
+from .queries import QueryContext, Term, WithinBox, WithinRadius, GeoScanPlan, GeoNearestPlan
+from .statistics import ColumnStatistics
+
+# Mean Earth radius (IUGG), in meters
+EARTH_RADIUS_M = 6371008.8
+
+# Bits per axis of a cell: 2^26 steps of latitude and longitude, under a meter at the equator
+_CELL_BITS = 26
+_CELL_MAX = (1 << _CELL_BITS) - 1
+
+# Key ranges a query area is covered with. More ranges fit the area closer (fewer points
+# filtered out) at the price of one index descent each.
+MAX_COVER_RANGES = 64
+
+# First radius tried by nearest(), grown NEAREST_GROWTH times until k points are found
+NEAREST_START_M = 250.0
+NEAREST_GROWTH = 4.0
+
+
+def point_of(value: object) -> tuple[float, float] | None:
+    """
+    (latitude, longitude) of a point given as a (lat, lon) pair, a dict or an object with
+    lat/lon (or latitude/longitude, lng) fields; None if value is not a valid point.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (tuple, list)):
+        if len(value) != 2:
+            return None
+        lat, lon = value
+    else:
+        lat = _coordinate(value, ('lat', 'latitude'))
+        lon = _coordinate(value, ('lon', 'lng', 'longitude'))
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+
+def _coordinate(value: object, names: tuple[str, ...]) -> object:
+    for name in names:
+        if isinstance(value, dict):
+            found = value.get(name)
+        else:
+            try:
+                found = getattr(value, name)
+            except Exception:
+                found = None
+        if isinstance(found, Literal):
+            found = found.string
+        if found is not None:
+            return found
+    return None
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle (haversine) distance between two points, in meters.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def in_box(point: tuple[float, float], box: tuple) -> bool:
+    """
+    Whether point is inside box = (south, west, north, east). A box with west > east crosses
+    the antimeridian.
+    """
+    lat, lon = point
+    south, west, north, east = box
+    if not south <= lat <= north:
+        return False
+    return west <= lon <= east if west <= east else (lon >= west or lon <= east)
+
+
+def radius_boxes(lat: float, lon: float, radius_m: float) -> list[tuple]:
+    """
+    Boxes (without antimeridian crossings) covering every point within radius_m of (lat, lon).
+    """
+    d_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    south, north = max(-90.0, lat - d_lat), min(90.0, lat + d_lat)
+    if south <= -90.0 or north >= 90.0 or d_lat >= 90.0:
+        # Reaches a pole: every longitude is in range
+        return [(south, -180.0, north, 180.0)]
+    d_lon = math.degrees(math.asin(min(1.0, math.sin(radius_m / EARTH_RADIUS_M) / math.cos(math.radians(lat)))))
+    if d_lon >= 180.0 or radius_m >= math.pi * EARTH_RADIUS_M / 2:
+        return [(south, -180.0, north, 180.0)]
+    return _split_box((south, lon - d_lon, north, lon + d_lon))
+
+
+def _split_box(box: tuple) -> list[tuple]:
+    south, west, north, east = box
+    if west < -180.0:
+        return [(south, west + 360.0, north, 180.0), (south, -180.0, north, east)]
+    if east > 180.0:
+        return [(south, west, north, 180.0), (south, -180.0, north, east - 360.0)]
+    if west > east:
+        return [(south, west, north, 180.0), (south, -180.0, north, east)]
+    return [box]
+
+
+def _cell_y(lat: float) -> int:
+    return min(_CELL_MAX, max(0, int((lat + 90.0) / 180.0 * (_CELL_MAX + 1))))
+
+
+def _cell_x(lon: float) -> int:
+    return min(_CELL_MAX, max(0, int((lon + 180.0) / 360.0 * (_CELL_MAX + 1))))
+
+
+def _spread(value: int) -> int:
+    # Bits of value moved to the even positions (Morton / Z-order interleaving)
+    value &= 0xFFFFFFFF
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value << 2)) & 0x3333333333333333
+    value = (value | (value << 1)) & 0x5555555555555555
+    return value
+
+
+def _interleave(x: int, y: int) -> int:
+    return _spread(x) | (_spread(y) << 1)
+
+
+def cell_of(lat: float, lon: float) -> int:
+    """
+    Z-order cell of a point: nearby points mostly get close cells, and every quadtree cell
+    is a contiguous range of them.
+    """
+    return _interleave(_cell_x(lon), _cell_y(lat))
+
+
+def _node_range(level: int, y: int, x: int) -> tuple[int, int]:
+    shift = 2 * (_CELL_BITS - level)
+    code = _interleave(x, y)
+    return code << shift, ((code + 1) << shift) - 1
+
+
+def cover(box: tuple, max_ranges: int = MAX_COVER_RANGES) -> list[tuple[int, int]]:
+    """
+    Sorted, disjoint ranges of cells covering box (without antimeridian crossing), from a
+    quadtree descent that refines the cells crossing the border of the box while the budget
+    of max_ranges allows.
+    """
+    south, west, north, east = box
+    y0, y1, x0, x1 = _cell_y(south), _cell_y(north), _cell_x(west), _cell_x(east)
+    inside: list[tuple[int, int, int]] = []
+    crossing = [(0, 0, 0)]
+    level = 0
+    while crossing and level < _CELL_BITS:
+        children_inside, children_crossing = [], []
+        shift = _CELL_BITS - level - 1
+        for _, y, x in crossing:
+            for cy in ((y << 1), (y << 1) | 1):
+                low_y, high_y = cy << shift, ((cy + 1) << shift) - 1
+                if high_y < y0 or low_y > y1:
+                    continue
+                for cx in ((x << 1), (x << 1) | 1):
+                    low_x, high_x = cx << shift, ((cx + 1) << shift) - 1
+                    if high_x < x0 or low_x > x1:
+                        continue
+                    if y0 <= low_y and high_y <= y1 and x0 <= low_x and high_x <= x1:
+                        children_inside.append((level + 1, cy, cx))
+                    else:
+                        children_crossing.append((level + 1, cy, cx))
+        if len(inside) + len(children_inside) + len(children_crossing) > max_ranges and inside + crossing:
+            break
+        inside.extend(children_inside)
+        crossing = children_crossing
+        level += 1
+
+    ranges = sorted(_node_range(*node) for node in inside + crossing)
+    merged: list[tuple[int, int]] = []
+    for low, high in ranges:
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+class GeoIndex(RepeatedKeysDictionary):
+    """
+    Spatial index over the points held in `field_name` (see point_of), answering WithinBox
+    and WithinRadius terms and k-nearest-point queries.
+
+    Records are kept in an ordered dictionary keyed by the Z-order cell of their point, so
+    the index is stored like any other ProtoDB collection. An area is covered with a few
+    cell ranges (cover), each read with one range scan; the points of those ranges are then
+    checked exactly.
+    """
+    field_name: str
+
+    def __init__(
+            self,
+            field_name: str = None,
+            content: List = None,
+            indexes: DBCollections = None,
+            transaction: AbstractTransaction = None,
+            atom_pointer: AtomPointer = None,
+            op_log: list = None,
+            **kwargs):
+        super().__init__(content=content, indexes=indexes, transaction=transaction, atom_pointer=atom_pointer,
+                         op_log=op_log, **kwargs)
+        self.field_name = field_name
+
+    @classmethod
+    def from_records(cls, field_name: str, records, transaction: AbstractTransaction = None) -> GeoIndex:
+        """
+        Index of the points of records, built at once (see RepeatedKeysDictionary.from_pairs).
+        Records without a valid point are skipped.
+        """
+        def pairs():
+            for record in records:
+                point = point_of(_field_value(record, field_name))
+                if point is not None:
+                    yield cell_of(*point), record
+
+        built = RepeatedKeysDictionary.from_pairs(pairs(), transaction=transaction)
+        return GeoIndex(field_name=field_name, content=built.content, transaction=transaction,
+                        statistics=built.statistics)
+
+    def after_load(self):
+        # The field name is stored as a Literal
+        if isinstance(self.__dict__.get('field_name'), Literal):
+            object.__setattr__(self, 'field_name', self.field_name.string)
+
+    def point_of_record(self, record: object) -> tuple[float, float] | None:
+        self._load()
+        return point_of(_field_value(record, self.field_name))
+
+    def add_record(self, record: Atom, field_name: str = None) -> GeoIndex:
+        point = self.point_of_record(record)
+        return self if point is None else self.set_at(cell_of(*point), record)
+
+    def add_records(self, records) -> GeoIndex:
+        index = self
+        for record in records:
+            index = index.add_record(record)
+        return index
+
+    def remove_record(self, record: Atom, field_name: str = None) -> GeoIndex:
+        point = self.point_of_record(record)
+        return self if point is None else self.remove_record_at(cell_of(*point), record)
+
+    def index_add(self, item, field_name: str = None) -> GeoIndex:
+        return self.add_record(item)
+
+    def index_remove(self, item, field_name: str = None) -> GeoIndex:
+        return self.remove_record(item)
+
+    def indexed_field(self) -> str:
+        self._load()
+        return self.field_name
+
+    def _scan(self, box: tuple) -> Iterator[tuple[object, tuple[float, float]]]:
+        # (record, point) of the records in the cells covering box, some of them outside it
+        for low, high in cover(box):
+            for item in self.items_from(self.lower_bound(low)):
+                if item.key > high:
+                    break
+                for record in item.value.as_iterable():
+                    point = self.point_of_record(record)
+                    if point is not None:
+                        yield record, point
+
+    def records_in_box(self, south: float, west: float, north: float, east: float) -> Iterator[object]:
+        """
+        Records whose point is inside the box. A box with west > east crosses the antimeridian.
+        """
+        box = (south, west, north, east)
+        for part in _split_box(box):
+            for record, point in self._scan(part):
+                if in_box(point, box):
+                    yield record
+
+    def records_within(self, lat: float, lon: float, radius_m: float) -> Iterator[object]:
+        """
+        Records whose point is within radius_m meters of (lat, lon).
+        """
+        for record, _ in self._within(lat, lon, radius_m):
+            yield record
+
+    def _within(self, lat: float, lon: float, radius_m: float) -> Iterator[tuple[object, float]]:
+        for part in radius_boxes(lat, lon, radius_m):
+            for record, point in self._scan(part):
+                distance = distance_m(lat, lon, *point)
+                if distance <= radius_m:
+                    yield record, distance
+
+    def nearest(self, lat: float, lon: float, k: int) -> list[tuple[object, float]]:
+        """
+        The k records closest to (lat, lon) with their distance in meters, closest first.
+
+        Searches growing radii until one holds k points: the k closest of them are then the
+        k closest overall.
+        """
+        if k <= 0:
+            return []
+        radius = NEAREST_START_M
+        while True:
+            found = list(self._within(lat, lon, radius))
+            if len(found) >= k or radius >= math.pi * EARTH_RADIUS_M:
+                return heapq.nsmallest(k, found, key=lambda entry: entry[1])
+            radius *= NEAREST_GROWTH
+
+    def build_query_plan(self, term: Term, context: QueryContext) -> Optional[GeoScanPlan]:
+        if isinstance(term.operation, (WithinBox, WithinRadius)) and \
+                term.operation.valid_area(term.value):
+            return GeoScanPlan(index=self, operation=term.operation, area=tuple(term.value),
+                               transaction=context.transaction or self.transaction)
+        return None
+
+    def nearest_plan(self, lat: float, lon: float, k: int) -> GeoNearestPlan:
+        """
+        Plan yielding the k records closest to (lat, lon), closest first.
+        """
+        return GeoNearestPlan(index=self, lat=lat, lon=lon, k=k, transaction=self.transaction)
+
+    def _with_content(self, updated: RepeatedKeysDictionary | None) -> GeoIndex:
+        if updated is None or updated is self:
+            return self
+        return GeoIndex(
+            field_name=self.field_name,
+            content=updated.content,
+            transaction=self.transaction,
+            op_log=updated._op_log,
+            indexes=updated.indexes,
+            statistics=updated.statistics
+        )
+
+    def _with_statistics(self, statistics: ColumnStatistics) -> GeoIndex:
+        return GeoIndex(
+            field_name=self.field_name,
+            content=self.content,
+            transaction=self.transaction,
+            op_log=self._op_log,
+            indexes=self.indexes,
+            statistics=statistics
+        )
+
+    def set_at(self, key: object, value: Atom) -> GeoIndex:
+        return self._with_content(super().set_at(key, value))
+
+    def remove_at(self, key: object) -> GeoIndex:
+        return self._with_content(super().remove_at(key))
+
+    def remove_record_at(self, key: object, record: Atom) -> GeoIndex:
+        return self._with_content(super().remove_record_at(key, record))
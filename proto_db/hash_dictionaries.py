@@ -3,7 +3,8 @@ from __future__ import annotations
 import logging
 import uuid
 
-from .common import Atom, DBCollections, QueryPlan, AbstractTransaction, AtomPointer
+from .common import Atom, DBCollections, QueryPlan, AbstractTransaction, AtomPointer, subtree_stats, \
+    stamp_subtree_stats, iter_tree_nodes
 from .exceptions import ProtoCorruptionException
 
 _logger = logging.getLogger(__name__)
@@ -40,6 +41,10 @@ class HashDictionary(DBCollections):
     height: int  # The height of the current subtree rooted at this node.
     next: HashDictionary  # Reference to the next node in the structure (right child in a tree context).
     previous: HashDictionary  # Reference to the previous node in the structure (left child in a tree context).
+    # Header with the sizes of the children, so building or walking a node does not need to load them
+    previous_count: int | None = None
+    previous_height: int | None = None
+    next_height: int | None = None
 
     def __init__(
             self,
@@ -59,27 +64,19 @@ class HashDictionary(DBCollections):
         self.next = next
         self.previous = previous
 
-        # Calculate the total count of nodes in the current subtree.
+        # Calculate the total count and the height of the current subtree. Children sizes
+        # are taken from the header of the node they were loaded from when available, so
+        # untouched siblings are not read from storage.
         if key is not None:
-            count = 1
-            if self.previous:
-                self.previous._load()
-                count += self.previous.count
-            if self.next:
-                self.next._load()
-                count += self.next.count
-            self.count = count
+            previous_count, previous_height = subtree_stats(self.previous)
+            next_count, next_height = subtree_stats(self.next)
+            self.count = 1 + previous_count + next_count
+            self.height = 1 + max(previous_height, next_height)
+            self.previous_count = previous_count
+            self.previous_height = previous_height
+            self.next_height = next_height
         else:
             self.count = 0
-
-        # Calculate the height of the current subtree.
-        if key is not None:
-            height = 1
-            previous_height = previous.height if previous else 0
-            next_height = next.height if next else 0
-            height += max(previous_height, next_height)
-            self.height = height
-        else:
             self.height = 0
 
     def _load(self):
@@ -87,6 +84,12 @@ class HashDictionary(DBCollections):
             super()._load()
             self._loaded = True
 
+    def after_load(self):
+        # Pass the children sizes kept in this node header down to the (unloaded) children
+        if self.previous_count is not None:
+            stamp_subtree_stats(self.previous, self.previous_count, self.previous_height)
+            stamp_subtree_stats(self.next, self.count - 1 - self.previous_count, self.next_height)
+
     def _save(self):
         self._load()
         if not self._saved:
@@ -102,24 +105,19 @@ class HashDictionary(DBCollections):
             super()._save()
             self._saved = True
 
-    def as_iterable(self):
+    def as_iterable(self, prefetch_depth: int | None = None):
         """
             Get an iterable generator of the HashDictionary items.
 
+            Nodes and values ahead of the cursor are read from storage in the background
+            (see iter_tree_nodes).
+
+            :param prefetch_depth: Reads to keep in flight ahead of the cursor; None uses the default.
             :return: A generator that yields tuples (key, value) representing the nodes of the tree.
             """
-
-        def scan(node: HashDictionary):
-            node._load()
-            if node.previous:
-                yield from scan(node.previous)  # Subárbol izquierdo (recursión/yield)
+        for node in iter_tree_nodes(self, prefetch_depth):
             if node.key is not None:
-                yield (node.key, node.value)  # Nodo actual
-            if node.next:
-                yield from scan(node.next)  # Subárbol derecho (recursión/yield)
-
-        # Iniciar el generador desde el nodo actual
-        return scan(self)
+                yield node.key, node.value
 
     def as_query_plan(self) -> QueryPlan:
         """
@@ -142,7 +140,8 @@ class HashDictionary(DBCollections):
 
         node = self
         while node is not None:
-            node._load()
+            if not node._loaded:
+                node._load()
 
             if node.key == key:
                 if isinstance(node.value, Atom):
@@ -167,12 +166,15 @@ class HashDictionary(DBCollections):
         :param key: The integer key to locate within the structure.
         :return: True if the key exists, otherwise False.
         """
+        if not self._loaded:
+            self._load()
         if self.key is None:
             return False
 
         node = self
         while node is not None:
-            node._load()
+            if not node._loaded:
+                node._load()
 
             if node.key == key:
                 return True
@@ -190,20 +192,8 @@ class HashDictionary(DBCollections):
         Balance factor: height(right subtree) - height(left subtree).
         :return: The balance factor of the node.
         """
-        if not self:
-            return 0
-        if self.next and self.previous:
-            self.next._load()
-            self.previous._load()
-            return self.next.height - self.previous.height
-        elif self.previous:
-            self.previous._load()
-            return -self.previous.height
-        elif self.next:
-            self.next._load()
-            return self.next.height
-        else:
-            return 0
+        self._load()
+        return subtree_stats(self.next)[1] - subtree_stats(self.previous)[1]
 
     def _right_rotation(self) -> HashDictionary:
         """
@@ -275,8 +265,9 @@ class HashDictionary(DBCollections):
         # Rebalance child subtrees first (post-order traversal)
         node = self
 
-        while node.previous:
-            node.previous._load()
+        # Persisted children are immutable and were balanced when written: only subtrees
+        # built by this update need checking, which keeps untouched siblings unloaded.
+        while node.previous and not node.previous.atom_pointer:
             if not -1 <= node.previous._balance() <= 1:
                 node = HashDictionary(
                     key=node.key,
@@ -288,8 +279,7 @@ class HashDictionary(DBCollections):
             else:
                 break
 
-        while node.next:
-            node.next._load()
+        while node.next and not node.next.atom_pointer:
             if not -1 <= node.next._balance() <= 1:
                 node = HashDictionary(
                     key=node.key,
@@ -495,10 +485,53 @@ class HashDictionary(DBCollections):
         :param other:
         :return: the new merged dictionary
         """
-        new_dictionary = self
-        for item_hash, value in other.as_iterable():
-            new_dictionary = new_dictionary.set_at(item_hash, value)
-        return new_dictionary
+        # Values from other win on shared keys
+        return other.union(self, transaction=self.transaction)
+
+    def union(self, other: HashDictionary, combine=None,
+              transaction: AbstractTransaction = None) -> HashDictionary:
+        """
+        Return a dictionary with the keys of both dictionaries. On shared keys the value in self
+        is kept, or combine(value in self, value in other) when combine is given.
+
+        Implemented with split/join over both trees: runs in O(m log(n/m + 1)) for sizes m <= n,
+        reuses every subtree that does not need to change, and skips shared subtrees (the
+        same node or the same stored atom) altogether unless a combine function is given.
+
+        :param other: The dictionary to merge with.
+        :param combine: Optional function producing the value of shared keys.
+        :param transaction: Transaction for the new nodes; defaults to this dictionary's transaction.
+        :return: The new dictionary.
+        """
+        transaction = transaction or self.transaction
+        return _as_dictionary(_union(_root(self), _root(other), combine, transaction), transaction)
+
+    def intersection(self, other: HashDictionary, combine=None,
+                     transaction: AbstractTransaction = None) -> HashDictionary:
+        """
+        Return a dictionary with the keys present in both dictionaries, with the values in self
+        or combine(value in self, value in other) when combine is given. See union for the
+        complexity and the subtree reuse.
+
+        :param other: The dictionary to intersect with.
+        :param combine: Optional function producing the value of shared keys.
+        :param transaction: Transaction for the new nodes; defaults to this dictionary's transaction.
+        :return: The new dictionary.
+        """
+        transaction = transaction or self.transaction
+        return _as_dictionary(_intersection(_root(self), _root(other), combine, transaction), transaction)
+
+    def difference(self, other: HashDictionary, transaction: AbstractTransaction = None) -> HashDictionary:
+        """
+        Return a dictionary with the keys of self that are not present in other.
+        See union for the complexity and the subtree reuse.
+
+        :param other: The dictionary whose keys are removed.
+        :param transaction: Transaction for the new nodes; defaults to this dictionary's transaction.
+        :return: The new dictionary.
+        """
+        transaction = transaction or self.transaction
+        return _as_dictionary(_difference(_root(self), _root(other), transaction), transaction)
 
     def _get_first(self) -> tuple[int, Atom] | None:
         """
@@ -529,3 +562,160 @@ class HashDictionary(DBCollections):
                 return (node.key, node.value)
             node = node.next
         raise ProtoCorruptionException(message='get_last traversal has found an inconsistency!')
+
+
+# Split/join primitives for the set operations. They work on bare subtrees, where None is the
+# empty tree, and build new nodes only along the paths they change.
+
+def _root(node: HashDictionary | None) -> HashDictionary | None:
+    if node is None or subtree_stats(node)[0] == 0:
+        return None
+    return node
+
+
+def _as_dictionary(node: HashDictionary | None, transaction: AbstractTransaction) -> HashDictionary:
+    return node if node is not None else HashDictionary(transaction=transaction)
+
+
+def _height(node: HashDictionary | None) -> int:
+    return subtree_stats(node)[1]
+
+
+def _same_subtree(a: HashDictionary, b: HashDictionary) -> bool:
+    if a is b:
+        return True
+    a_pointer = a.__dict__.get('atom_pointer')
+    return a_pointer is not None and a_pointer == b.__dict__.get('atom_pointer')
+
+
+def _node(previous, key, value, next, transaction) -> HashDictionary:
+    return HashDictionary(key=key, value=value, previous=_root(previous), next=_root(next),
+                          transaction=transaction)
+
+
+def _join(left, key, value, right, transaction) -> HashDictionary:
+    """
+    Join two trees and a middle key (all keys in left < key < all keys in right) into a
+    balanced tree, descending only along the spine of the taller one.
+    """
+    if _height(left) > _height(right) + 1:
+        return _join_right(left, key, value, right, transaction)
+    if _height(right) > _height(left) + 1:
+        return _join_left(left, key, value, right, transaction)
+    return _node(left, key, value, right, transaction)
+
+
+def _join_right(left, key, value, right, transaction) -> HashDictionary:
+    # left is the taller tree: walk down its right spine until the heights meet
+    left._load()
+    outer = _root(left.previous)
+    inner = _root(left.next)
+    if _height(inner) <= _height(right) + 1:
+        joined = _node(inner, key, value, right, transaction)
+        if _height(joined) <= _height(outer) + 1:
+            return _node(outer, left.key, left.value, joined, transaction)
+        return _node(outer, left.key, left.value, joined._right_rotation(), transaction)._left_rotation()
+    joined = _join_right(inner, key, value, right, transaction)
+    result = _node(outer, left.key, left.value, joined, transaction)
+    if _height(joined) <= _height(outer) + 1:
+        return result
+    return result._left_rotation()
+
+
+def _join_left(left, key, value, right, transaction) -> HashDictionary:
+    # Mirror of _join_right, for a taller right tree
+    right._load()
+    outer = _root(right.next)
+    inner = _root(right.previous)
+    if _height(inner) <= _height(left) + 1:
+        joined = _node(left, key, value, inner, transaction)
+        if _height(joined) <= _height(outer) + 1:
+            return _node(joined, right.key, right.value, outer, transaction)
+        return _node(joined._left_rotation(), right.key, right.value, outer, transaction)._right_rotation()
+    joined = _join_left(left, key, value, inner, transaction)
+    result = _node(joined, right.key, right.value, outer, transaction)
+    if _height(joined) <= _height(outer) + 1:
+        return result
+    return result._right_rotation()
+
+
+def _split(node, key, transaction):
+    """
+    Split a tree by key into (keys lower than key, (key, value) if present, keys greater than key).
+    """
+    if node is None:
+        return None, None, None
+    node._load()
+    if key == node.key:
+        return _root(node.previous), (node.key, node.value), _root(node.next)
+    if key < node.key:
+        lower, found, greater = _split(_root(node.previous), key, transaction)
+        return lower, found, _join(greater, node.key, node.value, _root(node.next), transaction)
+    lower, found, greater = _split(_root(node.next), key, transaction)
+    return _join(_root(node.previous), node.key, node.value, lower, transaction), found, greater
+
+
+def _split_last(node, transaction):
+    node._load()
+    if _root(node.next) is None:
+        return _root(node.previous), (node.key, node.value)
+    rest, last = _split_last(node.next, transaction)
+    return _join(_root(node.previous), node.key, node.value, rest, transaction), last
+
+
+def _join2(left, right, transaction):
+    # Join two trees without a middle key
+    if left is None:
+        return right
+    if right is None:
+        return left
+    rest, (key, value) = _split_last(left, transaction)
+    return _join(rest, key, value, right, transaction)
+
+
+def _union(a, b, combine, transaction):
+    if a is None:
+        return b
+    if b is None or (combine is None and _same_subtree(a, b)):
+        return a
+    a._load()
+    lower, found, greater = _split(b, a.key, transaction)
+    new_previous = _union(_root(a.previous), lower, combine, transaction)
+    new_next = _union(_root(a.next), greater, combine, transaction)
+    if found is not None and combine is not None:
+        return _join(new_previous, a.key, combine(a.value, found[1]), new_next, transaction)
+    if new_previous is _root(a.previous) and new_next is _root(a.next):
+        return a
+    return _join(new_previous, a.key, a.value, new_next, transaction)
+
+
+def _intersection(a, b, combine, transaction):
+    if a is None or b is None:
+        return None
+    if combine is None and _same_subtree(a, b):
+        return a
+    a._load()
+    lower, found, greater = _split(b, a.key, transaction)
+    new_previous = _intersection(_root(a.previous), lower, combine, transaction)
+    new_next = _intersection(_root(a.next), greater, combine, transaction)
+    if found is None:
+        return _join2(new_previous, new_next, transaction)
+    if combine is not None:
+        return _join(new_previous, a.key, combine(a.value, found[1]), new_next, transaction)
+    if new_previous is _root(a.previous) and new_next is _root(a.next):
+        return a
+    return _join(new_previous, a.key, a.value, new_next, transaction)
+
+
+def _difference(a, b, transaction):
+    if a is None:
+        return None
+    if b is None:
+        return a
+    if _same_subtree(a, b):
+        return None
+    b._load()
+    lower, _, greater = _split(a, b.key, transaction)
+    return _join2(_difference(lower, _root(b.previous), transaction),
+                  _difference(greater, _root(b.next), transaction),
+                  transaction)
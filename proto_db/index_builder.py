@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import threading
+from collections import Counter
+
+from .common import Atom, subtree_stats
+from .exceptions import ProtoLockingException, ProtoNotSupportedException, ProtoValidationException
+from .indexes import IndexDefinition
+
+_logger = logging.getLogger(__name__)
+
+# Records scanned between two progress updates (and cancellation checks)
+SCAN_BATCH = 1000
+
+# Index entries sorted together while scanning; the sorted runs are merged to build the index
+SORT_RUN = 64 * SCAN_BATCH
+
+# Times the builder catches up and retries the publication before giving up
+MAX_PUBLISH_ATTEMPTS = 16
+
+
+class _BuildCancelled(Exception):
+    pass
+
+
+def _entry_order(entry: tuple):
+    return entry[0]
+
+
+def record_index_keys(index_def: str | IndexDefinition, record: object) -> list:
+    """
+    Keys under which record goes in the index, as List.add_index and Set.add_index compute them:
+    the value of the field for a field name, or what the extractor of an IndexDefinition returns
+    (a key, an iterable of keys or of (index_name, key) pairs). Nothing for the records left out
+    by the predicate of a partial IndexDefinition.
+    """
+    if isinstance(index_def, str):
+        try:
+            key = getattr(record, index_def)
+        except Exception:
+            key = None
+        if key is not None and hasattr(key, 'string'):
+            key = key.string
+        return [] if key is None else [key]
+
+    if not index_def.matches(record):
+        return []
+    keys = index_def.extractor(record)
+    if keys is None:
+        return []
+    if isinstance(keys, (str, bytes)):
+        return [keys]
+    try:
+        iterator = iter(keys)
+    except TypeError:
+        return [keys]
+    result = []
+    for key in iterator:
+        if isinstance(key, tuple) and len(key) == 2:
+            key = key[1]
+        if key is not None:
+            result.append(key)
+    return result
+
+
+def _record_ref(record: object) -> int:
+    from .dictionaries import _record_ref as _ref
+    return _ref(record)
+
+
+def _same_version(old: Atom, new: Atom) -> bool:
+    old_pointer = getattr(old, 'atom_pointer', None)
+    return old is new or (old_pointer is not None and old_pointer == getattr(new, 'atom_pointer', None))
+
+
+def _node_version(node: Atom) -> object:
+    # Stored nodes are told apart by where they were written, nodes in memory by identity
+    pointer = node.__dict__.get('atom_pointer')
+    return pointer if pointer is not None else id(node)
+
+
+def _changed_values(old_root: Atom | None, new_root: Atom | None) -> tuple[list, list]:
+    """
+    Values of the nodes of two versions of a binary tree (List or HashDictionary nodes) that
+    are outside the subtrees both versions share.
+
+    Nodes of both trees are expanded largest subtree first, using the sizes kept in the node
+    headers. A subtree is only expanded after all the larger ones, so a subtree shared by both
+    versions is met in both of them before it is loaded, and is skipped as a whole. Only the
+    nodes on the paths to the changes are read.
+
+    :return: (values only in old, values only in new), including values that just moved
+    """
+    pending = ({}, {})
+    heap = []
+    sequence = itertools.count()
+
+    def push(side: int, node: Atom | None):
+        if node is None:
+            return
+        count, _ = subtree_stats(node)
+        if count:
+            version = _node_version(node)
+            pending[side][version] = node
+            heapq.heappush(heap, (-count, next(sequence), side, version))
+
+    push(0, old_root)
+    push(1, new_root)
+    values = ([], [])
+    while heap:
+        _, _, side, version = heapq.heappop(heap)
+        node = pending[side].pop(version, None)
+        if node is None:
+            continue
+        if pending[1 - side].pop(version, None) is not None:
+            # Shared subtree
+            continue
+        node._load()
+        values[side].append(node.value)
+        push(side, node.previous)
+        push(side, node.next)
+    return values
+
+
+def collection_changes(old: Atom, new: Atom) -> tuple[list, list]:
+    """
+    Records removed from and added to a collection between two of its versions.
+
+    The element trees of Lists and Sets are diffed by their shared subtrees (see
+    _changed_values), so the records of the unchanged parts are not visited. Records found on
+    both sides (moved by a rebalance) are matched by reference and left out. Other collections
+    are compared as multisets of record references.
+
+    :return: (removed records, added records)
+    """
+    from .lists import List
+    from .sets import Set
+
+    if _same_version(old, new):
+        return [], []
+    if isinstance(old, Set) and isinstance(new, Set):
+        old._load()
+        new._load()
+        old_values, new_values = _changed_values(old.content, new.content)
+        # Elements added to a Set stay out of its element tree until the Set is saved
+        for staged, values in ((old._new_objects, old_values), (new._new_objects, new_values)):
+            if staged is not None:
+                values.extend(element for _, element in staged.as_iterable())
+    elif isinstance(old, List) and isinstance(new, List):
+        old_values, new_values = _changed_values(old, new)
+    else:
+        old_values, new_values = old.as_iterable(), new.as_iterable()
+
+    old_records: dict = {}
+    old_counts: Counter = Counter()
+    for record in old_values:
+        ref = _record_ref(record)
+        old_records[ref] = record
+        old_counts[ref] += 1
+    added: list = []
+    for record in new_values:
+        ref = _record_ref(record)
+        if old_counts[ref] > 0:
+            old_counts[ref] -= 1
+        else:
+            added.append(record)
+    removed: list = []
+    for ref, count in old_counts.items():
+        removed.extend([old_records[ref]] * count)
+    return removed, added
+
+
+class OnlineIndexBuilder:
+    """
+    Builds an index over a collection stored as a database root without blocking its writers.
+
+    List.add_index and Set.add_index index every record inside the caller's transaction, one
+    set_at per key. This builder instead:
+
+    1. scans a snapshot of the collection in a read transaction of its own, in the background,
+    2. builds the index at once from the keys, sorted in runs while scanning and merged
+       (RepeatedKeysDictionary.from_sorted_entries),
+    3. catches up with the records added and removed by transactions committed meanwhile, from
+       a diff of the snapshot and the current version (see collection_changes), and
+    4. publishes the collection with the index in a single commit. The root is read-locked, so
+       a commit racing the publication makes it fail; the builder then catches up again and
+       retries (up to MAX_PUBLISH_ATTEMPTS times).
+
+    Writers keep working on the collection during the build; the index is only visible to them
+    once published. progress() reports how far the build went, and cancel() stops it, leaving
+    the collection untouched.
+
+    Usage:
+
+        builder = OnlineIndexBuilder(database, 'people', 'age').start()
+        ...
+        people = builder.wait()
+    """
+
+    def __init__(self, database, root_name: str, index_def: str | IndexDefinition,
+                 max_publish_attempts: int = MAX_PUBLISH_ATTEMPTS):
+        if isinstance(index_def, IndexDefinition):
+            if not hasattr(index_def.index_class, 'set_at'):
+                raise ProtoNotSupportedException(
+                    message=f'Index {index_def.name} can not be built online: '
+                            f'{index_def.index_class.__name__} is not updated by key'
+                )
+            self.index_name = index_def.name
+        elif isinstance(index_def, str):
+            self.index_name = index_def
+        else:
+            raise ProtoValidationException(
+                message='OnlineIndexBuilder expects a field name (str) or an IndexDefinition'
+            )
+        self.database = database
+        self.root_name = root_name
+        self.index_def = index_def
+        self.max_publish_attempts = max_publish_attempts
+
+        self.state = 'pending'
+        self.records_total = 0
+        self.records_scanned = 0
+        self.records_caught_up = 0
+        self.publish_attempts = 0
+        self.error: BaseException | None = None
+        self.result = None
+
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def start(self) -> OnlineIndexBuilder:
+        """
+        Run the build in a background thread.
+        """
+        if self._thread is not None or self.state != 'pending':
+            raise ProtoValidationException(message='The index build was already started')
+        self._thread = threading.Thread(target=self._run_in_background, daemon=True,
+                                        name=f'index-build-{self.root_name}-{self.index_name}')
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """
+        Stop the build as soon as possible. Nothing is published once cancelled.
+        """
+        self._cancelled.set()
+
+    def wait(self, timeout: float | None = None):
+        """
+        Wait for the build to finish.
+
+        :return: the published collection, or None if cancelled or still running at timeout
+        :raises: the error that made the build fail
+        """
+        self._finished.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    @property
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def progress(self) -> dict:
+        """
+        Snapshot of the build progress: its phase (pending, scanning, building, catching_up,
+        publishing, done, cancelled or failed), records scanned of the snapshot total, records
+        caught up with afterwards and publication attempts.
+        """
+        with self._lock:
+            fraction = self.records_scanned / self.records_total if self.records_total else 1.0
+            return {
+                'index_name': self.index_name,
+                'state': self.state,
+                'records_total': self.records_total,
+                'records_scanned': self.records_scanned,
+                'scanned_fraction': min(fraction, 1.0),
+                'records_caught_up': self.records_caught_up,
+                'publish_attempts': self.publish_attempts,
+            }
+
+    def _set_state(self, state: str):
+        with self._lock:
+            self.state = state
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            raise _BuildCancelled()
+
+    def _run_in_background(self):
+        try:
+            self.run()
+        except BaseException:
+            # Kept in self.error and raised again by wait()
+            pass
+
+    def run(self):
+        """
+        Run the build in the calling thread.
+
+        :return: the published collection, or None if cancelled
+        """
+        try:
+            snapshot_transaction = self.database.new_transaction()
+            try:
+                collection = snapshot_transaction.get_root_object(self.root_name)
+                if collection is None or not hasattr(collection, 'attach_index'):
+                    raise ProtoValidationException(
+                        message=f'Root {self.root_name} is not a collection that can hold indexes'
+                    )
+                index = self._build(collection, snapshot_transaction)
+                self.result = self._publish(collection, index)
+            finally:
+                snapshot_transaction.abort()
+            self._set_state('done')
+            return self.result
+        except _BuildCancelled:
+            self._set_state('cancelled')
+            return None
+        except BaseException as error:
+            _logger.exception('Online build of index %s on %s failed', self.index_name, self.root_name)
+            self.error = error
+            self._set_state('failed')
+            raise
+        finally:
+            self._finished.set()
+
+    def _build(self, collection: Atom, transaction):
+        from .dictionaries import RepeatedKeysDictionary, _sort_entries
+
+        with self._lock:
+            self.records_total = collection.count
+        self._set_state('scanning')
+        # Entries are sorted in runs while scanning, then merged into one sorted stream
+        runs = []
+        run = []
+        for position, record in enumerate(collection.as_iterable(), 1):
+            run.extend(_sort_entries((key, record) for key in record_index_keys(self.index_def, record)))
+            if position % SCAN_BATCH == 0:
+                self._check_cancelled()
+                with self._lock:
+                    self.records_scanned = position
+                if len(run) >= SORT_RUN:
+                    run.sort(key=_entry_order)
+                    runs.append(run)
+                    run = []
+        run.sort(key=_entry_order)
+        runs.append(run)
+        with self._lock:
+            self.records_scanned = self.records_total
+        self._check_cancelled()
+
+        self._set_state('building')
+        entries = heapq.merge(*runs, key=_entry_order)
+        if isinstance(self.index_def, str) or \
+                (self.index_def.index_class is RepeatedKeysDictionary and not self.index_def.index_params):
+            return RepeatedKeysDictionary.from_sorted_entries(entries, transaction=transaction)
+
+        # Other index classes are filled by key, still off the writers' transactions
+        index = self.index_def.new_index(transaction)
+        for position, (_, key, record) in enumerate(entries, 1):
+            index = index.set_at(key, record)
+            if position % SCAN_BATCH == 0:
+                self._check_cancelled()
+        return index
+
+    def _caught_up(self, index, base: Atom, current: Atom):
+        removed, added = collection_changes(base, current)
+        for record in removed:
+            for key in record_index_keys(self.index_def, record):
+                if hasattr(index, 'remove_record_at'):
+                    index = index.remove_record_at(key, record)
+                else:
+                    index = index.remove_at(key)
+        for record in added:
+            for key in record_index_keys(self.index_def, record):
+                index = index.set_at(key, record)
+        with self._lock:
+            self.records_caught_up += len(removed) + len(added)
+        return index
+
+    def _publish(self, base: Atom, index):
+        for attempt in range(1, self.max_publish_attempts + 1):
+            self._check_cancelled()
+            with self._lock:
+                self.publish_attempts = attempt
+            transaction = self.database.new_transaction()
+            try:
+                current = transaction.get_root_object(self.root_name)
+                if current is None:
+                    raise ProtoValidationException(
+                        message=f'Root {self.root_name} was removed while building index {self.index_name}'
+                    )
+                self._set_state('catching_up')
+                index = self._caught_up(index, base, current)
+                base = current
+                self._check_cancelled()
+
+                self._set_state('publishing')
+                published = current.attach_index(self.index_name, index)
+                transaction.set_root_object(self.root_name, published)
+                transaction.commit()
+                return published
+            except ProtoLockingException:
+                # A writer committed after the catch up: catch up again
+                _logger.debug('Publication of index %s on %s raced a commit (attempt %d)',
+                              self.index_name, self.root_name, attempt)
+            finally:
+                if transaction.state == 'Running':
+                    transaction.abort()
+        raise ProtoLockingException(
+            message=f'Index {self.index_name} on {self.root_name} could not be published: '
+                    f'the collection kept changing ({self.max_publish_attempts} attempts)'
+        )
+
+
+def build_index_online(database, root_name: str, index_def: str | IndexDefinition) -> OnlineIndexBuilder:
+    """
+    Start building an index over the collection stored as root_name in the background.
+
+    :return: the running OnlineIndexBuilder
+    """
+    return OnlineIndexBuilder(database, root_name, index_def).start()
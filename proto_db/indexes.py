@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import inspect
+from collections.abc import Mapping, Set as AbstractSet
 from dataclasses import dataclass
 from typing import Callable, Iterable, Any, Dict, Tuple, FrozenSet
 
@@ -15,24 +17,321 @@ class IndexDefinition:
         - an iterable of (index_name, key_value) tuples to feed multiple indexes
     - index_class: the concrete index class to instantiate (e.g., RepeatedKeysDictionary, HNSWVectorIndex)
     - index_params: optional constructor params for the index class
+    - predicate: optional filter making it a partial index, so only the items matching it are
+      indexed. An Expression, a token list (as accepted by Expression.compile) or a callable.
     """
     name: str
     extractor: Callable[[Any], Any]
     index_class: type
     index_params: dict = None
+    predicate: Any = None
+
+    def matches(self, item: Any) -> bool:
+        """
+        Whether item belongs in the index: always, unless the predicate leaves it out.
+        """
+        predicate = self.predicate
+        if predicate is None:
+            return True
+        if hasattr(predicate, 'match'):
+            return bool(predicate.match(item))
+        if callable(predicate):
+            return bool(predicate(item))
+        compiled = self.__dict__.get('_compiled_predicate')
+        if compiled is None:
+            from .queries import Expression
+            compiled = Expression.compile(list(predicate))
+            # Frozen dataclass: cache the compiled expression behind its back
+            object.__setattr__(self, '_compiled_predicate', compiled)
+        return bool(compiled.match(item))
+
+    def new_index(self, transaction: Any = None) -> Any:
+        """
+        Empty index_class instance built with index_params, in transaction when its constructor
+        takes one.
+        """
+        params = self.index_params or {}
+        try:
+            parameters = inspect.signature(self.index_class).parameters
+        except (TypeError, ValueError):
+            parameters = {}
+        if 'transaction' in parameters:
+            return self.index_class(transaction=transaction, **params)
+        return self.index_class(**params)
+
+
+# Persistent hash array mapped trie (HAMT) used by IndexRegistry. Every update copies only the
+# path from the root to the touched entry (at most 13 small nodes), sharing everything else with
+# the previous version.
+
+_HAMT_BITS = 5
+_HAMT_MASK = (1 << _HAMT_BITS) - 1
+_HASH_MASK = (1 << 64) - 1
+
+
+class _HamtNode:
+    __slots__ = ('bitmap', 'entries')
+
+    def __init__(self, bitmap: int, entries: tuple):
+        # entries: (hash, key, value) leaves, nested _HamtNode or _HamtCollision, in bitmap order
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class _HamtCollision:
+    __slots__ = ('hash', 'pairs')
+
+    def __init__(self, hash_value: int, pairs: tuple):
+        self.hash = hash_value
+        self.pairs = pairs
+
+
+def _hamt_get(node, h: int, key, default):
+    shift = 0
+    while node is not None:
+        if type(node) is _HamtCollision:
+            for k, v in node.pairs:
+                if k == key:
+                    return v
+            return default
+        bit = 1 << ((h >> shift) & _HAMT_MASK)
+        if not node.bitmap & bit:
+            return default
+        entry = node.entries[(node.bitmap & (bit - 1)).bit_count()]
+        if type(entry) is tuple:
+            return entry[2] if entry[0] == h and entry[1] == key else default
+        node = entry
+        shift += _HAMT_BITS
+    return default
+
+
+def _hamt_pair(shift: int, a: tuple, b: tuple):
+    # Node holding two leaves whose hashes differ
+    index_a = (a[0] >> shift) & _HAMT_MASK
+    index_b = (b[0] >> shift) & _HAMT_MASK
+    if index_a == index_b:
+        return _HamtNode(1 << index_a, (_hamt_pair(shift + _HAMT_BITS, a, b),))
+    entries = (a, b) if index_a < index_b else (b, a)
+    return _HamtNode((1 << index_a) | (1 << index_b), entries)
+
+
+def _hamt_set(node, shift: int, h: int, key, value):
+    """
+    Return (new node, whether the key was added). The node is returned as is when unchanged.
+    """
+    if type(node) is _HamtCollision:
+        if node.hash != h:
+            wrapper = _HamtNode(1 << ((node.hash >> shift) & _HAMT_MASK), (node,))
+            return _hamt_set(wrapper, shift, h, key, value)
+        for position, (k, v) in enumerate(node.pairs):
+            if k == key:
+                if v is value:
+                    return node, False
+                pairs = node.pairs[:position] + ((key, value),) + node.pairs[position + 1:]
+                return _HamtCollision(h, pairs), False
+        return _HamtCollision(h, node.pairs + ((key, value),)), True
+
+    bit = 1 << ((h >> shift) & _HAMT_MASK)
+    position = (node.bitmap & (bit - 1)).bit_count()
+    if not node.bitmap & bit:
+        entries = node.entries[:position] + ((h, key, value),) + node.entries[position:]
+        return _HamtNode(node.bitmap | bit, entries), True
+
+    entry = node.entries[position]
+    if type(entry) is tuple:
+        if entry[0] == h and entry[1] == key:
+            if entry[2] is value:
+                return node, False
+            new_entry, added = (h, key, value), False
+        elif entry[0] == h:
+            new_entry, added = _HamtCollision(h, ((entry[1], entry[2]), (key, value))), True
+        else:
+            new_entry, added = _hamt_pair(shift + _HAMT_BITS, entry, (h, key, value)), True
+    else:
+        new_entry, added = _hamt_set(entry, shift + _HAMT_BITS, h, key, value)
+        if new_entry is entry:
+            return node, False
+    entries = node.entries[:position] + (new_entry,) + node.entries[position + 1:]
+    return _HamtNode(node.bitmap, entries), added
+
+
+def _hamt_remove(node, shift: int, h: int, key):
+    """
+    Return the node without key: the same node when absent, a bare leaf when a single leaf
+    remains below the root, or None when it becomes empty.
+    """
+    if type(node) is _HamtCollision:
+        pairs = tuple(pair for pair in node.pairs if pair[0] != key)
+        if len(pairs) == len(node.pairs):
+            return node
+        if len(pairs) == 1:
+            return h, pairs[0][0], pairs[0][1]
+        return _HamtCollision(h, pairs)
+
+    bit = 1 << ((h >> shift) & _HAMT_MASK)
+    if not node.bitmap & bit:
+        return node
+    position = (node.bitmap & (bit - 1)).bit_count()
+    entry = node.entries[position]
+    if type(entry) is tuple:
+        if entry[0] != h or entry[1] != key:
+            return node
+        new_entry = None
+    else:
+        new_entry = _hamt_remove(entry, shift + _HAMT_BITS, h, key)
+        if new_entry is entry:
+            return node
+    if new_entry is None:
+        entries = node.entries[:position] + node.entries[position + 1:]
+        if not entries:
+            return None
+        if len(entries) == 1 and type(entries[0]) is tuple and shift:
+            return entries[0]
+        return _HamtNode(node.bitmap & ~bit, entries)
+    entries = node.entries[:position] + (new_entry,) + node.entries[position + 1:]
+    return _HamtNode(node.bitmap, entries)
+
+
+def _hamt_items(node):
+    if node is None:
+        return
+    if type(node) is _HamtCollision:
+        yield from node.pairs
+        return
+    for entry in node.entries:
+        if type(entry) is tuple:
+            yield entry[1], entry[2]
+        else:
+            yield from _hamt_items(entry)
+
+
+class PersistentMap(Mapping):
+    """
+    Immutable mapping with cheap updates: set and remove return a new map that shares all the
+    untouched structure with this one.
+    """
+    __slots__ = ('_root', '_size')
+
+    def __init__(self, root=None, size: int = 0):
+        self._root = root
+        self._size = size
+
+    @classmethod
+    def from_mapping(cls, mapping) -> PersistentMap:
+        result = cls()
+        for key, value in mapping.items():
+            result = result.set(key, value)
+        return result
+
+    def __getitem__(self, key):
+        value = _hamt_get(self._root, hash(key) & _HASH_MASK, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        return _hamt_get(self._root, hash(key) & _HASH_MASK, key, default)
+
+    def __contains__(self, key) -> bool:
+        return _hamt_get(self._root, hash(key) & _HASH_MASK, key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        for key, _ in _hamt_items(self._root):
+            yield key
+
+    def items(self):
+        return _hamt_items(self._root)
+
+    def set(self, key, value) -> PersistentMap:
+        h = hash(key) & _HASH_MASK
+        if self._root is None:
+            return PersistentMap(_HamtNode(1 << (h & _HAMT_MASK), ((h, key, value),)), 1)
+        root, added = _hamt_set(self._root, 0, h, key, value)
+        if root is self._root:
+            return self
+        return PersistentMap(root, self._size + 1 if added else self._size)
+
+    def remove(self, key) -> PersistentMap:
+        if self._root is None:
+            return self
+        root = _hamt_remove(self._root, 0, hash(key) & _HASH_MASK, key)
+        if root is self._root:
+            return self
+        return PersistentMap(root, self._size - 1)
+
+    def __repr__(self):
+        return f"PersistentMap({dict(self.items())!r})"
+
+
+class PersistentSet(AbstractSet):
+    """
+    Immutable set on top of PersistentMap; add and discard share structure with this set.
+    Compares equal to frozenset/set with the same elements.
+    """
+    __slots__ = ('_map',)
+
+    def __init__(self, elements: Iterable[Any] = (), _map: PersistentMap = None):
+        if _map is None:
+            _map = PersistentMap()
+            for element in elements:
+                _map = _map.set(element, True)
+        self._map = _map
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return cls(iterable)
+
+    def __contains__(self, element) -> bool:
+        return element in self._map
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def add(self, element) -> PersistentSet:
+        new_map = self._map.set(element, True)
+        return self if new_map is self._map else PersistentSet(_map=new_map)
+
+    def discard(self, element) -> PersistentSet:
+        new_map = self._map.remove(element)
+        return self if new_map is self._map else PersistentSet(_map=new_map)
+
+    def __repr__(self):
+        return f"PersistentSet({set(self)!r})"
+
+
+_MISSING = object()
+_EMPTY_MAP = PersistentMap()
+_EMPTY_SET = PersistentSet()
 
 
 class IndexRegistry:
     """
     Immutable registry of secondary indexes.
-    data: dict[index_name -> dict[key_value -> frozenset[obj_id]]]
+    data: PersistentMap[index_name -> PersistentMap[key_value -> PersistentSet[obj_id]]]
     defs: tuple[IndexDefinition, ...]
+
+    Updates copy only the touched paths of the maps and the touched buckets, so a single
+    with_add costs O(log n) regardless of the size of the indexes.
     """
     __slots__ = ("_data", "_defs")
 
-    def __init__(self, data: Dict[str, Dict[Any, FrozenSet[Any]]] | None = None,
+    def __init__(self, data: Dict[str, Dict[Any, FrozenSet[Any]]] | PersistentMap | None = None,
                  defs: Tuple[IndexDefinition, ...] | None = None):
-        self._data: Dict[str, Dict[Any, FrozenSet[Any]]] = data or {}
+        if data is None:
+            data = _EMPTY_MAP
+        elif not isinstance(data, PersistentMap):
+            # Plain nested dicts (as accepted before) are converted once
+            data = PersistentMap.from_mapping({
+                name: PersistentMap.from_mapping({key: PersistentSet(ids) for key, ids in map_.items()})
+                for name, map_ in data.items()
+            })
+        self._data: PersistentMap = data
         self._defs: Tuple[IndexDefinition, ...] = defs or tuple()
 
     def with_defs(self, defs: Iterable[IndexDefinition]) -> "IndexRegistry":
@@ -42,11 +341,11 @@ class IndexRegistry:
     def defs(self) -> Tuple[IndexDefinition, ...]:
         return self._defs
 
-    def get(self, index_name: str) -> Dict[Any, FrozenSet[Any]]:
-        return self._data.get(index_name, {})
+    def get(self, index_name: str) -> PersistentMap:
+        return self._data.get(index_name, _EMPTY_MAP)
 
     @property
-    def data(self) -> Dict[str, Dict[Any, FrozenSet[Any]]]:
+    def data(self) -> PersistentMap:
         return self._data
 
     def _normalize_extractions(self, item: Any) -> Iterable[Tuple[str, Any]]:
@@ -59,6 +358,8 @@ class IndexRegistry:
         """
         results: list[Tuple[str, Any]] = []
         for d in self._defs:
+            if not d.matches(item):
+                continue
             extracted = d.extractor(item)
             # If it's a tuple of (name,key) or iterable of such
             if isinstance(extracted, tuple) and len(extracted) == 2:
@@ -66,6 +367,9 @@ class IndexRegistry:
             elif isinstance(extracted, dict):
                 for k, v in extracted.items():
                     results.append((k, v))
+            elif isinstance(extracted, (str, bytes)):
+                # A single key, not an iterable of characters
+                results.append((d.name, extracted))
             else:
                 try:
                     it = iter(extracted)
@@ -85,40 +389,61 @@ class IndexRegistry:
         """
         Apply a set of updates described as (op, index_name, key, obj_id)
         where op in {"add","remove"}, producing a new IndexRegistry.
+        Updates are grouped by index and key first, so every index map and bucket is copied
+        at most once per batch, whatever the number of updates touching it.
         """
-        new_data: Dict[str, Dict[Any, FrozenSet[Any]]] = {idx: dict(map_.items()) for idx, map_ in self._data.items()}
+        # Only the last operation on each (key, obj_id) matters for set semantics
+        grouped: Dict[str, Dict[Any, Dict[Any, str]]] = {}
         for op, index_name, key, obj_id in updates:
-            bucket = new_data.get(index_name)
-            if bucket is None:
-                bucket = {}
-                new_data[index_name] = bucket
-            current: FrozenSet[Any] = bucket.get(key, frozenset())
-            if op == "add":
-                if obj_id in current:
-                    continue
-                bucket[key] = frozenset(set(current) | {obj_id})
-            elif op == "remove":
-                if not current or obj_id not in current:
+            grouped.setdefault(index_name, {}).setdefault(key, {})[obj_id] = op
+
+        data = self._data
+        for index_name, by_key in grouped.items():
+            index_map = data.get(index_name, _EMPTY_MAP)
+            original_map = index_map
+            for key, ops in by_key.items():
+                bucket = index_map.get(key, _EMPTY_SET)
+                original_bucket = bucket
+                for obj_id, op in ops.items():
+                    if op == "add":
+                        bucket = bucket.add(obj_id)
+                    elif op == "remove":
+                        bucket = bucket.discard(obj_id)
+                if bucket is original_bucket:
                     continue
-                after = set(current)
-                after.discard(obj_id)
-                if after:
-                    bucket[key] = frozenset(after)
-                else:
-                    # remove empty key bucket to keep map clean
-                    bucket.pop(key, None)
-        return IndexRegistry(data=new_data, defs=self._defs)
+                # remove empty key bucket to keep map clean
+                index_map = index_map.set(key, bucket) if bucket else index_map.remove(key)
+            if index_map is not original_map:
+                data = data.set(index_name, index_map)
+        if data is self._data:
+            return self
+        return IndexRegistry(data=data, defs=self._defs)
 
     def with_add(self, obj_id: Any, item: Any) -> "IndexRegistry":
-        pairs = self._normalize_extractions(item)
-        updates = [("add", name, key, obj_id) for (name, key) in pairs]
-        return self._with_update(updates)
+        return self.with_add_many(((obj_id, item),))
 
     def with_remove(self, obj_id: Any, item: Any) -> "IndexRegistry":
-        pairs = self._normalize_extractions(item)
-        updates = [("remove", name, key, obj_id) for (name, key) in pairs]
+        return self.with_remove_many(((obj_id, item),))
+
+    def with_add_many(self, entries: Iterable[Tuple[Any, Any]]) -> "IndexRegistry":
+        """
+        Index a batch of (obj_id, item) pairs in a single pass.
+        """
+        updates = [("add", name, key, obj_id)
+                   for obj_id, item in entries
+                   for (name, key) in self._normalize_extractions(item)]
+        return self._with_update(updates)
+
+    def with_remove_many(self, entries: Iterable[Tuple[Any, Any]]) -> "IndexRegistry":
+        """
+        Remove a batch of (obj_id, item) pairs from the indexes in a single pass.
+        """
+        updates = [("remove", name, key, obj_id)
+                   for obj_id, item in entries
+                   for (name, key) in self._normalize_extractions(item)]
         return self._with_update(updates)
 
     def with_replace(self, obj_id: Any, old_item: Any, new_item: Any) -> "IndexRegistry":
-        reg = self.with_remove(obj_id, old_item)
-        return reg.with_add(obj_id, new_item)
+        updates = [("remove", name, key, obj_id) for (name, key) in self._normalize_extractions(old_item)]
+        updates.extend(("add", name, key, obj_id) for (name, key) in self._normalize_extractions(new_item))
+        return self._with_update(updates)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import heapq
 import time
 import warnings
 from dataclasses import dataclass
@@ -10,6 +11,9 @@ import ast
 # ProtoDB query infrastructure
 from .common import QueryPlan, DBCollections, Literal
 from .queries import ListPlan, WherePlan, SelectPlan, Expression as PBExpression, FromPlan as PBFromPlan, RecursivePlan
+from .queries import value_fingerprint, _VALUE_FUNCTIONS, _VALUE_TRANSFORMS, MatchesText, StartsWith, WithinBox, WithinRadius, path_getter
+from .queries import AndExpression as PBAndExpression, CountPlan, OrderedIndexScanPlan, ordering_index
+from .parallel import ParallelConfig
 
 T = TypeVar('T')
 K = TypeVar('K')
@@ -24,11 +28,14 @@ class Policy:
 
     on_unsupported: 'error' | 'warn' | 'fallback'
     Limits are enforced when local Python fallback is used.
+    parallel: configuration of the plan operators filtering and projecting rows in parallel;
+    None leaves them to default_parallel_config (the environment).
     """
     on_unsupported: str = "fallback"  # 'error' | 'warn' | 'fallback'
     max_rows_local: int = 100_000
     max_memory_mb: int = 256
     timeout_ms: int = 0  # 0 = no timeout
+    parallel: Optional[ParallelConfig] = None
 
 
 class Grouping(Generic[K, U]):
@@ -85,40 +92,66 @@ def _prefix_alias(attr: str) -> str:
         return attr
     return f"{DEFAULT_ALIAS}.{attr}"
 
+def _apply_transform(name: str, value: Any, arguments: list) -> Any:
+    # Same transforms as the derived values of queries (value_fingerprint)
+    function = _VALUE_TRANSFORMS.get(name) or _VALUE_FUNCTIONS[name]
+    return function(value, *arguments)
+
+
 class _Field:
-    def __init__(self, path: Tuple[str, ...] = ()):  # empty is root
+    def __init__(self, path: Tuple[str, ...] = (), transforms: Tuple[tuple, ...] = ()):  # empty is root
         self._path = path
+        # Derived values (lower(), mul, ...) as (name, *arguments) steps applied to the path value
+        self._transforms = transforms
+        # Reader of the path, generated on first use (see path_getter)
+        self._getter: Optional[Callable[[Any], Any]] = None
         self._pending_between: Optional[tuple[Any, Any, tuple[bool,bool]]] = None
 
     def __getattr__(self, item: str) -> '_Field':
+        if self._transforms:
+            raise AttributeError(item)
         return _Field(self._path + (item,))
 
     def __getitem__(self, item: str) -> '_Field':
+        if self._transforms:
+            raise TypeError('Derived values have no fields')
         return _Field(self._path + (item,))
 
+    def __call__(self, rec: Any) -> Any:
+        return self._resolve(rec)
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Text identifying the value of this field (path and transforms), as expression indexes
+        are defined on, e.g. 'lower(email)' for F.email.lower().
+        """
+        return value_fingerprint('.'.join(self._path), self._transforms)
+
+    def _pb_attribute(self) -> str:
+        # Attribute of the PB tokens: the aliased path, wrapped in the transforms if derived
+        return value_fingerprint(_prefix_alias('.'.join(self._path)), self._transforms)
+
+    def _derived(self, *step: Any) -> '_Field':
+        return _Field(self._path, self._transforms + (step,))
+
     def _resolve(self, rec: Any) -> Any:
-        cur = rec
-        for p in self._path:
-            if cur is None:
-                return None
-            if isinstance(cur, dict):
-                cur = cur.get(p)
-            else:
-                cur = getattr(cur, p, None)
+        getter = self._getter
+        if getter is None:
+            getter = self._getter = path_getter(self._path)
+        cur = getter(rec)
         # Unwrap ProtoDB Literal to raw Python value for user-friendly predicates
-        try:
-            if isinstance(cur, Literal):
-                return cur.string
-        except Exception:
-            pass
+        if isinstance(cur, Literal):
+            cur = cur.string
+        for name, *arguments in self._transforms:
+            cur = _apply_transform(name, cur, arguments)
         return cur
 
     # comparison and boolean operators build callables and PB tokens for pushdown
     def _cmp(self, other: Any, op: Callable[[Any, Any], bool], op_token: Optional[str] = None) -> _Pred:
         pb = None
         if op_token is not None:
-            pb_attr = _prefix_alias('.'.join(self._path))
-            pb = [pb_attr, op_token, other]
+            pb = [self._pb_attribute(), op_token, other]
         return _Pred(lambda x: op(self._resolve(x), other), pb)
 
     def __eq__(self, other):
@@ -143,7 +176,7 @@ class _Field:
         s = set(seq)
         # Note: store original iterable in tokens if list/tuple; else fall back to list for safety
         vals = list(seq) if not isinstance(seq, (list, tuple)) else seq
-        pb = [_prefix_alias('.'.join(self._path)), 'in', list(vals)]
+        pb = [self._pb_attribute(), 'in', list(vals)]
         return _Pred(lambda x: self._resolve(x) in s, pb)
 
     # Between DSL
@@ -178,8 +211,7 @@ class _Field:
                 'between[)' if (l_inc and not r_inc) else 'between(]'
             )
         )
-        attr = _prefix_alias('.'.join(self._path))
-        pb_tokens = [attr, bounds_token, lo, hi]
+        pb_tokens = [self._pb_attribute(), bounds_token, lo, hi]
         return _Pred(_pred, pb_tokens)
 
     def between_closed(self, lo: Any, hi: Any) -> _Pred:
@@ -208,7 +240,7 @@ class _Field:
         return self.between(lo, hi, inclusive=inc)
 
     def contains(self, sub: Any):
-        pb = [_prefix_alias('.'.join(self._path)), 'contains', sub]
+        pb = [self._pb_attribute(), 'contains', sub]
         def _fn(x):
             v = self._resolve(x)
             try:
@@ -223,18 +255,49 @@ class _Field:
                 return False
         return _Pred(_fn, pb)
 
-    def startswith(self, prefix: str):
-        return _Pred(lambda x: (self._resolve(x) or "").startswith(prefix))
+    def matches(self, text: str) -> _Pred:
+        # Every word of text, ignoring case; full-text indexes answer it from their posting lists
+        op = MatchesText()
+        return _Pred(lambda x: op.match(self._resolve(x), text), [self._pb_attribute(), 'matches', text])
+
+    # Geospatial DSL: points are (lat, lon) pairs or objects with lat/lon fields
+    def within(self, *area: float) -> _Pred:
+        """
+        within(south, west, north, east) keeps points inside the box; within(lat, lon, meters)
+        keeps points at most that far from (lat, lon).
+        """
+        if len(area) == 4:
+            return self.within_box(*area)
+        if len(area) == 3:
+            return self.within_radius(*area)
+        raise TypeError('within() takes a box (south, west, north, east) or a circle (lat, lon, meters)')
+
+    def within_box(self, south: float, west: float, north: float, east: float) -> _Pred:
+        op, value = WithinBox(), (south, west, north, east)
+        return _Pred(lambda x: op.match(self._resolve(x), value), [self._pb_attribute(), 'within_box', value])
+
+    def within_radius(self, lat: float, lon: float, meters: float) -> _Pred:
+        op, value = WithinRadius(), (lat, lon, meters)
+        return _Pred(lambda x: op.match(self._resolve(x), value), [self._pb_attribute(), 'within_radius', value])
+
+    def startswith(self, prefix: str, ignore_case: bool = False):
+        # Ordered indexes answer it with a range scan; ignoring case, an expression index on lower()
+        if ignore_case:
+            return self.lower().startswith(prefix.lower())
+        op = StartsWith()
+        return _Pred(lambda x: op.match(self._resolve(x), prefix), [self._pb_attribute(), 'startswith', prefix])
 
     def endswith(self, suffix: str):
         return _Pred(lambda x: (self._resolve(x) or "").endswith(suffix))
 
-    # arithmetic for select
-    def _arith(self, other: Any, op: Callable[[Any, Any], Any]):
+    # arithmetic for select; with a constant operand it is a derived value, usable in where()
+    def _arith(self, other: Any, op: Callable[[Any, Any], Any], name: Optional[str] = None):
+        if name is not None and not callable(other):
+            return self._derived(name, other)
         return lambda x: op(self._resolve(x), other if not callable(other) else other(x))
 
     def __add__(self, other):
-        return self._arith(other, lambda a, b: (a or 0) + (b or 0))
+        return self._arith(other, lambda a, b: (a or 0) + (b or 0), 'add')
 
     def __radd__(self, other):
         # support chaining where left side is a callable or literal
@@ -243,25 +306,31 @@ class _Field:
         return lambda x: (other or 0) + (self._resolve(x) or 0)
 
     def __sub__(self, other):
-        return self._arith(other, lambda a, b: (a or 0) - (b or 0))
+        return self._arith(other, lambda a, b: (a or 0) - (b or 0), 'sub')
 
     def __mul__(self, other):
-        return self._arith(other, lambda a, b: (a or 0) * (b or 0))
+        return self._arith(other, lambda a, b: (a or 0) * (b or 0), 'mul')
 
     def __truediv__(self, other):
-        return self._arith(other, lambda a, b: (a or 1) / (b or 1))
+        return self._arith(other, lambda a, b: (a or 1) / (b or 1), 'div')
 
     def lower(self):
-        return lambda x: (self._resolve(x) or "").lower()
+        return self._derived('lower')
 
     def upper(self):
-        return lambda x: (self._resolve(x) or "").upper()
+        return self._derived('upper')
 
     def length(self):
-        return lambda x: len(self._resolve(x) or [])
+        return self._derived('length')
 
     def abs(self):
-        return lambda x: abs(self._resolve(x) or 0)
+        return self._derived('abs')
+
+    def apply(self, function_name: str):
+        """
+        Derived value of a function registered with register_value_function.
+        """
+        return self._derived(function_name)
 
 
 class _FProxy:
@@ -493,6 +562,14 @@ class Queryable(Generic[T]):
         pol = Policy(**{**self._policy.__dict__, 'on_unsupported': mode})
         return self.with_policy(pol)
 
+    def with_parallel(self, config: Optional[ParallelConfig] = None) -> 'Queryable[T]':
+        """
+        Run the filters and projections planned for this query on partitions of its source, on
+        the workers of config (ParallelConfig.from_env() by default).
+        """
+        pol = Policy(**{**self._policy.__dict__, 'parallel': config or ParallelConfig.from_env()})
+        return self.with_policy(pol)
+
     # Intermediate operators (lazy)
     def where(self, predicate: Callable[[T], bool] | Any) -> 'Queryable[T]':
         self._ops.append(("where", (predicate,), {}))
@@ -553,9 +630,86 @@ class Queryable(Generic[T]):
         return self
 
     # Terminal operators
+    def _ordered_scan(self, filters: list, ops: list) -> Optional[QueryPlan]:
+        """
+        Plan for a query ending in order_by(field) and skip/take, with `filters` the where()
+        filters before them and `ops` the operations after those: a walk of an ordered index
+        on field that stops after skip + take rows, instead of sorting every row. None when
+        there is no such index, or when the filters have an index of their own selecting so
+        few rows that sorting them is cheaper.
+        """
+        base = self._base_plan
+        indexes = getattr(base, 'indexes', None)
+        if not indexes or not ops or ops[0][0] != 'order_by':
+            return None
+        key, ascending, nulls_last = ops[0][1][0], ops[0][2].get('ascending', True), ops[0][2].get('nulls_last', True)
+        if not isinstance(key, _Field) or not key._path or not nulls_last:
+            return None
+        skip_n, take_n = 0, None
+        for name, args, _ in ops[1:]:
+            if name == 'skip':
+                skip_n += args[0]
+            elif name == 'take':
+                take_n = min(take_n, args[0]) if take_n is not None else args[0]
+            else:
+                # then_by, or operations the local path runs before sorting
+                return None
+        if take_n is None:
+            return None
+
+        condition = filters[0] if len(filters) == 1 else (PBAndExpression(terms=list(filters)) if filters else None)
+        field = key._pb_attribute()
+        index = ordering_index(indexes, field, condition)
+        if index is None:
+            return None
+        if condition is not None:
+            filtered = WherePlan(filter=condition, based_on=base, transaction=getattr(base, 'transaction', None))
+            try:
+                filtered = filtered.optimize()
+                rows = base.estimated_rows() if hasattr(base, 'estimated_rows') else None
+                selected = filtered.get_cardinality_estimate()
+            except Exception:
+                rows, selected = None, None
+            if rows and selected:
+                # The walk reads about (skip + take) * rows / selected rows, the filter plan selected
+                if (skip_n + take_n) * rows / selected > selected:
+                    return None
+            elif not isinstance(filtered, WherePlan):
+                return None
+        return OrderedIndexScanPlan(index=index, field=field, ascending=ascending, filter=condition, skip=skip_n,
+                                    limit=take_n, based_on=base, transaction=getattr(base, 'transaction', None))
+
+    def _filter_plan(self) -> Optional[QueryPlan]:
+        """
+        Plan of a query made only of where() steps over a QueryPlan, so count() and any() can
+        be answered by the plan (and the indexes under it) instead of by iterating rows. None
+        for any other query.
+        """
+        plan = self._base_plan
+        parallel = self._policy.parallel
+        if plan is None or not self._ops:
+            return None
+        for name, args, _ in self._ops:
+            if name != 'where':
+                return None
+            arg0 = args[0]
+            if isinstance(arg0, _Pred) and arg0.pb_tokens is not None:
+                compiled = arg0.get_compiled()
+                if compiled is not None:
+                    plan = WherePlan(filter=compiled, based_on=plan, parallel=parallel)
+                else:
+                    plan = WherePlan(filter_spec=arg0.pb_tokens, based_on=plan, parallel=parallel)
+                continue
+            tokens = _translate_lambda_between(arg0) if callable(arg0) else None
+            if tokens is None:
+                return None
+            plan = WherePlan(filter_spec=tokens, based_on=plan, parallel=parallel)
+        return plan
+
     def _execute(self) -> Iterator[Any]:
         # Preserve operator order for correctness (do not hoist where() across plan-generating ops)
         ops_in_order = list(self._ops)
+        parallel = self._policy.parallel
 
         # If we have a base QueryPlan, translate the prefix of ops into a QueryPlan chain
         it: Iterable[Any]
@@ -563,6 +717,8 @@ class Queryable(Generic[T]):
 
         # Build a plan prefix if possible
         plan_prefix_len = 0
+        # Filters of the prefix, while it only has where() steps
+        prefix_filters: Optional[list] = []
         current_plan: Optional[QueryPlan] = self._base_plan
         if current_plan is not None:
             for (name, args, kwargs) in ops_in_order:
@@ -579,25 +735,32 @@ class Queryable(Generic[T]):
                     if isinstance(arg0, _Pred) and arg0.pb_tokens is not None:
                         compiled = arg0.get_compiled()
                         if compiled is not None:
-                            current_plan = WherePlan(filter=compiled, based_on=current_plan)
+                            current_plan = WherePlan(filter=compiled, based_on=current_plan, parallel=parallel)
                         else:
-                            current_plan = WherePlan(filter_spec=arg0.pb_tokens, based_on=current_plan)
+                            current_plan = WherePlan(filter_spec=arg0.pb_tokens, based_on=current_plan, parallel=parallel)
+                        if prefix_filters is not None:
+                            prefix_filters.append(current_plan.filter)
                         plan_prefix_len += 1
                         continue
                     # Try translating lambda chained comparisons to Between
                     if callable(arg0):
                         lam_tokens = _translate_lambda_between(arg0)
                         if lam_tokens is not None:
-                            current_plan = WherePlan(filter_spec=lam_tokens, based_on=current_plan)
+                            current_plan = WherePlan(filter_spec=lam_tokens, based_on=current_plan, parallel=parallel)
+                            if prefix_filters is not None:
+                                prefix_filters.append(current_plan.filter)
                             plan_prefix_len += 1
                             continue
                     pred = _to_callable(arg0)
                     if pred is None:
                         plan_prefix_len += 1
                         continue
-                    current_plan = WherePlan(filter=FunctionExpression(pred), based_on=current_plan)
+                    current_plan = WherePlan(filter=FunctionExpression(pred), based_on=current_plan, parallel=parallel)
+                    if prefix_filters is not None:
+                        prefix_filters.append(current_plan.filter)
                     plan_prefix_len += 1
                 elif name == 'select':
+                    prefix_filters = None
                     sel = args[0]
                     if isinstance(sel, dict):
                         # Convert dict values to callables or keep strings
@@ -613,7 +776,7 @@ class Queryable(Generic[T]):
                                     break
                                 fields[k] = fn
                         if ok:
-                            current_plan = SelectPlan(fields=fields, based_on=current_plan)
+                            current_plan = SelectPlan(fields=fields, based_on=current_plan, parallel=parallel)
                             plan_prefix_len += 1
                         else:
                             break
@@ -623,7 +786,13 @@ class Queryable(Generic[T]):
                     break  # we don't have plan nodes for other ops (order_by, skip, take, etc.)
         # Execute plan prefix if built
         remaining_ops = ops_in_order
-        if current_plan is not None and plan_prefix_len > 0:
+        ordered_plan = self._ordered_scan(prefix_filters, ops_in_order[plan_prefix_len:]) \
+            if prefix_filters is not None else None
+        if ordered_plan is not None:
+            # The index walk sorts, filters and pages by itself
+            remaining_ops = []
+            it = ordered_plan.execute()
+        elif current_plan is not None and plan_prefix_len > 0:
             # Before executing, consume plan-generating ops like 'traverse'
             remaining_ops = ops_in_order[plan_prefix_len:]
             new_remaining: list[tuple[str, tuple, dict]] = []
@@ -701,7 +870,8 @@ class Queryable(Generic[T]):
                         except Exception:
                             return False
                     return _f
-                it = (x for x in it if _safe(pred)(x))
+                # filter() binds this predicate now: a generator would see the last where's
+                it = filter(_safe(pred), it)
             elif name == 'select':
                 sel = _to_callable(args[0]) or (lambda x: x)
                 it = (sel(x) for x in it)
@@ -835,9 +1005,14 @@ class Queryable(Generic[T]):
                 def __ge__(self, other): return self.v<=other.v
                 def __hash__(self): return hash(self.v)
 
-            arr = list(it)
-            arr.sort(key=compose_key)
-            it = arr
+            if take_n is not None:
+                # Only the first skip + take rows are kept: a bounded heap instead of a full sort
+                # (nsmallest keeps the order of equal keys, as sort does)
+                it = heapq.nsmallest(skip_n + take_n, it, key=compose_key)
+            else:
+                arr = list(it)
+                arr.sort(key=compose_key)
+                it = arr
 
         # apply skip/take
         if skip_n:
@@ -896,6 +1071,9 @@ class Queryable(Generic[T]):
 
     def any(self, predicate: Optional[Callable[[T], bool] | Any] = None) -> bool:
         it = self.where(predicate) if predicate is not None else self
+        plan = it._filter_plan()
+        if plan is not None:
+            return plan.optimize().exists()
         for _ in it._execute():
             return True
         return False
@@ -909,6 +1087,11 @@ class Queryable(Generic[T]):
 
     def count(self, predicate: Optional[Callable[[T], bool] | Any] = None) -> int:
         it = self.where(predicate) if predicate is not None else self
+        plan = it._filter_plan()
+        if plan is not None:
+            # Index-backed plans count from bucket sizes and key positions
+            counted = CountPlan(based_on=plan, transaction=getattr(self._base_plan, 'transaction', None)).optimize()
+            return counted.execute()[0]['count']
         c = 0
         for _ in it._execute():
             c += 1
@@ -960,8 +1143,10 @@ class Queryable(Generic[T]):
 
     def explain(self, format: str = "text") -> str | dict:
         ops = [op for op in self._ops]
+        parallel = self._policy.parallel
         # Build a plan prefix mirroring _execute()
         plan_prefix_len = 0
+        prefix_filters: Optional[list] = []
         current_plan: Optional[QueryPlan] = self._base_plan
         if current_plan is not None:
             for (name, args, kwargs) in ops:
@@ -970,20 +1155,25 @@ class Queryable(Generic[T]):
                     if isinstance(arg0, _Pred) and arg0.pb_tokens is not None:
                         compiled = arg0.get_compiled()
                         if compiled is not None:
-                            current_plan = WherePlan(filter=compiled, based_on=current_plan)
+                            current_plan = WherePlan(filter=compiled, based_on=current_plan, parallel=parallel)
                         else:
-                            current_plan = WherePlan(filter_spec=arg0.pb_tokens, based_on=current_plan)
+                            current_plan = WherePlan(filter_spec=arg0.pb_tokens, based_on=current_plan, parallel=parallel)
+                        if prefix_filters is not None:
+                            prefix_filters.append(current_plan.filter)
                         plan_prefix_len += 1
                         continue
                     if callable(arg0):
                         lam_tokens = _translate_lambda_between(arg0)
                         if lam_tokens is not None:
-                            current_plan = WherePlan(filter_spec=lam_tokens, based_on=current_plan)
+                            current_plan = WherePlan(filter_spec=lam_tokens, based_on=current_plan, parallel=parallel)
+                            if prefix_filters is not None:
+                                prefix_filters.append(current_plan.filter)
                             plan_prefix_len += 1
                             continue
                     # Fallback cannot be planned
                     break
                 elif name == 'select' and isinstance(args[0], dict):
+                    prefix_filters = None
                     fields: Dict[str, Any] = {}
                     ok = True
                     for k, v in args[0].items():
@@ -996,7 +1186,7 @@ class Queryable(Generic[T]):
                                 break
                             fields[k] = fn
                     if ok:
-                        current_plan = SelectPlan(fields=fields, based_on=current_plan)
+                        current_plan = SelectPlan(fields=fields, based_on=current_plan, parallel=parallel)
                         plan_prefix_len += 1
                         continue
                     break
@@ -1004,7 +1194,12 @@ class Queryable(Generic[T]):
                     break
         optimized_node = None
         try:
-            if current_plan is not None and plan_prefix_len > 0:
+            ordered_plan = self._ordered_scan(prefix_filters, ops[plan_prefix_len:]) \
+                if prefix_filters is not None else None
+            if ordered_plan is not None:
+                optimized_node = ordered_plan
+                plan_prefix_len = len(ops)
+            elif current_plan is not None and plan_prefix_len > 0:
                 optimized_node = current_plan.optimize()
         except Exception:
             optimized_node = None
@@ -1,8 +1,9 @@
 from __future__ import annotations
 import logging
 from typing import cast, TYPE_CHECKING
-from .common import Atom, QueryPlan, DBCollections, AbstractTransaction, AtomPointer
-from .indexes import IndexRegistry, IndexDefinition
+from .common import Atom, QueryPlan, DBCollections, AbstractTransaction, AtomPointer, subtree_stats, \
+    stamp_subtree_stats, iter_tree_nodes, value_weight, subtree_total, stamp_subtree_total
+from .indexes import IndexDefinition
 from .queries import IndexedQueryPlan
 
 logger = logging.getLogger(__name__)
@@ -12,6 +13,13 @@ if TYPE_CHECKING:
     from .dictionaries import RepeatedKeysDictionary
 
 
+def _is_empty_node(node: List | None) -> bool:
+    """
+    Tell whether a child node holds no elements, without loading it when its size is already known.
+    """
+    return node is None or subtree_stats(node)[0] == 0
+
+
 class ListQueryPlan(QueryPlan):
     base: List
 
@@ -45,6 +53,16 @@ class List(DBCollections):
     height: int  # The height of the current subtree rooted at this node.
     next: List  # Reference to the next node in the structure (right child in a tree context).
     previous: List  # Reference to the previous node in the structure (left child in a tree context).
+    # Header with the sizes of the children, so building or walking a node does not need to load them
+    previous_count: int | None = None
+    previous_height: int | None = None
+    next_height: int | None = None
+    # Sum of the weights of the values of this subtree (see value_weight), with the totals of
+    # the children in the header, so the rows before a position are found in one descent.
+    # None when unknown (nodes written before totals were kept).
+    total: int | None = None
+    previous_total: int | None = None
+    next_total: int | None = None
 
     def __init__(
             self,
@@ -61,9 +79,9 @@ class List(DBCollections):
         # Initialize the current node's key, value, and child references.
         self.value = value
         # Normalize empty child nodes to None to avoid placeholder empties in the tree
-        if previous is not None and getattr(previous, 'empty', False):
+        if previous is not None and _is_empty_node(previous):
             previous = None
-        if next is not None and getattr(next, 'empty', False):
+        if next is not None and _is_empty_node(next):
             next = None
         self.next = next
         self.previous = previous
@@ -74,28 +92,52 @@ class List(DBCollections):
         # Leave indexes as provided (can be None). Index structures will be created lazily when needed.
         self.indexes = indexes
 
-        # Calculate the total count of nodes in the current subtree.
+        # Calculate the total count and the height of the current subtree. Children sizes
+        # are taken from the header of the node they were loaded from when available, so
+        # untouched siblings are not read from storage.
         if not self.empty:
-            count = 1
-            if self.previous:
-                self.previous._load()
-                count += self.previous.count
-            if self.next:
-                self.next._load()
-                count += self.next.count
-            self.count = count
+            previous_count, previous_height = subtree_stats(self.previous)
+            next_count, next_height = subtree_stats(self.next)
+            self.count = 1 + previous_count + next_count
+            self.height = 1 + max(previous_height, next_height)
+            self.previous_count = previous_count
+            self.previous_height = previous_height
+            self.next_height = next_height
+            previous_total, next_total = subtree_total(self.previous), subtree_total(self.next)
+            weight = value_weight(self.value)
+            if weight is not None and previous_total is not None and next_total is not None:
+                self.total = weight + previous_total + next_total
+                self.previous_total = previous_total
+                self.next_total = next_total
         else:
             self.count = 0
-
-        # Calculate the height of the current subtree.
-        if not self.empty:
-            height = 1
-            previous_height = previous.height if previous else 0
-            next_height = next.height if next else 0
-            height += max(previous_height, next_height)
-            self.height = height
-        else:
             self.height = 0
+            self.total = 0
+
+    @classmethod
+    def from_values(cls, values: list, transaction: AbstractTransaction = None) -> List:
+        """
+        Balanced List holding values in the given order, built bottom-up in linear time instead
+        of one insertion (and rebalance) per value.
+
+        :param values: The values, in list order.
+        :param transaction: The transaction of the new nodes.
+        :return: The new List.
+        """
+        def _build(lo: int, hi: int) -> List | None:
+            if lo >= hi:
+                return None
+            middle = (lo + hi) // 2
+            return cls(
+                value=values[middle],
+                empty=False,
+                previous=_build(lo, middle),
+                next=_build(middle + 1, hi),
+                transaction=transaction
+            )
+
+        root = _build(0, len(values))
+        return root if root is not None else cls(transaction=transaction)
 
     def add_index(self, index_def):
         """
@@ -106,7 +148,7 @@ class List(DBCollections):
         to enable mapping search results back to records.
         """
         # Local imports to avoid circular dependencies
-        from .dictionaries import RepeatedKeysDictionary, Dictionary as _Dictionary
+        from .dictionaries import RepeatedKeysDictionary
         from .indexes import IndexDefinition as _IndexDef
         from .common import canonical_hash as _canonical_hash
 
@@ -133,13 +175,14 @@ class List(DBCollections):
             if not isinstance(index_def, _IndexDef):
                 raise TypeError("add_index expects a field name (str) or IndexDefinition")
             index_name = index_def.name
-            params = index_def.index_params or {}
             # Instantiate the index
-            new_index = index_def.index_class(transaction=self.transaction, **params) if 'transaction' in getattr(index_def.index_class.__init__, '__code__', ()).co_varnames else index_def.index_class(**params)
+            new_index = index_def.new_index(self.transaction)
             # Populate
             if hasattr(new_index, 'set_at'):
                 if not self.empty:
                     for rec in self.as_iterable():
+                        if not index_def.matches(rec):
+                            continue
                         keys = index_def.extractor(rec)
                         try:
                             it = iter(keys)
@@ -161,7 +204,7 @@ class List(DBCollections):
                 id_to_obj = {}
                 if not self.empty:
                     for rec in self.as_iterable():
-                        v = index_def.extractor(rec)
+                        v = index_def.extractor(rec) if index_def.matches(rec) else None
                         if v is None:
                             continue
                         vid = _canonical_hash(rec)
@@ -183,12 +226,21 @@ class List(DBCollections):
                 # Unknown index API
                 raise TypeError("Unsupported index type: missing set_at/build")
 
+        return self.attach_index(index_name, new_index)
+
+    def attach_index(self, index_name: str, index: object) -> List:
+        """
+        This List with an already built index registered under index_name (replacing any
+        index with that name). The index is expected to cover every element of the List.
+        """
+        from .dictionaries import Dictionary as _Dictionary
+
         # Register index into the per-collection index dictionary
         if self.indexes is None:
             indexes_dict = _Dictionary(transaction=self.transaction)
-            new_indexes = indexes_dict.set_at(index_name, new_index)
+            new_indexes = indexes_dict.set_at(index_name, index)
         else:
-            new_indexes = self.indexes.set_at(index_name, new_index)
+            new_indexes = self.indexes.set_at(index_name, index)
 
         return List(
             value=self.value,
@@ -219,6 +271,21 @@ class List(DBCollections):
             super()._load()
             self._loaded = True
 
+    def after_load(self):
+        # Pass the children sizes kept in this node header down to the (unloaded) children
+        if self.previous_count is not None:
+            stamp_subtree_stats(self.previous, self.previous_count, self.previous_height)
+            stamp_subtree_stats(self.next, self.count - 1 - self.previous_count, self.next_height)
+            for child in (self.previous, self.next):
+                if child is not None and child.__dict__.get('_stats_known'):
+                    object.__setattr__(child, 'empty', child.count == 0)
+        if self.previous_total is not None:
+            stamp_subtree_total(self.previous, self.previous_total)
+            stamp_subtree_total(self.next, self.next_total)
+            # The value keeps its weight, so nodes rebuilt around it do not load it
+            if isinstance(self.value, Atom) and not self.value.__dict__.get('_loaded'):
+                object.__setattr__(self.value, '_list_weight', self.total - self.previous_total - self.next_total)
+
     def _save(self):
         if not self._saved:
             if self.previous:
@@ -243,27 +310,107 @@ class List(DBCollections):
                 pass
             self._saved = True
 
-    def as_iterable(self) -> list[tuple[int, object]]:
+    def as_iterable(self, prefetch_depth: int | None = None) -> list[tuple[int, object]]:
         """
         Returns an iterable representation of the list items.
 
         This method traverses the list structure in-order and yields each item,
-        allowing for iteration over the list's contents.
+        allowing for iteration over the list's contents. Nodes and items ahead of the
+        cursor are read from storage in the background (see iter_tree_nodes).
 
+        :param prefetch_depth: Reads to keep in flight ahead of the cursor; None uses the default.
         :return: An iterable of the list items.
         """
+        for node in iter_tree_nodes(self, prefetch_depth):
+            if not node.empty:
+                yield node.value
 
-        # Get an iterable of the List items
-        def scan(node: List) -> list:
+    def iter_from(self, offset: int = 0):
+        """
+        Yields the list items in order, starting at the given offset.
+
+        A single descent locates the first item and leaves the pending ancestors on an
+        explicit stack, so each following item costs amortized O(1) node visits instead
+        of a full get_at() descent per offset.
+
+        :param offset: Offset of the first item to yield.
+        :return: A generator of the items from offset to the end of the list.
+        """
+        self._load()
+        if self.empty or offset >= self.count:
+            return
+        if offset < 0:
+            offset = max(0, self.count + offset)
+
+        stack = []
+        node = self
+        while node is not None:
             node._load()
-            if node.previous:
-                yield from scan(node.previous)  # Left subtree (recursion/yield)
-            if not node.empty:
-                yield node.value  # Current node
-            if node.next:
-                yield from scan(node.next)  # Right subtree (recursion/yield)
+            node_offset = subtree_stats(node.previous)[0]
+            if offset == node_offset:
+                stack.append(node)
+                break
+            if offset > node_offset:
+                offset -= node_offset + 1
+                node = node.next
+            else:
+                stack.append(node)
+                node = node.previous
+
+        while stack:
+            node = stack.pop()
+            if isinstance(node.value, Atom):
+                node.value._load()
+            yield node.value
+            child = node.next
+            while child is not None:
+                child._load()
+                stack.append(child)
+                child = child.previous
+
+    def iter_reversed(self, offset: int | None = None):
+        """
+        Yields the list items in reverse order, starting at the given offset (the last item
+        by default) and ending at the first one.
+
+        The mirror of iter_from: one descent, then amortized O(1) node visits per item.
 
-        return scan(self)
+        :param offset: Offset of the first item to yield.
+        :return: A generator of the items from offset back to the start of the list.
+        """
+        self._load()
+        if self.empty:
+            return
+        if offset is None or offset >= self.count:
+            offset = self.count - 1
+        if offset < 0:
+            return
+
+        stack = []
+        node = self
+        while node is not None:
+            node._load()
+            node_offset = subtree_stats(node.previous)[0]
+            if offset == node_offset:
+                stack.append(node)
+                break
+            if offset > node_offset:
+                stack.append(node)
+                offset -= node_offset + 1
+                node = node.next
+            else:
+                node = node.previous
+
+        while stack:
+            node = stack.pop()
+            if isinstance(node.value, Atom):
+                node.value._load()
+            yield node.value
+            child = node.previous
+            while child is not None:
+                child._load()
+                stack.append(child)
+                child = child.next
 
     def as_query_plan(self) -> QueryPlan:
         """
@@ -305,11 +452,7 @@ class List(DBCollections):
         while node is not None:
             node._load()
 
-            if node.previous:
-                node.previous._load()
-                node_offset = node.previous.count
-            else:
-                node_offset = 0
+            node_offset = subtree_stats(node.previous)[0]
 
             if offset == node_offset:
                 if isinstance(node.value, Atom):
@@ -330,20 +473,8 @@ class List(DBCollections):
         Balance factor: height(right subtree) - height(left subtree).
         :return: The balance factor of the node.
         """
-        if not self:
-            return 0
-        if self.next and self.previous:
-            self.next._load()
-            self.previous._load()
-            return self.next.height - self.previous.height
-        elif self.previous:
-            self.previous._load()
-            return -self.previous.height
-        elif self.next:
-            self.next._load()
-            return self.next.height
-        else:
-            return 0
+        self._load()
+        return subtree_stats(self.next)[1] - subtree_stats(self.previous)[1]
 
     def _right_rotation(self) -> List:
         """
@@ -415,8 +546,9 @@ class List(DBCollections):
         # Rebalance child subtrees first (post-order traversal)
         node = self
 
-        while node.previous:
-            node.previous._load()
+        # Persisted children are immutable and were balanced when written: only subtrees
+        # built by this update need checking, which keeps untouched siblings unloaded.
+        while node.previous and not node.previous.atom_pointer:
             if not -1 <= node.previous._balance() <= 1:
                 node = List(
                     value=node.value,
@@ -428,8 +560,7 @@ class List(DBCollections):
             else:
                 break
 
-        while node.next:
-            node.next._load()
+        while node.next and not node.next.atom_pointer:
             if not -1 <= node.next._balance() <= 1:
                 node = List(
                     value=node.value,
@@ -499,7 +630,7 @@ class List(DBCollections):
         if offset < 0 or offset > self.count:
             raise IndexError('Offset out of range')
 
-        node_offset = self.previous.count if self.previous else 0
+        node_offset = subtree_stats(self.previous)[0]
 
         cmp = offset - node_offset
         if cmp > 0:
@@ -595,7 +726,7 @@ class List(DBCollections):
         if offset >= self.count:
             offset = self.count
 
-        node_offset = self.previous.count if self.previous else 0
+        node_offset = subtree_stats(self.previous)[0]
 
         # Case: Inserting into an empty List.
         if self.empty:
@@ -604,6 +735,7 @@ class List(DBCollections):
                 empty=False,
                 previous=None,
                 next=None,
+                indexes=self.add2indexes(value) if self.indexes else self.indexes,
                 transaction=self.transaction
             )
 
@@ -712,7 +844,7 @@ class List(DBCollections):
         if offset >= self.count:
             return self
 
-        node_offset = self.previous.count if self.previous else 0
+        node_offset = subtree_stats(self.previous)[0]
 
         # Case: Remove from an empty List.
         if self.empty:
@@ -726,7 +858,7 @@ class List(DBCollections):
             if self.next:
                 self.next._load()
                 new_next = self.next.remove_at(offset - node_offset - 1)
-                if new_next is not None and getattr(new_next, 'empty', False):
+                if new_next is not None and _is_empty_node(new_next):
                     new_next = None
                 new_node = List(
                     value=self.value,
@@ -747,7 +879,7 @@ class List(DBCollections):
                 new_node = List(
                     value=self.value,
                     empty=False,
-                    previous=prev_removed if not getattr(prev_removed, 'empty', False) else None,
+                    previous=prev_removed if not _is_empty_node(prev_removed) else None,
                     next=self.next,
                     transaction=self.transaction
                 )
@@ -759,16 +891,16 @@ class List(DBCollections):
             # Remove this node
             if self.next:
                 self.next._load()
-                if getattr(self.next, 'empty', False):
+                if _is_empty_node(self.next):
                     # Treat as no right child
-                    if self.previous and not getattr(self.previous, 'empty', False):
+                    if self.previous and not _is_empty_node(self.previous):
                         self.previous._load()
                         last_value = self.previous.get_at(-1)
                         new_previous = self.previous.remove_last()
                         new_node = List(
                             value=last_value,
                             empty=False,
-                            previous=new_previous if not new_previous.empty else None,
+                            previous=new_previous if not _is_empty_node(new_previous) else None,
                             next=None,
                             transaction=self.transaction
                         )
@@ -780,20 +912,20 @@ class List(DBCollections):
                     new_node = List(
                         value=first_value,
                         empty=False,
-                        previous=self.previous if self.previous and not self.previous.empty else None,
-                        next=new_next if not new_next.empty else None,
+                        previous=self.previous if self.previous and not _is_empty_node(self.previous) else None,
+                        next=new_next if not _is_empty_node(new_next) else None,
                         transaction=self.transaction
                     )
             elif self.previous:
                 self.previous._load()
-                if getattr(self.previous, 'empty', False):
+                if _is_empty_node(self.previous):
                     return List(transaction=self.transaction)
                 last_value = self.previous.get_at(-1)
                 new_previous = self.previous.remove_last()
                 new_node = List(
                     value=last_value,
                     empty=False,
-                    previous=new_previous if not new_previous.empty else None,
+                    previous=new_previous if not _is_empty_node(new_previous) else None,
                     next=None,
                     transaction=self.transaction
                 )
@@ -829,20 +961,20 @@ class List(DBCollections):
 
         current_value = self.get_at(0)
 
-        if self.previous and not getattr(self.previous, 'empty', False):
+        if self.previous and not _is_empty_node(self.previous):
             # Recurse into left subtree and rebuild
             self.previous._load()
             previous_removed = self.previous.remove_first()
             new_node = List(
                 value=self.value,
                 empty=False,
-                previous=previous_removed if not previous_removed.empty else None,
+                previous=previous_removed if not _is_empty_node(previous_removed) else None,
                 next=self.next,
                 transaction=self.transaction
             )
         else:
             # This node is the leftmost; drop it and promote the right subtree
-            return (self.next if self.next is not None else List(transaction=self.transaction))
+            return self.next if not _is_empty_node(self.next) else List(transaction=self.transaction)
 
         result = new_node._rebalance()
 
@@ -872,7 +1004,7 @@ class List(DBCollections):
 
         current_value = self.get_at(-1)
 
-        if self.next and not getattr(self.next, 'empty', False):
+        if self.next and not _is_empty_node(self.next):
             self.next._load()
             # Remove from the right subtree and rebuild
             next_removed = self.next.remove_last()
@@ -880,12 +1012,12 @@ class List(DBCollections):
                 value=self.value,
                 empty=False,
                 previous=self.previous,
-                next=next_removed if not next_removed.empty else None,
+                next=next_removed if not _is_empty_node(next_removed) else None,
                 transaction=self.transaction
             )
         else:
             # This node is the rightmost; drop it and promote the left subtree
-            return (self.previous if self.previous is not None else List(transaction=self.transaction))
+            return self.previous if not _is_empty_node(self.previous) else List(transaction=self.transaction)
 
         result = new_node._rebalance()
 
@@ -972,7 +1104,7 @@ class List(DBCollections):
             return self
 
         node = self
-        offset = node.previous.count if node.previous else 0
+        offset = subtree_stats(node.previous)[0]
         cmp = upper_limit - offset
 
         if cmp == 0:
@@ -987,7 +1119,7 @@ class List(DBCollections):
                 value=node.value,
                 empty=False,
                 previous=self.previous,
-                next=next_node if not next_node.empty else None,
+                next=next_node if not _is_empty_node(next_node) else None,
                 transaction=self.transaction
             )
         elif cmp < 0 and node.previous:
@@ -1032,7 +1164,7 @@ class List(DBCollections):
             return self
 
         node = self
-        offset = node.previous.count if node.previous else 0
+        offset = subtree_stats(node.previous)[0]
         cmp = lower_limit - offset
 
         if cmp == 0:
@@ -1052,7 +1184,7 @@ class List(DBCollections):
             node = List(
                 value=node.value,
                 empty=False,
-                previous=previous_node if not previous_node.empty else None,
+                previous=previous_node if not _is_empty_node(previous_node) else None,
                 next=self.next,
                 transaction=self.transaction
             )
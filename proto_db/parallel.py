@@ -6,6 +6,7 @@ It provides:
 - AdaptiveChunkController: per‑worker chunk size adjustment with EMA.
 - WorkStealingPool: per‑worker local deques, stealing, bounded feeder, cancellation.
 - parallel_scan helper: executes a map/filter over a range/sequence with the pool.
+- map_partitions helper: runs one task per partition of an input, results in partition order.
 - Config with safe defaults and env overrides.
 - Metrics hooks: a callback invoked with periodic samples and final aggregates.
 
@@ -14,10 +15,11 @@ The design favors correctness and simplicity first. Optimizations can follow lat
 from __future__ import annotations
 
 import os
+import queue
 import time
 import threading
 from dataclasses import dataclass, field
-from typing import Callable, Deque, Optional, Any, Iterable, List, Tuple
+from typing import Callable, Deque, Optional, Any, Iterable, Iterator, List, Tuple
 from collections import deque
 
 
@@ -49,6 +51,8 @@ class ParallelConfig:
     target_ms_high: float = _float_env("PROTO_PARALLEL_TARGET_MS_HIGH", 2.0)
     chunk_ema_alpha: float = _float_env("PROTO_PARALLEL_EMA_ALPHA", 0.2)
     max_inflight_chunks_per_worker: int = _int_env("PROTO_PARALLEL_MAX_INFLIGHT", 2)
+    # Whether query operators run in parallel keep the order of the sequential run
+    ordered: bool = True
 
     @staticmethod
     def from_env() -> "ParallelConfig":
@@ -370,3 +374,63 @@ def parallel_scan(
         pool.shutdown(wait=True)
 
     return results
+
+
+# ---------------------------- Helper: map_partitions ----------------------------
+
+def map_partitions(
+    tasks: List[Callable[[], Any]],
+    *,
+    config: Optional[ParallelConfig] = None,
+    ordered: Optional[bool] = None,
+    metrics_cb: Optional[MetricsCallback] = None,
+) -> Iterator[Any]:
+    """
+    Run tasks (one per partition of an input) on a WorkStealingPool and yield their results:
+    in the order of tasks when ordered (config.ordered by default), each one as soon as it and
+    those before it are done, otherwise as they complete. The first error raised by a task is raised here, and closing
+    the generator early stops the workers once their current task ends.
+
+    With a single worker or the 'thread_pool' scheduler the tasks run in turn on the caller's
+    thread, as parallel_scan does.
+    """
+    cfg = config or ParallelConfig.from_env()
+    if ordered is None:
+        ordered = cfg.ordered
+    if cfg.scheduler == 'thread_pool' or cfg.max_workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield task()
+        return
+
+    done: "queue.Queue[Tuple[int, Any, Optional[BaseException]]]" = queue.Queue()
+
+    def wrap(position: int, task: Callable[[], Any]) -> Callable[[], int]:
+        def run() -> int:
+            try:
+                result = task()
+            except BaseException as e:
+                done.put((position, None, e))
+                return 0
+            done.put((position, result, None))
+            return len(result) if hasattr(result, '__len__') else 0
+        return run
+
+    pool = WorkStealingPool(min(cfg.max_workers, len(tasks)), metrics_cb)
+    pool.submit_global([wrap(i, task) for i, task in enumerate(tasks)])
+    pool.run()
+    try:
+        pending = {}
+        next_position = 0
+        for _ in range(len(tasks)):
+            position, result, error = done.get()
+            if error is not None:
+                raise error
+            if not ordered:
+                yield result
+                continue
+            pending[position] = result
+            while next_position in pending:
+                yield pending.pop(next_position)
+                next_position += 1
+    finally:
+        pool.shutdown(wait=False)
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import itertools
+import keyword
 import os
 import logging
+import math
+import re
 from dataclasses import dataclass
+from functools import lru_cache, partial
 from abc import ABC, abstractmethod
 from typing import Optional, cast, TYPE_CHECKING
 
-from .common import Atom, QueryPlan, AtomPointer, DBObject, AbstractTransaction, DBCollections
+from .common import Atom, QueryPlan, AtomPointer, DBObject, AbstractTransaction, DBCollections, Literal
 from .exceptions import ProtoValidationException
 from .hybrid_executor import HybridExecutor
+from .parallel import ParallelConfig, map_partitions
 
 if TYPE_CHECKING:
     from .db_access import ObjectTransaction
@@ -42,6 +48,33 @@ class QueryableIndex(DBCollections, ABC):
         """
         raise NotImplementedError
 
+    def add_record(self, record: object, field_name: str = None) -> QueryableIndex:
+        """
+        Return the index with record added. Keyed indexes add it under its value of the field
+        the index is registered under (field_name, unless indexed_field names another one);
+        records without a value are left out. Indexes computing their keys from the whole
+        record override it.
+        """
+        key = _indexed_value(self, record, field_name)
+        return self if key is None else self.set_at(key, record)
+
+    def remove_record(self, record: object, field_name: str = None) -> QueryableIndex:
+        """
+        Return the index without record (see add_record). An index without it is returned
+        as is.
+        """
+        key = _indexed_value(self, record, field_name)
+        updated = self.remove_record_at(key, record) if key is not None else None
+        return self if updated is None else updated
+
+
+def _indexed_value(index: QueryableIndex, record: object, field_name: str | None) -> object:
+    from .common import _indexed_field
+    from .dictionaries import _field_value
+    field_name = _indexed_field(field_name, index)
+    return None if field_name is None else _field_value(record, field_name)
+
+
 # Executor for async operations
 max_workers = (os.cpu_count() or 1) * 5
 executor_pool = HybridExecutor(base_num_workers=max_workers // 5, sync_multiplier=5)
@@ -49,6 +82,21 @@ executor_pool = HybridExecutor(base_num_workers=max_workers // 5, sync_multiplie
 _logger = logging.getLogger(__name__)
 PROTODB_WARN_LINEAR_FALLBACK = os.getenv('PROTODB_WARN_LINEAR_FALLBACK', '0') not in ('', '0', 'false', 'False', 'no', 'No')
 
+# In a conjunction, an index term expected to select more than this fraction of the rows is
+# checked as a residual filter on the rows of the most selective index term, instead of
+# having its (large) result intersected
+INDEX_SCAN_SELECTIVITY = 0.3
+
+
+def default_parallel_config() -> ParallelConfig | None:
+    """
+    Configuration of the operators built without one: ParallelConfig.from_env() when the
+    PROTODB_PARALLEL_QUERIES environment variable is set, else None (run sequentially).
+    """
+    if os.getenv('PROTODB_PARALLEL_QUERIES', '0') in ('', '0', 'false', 'False', 'no', 'No'):
+        return None
+    return ParallelConfig.from_env()
+
 
 class Expression(ABC):
     """
@@ -226,6 +274,27 @@ class Expression(ABC):
                 message=f"It's not possible to filter {self} expression by alias!"
             )
 
+    def predicate(self):
+        """
+        The expression as a function of a record, answering as match() does. It is built
+        once per expression, to be called for every record of a scan: attribute paths are
+        resolved by generated code, constants are bound once and comparisons are inlined.
+        """
+        predicate = self.__dict__.get('_predicate')
+        if predicate is None:
+            predicate = self._build_predicate()
+            self._predicate = predicate
+        return predicate
+
+    def _build_predicate(self):
+        return self.match
+
+    def __getstate__(self):
+        # Generated predicates are rebuilt on demand, never stored
+        state = dict(self.__dict__)
+        state.pop('_predicate', None)
+        return state
+
     @abstractmethod
     def match(self, record) -> bool:
         """
@@ -272,6 +341,9 @@ class AndExpression(Expression):
                 return False
         return True
 
+    def _build_predicate(self):
+        return _chain_predicates([_predicate_of(term) for term in self.terms], on_match=False)
+
 
 class OrExpression(Expression):
     terms: list[Expression]
@@ -285,6 +357,9 @@ class OrExpression(Expression):
                 return True
         return False
 
+    def _build_predicate(self):
+        return _chain_predicates([_predicate_of(term) for term in self.terms], on_match=True)
+
 
 class NotExpression(Expression):
     negated_expression: Expression
@@ -295,6 +370,35 @@ class NotExpression(Expression):
     def match(self, record):
         return not self.negated_expression.match(record)
 
+    def _build_predicate(self):
+        negated = _predicate_of(self.negated_expression)
+        return lambda record: not negated(record)
+
+
+def _predicate_of(expression):
+    return expression.predicate() if isinstance(expression, Expression) else expression.match
+
+
+def _generate(name: str, lines: list[str], names: dict):
+    """
+    Function `name` defined by the source lines, seeing names as its globals.
+    """
+    namespace = dict(names)
+    exec(compile('\n'.join(lines), f'<{name}>', 'exec'), namespace)
+    return namespace[name]
+
+
+def _chain_predicates(predicates: list, on_match: bool):
+    """
+    One function calling predicates in turn, stopping at the first answering on_match
+    (an OR stops at the first match, an AND at the first miss).
+    """
+    lines = ['def predicate(record):']
+    for i in range(len(predicates)):
+        lines += [f'    if {"" if on_match else "not "}_p{i}(record):', f'        return {on_match}']
+    lines.append(f'    return {not on_match}')
+    return _generate('predicate', lines, {f'_p{i}': p for i, p in enumerate(predicates)})
+
 
 class Operator(ABC):
     """
@@ -338,6 +442,10 @@ class Operator(ABC):
             return LowerOrEqual()
         elif string == 'contains':
             return Contains()
+        elif string == 'startswith':
+            return StartsWith()
+        elif string == 'matches':
+            return MatchesText()
         elif string == 'in':
             return In()
         elif string == '?T':
@@ -358,6 +466,10 @@ class Operator(ABC):
             return Between(include_lower=True, include_upper=False)
         elif string == 'near[]':
             return Near(metric='cosine')
+        elif string == 'within_box':
+            return WithinBox()
+        elif string == 'within_radius':
+            return WithinRadius()
         else:
             raise ProtoValidationException(
                 message=f'Unknown operator: {string}!'
@@ -444,6 +556,53 @@ class Contains(Operator):
         return value in source
 
 
+class StartsWith(Operator):
+    """
+    Text starting with a prefix. Ordered indexes answer it with a range scan over
+    [prefix, prefix_successor(prefix)).
+    """
+    parameter_count: int = 2
+
+    def match(self, source, value=None):
+        if isinstance(source, Literal):
+            source = source.string
+        return isinstance(source, str) and isinstance(value, str) and source.startswith(value)
+
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class MatchesText(Operator):
+    """
+    Text having every word of a search text, ignoring case: 'Quick FOX' matches
+    'the quick brown fox'. Full-text indexes answer it from their posting lists, with their
+    own tokenizer and normalizer; Contains remains an exact substring test.
+    """
+    parameter_count: int = 2
+
+    def match(self, source, value=None):
+        if isinstance(source, Literal):
+            source = source.string
+        if isinstance(value, Literal):
+            value = value.string
+        if not isinstance(source, str) or not isinstance(value, str):
+            return False
+        words = {word.casefold() for word in _WORD_RE.findall(value)}
+        return bool(words) and words <= {word.casefold() for word in _WORD_RE.findall(source)}
+
+
+def prefix_successor(prefix: str) -> str | None:
+    """
+    Smallest text greater than every text starting with prefix (None when there is none):
+    the texts starting with prefix are exactly those in [prefix, prefix_successor(prefix)).
+    """
+    while prefix and ord(prefix[-1]) == 0x10FFFF:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
 class In(Operator):
     parameter_count: int = 2
 
@@ -561,6 +720,271 @@ class Near(Operator):
             return False
 
 
+class WithinBox(Operator):
+    """
+    Point inside a bounding box.
+    Usage in Expression.compile: ['field', 'within_box', (south, west, north, east)]
+    - a box with west > east crosses the antimeridian
+    - points are (lat, lon) pairs or objects with lat/lon fields (see geo_index.point_of)
+    """
+    parameter_count: int = 2
+
+    @staticmethod
+    def valid_area(value) -> bool:
+        try:
+            south, west, north, east = (float(v) for v in value)
+        except (TypeError, ValueError):
+            return False
+        return -90.0 <= south <= north <= 90.0 and -180.0 <= west <= 180.0 and -180.0 <= east <= 180.0
+
+    def match(self, source, value=None) -> bool:
+        from .geo_index import in_box, point_of
+        point = point_of(source)
+        return point is not None and self.valid_area(value) and in_box(point, tuple(float(v) for v in value))
+
+
+class WithinRadius(Operator):
+    """
+    Point within a distance (great-circle, in meters) of a center.
+    Usage in Expression.compile: ['field', 'within_radius', (lat, lon, meters)]
+    """
+    parameter_count: int = 2
+
+    @staticmethod
+    def valid_area(value) -> bool:
+        try:
+            lat, lon, radius = (float(v) for v in value)
+        except (TypeError, ValueError):
+            return False
+        return -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0 and radius >= 0.0
+
+    def match(self, source, value=None) -> bool:
+        from .geo_index import distance_m, point_of
+        point = point_of(source)
+        if point is None or not self.valid_area(value):
+            return False
+        lat, lon, radius = (float(v) for v in value)
+        return distance_m(lat, lon, *point) <= radius
+
+
+# Derived values: a field path wrapped in transforms, written as calls, e.g. lower(email),
+# mul(price, 2) or length(lower(r.name)). Their text is their fingerprint: a term and an
+# expression index match when they name the same expression.
+
+_VALUE_TRANSFORMS = {
+    'lower': lambda value: (value or '').lower(),
+    'upper': lambda value: (value or '').upper(),
+    'length': lambda value: len(value or []),
+    'abs': lambda value: abs(value or 0),
+    'add': lambda value, other: (value or 0) + (other or 0),
+    'sub': lambda value, other: (value or 0) - (other or 0),
+    'mul': lambda value, other: (value or 0) * (other or 0),
+    'div': lambda value, other: (value or 1) / (other or 1),
+}
+
+# Functions registered by name to be used in derived values (see register_value_function)
+_VALUE_FUNCTIONS: dict = {}
+
+
+def register_value_function(name: str, function) -> None:
+    """
+    Register a one-argument function so derived values (and expression indexes) can use it
+    as name(field). The same name must be registered, with the same function, wherever the
+    indexes using it are loaded.
+    """
+    if not name.isidentifier() or name in _VALUE_TRANSFORMS:
+        raise ProtoValidationException(message=f'{name!r} can not name a value function')
+    _VALUE_FUNCTIONS[name] = function
+    _parse_value.cache_clear()
+
+
+def value_fingerprint(path: str, transforms=()) -> str:
+    """
+    Text of the derived value of path through transforms, each a (name, *arguments) tuple
+    applied in order (e.g. ('lower',), ('mul', 2)).
+    """
+    text = path
+    for name, *arguments in transforms:
+        if name not in _VALUE_TRANSFORMS and name not in _VALUE_FUNCTIONS:
+            raise ProtoValidationException(message=f'Unknown value transform {name!r}')
+        text = f"{name}({', '.join([text] + [repr(argument) for argument in arguments])})"
+    return text
+
+
+def is_derived(attribute) -> bool:
+    return isinstance(attribute, str) and attribute.endswith(')') and '(' in attribute
+
+
+@lru_cache(maxsize=1024)
+def _parse_value(text: str) -> tuple[str, tuple] | None:
+    import ast
+
+    def _path(node):
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            parent = _path(node.value)
+            return None if parent is None else f'{parent}.{node.attr}'
+        return None
+
+    def _walk(node):
+        if not isinstance(node, ast.Call):
+            path = _path(node)
+            return None if path is None else (path, ())
+        if not isinstance(node.func, ast.Name) or not node.args or node.keywords:
+            return None
+        inner = _walk(node.args[0])
+        if inner is None:
+            return None
+        try:
+            arguments = tuple(ast.literal_eval(argument) for argument in node.args[1:])
+        except ValueError:
+            return None
+        return inner[0], inner[1] + ((node.func.id,) + arguments,)
+
+    try:
+        parsed = _walk(ast.parse(text, mode='eval').body)
+    except SyntaxError:
+        return None
+    if parsed is None or any(name not in _VALUE_TRANSFORMS and name not in _VALUE_FUNCTIONS
+                             for name, *_ in parsed[1]):
+        return None
+    return parsed
+
+
+def parse_value(text: str) -> tuple[str, tuple] | None:
+    """
+    (path, transforms) of a derived value text, or None if it is not one.
+    """
+    return _parse_value(text) if is_derived(text) else None
+
+
+def canonical_value(text: str) -> str:
+    """
+    Fingerprint of a derived value as value_fingerprint writes it (normalizing spacing and
+    quotes); other attributes are returned as they are.
+    """
+    parsed = parse_value(text)
+    return value_fingerprint(*parsed) if parsed is not None else text
+
+
+def _resolve_path(obj, path: str):
+    cur = obj
+    for part in path.split('.'):
+        if cur is None:
+            return None
+        if isinstance(cur, dict):
+            cur = cur.get(part)
+        else:
+            try:
+                cur = getattr(cur, part)
+            except Exception:
+                return None
+    return cur
+
+
+def _path_lines(parts) -> list[str]:
+    # Statements resolving parts from v into v, as _resolve_path does: dict keys or
+    # attributes, None once a step is missing
+    lines = []
+    for part in parts:
+        read = f'v.{part}' if part.isidentifier() and not keyword.iskeyword(part) else f'getattr(v, {part!r})'
+        lines += ['    if v is not None:',
+                  '        if isinstance(v, dict):',
+                  f'            v = v.get({part!r})',
+                  '        else:',
+                  '            try:',
+                  f'                v = {read}',
+                  '            except Exception:',
+                  '                v = None']
+    return lines
+
+
+def path_getter(path):
+    """
+    Function reading the dotted path (or tuple of steps) from a record, as _resolve_path
+    does, with the steps unrolled into generated code.
+    """
+    parts = tuple(path.split('.')) if isinstance(path, str) else tuple(path)
+    return _generate('getter', ['def getter(v):'] + _path_lines(parts) + ['    return v'], {})
+
+
+# Types with no 'string' field to unwrap (see Term.match)
+_PLAIN_VALUES = frozenset({str, int, float, bool, type(None)})
+
+
+def _unwrap_string(value):
+    try:
+        if hasattr(value, 'string'):
+            return getattr(value, 'string')
+    except Exception:
+        pass
+    return value
+
+
+# Comparisons inlined in generated predicates, v being the value read from the record.
+# Keyed by exact type: subclasses may redefine match().
+_INLINE_TESTS = {
+    Equal: 'v == _value',
+    NotEqual: 'v != _value',
+    Greater: 'v > _value',
+    GreaterOrEqual: 'v >= _value',
+    Lower: 'v < _value',
+    LowerOrEqual: 'v <= _value',
+    Contains: '_value in v',
+    In: 'v in _value',
+    IsTrue: 'bool(v)',
+    NotTrue: 'not v',
+    IsNone: 'v is None',
+    NotNone: 'v is not None',
+}
+
+
+def _inline_test(operation: Operator, value) -> tuple[str, dict, bool] | None:
+    """
+    (expression, names it uses, whether errors mean no match) testing v as
+    operation.match(v, value) does, or None when the operation has to be called.
+    """
+    kind = type(operation)
+    if kind is Between:
+        try:
+            lo, hi = value if isinstance(value, tuple) else (None, None)
+            empty = lo is None or hi is None or lo > hi
+        except Exception:
+            empty = True
+        if empty:
+            return 'False', {}, False
+        lower = 'not v < _lo' if operation.include_lower else 'not v <= _lo'
+        upper = 'not v > _hi' if operation.include_upper else 'not v >= _hi'
+        return f'{lower} and {upper}', {'_lo': lo, '_hi': hi}, True
+    if kind is StartsWith:
+        if not isinstance(value, str):
+            return 'False', {}, False
+        return 'isinstance(v, str) and v.startswith(_value)', {'_value': value}, False
+    template = _INLINE_TESTS.get(kind)
+    return None if template is None else (template, {'_value': value}, False)
+
+
+def evaluate_value(record, text: str):
+    """
+    Value of the derived value text for record (None when it can not be computed).
+    """
+    parsed = parse_value(text)
+    if parsed is None:
+        raise ProtoValidationException(message=f'{text!r} is not a derived value')
+    path, transforms = parsed
+    value = _resolve_path(record, path)
+    if isinstance(value, Literal):
+        value = value.string
+    try:
+        for name, *arguments in transforms:
+            function = _VALUE_TRANSFORMS.get(name) or _VALUE_FUNCTIONS[name]
+            value = function(value, *arguments)
+    except Exception:
+        return None
+    return value
+
+
 class Term(Expression):
     target_attribute: str
     operation: Operator
@@ -572,6 +996,10 @@ class Term(Expression):
         self.value = value
 
     def match(self, record):
+        if is_derived(self.target_attribute):
+            value = self.value.string if isinstance(self.value, Literal) else self.value
+            return self.operation.match(evaluate_value(record, self.target_attribute), value)
+
         # Support dotted-paths and dict/DBObject records
         def resolve(obj, path: str):
             parts = path.split('.') if isinstance(path, str) else [path]
@@ -602,16 +1030,426 @@ class Term(Expression):
             pass
         return self.operation.match(source_value, val)
 
+    def _build_predicate(self):
+        if not isinstance(self.target_attribute, str):
+            return self.match
+        operation = self.operation
+        if is_derived(self.target_attribute):
+            text, value = self.target_attribute, self.value
+            value = value.string if isinstance(value, Literal) else value
+            return lambda record: operation.match(evaluate_value(record, text), value)
+
+        value = _unwrap_string(self.value)
+        test = _inline_test(operation, value)
+        if test is None:
+            test = '_match(v, _value)', {'_match': operation.match, '_value': value}, False
+        expression, names, errors_miss = test
+        lines = ['def predicate(v):'] + _path_lines(self.target_attribute.split('.'))
+        lines += ['    if type(v) not in _plain:', '        v = _unwrap(v)']
+        if errors_miss:
+            lines += ['    try:', f'        return {expression}', '    except Exception:', '        return False']
+        else:
+            lines.append(f'    return {expression}')
+        return _generate('predicate', lines, {**names, '_plain': _PLAIN_VALUES, '_unwrap': _unwrap_string})
+
+
+def _always(record):
+    return True
+
+
+def _never(record):
+    return False
+
 
 class TrueTerm(Expression):
     def match(self, record):
         return True
 
+    def _build_predicate(self):
+        return _always
+
 
 class FalseTerm(Expression):
     def match(self, record):
         return False
 
+    def _build_predicate(self):
+        return _never
+
+
+_OPERATOR_TOKENS = {
+    Equal: '==',
+    NotEqual: '!=',
+    Greater: '>',
+    GreaterOrEqual: '>=',
+    Lower: '<',
+    LowerOrEqual: '<=',
+    Contains: 'contains',
+    StartsWith: 'startswith',
+    MatchesText: 'matches',
+    In: 'in',
+    IsTrue: '?T',
+    NotTrue: '?!T',
+    IsNone: '?N',
+    NotNone: '?!N',
+    WithinBox: 'within_box',
+    WithinRadius: 'within_radius',
+}
+
+
+def _operator_token(op: Operator | str) -> str:
+    if isinstance(op, str):
+        return op
+    if isinstance(op, Between):
+        return 'between' + ('[' if op.include_lower else '(') + (']' if op.include_upper else ')')
+    token = _OPERATOR_TOKENS.get(type(op))
+    if token is None:
+        raise ProtoValidationException(message=f'Operator {type(op).__name__} has no token form')
+    return token
+
+
+def expression_spec(expression: Expression) -> list:
+    """
+    Token list of expression, as accepted by Expression.compile (the inverse of compile), so
+    an expression can be stored. Only Terms and AND/OR/NOT combinations of them have one.
+    """
+    if isinstance(expression, TrueTerm):
+        return []
+    if isinstance(expression, Term):
+        token = _operator_token(expression.operation)
+        operator = Operator.get_operator(token)
+        if operator.parameter_count == 1:
+            return [expression.target_attribute, token]
+        if operator.parameter_count == 3:
+            lo, hi = expression.value
+            return [expression.target_attribute, token, lo, hi]
+        return [expression.target_attribute, token, expression.value]
+    if isinstance(expression, NotExpression):
+        return ['!', expression_spec(expression.negated_expression)]
+    if isinstance(expression, (AndExpression, OrExpression)) and expression.terms:
+        connective = '&' if isinstance(expression, AndExpression) else '|'
+        spec = expression_spec(expression.terms[-1])
+        for term in reversed(expression.terms[:-1]):
+            spec = [connective, expression_spec(term), spec]
+        return spec
+    raise ProtoValidationException(message=f'{type(expression).__name__} can not be stored as a predicate')
+
+
+def with_attributes(expression: Expression, rename) -> Expression:
+    """
+    Copy of expression with the target attribute of every term replaced by rename(attribute).
+    """
+    if isinstance(expression, Term):
+        return Term(rename(expression.target_attribute), expression.operation, expression.value)
+    if isinstance(expression, AndExpression):
+        return AndExpression([with_attributes(term, rename) for term in expression.terms])
+    if isinstance(expression, OrExpression):
+        return OrExpression([with_attributes(term, rename) for term in expression.terms])
+    if isinstance(expression, NotExpression):
+        return NotExpression(with_attributes(expression.negated_expression, rename))
+    return expression
+
+
+def predicate_spec(predicate) -> list:
+    """
+    Token list of a record predicate given as an Expression, a token list or a LINQ F
+    predicate (whose fields are taken relative to the record).
+    """
+    if isinstance(predicate, list):
+        return predicate
+    if isinstance(predicate, Expression):
+        return expression_spec(predicate)
+    tokens = getattr(predicate, 'pb_tokens', None)
+    if tokens is not None:
+        from .linq import DEFAULT_ALIAS
+        prefix = DEFAULT_ALIAS + '.'
+        return expression_spec(with_attributes(
+            Expression.compile(tokens),
+            lambda attribute: attribute[len(prefix):] if attribute.startswith(prefix) else attribute
+        ))
+    raise ProtoValidationException(
+        message='A predicate must be an Expression, a token list or an F predicate (e.g. F.status == "open")'
+    )
+
+
+def _normalized_term(term: Term) -> Term:
+    if isinstance(term.operation, str):
+        return Term(term.target_attribute, Operator.get_operator(term.operation), term.value)
+    return term
+
+
+def _interval(term: Term) -> tuple | None:
+    """
+    (lo, hi, include_lower, include_upper) of the values matching an equality or range term
+    (an open side is None); None for other terms.
+    """
+    from .dictionaries import _range_bounds, _raw_value
+    if isinstance(term.operation, Equal):
+        value = _raw_value(term.value)
+        return value, value, True, True
+    return _range_bounds(term)
+
+
+def _interval_within(inner: tuple, outer: tuple) -> bool:
+    lo, hi, include_lower, include_upper = inner
+    outer_lo, outer_hi, outer_include_lower, outer_include_upper = outer
+    if outer_lo is not None:
+        if lo is None or lo < outer_lo or (lo == outer_lo and include_lower and not outer_include_lower):
+            return False
+    if outer_hi is not None:
+        if hi is None or hi > outer_hi or (hi == outer_hi and include_upper and not outer_include_upper):
+            return False
+    return True
+
+
+def _intersection(intervals: list[tuple]) -> tuple:
+    lo, hi, include_lower, include_upper = intervals[0]
+    for other_lo, other_hi, other_include_lower, other_include_upper in intervals[1:]:
+        if other_lo is not None and (lo is None or other_lo > lo or (other_lo == lo and not other_include_lower)):
+            lo, include_lower = other_lo, other_include_lower
+        if other_hi is not None and (hi is None or other_hi < hi or (other_hi == hi and not other_include_upper)):
+            hi, include_upper = other_hi, other_include_upper
+    return lo, hi, include_lower, include_upper
+
+
+def _term_implies(terms: list[Term], implied: Term) -> bool:
+    """
+    Whether every record matching all of terms (on the attribute of implied) matches implied.
+    """
+    from .dictionaries import _raw_value
+    implied = _normalized_term(implied)
+    terms = [_normalized_term(term) for term in terms]
+    try:
+        for term in terms:
+            # Records matching one of a few values: check each value
+            if isinstance(term.operation, (Equal, In)):
+                values = [term.value] if isinstance(term.operation, Equal) else list(term.value)
+                if all(implied.operation.match(_raw_value(value), _raw_value(implied.value))
+                       for value in values):
+                    return True
+            elif type(term.operation) is type(implied.operation) and term.value == implied.value and \
+                    getattr(term.operation, '__dict__', {}) == getattr(implied.operation, '__dict__', {}):
+                return True
+
+        intervals = [_interval(term) for term in terms]
+        intervals = [interval for interval in intervals if interval is not None]
+        if not intervals:
+            return False
+        within = _intersection(intervals)
+        if isinstance(implied.operation, NotNone):
+            # Comparisons never match a missing value
+            return True
+        if isinstance(implied.operation, NotEqual):
+            value = _raw_value(implied.value)
+            return not _interval_within((value, value, True, True), within)
+        implied_interval = _interval(implied)
+        return implied_interval is not None and _interval_within(within, implied_interval)
+    except TypeError:
+        # Values that do not compare prove nothing
+        return False
+
+
+def expression_implies(condition: Expression, predicate: Expression) -> bool:
+    """
+    Whether every record matching condition also matches predicate, as far as can be told
+    from the terms of both: a conservative check (False when unsure) used to decide if a
+    query can be answered by a partial index on predicate.
+    """
+    if predicate is None or isinstance(predicate, TrueTerm):
+        return True
+    if isinstance(predicate, AndExpression):
+        return all(expression_implies(condition, term) for term in predicate.terms)
+    if isinstance(condition, OrExpression):
+        return all(expression_implies(term, predicate) for term in condition.terms)
+    if isinstance(predicate, OrExpression):
+        return any(expression_implies(condition, term) for term in predicate.terms)
+    if isinstance(condition, FalseTerm):
+        return True
+    if not isinstance(predicate, Term):
+        return False
+    if isinstance(condition, Term):
+        conjuncts = [condition]
+    elif isinstance(condition, AndExpression):
+        conjuncts = condition.terms
+        if any(expression_implies(term, predicate) for term in conjuncts if not isinstance(term, Term)):
+            return True
+    else:
+        return False
+    same_attribute = [term for term in conjuncts
+                      if isinstance(term, Term) and term.target_attribute == predicate.target_attribute]
+    return bool(same_attribute) and _term_implies(same_attribute, predicate)
+
+
+# Fraction of the records assumed to match a term on a field without statistics
+_DEFAULT_SELECTIVITY = {
+    Equal: 0.1,
+    In: 0.2,
+    NotEqual: 0.9,
+    Between: 0.25,
+    Greater: 1 / 3,
+    GreaterOrEqual: 1 / 3,
+    Lower: 1 / 3,
+    LowerOrEqual: 1 / 3,
+}
+
+
+def _estimate_term_rows(statistics, term: Term) -> float | None:
+    """
+    Records expected to match term, from the ColumnStatistics of its field; None when the
+    statistics cannot tell.
+    """
+    from .dictionaries import _range_bounds, _raw_value
+    op = term.operation
+    if isinstance(op, Equal):
+        return statistics.estimate_equal(_raw_value(term.value))
+    if isinstance(op, In):
+        try:
+            return sum(statistics.estimate_equal(_raw_value(value)) for value in term.value)
+        except TypeError:
+            return None
+    if isinstance(op, NotEqual):
+        return max(0.0, statistics.row_count - statistics.estimate_equal(_raw_value(term.value)))
+    if isinstance(op, (Between, Greater, GreaterOrEqual, Lower, LowerOrEqual, StartsWith)):
+        bounds = _range_bounds(term)
+        return statistics.estimate_range(*bounds) if bounds is not None else None
+    return None
+
+
+def _type_floor(value: object) -> object:
+    # Smallest key of the type of value, in the key order of ordered indexes
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return float('-inf')
+    if isinstance(value, str):
+        return ''
+    if isinstance(value, bytes):
+        return b''
+    if isinstance(value, (tuple, list)):
+        return ()
+    return value
+
+
+def range_items(index, lo: object, hi: object, include_lower: bool = True, include_upper: bool = True):
+    """
+    DictionaryItems of an ordered index whose keys are between lo and hi, in key order: one
+    descent to the lower bound, then an in-order walk until hi. An open side (None) reaches
+    the first or last key of the type of the other bound, so `> 'm'` stays within texts.
+    """
+    from .dictionaries import DictionaryItem as _DI
+    if lo is None and hi is None:
+        yield from index.items_from(0)
+        return
+    lo_ok = _DI._order_key(lo) if lo is not None else None
+    hi_ok = _DI._order_key(hi) if hi is not None else None
+    kind = (lo_ok or hi_ok)[0]
+    start = index.lower_bound(lo if lo is not None else _type_floor(hi))
+    for item in index.items_from(start):
+        if item is None:
+            continue
+        key_ok = item._key_order()
+        if hi_ok is None:
+            if key_ok[0] != kind:
+                break
+        elif key_ok > hi_ok or (key_ok == hi_ok and not include_upper and item.key == hi):
+            break
+        if lo_ok is not None and (key_ok < lo_ok or (key_ok == lo_ok and not include_lower and item.key == lo)):
+            continue
+        if lo_ok is None and key_ok[0] != kind:
+            continue
+        yield item
+
+
+def range_count(index, lo: object, hi: object, include_lower: bool = True, include_upper: bool = True) -> int:
+    """
+    Number of records of an ordered index with keys between lo and hi (open sides as in
+    range_items), read from the index alone. Two descents give the bounds: for a unique
+    index the keys in range are counted from subtree sizes, and a RepeatedKeysDictionary
+    reads the records before each bound from the bucket totals of its key tree. Key trees
+    written without totals add up the sizes of the buckets in range instead.
+    """
+    from .dictionaries import DictionaryItem as _DI, RepeatedKeysDictionary as _RKD
+    index._load()
+    if lo is None and hi is None:
+        start_ok, end_ok = None, None
+    else:
+        lo_ok = _DI._order_key(lo) if lo is not None else None
+        hi_ok = _DI._order_key(hi) if hi is not None else None
+        kind = (lo_ok or hi_ok)[0]
+        # (k,) orders before every key of type k and (k + '\0',) after all of them; a
+        # trailing None places a bound right after the key it extends
+        if lo_ok is None:
+            start_ok = (kind,)
+        else:
+            start_ok = lo_ok if include_lower else lo_ok + (None,)
+        if hi_ok is None:
+            end_ok = (kind + '\0',)
+        else:
+            end_ok = hi_ok + (None,) if include_upper else hi_ok
+    if isinstance(index, _RKD):
+        if start_ok is None:
+            root = index.content
+            root._load()
+            if root.total is not None:
+                return root.total
+        else:
+            end_rows = index.rows_before(end_ok)
+            if end_rows is not None:
+                return max(0, end_rows - index.rows_before(start_ok))
+    if start_ok is None:
+        start, end = 0, index.count
+    else:
+        start, end = index.position_of(start_ok), index.position_of(end_ok)
+    if end <= start:
+        return 0
+    if not isinstance(index, _RKD):
+        return end - start
+    total = 0
+    for item in itertools.islice(index.items_from(start), end - start):
+        if item is not None:
+            # Stored buckets only know their size once loaded
+            bucket = cast('Set', item.value)
+            bucket._load()
+            total += bucket.count
+    return total
+
+
+class ResultStream:
+    """
+    Rows of a plan, pulled one at a time. Nothing runs until the stream is iterated, and a
+    consumer that stops early (take, first, any) stops the plans under it as well. Every
+    iteration runs the plan again, as iterating a List reads it again.
+
+    get_at() and slice() read rows up to the offsets asked for only; to_list() builds a List
+    when a collection is needed.
+    """
+
+    def __init__(self, rows, transaction: AbstractTransaction | None = None):
+        # Callable returning a new iterator over the rows
+        self._rows = rows
+        self.transaction = transaction
+
+    def __iter__(self):
+        return iter(self._rows())
+
+    def as_iterable(self):
+        return iter(self._rows())
+
+    def get_at(self, offset: int) -> object | None:
+        if offset < 0:
+            return self.to_list().get_at(offset)
+        return next(itertools.islice(self, offset, None), None)
+
+    def slice(self, from_offset: int, to_offset: int):
+        if from_offset < 0 or to_offset < 0:
+            return self.to_list().slice(from_offset, to_offset)
+        from .lists import List as _List
+        return _List.from_values(list(itertools.islice(self, from_offset, to_offset)), transaction=self.transaction)
+
+    def to_list(self):
+        from .lists import List as _List
+        return _List.from_values(list(self), transaction=self.transaction)
+
 
 class ListPlan(QueryPlan):
     """
@@ -627,16 +1465,42 @@ class ListPlan(QueryPlan):
         super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
         self.base_list = base_list
 
-    def execute(self) -> DBCollections:
-        from .lists import List as _List
-        res = _List(transaction=self.transaction)
-        for item in self.base_list:
-            res = res.append_last(item)
-        return res
+    def execute(self) -> ResultStream:
+        return ResultStream(lambda: iter(self.base_list), transaction=self.transaction)
 
     def optimize(self, *args, **kwargs) -> QueryPlan:
         return self
 
+    def count(self) -> int:
+        return len(self.base_list)
+
+    def get_cardinality_estimate(self) -> int:
+        return len(self.base_list)
+
+    def partitions(self, count: int, min_rows: int = 1) -> list | None:
+        """
+        Ranges of offsets of the list. A database List is read from the first offset of
+        each range with iter_from(), whose single descent is guided by the subtree counts.
+        """
+        from .lists import List as _List
+        base = self.base_list
+        if isinstance(base, (list, tuple)):
+            size = len(base)
+
+            def read(lo: int, hi: int):
+                return map(base.__getitem__, range(lo, hi))
+        elif isinstance(base, _List):
+            base._load()
+            size = base.count
+
+            def read(lo: int, hi: int):
+                return itertools.islice(base.iter_from(lo), hi - lo)
+        else:
+            return None
+        parts = max(1, min(count, size // max(1, min_rows)))
+        bounds = [size * i // parts for i in range(parts + 1)]
+        return [partial(read, lo, hi) for lo, hi in zip(bounds, bounds[1:])]
+
 
 class VectorSearchPlan(QueryPlan):
     """
@@ -655,9 +1519,10 @@ class VectorSearchPlan(QueryPlan):
         self.threshold = threshold
         self.metric = metric
 
-    def execute(self) -> DBCollections:
-        from .lists import List as _List
-        res = _List(transaction=self.transaction)
+    def execute(self) -> ResultStream:
+        return ResultStream(self._results, transaction=self.transaction)
+
+    def _results(self):
         try:
             if self.k is not None:
                 results = self.index.search(self.query_vector, self.k, metric=self.metric)
@@ -682,9 +1547,7 @@ class VectorSearchPlan(QueryPlan):
                         objs.append(rid)
                 except Exception:
                     continue
-        for obj in objs:
-            res = res.append_last(obj)
-        return res
+        yield from objs
 
     def get_cardinality_estimate(self) -> int:
         if self.k is not None and isinstance(self.k, int) and self.k > 0:
@@ -716,56 +1579,470 @@ class VectorSearchPlan(QueryPlan):
         }
 
 
-class IndexedQueryPlan(QueryPlan):
+def _reference_of(record) -> int:
     """
-    IndexedQueryPlan is a specialized version of QueryPlan.
+    Reference used to intersect sub-plan results: AtomPointer hash for persisted atoms.
+    """
+    try:
+        if isinstance(record, Atom) and getattr(record, 'atom_pointer', None):
+            return record.atom_pointer.hash()
+    except Exception:
+        pass
+    try:
+        return record.hash()
+    except Exception:
+        return hash(record)
+
+
+def _plan_references(plan: QueryPlan) -> frozenset[int]:
+    """
+    References of the records of plan: from its get_references() when it has one, otherwise
+    (or when that gives nothing) from its materialized records.
+    """
+    refs = None
+    if hasattr(plan, 'get_references'):
+        try:
+            refs = plan.get_references()
+        except Exception:
+            refs = None
+    if refs:
+        return frozenset(refs)
+    try:
+        return frozenset(_reference_of(record) for record in plan.execute())
+    except Exception:
+        return frozenset()
 
-    It provides functionality for creating and managing indexed query plans
-    that optimize query execution based on indexed data sources. This class
-    extends the base functionality of QueryPlan to incorporate the use of
-    indices in query operations.
 
+class FullTextMatchPlan(QueryPlan):
     """
-    indexes: object
-
-    def __init__(
-            self,
-            indexes = None,
-            based_on: QueryPlan = None,
-            atom_pointer: AtomPointer = None,
-            transaction: ObjectTransaction = None,
-            **kwargs):
-        super().__init__(based_on=based_on, atom_pointer=atom_pointer, transaction=transaction, **kwargs)
-        if indexes is None:
-            # Lazy import to avoid circular dependency; only used if someone constructs
-            # an IndexedQueryPlan without providing indexes.
-            from .dictionaries import Dictionary as _Dictionary
-            self.indexes = _Dictionary(transaction=self.transaction)
-        else:
-            self.indexes = indexes
+    Records whose indexed text has every token of `text`, found by intersecting the posting
+    lists of a FullTextIndex (shortest list first).
+    """
+    def __init__(self, index, text: str, based_on: QueryPlan | None = None,
+                 transaction: ObjectTransaction | None = None, atom_pointer: AtomPointer | None = None, **kwargs):
+        super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.index = index
+        self.text = text
 
-    def execute(self) -> DBCollections:
-        # Delegate execution to the underlying plan; indexes are only metadata for optimization
-        if self.based_on is None:
-            from .lists import List as _List
-            return _List(transaction=self.transaction)
-        return self.based_on.execute()
+    def execute(self):
+        documents = self.index.documents
+        for ref in self.index.matching_references(self.text):
+            yield documents.get_at(ref)
 
     def optimize(self, *args, **kwargs) -> QueryPlan:
-        return IndexedQueryPlan(
-            indexes=self.indexes,
-            based_on=self.based_on.optimize() if self.based_on else None,
-            transaction=self.transaction
-        )
+        return self
 
-    def add_index(self,
-                  field_name: str) -> IndexedQueryPlan:
-        """
-        Adds an index to the database for optimizing query performance on specified columns. This method
-        creates a new index with the given name on the columns specified in the list. Indexing can
+    def count(self) -> int:
+        return len(self.index.matching_references(self.text))
+
+    def get_references(self) -> frozenset[int]:
+        return frozenset(_reference_of(record) for record in self.execute())
+
+    def get_cardinality_estimate(self) -> int:
+        # Bounded by the shortest posting list
+        try:
+            sizes = [posting.count if posting is not None else 0
+                     for posting in (self.index.postings.get_at(token) for token in set(self.index.tokens(self.text)))]
+            return min(sizes) if sizes else 0
+        except Exception:
+            return 0
+
+    def get_cost_estimate(self) -> float:
+        return 1.0 + self.get_cardinality_estimate() * 0.05
+
+    def explain(self) -> dict:
+        return {
+            'plan_type': 'FullTextMatchPlan',
+            'index_used': getattr(self.index, 'field_name', None),
+            'lookup_type': 'Posting-list intersection',
+            'tokens': sorted(set(self.index.tokens(self.text))),
+            'estimated_cardinality': self.get_cardinality_estimate(),
+            'estimated_cost': self.get_cost_estimate(),
+        }
+
+
+class FullTextSearchPlan(QueryPlan):
+    """
+    BM25-ranked top-k search over a FullTextIndex: yields the best k records for `text`, best
+    first. `ranked()` also returns their scores.
+    """
+    def __init__(self, index, text: str, k: int = 10, k1: float = 1.2, b: float = 0.75,
+                 based_on: QueryPlan | None = None, transaction: ObjectTransaction | None = None,
+                 atom_pointer: AtomPointer | None = None, **kwargs):
+        super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.index = index
+        self.text = text
+        self.k = k
+        self.k1 = k1
+        self.b = b
+
+    def ranked(self) -> list[tuple[object, float]]:
+        return self.index.search(self.text, k=self.k, k1=self.k1, b=self.b)
+
+    def execute(self):
+        for record, _ in self.ranked():
+            yield record
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return self
+
+    def count(self) -> int:
+        return len(self.ranked())
+
+    def get_cardinality_estimate(self) -> int:
+        return self.k
+
+    def get_cost_estimate(self) -> float:
+        return 25.0
+
+    def explain(self) -> dict:
+        return {
+            'plan_type': 'FullTextSearchPlan',
+            'index_used': getattr(self.index, 'field_name', None),
+            'lookup_type': 'BM25 top-k',
+            'query_params': f"k={self.k}, k1={self.k1}, b={self.b}",
+            'tokens': sorted(set(self.index.tokens(self.text))),
+            'estimated_cardinality': self.get_cardinality_estimate(),
+            'estimated_cost': self.get_cost_estimate(),
+        }
+
+
+class GeoScanPlan(QueryPlan):
+    """
+    Records of a GeoIndex inside a WithinBox or WithinRadius area, read from the index cell
+    ranges covering the area and filtered exactly.
+    """
+    def __init__(self, index, operation: Operator, area: tuple, based_on: QueryPlan | None = None,
+                 transaction: ObjectTransaction | None = None, atom_pointer: AtomPointer | None = None, **kwargs):
+        super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.index = index
+        self.operation = operation
+        self.area = tuple(float(v) for v in area)
+
+    def execute(self):
+        if isinstance(self.operation, WithinBox):
+            return self.index.records_in_box(*self.area)
+        return self.index.records_within(*self.area)
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return self
+
+    def count(self) -> int:
+        return sum(1 for _ in self.execute())
+
+    def get_references(self) -> frozenset[int]:
+        return frozenset(_reference_of(record) for record in self.execute())
+
+    def get_cardinality_estimate(self) -> int:
+        # Share of the indexed records in the area, assuming they are spread evenly
+        from .geo_index import EARTH_RADIUS_M
+        if isinstance(self.operation, WithinBox):
+            south, west, north, east = self.area
+            width = (east - west) if west <= east else (360.0 - west + east)
+            share = width / 360.0 * (math.sin(math.radians(north)) - math.sin(math.radians(south))) / 2.0
+        else:
+            share = (1.0 - math.cos(min(math.pi, self.area[2] / EARTH_RADIUS_M))) / 2.0
+        # Cells are fine enough to hold about one point each when there are no statistics
+        statistics = getattr(self.index, 'statistics', None)
+        total = statistics.row_count if statistics is not None else self.index.count
+        return max(1, int(total * share))
+
+    def get_cost_estimate(self) -> float:
+        return 1.0 + self.get_cardinality_estimate() * 0.05
+
+    def explain(self) -> dict:
+        return {
+            'plan_type': 'GeoScanPlan',
+            'index_used': getattr(self.index, 'field_name', None),
+            'lookup_type': 'Cell range scan',
+            'query_params': f"{_operator_token(self.operation)} {self.area}",
+            'estimated_cardinality': self.get_cardinality_estimate(),
+            'estimated_cost': self.get_cost_estimate(),
+        }
+
+
+class GeoNearestPlan(QueryPlan):
+    """
+    The k records of a GeoIndex closest to (lat, lon), closest first. `ranked()` also returns
+    their distances in meters.
+    """
+    def __init__(self, index, lat: float, lon: float, k: int = 10, based_on: QueryPlan | None = None,
+                 transaction: ObjectTransaction | None = None, atom_pointer: AtomPointer | None = None, **kwargs):
+        super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.index = index
+        self.lat = lat
+        self.lon = lon
+        self.k = k
+
+    def ranked(self) -> list[tuple[object, float]]:
+        return self.index.nearest(self.lat, self.lon, self.k)
+
+    def execute(self):
+        for record, _ in self.ranked():
+            yield record
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return self
+
+    def count(self) -> int:
+        return len(self.ranked())
+
+    def get_cardinality_estimate(self) -> int:
+        return self.k
+
+    def get_cost_estimate(self) -> float:
+        return 25.0
+
+    def explain(self) -> dict:
+        return {
+            'plan_type': 'GeoNearestPlan',
+            'index_used': getattr(self.index, 'field_name', None),
+            'lookup_type': 'Nearest k by growing radius',
+            'query_params': f"lat={self.lat}, lon={self.lon}, k={self.k}",
+            'estimated_cardinality': self.get_cardinality_estimate(),
+            'estimated_cost': self.get_cost_estimate(),
+        }
+
+
+class BitmapScanPlan(QueryPlan):
+    """
+    Records of a BitmapIndex whose value is one of `values` (or, when `negated`, none of them,
+    including records without a value). AndMerge/OrMerge combine bitmap scans over aligned
+    indexes with bitmap AND/OR/ANDNOT before loading any record.
+    """
+    def __init__(self, index, values: list, negated: bool = False, based_on: QueryPlan | None = None,
+                 transaction: ObjectTransaction | None = None, atom_pointer: AtomPointer | None = None, **kwargs):
+        super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.index = index
+        self.values = list(values)
+        self.negated = negated
+        self._values_bitmap = None
+
+    def values_bitmap(self):
+        """
+        Union of the bitmaps of `values`, ignoring `negated`.
+        """
+        if self._values_bitmap is None:
+            from .bitmap_index import RoaringBitmap
+            self._values_bitmap = RoaringBitmap.union_all(self.index.bitmap_at(value) for value in self.values)
+        return self._values_bitmap
+
+    def bitmap(self):
+        """
+        Ordinals of the matching records.
+        """
+        if self.negated:
+            return self.index.all_rows() - self.values_bitmap()
+        return self.values_bitmap()
+
+    @staticmethod
+    def combinable(plans: list[QueryPlan]) -> bool:
+        """
+        Whether plans are all bitmap scans over indexes sharing the same row ordinals.
+        """
+        if not plans or not all(isinstance(plan, BitmapScanPlan) for plan in plans):
+            return False
+        first = plans[0].index
+        return all(plan.index is first or first.aligned_with(plan.index) for plan in plans[1:])
+
+    def execute(self):
+        yield from self.index.records_of(self.bitmap())
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return self
+
+    def count(self) -> int:
+        return len(self.bitmap())
+
+    def get_references(self) -> frozenset[int]:
+        return frozenset(_reference_of(record) for record in self.execute())
+
+    def get_cardinality_estimate(self) -> int:
+        return self.count()
+
+    def get_cost_estimate(self) -> float:
+        return 1.0 + self.get_cardinality_estimate() * 0.01
+
+    def explain(self) -> dict:
+        return {
+            'plan_type': 'BitmapScanPlan',
+            'index_used': getattr(self.index, 'field_name', None),
+            'lookup_type': 'Bitmap (complement)' if self.negated else 'Bitmap',
+            'values': list(self.values),
+            'estimated_cardinality': self.get_cardinality_estimate(),
+            'estimated_cost': self.get_cost_estimate(),
+        }
+
+
+def ordering_index(indexes, field: str, condition: Expression | None = None):
+    """
+    Index whose keys give the order of field (a field path or derived value), to walk records
+    sorted by it: a plain ordered index registered under field, an expression index on that
+    very expression, or a partial index on field when condition implies its predicate. Other
+    kinds of index (unique, covering, full-text, ...) do not hold records in key buckets.
+    """
+    from .dictionaries import ExpressionIndex, PartialIndex, RepeatedKeysDictionary
+    if not indexes:
+        return None
+    field = canonical_value(field)
+
+    def usable(index) -> bool:
+        if type(index) is RepeatedKeysDictionary:
+            return not is_derived(field)
+        if isinstance(index, PartialIndex):
+            return condition is not None and index.applies_to(field, condition)
+        if isinstance(index, ExpressionIndex):
+            return index.applies_to(field)
+        return False
+
+    try:
+        index = indexes.get_at(field) if indexes.has(field) else None
+        if index is not None and usable(index):
+            return index
+        for name, candidate in indexes.as_iterable():
+            if name != field and isinstance(candidate, (PartialIndex, ExpressionIndex)) and usable(candidate):
+                return candidate
+    except Exception:
+        return None
+    return None
+
+
+class OrderedIndexScanPlan(QueryPlan):
+    """
+    Records of based_on sorted by `field`, read by walking an ordered index in key order
+    (descending when not `ascending`) instead of sorting them. Records not matching `filter`
+    are passed over, and the walk stops once `skip` + `limit` records have been found.
+    Records without a value for field (not held by the index) come last, as in a sort; they
+    are only looked for when the index runs out first.
+    """
+    def __init__(self, index, field: str, ascending: bool = True, filter: Expression | None = None,
+                 skip: int = 0, limit: int | None = None, based_on: QueryPlan | None = None,
+                 transaction: ObjectTransaction | None = None, atom_pointer: AtomPointer | None = None, **kwargs):
+        super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.index = index
+        self.field = field
+        self.ascending = ascending
+        self.filter = filter
+        self.skip = skip
+        self.limit = limit
+
+    def _sorted(self):
+        items = self.index.items_from(0) if self.ascending else self.index.items_reversed()
+        for item in items:
+            for record in item.value.as_iterable():
+                yield record
+        if self.based_on is not None:
+            key_of = getattr(self.index, 'key_of', None) or (lambda record: _resolve_path(record, self.field))
+            for record in self.based_on.execute():
+                if key_of(record) is None:
+                    yield record
+
+    def execute(self):
+        if self.limit is not None and self.limit <= 0:
+            return
+        to_skip, remaining = self.skip, self.limit
+        match = self.filter.predicate() if self.filter is not None else None
+        for record in self._sorted():
+            if match is not None and not match(record):
+                continue
+            if to_skip > 0:
+                to_skip -= 1
+                continue
+            yield record
+            if remaining is not None:
+                remaining -= 1
+                if remaining <= 0:
+                    return
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return self
+
+    def count(self) -> int:
+        return sum(1 for _ in self.execute())
+
+    def get_references(self) -> frozenset[int]:
+        return frozenset(_reference_of(record) for record in self.execute())
+
+    def get_cardinality_estimate(self) -> int:
+        statistics = getattr(self.index, 'statistics', None)
+        rows = statistics.row_count if statistics is not None else self.index.count
+        return rows if self.limit is None else min(rows, self.limit)
+
+    def get_cost_estimate(self) -> float:
+        return 1.0 + (self.skip + self.get_cardinality_estimate()) * 0.05
+
+    def explain(self) -> dict:
+        return {
+            'plan_type': 'OrderedIndexScanPlan',
+            'index_used': self.field,
+            'lookup_type': 'Index order ' + ('ascending' if self.ascending else 'descending'),
+            'query_params': f"skip={self.skip}, limit={self.limit}",
+            'filter': self.filter is not None,
+            'estimated_cardinality': self.get_cardinality_estimate(),
+            'estimated_cost': self.get_cost_estimate(),
+        }
+
+
+class IndexedQueryPlan(QueryPlan):
+    """
+    IndexedQueryPlan is a specialized version of QueryPlan.
+
+    It provides functionality for creating and managing indexed query plans
+    that optimize query execution based on indexed data sources. This class
+    extends the base functionality of QueryPlan to incorporate the use of
+    indices in query operations.
+
+    """
+    indexes: object
+
+    def __init__(
+            self,
+            indexes = None,
+            based_on: QueryPlan = None,
+            atom_pointer: AtomPointer = None,
+            transaction: ObjectTransaction = None,
+            **kwargs):
+        super().__init__(based_on=based_on, atom_pointer=atom_pointer, transaction=transaction, **kwargs)
+        if indexes is None:
+            # Lazy import to avoid circular dependency; only used if someone constructs
+            # an IndexedQueryPlan without providing indexes.
+            from .dictionaries import Dictionary as _Dictionary
+            self.indexes = _Dictionary(transaction=self.transaction)
+        else:
+            self.indexes = indexes
+
+    def execute(self) -> DBCollections:
+        # Delegate execution to the underlying plan; indexes are only metadata for optimization
+        if self.based_on is None:
+            from .lists import List as _List
+            return _List(transaction=self.transaction)
+        return self.based_on.execute()
+
+    def partitions(self, count: int, min_rows: int = 1) -> list | None:
+        # The records of based_on; plans deriving from this one yield records of their own
+        if type(self) is not IndexedQueryPlan or self.based_on is None:
+            return None
+        return self.based_on.partitions(count, min_rows)
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return IndexedQueryPlan(
+            indexes=self.indexes,
+            based_on=self.based_on.optimize() if self.based_on else None,
+            transaction=self.transaction
+        )
+
+    def add_index(self,
+                  field_name: str,
+                  covering: list[str] | None = None) -> IndexedQueryPlan:
+        """
+        Adds an index to the database for optimizing query performance on specified columns. This method
+        creates a new index with the given name on the columns specified in the list. Indexing can
         significantly improve the efficiency of certain queries, particularly for large datasets.
 
         :param field_name: field the index will be created on
+        :param covering: optional fields whose values are stored with every index entry, so
+                         projections, counts and aggregates over them are answered from the index
+                         alone (see CoveringIndex)
         :return: An indexed query plan that contains details of the created index and its application
                  to the underlying query structure.
         :rtype: IndexedQueryPlan
@@ -774,12 +2051,15 @@ class IndexedQueryPlan(QueryPlan):
             return self
 
         # Reindex the current content on the added field
-        from .dictionaries import RepeatedKeysDictionary
-        new_index = RepeatedKeysDictionary(transaction=self.transaction)
+        from .dictionaries import RepeatedKeysDictionary, CoveringIndex
+        if covering:
+            new_index = CoveringIndex(covered_fields=covering, transaction=self.transaction)
+        else:
+            new_index = RepeatedKeysDictionary(transaction=self.transaction)
         for record in self.execute():
-            if record.has(field_name):
+            key = record.get(field_name) if isinstance(record, dict) else getattr(record, field_name, None)
+            if key is not None:
                 # Use native key types (no string conversion)
-                key = record[field_name]
                 new_index = new_index.set_at(key, record)
 
         return IndexedQueryPlan(
@@ -788,6 +2068,252 @@ class IndexedQueryPlan(QueryPlan):
             transaction=self.transaction
         )
 
+    def add_unique_index(self, field_name: str) -> IndexedQueryPlan:
+        """
+        Adds a unique (primary key) index on field_name. Equality queries on this field are
+        answered by a PrimaryKeyLookupPlan.
+
+        :param field_name: field the index will be created on
+        :return: An indexed query plan including the new index
+        :raises ProtoUniqueConstraintException: if two records share a value of field_name
+        """
+        if self.indexes.has(field_name):
+            return self
+
+        from .dictionaries import UniqueIndex
+        new_index = UniqueIndex(field_name=field_name, transaction=self.transaction)
+        for record in self.execute():
+            key = record.get(field_name) if isinstance(record, dict) else getattr(record, field_name, None)
+            if key is not None:
+                new_index = new_index.set_at(key, record)
+
+        return IndexedQueryPlan(
+            indexes=self.indexes.set_at(field_name, new_index),
+            based_on=self.based_on,
+            transaction=self.transaction
+        )
+
+    def get_unique(self, field_name: str, value: object) -> object | None:
+        """
+        Fast path for primary key lookups: the record stored under value in the unique index
+        on field_name, or None.
+        """
+        idx = self.indexes.get_at(field_name) if self.indexes and self.indexes.has(field_name) else None
+        if idx is None:
+            raise ProtoValidationException(message=f'No index on field {field_name}!')
+        return idx.get_at(value)
+
+    def add_bitmap_index(self, field_name: str) -> IndexedQueryPlan:
+        """
+        Adds a bitmap index on field_name, meant for fields with few distinct values. It shares
+        the row ordinals of the other bitmap indexes of this plan, so conjunctions and
+        disjunctions over them are computed with bitmap AND/OR/ANDNOT.
+
+        :param field_name: field the index will be created on
+        :return: An indexed query plan including the new index
+        """
+        if self.indexes.has(field_name):
+            return self
+
+        from .bitmap_index import BitmapIndex
+        for _, index in self.indexes.as_iterable():
+            if isinstance(index, BitmapIndex):
+                new_index = index.sharing_rows(field_name)
+                break
+        else:
+            new_index = BitmapIndex(field_name=field_name, transaction=self.transaction)
+            new_index = new_index.add_records(self.execute())
+
+        return IndexedQueryPlan(
+            indexes=self.indexes.set_at(field_name, new_index),
+            based_on=self.based_on,
+            transaction=self.transaction
+        )
+
+    def add_fulltext_index(self, field_name: str, tokenizer: str = 'word',
+                           normalizer: str = 'casefold') -> IndexedQueryPlan:
+        """
+        Adds a full-text inverted index on the text of field_name. `matches` terms on the field
+        are answered from its posting lists, and search_text ranks records by BM25.
+
+        :param field_name: text field the index will be created on
+        :param tokenizer: name of a registered tokenizer (see fulltext_index.register_tokenizer)
+        :param normalizer: name of a registered token normalizer
+        :return: An indexed query plan including the new index
+        """
+        if self.indexes.has(field_name):
+            return self
+
+        from .fulltext_index import FullTextIndex
+        new_index = FullTextIndex(field_name=field_name, tokenizer=tokenizer, normalizer=normalizer,
+                                  transaction=self.transaction)
+        new_index = new_index.add_records(self.execute())
+
+        return IndexedQueryPlan(
+            indexes=self.indexes.set_at(field_name, new_index),
+            based_on=self.based_on,
+            transaction=self.transaction
+        )
+
+    def search_text(self, field_name: str, text: str, k: int = 10) -> QueryPlan:
+        """
+        BM25-ranked top k records for text, using the full-text index on field_name.
+        """
+        idx = self.indexes.get_at(field_name) if self.indexes and self.indexes.has(field_name) else None
+        if idx is None or not hasattr(idx, 'search_plan'):
+            raise ProtoValidationException(message=f'No full-text index on field {field_name}!')
+        return idx.search_plan(text, k=k)
+
+    def add_geo_index(self, field_name: str) -> IndexedQueryPlan:
+        """
+        Adds a spatial index on the points held in field_name. `WithinBox` and `WithinRadius`
+        terms on the field are answered from it, and nearest finds the closest records.
+
+        :param field_name: field holding (lat, lon) points
+        :return: An indexed query plan including the new index
+        """
+        if self.indexes.has(field_name):
+            return self
+
+        from .geo_index import GeoIndex
+        new_index = GeoIndex.from_records(field_name, self.execute(), transaction=self.transaction)
+
+        return IndexedQueryPlan(
+            indexes=self.indexes.set_at(field_name, new_index),
+            based_on=self.based_on,
+            transaction=self.transaction
+        )
+
+    def nearest(self, field_name: str, lat: float, lon: float, k: int = 10) -> QueryPlan:
+        """
+        The k records closest to (lat, lon), closest first, using the spatial index on field_name.
+        """
+        idx = self.indexes.get_at(field_name) if self.indexes and self.indexes.has(field_name) else None
+        if idx is None or not hasattr(idx, 'nearest_plan'):
+            raise ProtoValidationException(message=f'No spatial index on field {field_name}!')
+        return idx.nearest_plan(lat, lon, k=k)
+
+    def add_composite_index(self, fields: list[str], index_name: str | None = None) -> IndexedQueryPlan:
+        """
+        Adds a composite index keyed by the tuple of values of fields (in order). Queries with
+        equality terms on a prefix of fields, optionally followed by a range term on the next
+        field, are answered by a single scan of this index.
+
+        :param fields: fields of the composite key, most selective equality fields first
+        :param index_name: name to register the index under (defaults to the comma-joined fields)
+        :return: An indexed query plan including the new index
+        :rtype: IndexedQueryPlan
+        """
+        index_name = index_name or ','.join(fields)
+        if self.indexes.has(index_name):
+            return self
+
+        from .dictionaries import CompositeIndex
+        new_index = CompositeIndex(fields=fields, transaction=self.transaction)
+        for record in self.execute():
+            new_index = new_index.add_record(record)
+
+        return IndexedQueryPlan(
+            indexes=self.indexes.set_at(index_name, new_index),
+            based_on=self.based_on,
+            transaction=self.transaction
+        )
+
+    def add_partial_index(self, field_name: str, predicate, index_name: str | None = None) -> IndexedQueryPlan:
+        """
+        Adds an ordered index on field_name holding only the records matching predicate (an
+        Expression, an Expression.compile token list or a LINQ F predicate). Terms on
+        field_name are answered by it only in queries whose filter implies the predicate.
+
+        :param field_name: field the index will be created on
+        :param predicate: condition a record must match to be indexed
+        :param index_name: name to register the index under (defaults to field_name)
+        :return: An indexed query plan including the new index
+        """
+        index_name = index_name or field_name
+        if self.indexes.has(index_name):
+            return self
+
+        from .dictionaries import PartialIndex
+        new_index = PartialIndex(field_name=field_name, predicate=predicate, transaction=self.transaction)
+        for record in self.execute():
+            new_index = new_index.add_record(record)
+
+        return IndexedQueryPlan(
+            indexes=self.indexes.set_at(index_name, new_index),
+            based_on=self.based_on,
+            transaction=self.transaction
+        )
+
+    def add_expression_index(self, expression, index_name: str | None = None) -> IndexedQueryPlan:
+        """
+        Adds an ordered index keyed by a value derived from each record: a derived value text
+        such as 'lower(email)' or a LINQ derived field such as F.email.lower(). Terms naming
+        the identical expression (e.g. F.email.lower() == x) are answered by it.
+
+        :param expression: the derived value to index
+        :param index_name: name to register the index under (defaults to the expression text)
+        :return: An indexed query plan including the new index
+        """
+        expression = getattr(expression, 'fingerprint', expression)
+        if not isinstance(expression, str) or parse_value(expression) is None:
+            raise ProtoValidationException(message=f'{expression!r} is not a derived value expression')
+        expression = canonical_value(expression)
+        index_name = index_name or expression
+        if self.indexes.has(index_name):
+            return self
+
+        from .dictionaries import ExpressionIndex
+        new_index = ExpressionIndex(expression=expression, transaction=self.transaction)
+        for record in self.execute():
+            new_index = new_index.add_record(record)
+
+        return IndexedQueryPlan(
+            indexes=self.indexes.set_at(index_name, new_index),
+            based_on=self.based_on,
+            transaction=self.transaction
+        )
+
+    def analyze(self, field_name: str | None = None) -> IndexedQueryPlan:
+        """
+        Rebuild the statistics of the index on field_name (of every index, when not given).
+        Statistics are also kept up to date as indexes change; analyze refreshes them at once.
+
+        :param field_name: name of the index to analyze
+        :return: An indexed query plan with the refreshed indexes
+        """
+        new_indexes = self.indexes
+        for name, index in self.indexes.as_iterable():
+            if (field_name is None or name == field_name) and hasattr(index, 'analyze'):
+                new_indexes = new_indexes.set_at(name, index.analyze())
+        return IndexedQueryPlan(
+            indexes=new_indexes,
+            based_on=self.based_on,
+            transaction=self.transaction
+        )
+
+    def column_statistics(self, field_name: str):
+        """
+        ColumnStatistics of the index on field_name, or None when it keeps none.
+        """
+        try:
+            index = self.indexes.get_at(field_name) if self.indexes and self.indexes.has(field_name) else None
+        except Exception:
+            return None
+        return getattr(index, 'statistics', None) if index is not None else None
+
+    def estimated_rows(self) -> int | None:
+        """
+        Records of the indexed collection, as counted by the statistics of its indexes (the
+        largest one, as records without a value are not indexed); None when unknown.
+        """
+        rows = None
+        for name, _ in self.indexes.as_iterable() if self.indexes else ():
+            statistics = self.column_statistics(name)
+            if statistics is not None:
+                rows = max(rows or 0, statistics.row_count)
+        return rows
+
     def update_indexes_on_remove(self, removed_record: Atom) -> IndexedQueryPlan:
         """
         Update indexes when specific data is removed from a collection or database.
@@ -804,10 +2330,7 @@ class IndexedQueryPlan(QueryPlan):
         """
         new_indexes = self.indexes
         for field_name, index in self.indexes.as_iterable():
-            # index is expected to support remove_record_at(key, record)
-            if removed_record[field_name]:
-                key = removed_record[field_name]
-                new_indexes.set_at(field_name, index.remove_record_at(key, removed_record))
+            new_indexes = new_indexes.set_at(field_name, index.remove_record(removed_record, field_name))
 
         return IndexedQueryPlan(
             indexes=new_indexes,
@@ -831,10 +2354,7 @@ class IndexedQueryPlan(QueryPlan):
         """
         new_indexes = self.indexes
         for field_name, index in self.indexes.as_iterable():
-            index = cast(RepeatedKeysDictionary, index)
-            if added_record[field_name]:
-                key = added_record[field_name]
-                new_indexes.set_at(field_name, index.set_at(key, added_record))
+            new_indexes = new_indexes.set_at(field_name, index.add_record(added_record, field_name))
 
         return IndexedQueryPlan(
             indexes=new_indexes,
@@ -842,66 +2362,51 @@ class IndexedQueryPlan(QueryPlan):
             transaction=self.transaction
         )
 
+    def update_indexes_on_update(self, old_record: Atom, new_record: Atom) -> IndexedQueryPlan:
+        """
+        Updates the indexes after old_record was replaced by new_record. Records leave or enter
+        partial indexes when the update changes whether they match their predicate.
+
+        :param old_record: the record before the update.
+        :param new_record: the record after the update.
+        :return: The updated IndexedQueryPlan.
+        :rtype: IndexedQueryPlan
+        """
+        return self.update_indexes_on_remove(old_record).update_indexes_on_add(new_record)
+
     def position_at(self, field_name: str, value) -> int:
         self._load()
 
         if self.indexes and self.indexes.has(field_name):
-            idx_dict = cast(Dictionary, self.indexes.get_at(field_name))
+            idx_dict = cast('Dictionary', self.indexes.get_at(field_name))
             if idx_dict is None:
                 return 0
 
-            def _ok(v):
-                # use same ordering as DictionaryItem
-                from .dictionaries import DictionaryItem as _DI
-                return _DI._order_key(v)
-
-            left = 0
-            right = idx_dict.content.count - 1
-            target_ok = _ok(value)
-
-            while left <= right:
-                center = (left + right) // 2
-
-                item = idx_dict.content.get_at(center)
-                if item is None:
-                    break
-                item_ok = _ok(item.key)
-                if item_ok == target_ok and item.key == value:
-                    return center
-
-                if item_ok > target_ok:
-                    right = center - 1
-                else:
-                    left = center + 1
-
-            return left
+            # Single descent of the key-ordered index: exact offset or insertion point
+            return idx_dict._locate(value)[0]
         else:
             raise ProtoValidationException(
                 message=f'No index on field {field_name}!'
             )
 
     def yield_from_index(self, field_name: str, index: int) -> list:
-        idx_dict = cast(Dictionary, self.indexes.get_at(field_name))
+        idx_dict = cast('Dictionary', self.indexes.get_at(field_name))
         if idx_dict is None:
             return
-        while index < idx_dict.content.count:
-            item = cast(DictionaryItem, idx_dict.content.get_at(index))
-            index += 1
+        for item in idx_dict.items_from(index):
             if item is None:
                 continue
-            value_set = cast(Set, item.value)
+            value_set = cast('Set', item.value)
             for record in value_set.as_iterable():
                 yield record
 
     def get_greater_than(self, field_name: str, value: object) -> list:
-        idx_dict = cast(Dictionary, self.indexes.get_at(field_name))
+        idx_dict = cast('Dictionary', self.indexes.get_at(field_name))
         if idx_dict is None:
             return []
-        index = self.position_at(field_name, value)
-        if index < idx_dict.content.count:
-            item = cast(DictionaryItem, idx_dict.content.get_at(index))
-            if item and item.key == value:
-                index += 1
+        index, item = idx_dict._locate(value)
+        if item is not None:
+            index += 1
         return self.yield_from_index(field_name, index)
 
     def get_greater_or_equal_than(self, field_name: str, value: object) -> list:
@@ -927,16 +2432,17 @@ class IndexedQueryPlan(QueryPlan):
             )
 
     def yield_up_to_index(self, field_name: str, index_up_to: int) -> list:
-        idx_dict = cast(Dictionary, self.indexes.get_at(field_name))
+        idx_dict = cast('Dictionary', self.indexes.get_at(field_name))
         if idx_dict is None:
             return
         index = 0
-        while index < idx_dict.content.count and index < index_up_to:
-            item = cast(DictionaryItem, idx_dict.content.get_at(index))
+        for item in idx_dict.items_from(0):
+            if index >= index_up_to:
+                break
             index += 1
             if item is None:
                 continue
-            value_set = cast(Set, item.value)
+            value_set = cast('Set', item.value)
             for record in value_set.as_iterable():
                 yield record
 
@@ -952,12 +2458,10 @@ class IndexedQueryPlan(QueryPlan):
         idx_dict = self.indexes.get_at(field_name)
         if idx_dict is None:
             return []
-        index = self.position_at(field_name, value)
+        index, item = idx_dict._locate(value)
         # Inclusive: if exact match at position, include it by advancing one
-        if index < idx_dict.content.count:
-            item = cast(DictionaryItem, idx_dict.content.get_at(index))
-            if item and item.key == value:
-                index += 1
+        if item is not None:
+            index += 1
         return self.yield_up_to_index(field_name, index)
 
     def get_range(self, field_name: str, lo: object, hi: object, include_lower: bool, include_upper: bool):
@@ -973,49 +2477,8 @@ class IndexedQueryPlan(QueryPlan):
         if idx_dict is None:
             return
 
-        from .dictionaries import DictionaryItem as _DI
-        def _ok(v):
-            return _DI._order_key(v)
-
-        count = idx_dict.content.count
-        # Binary search lower bound position
-        left, right = 0, count - 1
-        target_ok = _ok(lo)
-        pos = 0
-        while left <= right:
-            center = (left + right) // 2
-            item = cast(DictionaryItem, idx_dict.content.get_at(center))
-            if item is None:
-                break
-            iok = _ok(item.key)
-            if iok >= target_ok:
-                right = center - 1
-                pos = center
-            else:
-                left = center + 1
-        # Adjust for exclusivity on lower bound
-        if pos < count:
-            item = cast(DictionaryItem, idx_dict.content.get_at(pos))
-            if item is not None:
-                if not include_lower and item.key == lo:
-                    pos += 1
-
-        # Sequential scan until upper bound
-        i = pos
-        hi_ok = _ok(hi)
-        while i < count:
-            item = cast(DictionaryItem, idx_dict.content.set_at(i))
-            i += 1
-            if item is None:
-                continue
-            key_ok = _ok(item.key)
-            # Stop if beyond upper bound (respect inclusivity)
-            if key_ok > hi_ok or (key_ok == hi_ok and not include_upper and item.key == hi):
-                break
-            # Skip items below lower bound (in case of edge adjustments)
-            if key_ok < target_ok or (key_ok == target_ok and not include_lower and item.key == lo):
-                continue
-            value_set = cast(Set, item.value)
+        for item in range_items(idx_dict, lo, hi, include_lower, include_upper):
+            value_set = cast('Set', item.value)
             for record in value_set.as_iterable():
                 yield record
 
@@ -1090,7 +2553,7 @@ class IndexedSearchPlan(IndexedQueryPlan):
         """
         try:
             if isinstance(self.operator, Equal) and self.indexes and self.indexes.has(self.field_to_scan):
-                idx_dict = cast(Dictionary, self.indexes.get_at(self.field_to_scan))
+                idx_dict = cast('Dictionary', self.indexes.get_at(self.field_to_scan))
                 if idx_dict is None:
                     return 0
                 # Try native-key lookup by using get_at for direct access
@@ -1103,6 +2566,11 @@ class IndexedSearchPlan(IndexedQueryPlan):
             pass
         return sum(1 for _ in self.execute())
 
+    def exists(self) -> bool:
+        if isinstance(self.operator, Equal):
+            return self.count() > 0
+        return super().exists()
+
     def get_references(self) -> frozenset[int]:
         """
         Return a frozenset of stable references (preferably AtomPointer.hash()) for records
@@ -1112,7 +2580,7 @@ class IndexedSearchPlan(IndexedQueryPlan):
         try:
             if not (self.indexes and self.indexes.has(self.field_to_scan)):
                 return frozenset()
-            idx_dict = cast(Dictionary, self.indexes.get_at(self.field_to_scan))
+            idx_dict = cast('Dictionary', self.indexes.get_at(self.field_to_scan))
             if idx_dict is None:
                 return frozenset()
 
@@ -1141,35 +2609,130 @@ class IndexedSearchPlan(IndexedQueryPlan):
         """
         try:
             if isinstance(self.operator, Equal) and self.indexes and self.indexes.has(self.field_to_scan):
-                idx_dict = cast(Dictionary, self.indexes.get_at(self.field_to_scan))
+                idx_dict = cast('Dictionary', self.indexes.get_at(self.field_to_scan))
                 if idx_dict is None:
                     return 0
                 value_set = idx_dict.get_at(self.value)
                 return int(value_set.count) if value_set is not None else 0
+            statistics = self.column_statistics(self.field_to_scan)
+            if statistics is not None:
+                estimate = _estimate_term_rows(statistics, Term(self.field_to_scan, self.operator, self.value))
+                if estimate is not None:
+                    return int(round(estimate))
+        except Exception:
+            pass
+        # Fallback to base class heuristic
+        return super().get_cardinality_estimate()
+
+    def get_cost_estimate(self) -> float:
+        """
+        Equality lookup on an index is very cheap.
+        """
+        return 1.0
+
+    def explain(self) -> dict:
+        # Detailed explain for indexed equality lookup
+        return {
+            'plan_type': 'IndexedSearchPlan',
+            'index_used': self.field_to_scan,
+            'lookup_type': 'Exact (Equality)',
+            'value': self.value,
+            'estimated_cardinality': self.get_cardinality_estimate(),
+            'estimated_cost': self.get_cost_estimate(),
+        }
+
+
+
+class PrimaryKeyLookupPlan(IndexedQueryPlan):
+    """
+    Point lookup on a unique index: yields the single record stored under value, if any.
+
+    Residual filters from the rest of a conjunction are checked on that record only, so no
+    candidate sets, intersections or intermediate collections are built.
+    """
+    field_to_scan: str
+    value: object
+    residual_filters: list[Expression] | None
+
+    def __init__(self,
+                 field_to_scan: str,
+                 value: object = None,
+                 residual_filters: list[Expression] | None = None,
+                 indexes: Dictionary = None,
+                 based_on: QueryPlan = None,
+                 atom_pointer: AtomPointer = None,
+                 transaction: ObjectTransaction = None,
+                 **kwargs):
+        super().__init__(indexes=indexes, based_on=based_on, atom_pointer=atom_pointer, transaction=transaction,
+                         **kwargs)
+        if not field_to_scan:
+            raise ProtoValidationException(
+                message=f'The field to scan should be specified!'
+            )
+        self.field_to_scan = field_to_scan
+        self.value = value
+        self.residual_filters = residual_filters or []
+
+    def lookup(self) -> object | None:
+        """
+        The matching record, or None.
+        """
+        if not (self.indexes and self.indexes.has(self.field_to_scan)):
+            return None
+        idx = self.indexes.get_at(self.field_to_scan)
+        record = idx.get_at(self.value) if idx is not None else None
+        if record is None:
+            return None
+        for expr in self.residual_filters:
+            try:
+                if not expr.predicate()(record):
+                    return None
+            except Exception:
+                return None
+        return record
+
+    def execute(self):
+        record = self.lookup()
+        return (record,) if record is not None else ()
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return self
+
+    def count(self) -> int:
+        return 0 if self.lookup() is None else 1
+
+    def get_references(self) -> frozenset[int]:
+        record = self.lookup()
+        if record is None:
+            return frozenset()
+        try:
+            if isinstance(record, Atom) and getattr(record, 'atom_pointer', None):
+                return frozenset((record.atom_pointer.hash(),))
         except Exception:
             pass
-        # Fallback to base class heuristic
-        return super().get_cardinality_estimate()
+        try:
+            return frozenset((record.hash(),))
+        except Exception:
+            return frozenset((hash(record),))
+
+    def get_cardinality_estimate(self) -> int:
+        return self.count()
 
     def get_cost_estimate(self) -> float:
-        """
-        Equality lookup on an index is very cheap.
-        """
-        return 1.0
+        return 0.5
 
     def explain(self) -> dict:
-        # Detailed explain for indexed equality lookup
         return {
-            'plan_type': 'IndexedSearchPlan',
+            'plan_type': 'PrimaryKeyLookupPlan',
             'index_used': self.field_to_scan,
-            'lookup_type': 'Exact (Equality)',
+            'lookup_type': 'Unique (Primary Key)',
             'value': self.value,
+            'residual_filters': [str(expr) for expr in self.residual_filters],
             'estimated_cardinality': self.get_cardinality_estimate(),
             'estimated_cost': self.get_cost_estimate(),
         }
 
 
-
 class OrMerge(QueryPlan):
     or_queries: list[QueryPlan]
 
@@ -1186,11 +2749,19 @@ class OrMerge(QueryPlan):
         """
         Execute all sub-queries and yield the concatenated union of results without de-duplication.
         De-duplication is responsibility of count() or higher-level consumers when needed.
+        Bitmap scans over aligned indexes are OR-ed first, which yields each record once.
         """
+        if BitmapScanPlan.combinable(self.or_queries):
+            yield from self.or_queries[0].index.records_of(self._bitmap())
+            return
         for q in self.or_queries:
             for rec in q.execute():
                 yield rec
 
+    def _bitmap(self):
+        from .bitmap_index import RoaringBitmap
+        return RoaringBitmap.union_all(q.bitmap() for q in self.or_queries)
+
     def optimize(self, *args, **kwargs) -> QueryPlan:
         return OrMerge(
             or_queries=[q.optimize() for q in self.or_queries],
@@ -1200,56 +2771,29 @@ class OrMerge(QueryPlan):
 
     def count(self) -> int:
         """
-        Count unique records across sub-queries.
-        Prefer fast path with get_references()/keys_iterator() when available; otherwise fall back to hashing
-        materialized items from execute().
+        Count unique records across sub-queries, as the union of their references.
         """
-        # Try fast path using get_references when present
+        if BitmapScanPlan.combinable(self.or_queries):
+            return len(self._bitmap())
         uniq: set[int] = set()
-        any_fast = False
         for q in self.or_queries:
-            if hasattr(q, 'get_references'):
-                try:
-                    refs = getattr(q, 'get_references')()
-                    if refs:
-                        any_fast = True
-                        uniq.update(refs)
-                        continue
-                except Exception:
-                    pass
-            # Try keys_iterator if defined
-            if hasattr(q, 'keys_iterator'):
-                try:
-                    for k in q.keys_iterator():
-                        uniq.add(hash(k))
-                    any_fast = True
-                    continue
-                except Exception:
-                    pass
-        if any_fast:
-            return len(uniq)
-        # Fallback: materialize and hash
-        def _ref_of(rec) -> int:
-            try:
-                if isinstance(rec, Atom) and getattr(rec, 'atom_pointer', None):
-                    return rec.atom_pointer.hash()
-            except Exception:
-                pass
-            try:
-                return rec.hash()
-            except Exception:
-                return hash(rec)
-        for rec in self.execute():
-            try:
-                uniq.add(_ref_of(rec))
-            except Exception:
-                continue
+            uniq.update(_plan_references(q))
         return len(uniq)
 
+    def exists(self) -> bool:
+        # The first sub-query with a match answers
+        return any(q.exists() for q in self.or_queries)
+
+    def get_cardinality_estimate(self) -> int:
+        return sum(int(q.get_cardinality_estimate()) for q in self.or_queries)
+
+    def _explain_children(self) -> list[tuple[str, list[QueryPlan]]]:
+        return [('child_plans', list(self.or_queries or []))]
+
     def explain(self) -> dict:
         return {
             'plan_type': 'OrMerge',
-            'strategy': 'Union of index plans',
+            'strategy': 'Bitmap OR' if BitmapScanPlan.combinable(self.or_queries) else 'Union of index plans',
             'child_plans': [q.explain() for q in (self.or_queries or [])]
         }
 
@@ -1264,10 +2808,13 @@ class AndMerge(QueryPlan):
                  transaction: ObjectTransaction = None,
                  atom_pointer: AtomPointer = None,
                  residual_filters: list[Expression] | None = None,
+                 parallel: ParallelConfig | None = None,
                  **kwargs):
         super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
         self.and_queries = and_queries
         self.residual_filters = residual_filters or []
+        # Check the residual filters on the workers of this configuration
+        self.parallel = parallel
 
     def execute(self) -> list:
         """
@@ -1275,127 +2822,127 @@ class AndMerge(QueryPlan):
         Each sub-plan is asked for get_references(); if unavailable, we fallback to hashing
         materialized records. After computing the intersection, we materialize only from the
         smallest contributing sub-plan and yield records whose reference is in the intersection.
-        Residual filters (non-indexable terms) are applied at the end to the few remaining records.
+        Residual filters (non-indexable terms) are applied at the end to the few remaining records,
+        on the workers of self.parallel when there are many of them.
         """
         if not self.and_queries:
             return
-        # Collect reference sets and keep a plan to materialize from
-        ref_sets: list[tuple[frozenset[int], QueryPlan]] = []
+        parallel = self.parallel if self.residual_filters else None
+        matches_residual = self._residual_predicate()
+        if BitmapScanPlan.combinable(self.and_queries):
+            index = self.and_queries[0].index
+            yield from _matching_in_parallel(index.records_of(self._bitmap()), matches_residual, parallel)
+            return
+        intersected = self._intersection()
+        if intersected is None:
+            return
+        intersection, base_plan = intersected
+
+        def in_intersection(rec) -> bool:
+            try:
+                return _reference_of(rec) in intersection
+            except Exception:
+                return False
+
+        # Materialize minimally: iterate the smallest plan and filter by intersection
+        candidates = filter(in_intersection, base_plan.execute())
+        yield from _matching_in_parallel(candidates, matches_residual, parallel)
+
+    def _intersection(self) -> tuple[set[int], QueryPlan] | None:
+        """
+        References common to all sub-queries, with the sub-query that had the fewest of them
+        (to materialize from); None when the intersection is empty.
+        """
+        ref_sets = []
         for q in self.and_queries:
-            refs: frozenset[int] | None = None
-            if hasattr(q, 'get_references'):
-                try:
-                    refs = cast(frozenset[int], getattr(q, 'get_references')())
-                except Exception:
-                    refs = None
-            if refs is None or len(refs) == 0:
-                # Fallback: derive refs from materialized records (less efficient)
-                hset: set[int] = set()
-                try:
-                    for rec in q.execute():
-                        try:
-                            if isinstance(rec, Atom) and getattr(rec, 'atom_pointer', None):
-                                hset.add(rec.atom_pointer.hash())
-                            else:
-                                try:
-                                    hset.add(rec.hash())
-                                except Exception:
-                                    hset.add(hash(rec))
-                        except Exception:
-                            continue
-                    refs = frozenset(hset)
-                except Exception:
-                    refs = frozenset()
+            refs = _plan_references(q)
+            # Early exit if any is empty
+            if not refs:
+                return None
             ref_sets.append((refs, q))
 
-        # Early exit if any is empty
-        if any(len(rs[0]) == 0 for rs in ref_sets):
-            return
-
         # Sort by ascending size for efficient intersection
         ref_sets.sort(key=lambda t: len(t[0]))
         base_refs, base_plan = ref_sets[0]
         intersection = set(base_refs)
-        for rs, _ in ref_sets[1:]:
-            intersection.intersection_update(rs)
+        for refs, _ in ref_sets[1:]:
+            intersection.intersection_update(refs)
             if not intersection:
-                return
+                return None
+        return intersection, base_plan
 
-        # Materialize minimally: iterate the smallest plan and filter by intersection
-        def _ref_of(rec) -> int:
-            try:
-                if isinstance(rec, Atom) and getattr(rec, 'atom_pointer', None):
-                    return rec.atom_pointer.hash()
-            except Exception:
-                pass
-            try:
-                return rec.hash()
-            except Exception:
-                return hash(rec)
+    def _bitmap(self):
+        """
+        AND of the bitmap scans; complemented scans are removed with ANDNOT instead.
+        """
+        from .bitmap_index import RoaringBitmap
+        positive = [q.bitmap() for q in self.and_queries if not q.negated]
+        excluded = RoaringBitmap.union_all(q.values_bitmap() for q in self.and_queries if q.negated)
+        result = RoaringBitmap.intersect_all(positive) if positive else self.and_queries[0].index.all_rows()
+        return result - excluded if excluded else result
 
-        def _matches_residual(rec) -> bool:
-            if not self.residual_filters:
-                return True
+    def _residual_predicate(self):
+        """
+        The residual filters as one function of a record (records failing to be checked
+        do not match).
+        """
+        check = _chain_predicates([_predicate_of(expr) for expr in self.residual_filters or []], on_match=False)
+
+        def matches(rec) -> bool:
             try:
-                for expr in self.residual_filters:
-                    if not expr.match(rec):
-                        return False
-                return True
+                return check(rec)
             except Exception:
                 return False
+        return matches
 
-        for rec in base_plan.execute():
-            try:
-                if _ref_of(rec) in intersection and _matches_residual(rec):
-                    yield rec
-            except Exception:
-                continue
+    def get_cardinality_estimate(self) -> int:
+        """
+        Bounded by the most selective sub-query.
+        """
+        if not self.and_queries:
+            return 0
+        return min(int(q.get_cardinality_estimate()) for q in self.and_queries)
+
+    def _explain_children(self) -> list[tuple[str, list[QueryPlan]]]:
+        return [('child_plans', list(self.and_queries or []))]
 
     def explain(self) -> dict:
-        return {
+        node = {
             'plan_type': 'AndMerge',
-            'strategy': 'Intersecting sorted index plans',
+            'strategy': 'Bitmap AND/ANDNOT' if BitmapScanPlan.combinable(self.and_queries)
+            else 'Intersecting sorted index plans',
             'child_plans': [q.explain() for q in (self.and_queries or [])],
             'residual_filters': [str(expr) for expr in (self.residual_filters or [])]
         }
+        if self.parallel is not None and self.residual_filters:
+            node['parallel_workers'] = self.parallel.max_workers
+        return node
 
     def optimize(self, *args, **kwargs) -> QueryPlan:
         return AndMerge(
             and_queries=self.and_queries,
             based_on=self.based_on.optimize() if self.based_on else None,
-            transaction=self.transaction
+            transaction=self.transaction,
+            residual_filters=self.residual_filters,
+            parallel=self.parallel
         )
 
     def count(self) -> int:
         """
-        Calculates the count of the intersection of sub-queries.
-        It optimizes by iterating the smaller result set and checking for
-        existence in the larger one, without materializing full objects.
+        Calculates the count of the intersection of sub-queries, from their references.
+        Bitmap scans are counted from the combined bitmap, without loading records. Records
+        are only read to check residual filters.
         """
         if not self.and_queries:
             return 0
-
-        # Optimize sub-queries first
-        optimized_queries = [q.optimize() for q in self.and_queries]
-
-        # Get iterators of IDs, not full objects
-        id_iterators = [q.keys_iterator() for q in optimized_queries]
-
-        # Sort by potential size (if a count() method is available)
-        id_iterators.sort(key=lambda it: it.count() if hasattr(it, 'count') else float('inf'))
-
-        # Use the smallest set as the base for iteration
-        base_ids = set(id_iterators[0])
-        if not base_ids:
-            return 0
-
-        # Intersect with the other sets
-        for other_iterator in id_iterators[1:]:
-            base_ids.intersection_update(other_iterator)
-            if not base_ids:
-                return 0
-
-        return len(base_ids)
+        if BitmapScanPlan.combinable(self.and_queries):
+            if not self.residual_filters:
+                return len(self._bitmap())
+            return sum(1 for _ in self.execute())
+        if self.residual_filters:
+            return sum(1 for _ in self.execute())
+        intersected = self._intersection()
+        return len(intersected[0]) if intersected is not None else 0
 
 
 class IndexedRangeSearchPlan(IndexedQueryPlan):
@@ -1439,12 +2986,38 @@ class IndexedRangeSearchPlan(IndexedQueryPlan):
         )
 
     def count(self) -> int:
+        """
+        Counted from the positions of the bounds in the index and the sizes of its buckets;
+        no record is loaded.
+        """
+        if self.indexes and self.indexes.has(self.field_to_scan):
+            idx_dict = self.indexes.get_at(self.field_to_scan)
+            if idx_dict is None:
+                return 0
+            return range_count(idx_dict, self.lo, self.hi, self.include_lower, self.include_upper)
         return sum(1 for _ in self.execute())
 
+    def exists(self) -> bool:
+        if self.indexes and self.indexes.has(self.field_to_scan):
+            idx_dict = self.indexes.get_at(self.field_to_scan)
+            if idx_dict is None:
+                return False
+            # Stops at the first key in range
+            for _ in range_items(idx_dict, self.lo, self.hi, self.include_lower, self.include_upper):
+                return True
+            return False
+        return super().exists()
+
     def get_cardinality_estimate(self) -> int:
         """
-        Heuristic estimate for range scans. Use 25% of based_on count when available; otherwise a small constant.
+        Estimate from the histogram of the index when it keeps statistics. Otherwise, a
+        heuristic: 25% of based_on count when available, or a small constant.
         """
+        statistics = self.column_statistics(self.field_to_scan)
+        if statistics is not None:
+            estimate = statistics.estimate_range(self.lo, self.hi, self.include_lower, self.include_upper)
+            if estimate is not None:
+                return int(round(estimate))
         try:
             if getattr(self, 'based_on', None) is not None:
                 total = int(self.based_on.count())
@@ -1472,14 +3045,10 @@ class IndexedRangeSearchPlan(IndexedQueryPlan):
         try:
             if not (self.indexes and self.indexes.has(self.field_to_scan)):
                 return frozenset()
-            idx_dict = cast(Dictionary, self.indexes.get_at(self.field_to_scan))
+            idx_dict = cast('Dictionary', self.indexes.get_at(self.field_to_scan))
             if idx_dict is None:
                 return frozenset()
 
-            from .dictionaries import DictionaryItem as _DI
-            def _ok(v):
-                return _DI._order_key(v)
-
             def _ref_of(rec) -> int:
                 try:
                     if isinstance(rec, Atom) and getattr(rec, 'atom_pointer', None):
@@ -1491,59 +3060,297 @@ class IndexedRangeSearchPlan(IndexedQueryPlan):
                 except Exception:
                     return hash(rec)
 
-            count = idx_dict.content.count
-            left, right = 0, count - 1
-            lo_ok = _ok(self.lo)
-            pos = 0
-            while left <= right:
-                center = (left + right) // 2
-                item = cast(DictionaryItem, idx_dict.content.get_at(center))
-                if item is None:
-                    break
-                iok = _ok(item.key)
-                if iok >= lo_ok:
-                    right = center - 1
-                    pos = center
-                else:
-                    left = center + 1
-            # Adjust exclusivity for lower bound
-            if pos < count:
-                it = cast(DictionaryItem, idx_dict.content.get_at(pos))
-                if it is not None and not self.include_lower and it.key == self.lo:
-                    pos += 1
-
-            hi_ok = _ok(self.hi)
-            i = pos
-            while i < count:
-                it = cast(DictionaryItem, idx_dict.content.get_at(i))
-                i += 1
-                if it is None:
-                    continue
-                key_ok = _ok(it.key)
-                if key_ok > hi_ok or (key_ok == hi_ok and not self.include_upper and it.key == self.hi):
-                    break
-                if key_ok < lo_ok or (key_ok == lo_ok and not self.include_lower and it.key == self.lo):
-                    continue
-                value_set = cast(Set, it.value)
-                for rec in value_set.as_iterable():
-                    refs.add(_ref_of(rec))
-            return frozenset(refs)
-        except Exception:
-            return frozenset()
+            for it in range_items(idx_dict, self.lo, self.hi, self.include_lower, self.include_upper):
+                value_set = cast('Set', it.value)
+                for rec in value_set.as_iterable():
+                    refs.add(_ref_of(rec))
+            return frozenset(refs)
+        except Exception:
+            return frozenset()
+
+    def explain(self) -> dict:
+        # Build inclusive/exclusive range string
+        lb = '[' if self.include_lower else '('
+        ub = ']' if self.include_upper else ')'
+        lo = '-inf' if self.lo is None else self.lo
+        hi = 'inf' if self.hi is None else self.hi
+        rng = f"{lb}{lo}, {hi}{ub}"
+        return {
+            'plan_type': 'IndexedRangeSearchPlan',
+            'index_used': self.field_to_scan,
+            'lookup_type': 'Range Scan',
+            'range': rng,
+            'estimated_cardinality': self.get_cardinality_estimate(),
+            'estimated_cost': self.get_cost_estimate(),
+        }
+
+
+class CompositeIndexScanPlan(IndexedQueryPlan):
+    """
+    Single range scan over a CompositeIndex: the keys starting with `prefix` whose next
+    component lies within [lo, hi] (an open side is None), with bound inclusivity flags.
+    """
+    index_name: str
+    prefix: tuple
+    lo: object
+    hi: object
+    include_lower: bool
+    include_upper: bool
+
+    def __init__(self, index_name: str, prefix: tuple = (), lo=None, hi=None,
+                 include_lower: bool = True, include_upper: bool = True,
+                 indexes: Dictionary = None, based_on: QueryPlan = None,
+                 atom_pointer: AtomPointer = None, transaction: ObjectTransaction = None, **kwargs):
+        super().__init__(indexes=indexes, based_on=based_on, atom_pointer=atom_pointer, transaction=transaction, **kwargs)
+        self.index_name = index_name
+        self.prefix = tuple(prefix)
+        self.lo = lo
+        self.hi = hi
+        self.include_lower = include_lower
+        self.include_upper = include_upper
+
+    def _scan_items(self, limit: int | None = None):
+        """
+        Yield the index items within the scanned key range, in key order.
+        """
+        if not (self.indexes and self.indexes.has(self.index_name)):
+            return
+        idx_dict = cast('Dictionary', self.indexes.get_at(self.index_name))
+        if idx_dict is None:
+            return
+
+        from .dictionaries import DictionaryItem as _DI
+        width = len(self.prefix)
+        prefix_ok = tuple(_DI._order_key(v) for v in self.prefix)
+        lo_ok = _DI._order_key(self.lo) if self.lo is not None else None
+        hi_ok = _DI._order_key(self.hi) if self.hi is not None else None
+        start = self.prefix + (self.lo,) if self.lo is not None else self.prefix
+
+        # One descent to the first key of the range, then an in-order walk until it is left
+        scanned = 0
+        for item in idx_dict.items_from(idx_dict.lower_bound(start)):
+            if item is None:
+                continue
+            key_ok = item._key_order()
+            if key_ok[0] != 'tuple' or key_ok[1][:width] != prefix_ok:
+                break
+            if width < len(key_ok[1]):
+                part = key_ok[1][width]
+                if lo_ok is not None and (part < lo_ok or (part == lo_ok and not self.include_lower)):
+                    continue
+                if hi_ok is not None and (part > hi_ok or (part == hi_ok and not self.include_upper)):
+                    break
+            yield item
+            scanned += 1
+            if limit is not None and scanned >= limit:
+                return
+
+    def execute(self):
+        for item in self._scan_items():
+            value_set = cast('Set', item.value)
+            for record in value_set.as_iterable():
+                yield record
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return CompositeIndexScanPlan(
+            index_name=self.index_name,
+            prefix=self.prefix,
+            lo=self.lo,
+            hi=self.hi,
+            include_lower=self.include_lower,
+            include_upper=self.include_upper,
+            indexes=self.indexes,
+            based_on=self.based_on.optimize() if self.based_on else None,
+            transaction=self.transaction
+        )
+
+    def count(self) -> int:
+        return sum(cast('Set', item.value).count for item in self._scan_items())
+
+    def get_cardinality_estimate(self) -> int:
+        """
+        Bucket sizes of the first keys in range; scans of many keys are capped and extrapolated
+        as a large result.
+        """
+        limit = 64
+        total = 0
+        keys = 0
+        try:
+            for item in self._scan_items(limit=limit + 1):
+                keys += 1
+                if keys > limit:
+                    return total * 4
+                total += cast('Set', item.value).count
+        except Exception:
+            return super().get_cardinality_estimate()
+        return total
+
+    def get_cost_estimate(self) -> float:
+        return 1.0 + self.get_cardinality_estimate() * 0.1
+
+    def get_references(self) -> frozenset[int]:
+        def _ref_of(rec) -> int:
+            try:
+                if isinstance(rec, Atom) and getattr(rec, 'atom_pointer', None):
+                    return rec.atom_pointer.hash()
+            except Exception:
+                pass
+            try:
+                return rec.hash()
+            except Exception:
+                return hash(rec)
+
+        try:
+            return frozenset(_ref_of(rec) for rec in self.execute())
+        except Exception:
+            return frozenset()
+
+    def explain(self) -> dict:
+        node = {
+            'plan_type': 'CompositeIndexScanPlan',
+            'index_used': self.index_name,
+            'lookup_type': 'Prefix Range Scan' if self.lo is not None or self.hi is not None else 'Prefix Scan',
+            'prefix': list(self.prefix),
+            'estimated_cardinality': self.get_cardinality_estimate(),
+            'estimated_cost': self.get_cost_estimate(),
+        }
+        try:
+            idx = self.indexes.get_at(self.index_name)
+            node['fields'] = list(getattr(idx, 'fields', ()))
+        except Exception:
+            pass
+        if self.lo is not None or self.hi is not None:
+            lb = '[' if self.include_lower else '('
+            ub = ']' if self.include_upper else ')'
+            lo = '-inf' if self.lo is None else self.lo
+            hi = 'inf' if self.hi is None else self.hi
+            node['range'] = f"{lb}{lo}, {hi}{ub}"
+        return node
+
+
+class CoveredRow:
+    """
+    Projection of a record read from a covering index; covered fields are plain attributes.
+    """
+
+    def __init__(self, values: dict):
+        self.__dict__.update(values)
+
+    def get(self, name: str, default=None):
+        return self.__dict__.get(name, default)
+
+    def __repr__(self):
+        return f'CoveredRow({self.__dict__!r})'
+
+
+class CoveringIndexScanPlan(IndexedQueryPlan):
+    """
+    Answers an indexed equality or range lookup from a CoveringIndex alone: yields the covered
+    values of the matching records without loading the records themselves.
+
+    `fields` maps output names to source fields, each either covered by the index or the
+    indexed field itself. Rows are dicts (as SelectPlan produces), or CoveredRow objects when
+    `as_rows` is set.
+    """
+    source: QueryPlan
+    fields: dict
+    as_rows: bool
+
+    def __init__(self, source: QueryPlan, fields: dict[str, str] = None, as_rows: bool = False,
+                 atom_pointer: AtomPointer = None, transaction: ObjectTransaction = None, **kwargs):
+        super().__init__(indexes=source.indexes, based_on=None, atom_pointer=atom_pointer,
+                         transaction=transaction or source.transaction, **kwargs)
+        self.source = source
+        self.fields = dict(fields or {})
+        self.as_rows = as_rows
+
+    @staticmethod
+    def covering_index_of(plan: QueryPlan):
+        """
+        The CoveringIndex behind an index equality/range plan, or None.
+        """
+        if not (isinstance(plan, IndexedSearchPlan) and isinstance(plan.operator, Equal)) and \
+                not isinstance(plan, IndexedRangeSearchPlan):
+            return None
+        try:
+            from .dictionaries import CoveringIndex
+            idx = plan.indexes.get_at(plan.field_to_scan) if plan.indexes.has(plan.field_to_scan) else None
+        except Exception:
+            return None
+        return idx if isinstance(idx, CoveringIndex) else None
+
+    @classmethod
+    def covers(cls, plan: QueryPlan, source_fields) -> bool:
+        """
+        Whether plan is answered by a covering index holding every one of source_fields.
+        """
+        idx = cls.covering_index_of(plan)
+        if idx is None:
+            return False
+        available = set(idx.covered_fields) | {plan.field_to_scan}
+        return all(isinstance(field, str) and field in available for field in source_fields)
+
+    def _matching_keys(self, idx):
+        source = self.source
+        if isinstance(source, IndexedSearchPlan):
+            item = idx._locate(source.value)[1]
+            if item is not None:
+                yield item.key
+            return
+        # Same walk as IndexedQueryPlan.get_range, over keys only
+        for item in range_items(idx, source.lo, source.hi, source.include_lower, source.include_upper):
+            yield item.key
+
+    def _buckets(self):
+        idx = self.covering_index_of(self.source)
+        if idx is None:
+            return
+        for key in self._matching_keys(idx):
+            bucket = idx.projections_at(key)
+            if bucket is not None:
+                yield idx, key, bucket
+
+    def execute(self):
+        positions = None
+        for idx, key, bucket in self._buckets():
+            if positions is None:
+                covered = {field: i for i, field in enumerate(idx.covered_fields)}
+                positions = [(output, covered.get(source_field)) for output, source_field in self.fields.items()]
+            for _, values in bucket.as_iterable():
+                row = {}
+                for output, position in positions:
+                    # Fields not stored with the entry are the indexed key itself
+                    value = key if position is None else values[position]
+                    if value is not None:
+                        row[output] = value
+                yield CoveredRow(row) if self.as_rows else row
+
+    def optimize(self, *args, **kwargs) -> QueryPlan:
+        return self
+
+    def count(self) -> int:
+        return sum(bucket.count for _, _, bucket in self._buckets())
+
+    def get_cardinality_estimate(self) -> int:
+        return self.count()
+
+    def get_cost_estimate(self) -> float:
+        return 1.0 + self.get_cardinality_estimate() * 0.01
 
     def explain(self) -> dict:
-        # Build inclusive/exclusive range string
-        lb = '[' if self.include_lower else '('
-        ub = ']' if self.include_upper else ')'
-        rng = f"{lb}{self.lo}, {self.hi}{ub}"
-        return {
-            'plan_type': 'IndexedRangeSearchPlan',
-            'index_used': self.field_to_scan,
-            'lookup_type': 'Range Scan',
-            'range': rng,
+        node = {
+            'plan_type': 'CoveringIndexScanPlan',
+            'index_used': getattr(self.source, 'field_to_scan', None),
+            'strategy': 'Index-only scan (covered fields are read from the index; records are not loaded)',
+            'covering': True,
+            'projected_fields': list(self.fields.values()),
             'estimated_cardinality': self.get_cardinality_estimate(),
-            'estimated_cost': self.get_cost_estimate(),
         }
+        try:
+            node['source_plan'] = self.source.explain()
+        except Exception:
+            pass
+        return node
 
 
 class FromPlan(IndexedQueryPlan):
@@ -1570,16 +3377,25 @@ class FromPlan(IndexedQueryPlan):
 
     def execute(self) -> list:
         for item in self.based_on.execute():
-            result = DBObject(
-                transaction=self.transaction
-            )
-            if self.alias:
-                result = result.set_at(self.alias, item)
-            else:
-                for field_name, value in item.__dict__.items():
-                    if not field_name.startswith('_') and not callable(value):
-                        result = result.set_at(field_name, value)
-            yield result
+            yield self._wrap(item)
+
+    def _wrap(self, item) -> DBObject:
+        result = DBObject(
+            transaction=self.transaction
+        )
+        if self.alias:
+            result = result.set_at(self.alias, item)
+        else:
+            for field_name, value in item.__dict__.items():
+                if not field_name.startswith('_') and not callable(value):
+                    result = result.set_at(field_name, value)
+        return result
+
+    def partitions(self, count: int, min_rows: int = 1) -> list | None:
+        parts = self.based_on.partitions(count, min_rows) if self.based_on is not None else None
+        if parts is None:
+            return None
+        return [lambda part=part: map(self._wrap, part()) for part in parts]
 
     def optimize(self, *args, **kwargs) -> QueryPlan:
         return FromPlan(
@@ -1603,13 +3419,27 @@ class JoinPlan(QueryPlan):
     - 'external_right': right-only plus cartesian product
     - 'outer': only side-only elements (no combining)
 
-    Matching heuristic for inner/left/right::
+    With left_key and right_key (attribute paths on the rows of each side), inner, left and
+    right joins pair rows whose keys are equal, with one of these strategies (chosen by
+    optimize() unless given):
+
+    - 'hash': the side with fewer estimated rows is loaded in a hash table by key, the
+      other one is streamed against it
+    - 'merge': both sides are read once, in key order; it needs both sides sorted by key,
+      as an ascending OrderedIndexScanPlan on the key is
+    - 'index': index nested loop; every row of the driving side looks its key up in an
+      index of the other side, which must be an IndexedQueryPlan with an index on its key
+
+    Otherwise, the matching heuristic for inner/left/right::
 
       If left has field "{right_alias}_id" and right has field "id":
         left.{right_alias}_id == right.id
       Else if left has field "id" and right has field "{left_alias}_id":
         left.id == right.{left_alias}_id
       Otherwise, no match.
+
+    Inner joins stream their driving side and keep only the other one in memory. optimize()
+    picks the side with more estimated rows as the driving side.
     """
 
     def __init__(self,
@@ -1618,10 +3448,26 @@ class JoinPlan(QueryPlan):
                  based_on: QueryPlan = None,
                  transaction: ObjectTransaction = None,
                  atom_pointer: AtomPointer = None,
+                 driving_side: str = 'left',
+                 left_key: str | None = None,
+                 right_key: str | None = None,
+                 strategy: str | None = None,
                  **kwargs):
         super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
         self.join_query = join_query
         self.join_type = (join_type or 'inner').lower()
+        self.driving_side = driving_side
+        if (left_key is None) != (right_key is None):
+            raise ProtoValidationException(
+                message='Both left_key and right_key should be given!'
+            )
+        if strategy not in (None, 'hash', 'merge', 'index'):
+            raise ProtoValidationException(
+                message=f'Unknown join strategy {strategy}!'
+            )
+        self.left_key = left_key
+        self.right_key = right_key
+        self.strategy = strategy
 
     def _detect_alias(self, plan: QueryPlan, sample_record: DBObject | None) -> str | None:
         # Prefer alias from FromPlan
@@ -1662,28 +3508,231 @@ class JoinPlan(QueryPlan):
             pass
         return False
 
-    def _copy_public_attrs(self, target: DBObject, source: DBObject) -> DBObject:
-        for k, v in source.__dict__.items():
-            if not k.startswith('_') and not callable(v):
-                target = target.set_at(k, v)
-        return target
+    @staticmethod
+    def _public_attrs(source) -> dict:
+        if isinstance(source, dict):
+            items = source.items()
+        else:
+            if isinstance(source, Atom):
+                source._load()
+            items = getattr(source, '__dict__', None)
+            if items is None:
+                items = {name: getattr(source, name, None) for name in getattr(type(source), '__slots__', ())}
+            items = items.items()
+        return {k: v for k, v in items
+                if not k.startswith('_') and k not in ('transaction', 'atom_pointer') and not callable(v)}
 
     def _combine(self, left: DBObject | None, right: DBObject | None) -> DBObject:
-        res = DBObject(transaction=self.transaction)
+        # The attributes of both sides are gathered first, so the row is built once
+        fields = {}
         if left is not None:
-            res = self._copy_public_attrs(res, left)
+            fields.update(self._public_attrs(left))
         if right is not None:
-            res = self._copy_public_attrs(res, right)
-        return res
+            fields.update(self._public_attrs(right))
+        return DBObject(transaction=self.transaction, **fields)
+
+    def _keyed(self) -> bool:
+        return self.left_key is not None and self.join_type in ('inner', 'left', 'right')
+
+    def _driving_side(self) -> str:
+        # Outer joins are driven by the side all of whose rows are kept
+        if self.join_type in ('left', 'right'):
+            return self.join_type
+        return self.driving_side
+
+    def _sides(self) -> tuple:
+        """
+        (driving plan, driving key, other plan, other key, whether the right side drives).
+        """
+        if self._driving_side() == 'right':
+            return self.join_query, self.right_key, self.based_on, self.left_key, True
+        return self.based_on, self.left_key, self.join_query, self.right_key, False
+
+    def _pair(self, driving, other, drive_right: bool) -> DBObject:
+        return self._combine(other, driving) if drive_right else self._combine(driving, other)
+
+    @staticmethod
+    def _lookup_index(plan: QueryPlan | None, key: str):
+        """
+        Index on key of plan, when plan yields every record its indexes hold. Only a plain
+        ordered index or a unique index maps every value of key to all the records having it;
+        partial, full-text, bitmap or geo indexes registered under key do not.
+        """
+        from .dictionaries import RepeatedKeysDictionary, UniqueIndex
+        if type(plan) is not IndexedQueryPlan or not plan.indexes:
+            return None
+        try:
+            index = plan.indexes.get_at(key) if plan.indexes.has(key) else None
+        except Exception:
+            return None
+        return index if type(index) in (RepeatedKeysDictionary, UniqueIndex) else None
+
+    @staticmethod
+    def _sorted_by(plan: QueryPlan | None) -> str | None:
+        if isinstance(plan, OrderedIndexScanPlan) and plan.ascending:
+            return plan.field
+        return None
+
+    def _hash_join(self):
+        """
+        Hash join: the other side is loaded in a table by key, the driving side is streamed.
+        """
+        driving_plan, driving_key, other_plan, other_key, drive_right = self._sides()
+        if driving_plan is None:
+            return
+        table: dict = {}
+        for row in (other_plan.execute() if other_plan is not None else []):
+            key = _resolve_path(row, other_key)
+            if key is not None:
+                table.setdefault(key, []).append(row)
+        keep_unmatched = self.join_type != 'inner'
+        if not table and not keep_unmatched:
+            return
+        for row in driving_plan.execute():
+            key = _resolve_path(row, driving_key)
+            matches = table.get(key) if key is not None else None
+            if matches:
+                for other in matches:
+                    yield self._pair(row, other, drive_right)
+            elif keep_unmatched:
+                yield self._pair(row, None, drive_right)
+
+    def _index_join(self):
+        """
+        Index nested loop: every driving row looks its key up in the index of the other side.
+        """
+        driving_plan, driving_key, other_plan, other_key, drive_right = self._sides()
+        index = self._lookup_index(other_plan, other_key)
+        if index is None:
+            raise ProtoValidationException(
+                message=f'No index on {other_key} for an index join!'
+            )
+        from .sets import Set as _Set
+        keep_unmatched = self.join_type != 'inner'
+        for row in driving_plan.execute():
+            key = _resolve_path(row, driving_key)
+            found = index.get_at(key) if key is not None else None
+            if isinstance(found, (_Set, DBCollections)):
+                found = found.as_iterable()
+            elif found is not None:
+                # Unique indexes hold the record itself
+                found = (found,)
+            matched = False
+            for other in found or ():
+                matched = True
+                yield self._pair(row, other, drive_right)
+            if not matched and keep_unmatched:
+                yield self._pair(row, None, drive_right)
+
+    @staticmethod
+    def _key_groups(plan: QueryPlan | None, key: str):
+        """
+        (order key, rows) for each run of rows of plan with the same key; rows without a key
+        come alone, with None. Raises ProtoValidationException if keys go backwards.
+        """
+        from .dictionaries import DictionaryItem as _DI
+        current, rows = None, []
+        for row in (plan.execute() if plan is not None else []):
+            value = _resolve_path(row, key)
+            if value is None:
+                yield None, [row]
+                continue
+            order = _DI._order_key(value)
+            if rows and order == current:
+                rows.append(row)
+                continue
+            if rows:
+                if order < current:
+                    raise ProtoValidationException(
+                        message=f'Merge join input is not sorted by {key}!'
+                    )
+                yield current, rows
+            current, rows = order, [row]
+        if rows:
+            yield current, rows
+
+    def _merge_join(self):
+        """
+        Merge join of two inputs sorted by key: both are read once, run by run.
+        """
+        keep_left = self.join_type == 'left'
+        keep_right = self.join_type == 'right'
+        lefts = self._key_groups(self.based_on, self.left_key)
+        rights = self._key_groups(self.join_query, self.right_key)
+        left, right = next(lefts, None), next(rights, None)
+        while left is not None or right is not None:
+            if left is not None and (left[0] is None or right is None or
+                                     (right[0] is not None and left[0] < right[0])):
+                if keep_left:
+                    for row in left[1]:
+                        yield self._combine(row, None)
+                left = next(lefts, None)
+            elif right is not None and (right[0] is None or left is None or right[0] < left[0]):
+                if keep_right:
+                    for row in right[1]:
+                        yield self._combine(None, row)
+                right = next(rights, None)
+            else:
+                for lrow in left[1]:
+                    for rrow in right[1]:
+                        yield self._combine(lrow, rrow)
+                left, right = next(lefts, None), next(rights, None)
+
+    def _inner_join(self):
+        """
+        Inner join streaming the driving side against the materialized other side.
+        """
+        drive_right = self.driving_side == 'right'
+        driving_plan, held_plan = (self.join_query, self.based_on) if drive_right else (self.based_on, self.join_query)
+        held = list(held_plan.execute()) if held_plan else []
+        if not held or driving_plan is None:
+            return
+        driving = iter(driving_plan.execute())
+        first = next(driving, None)
+        if first is None:
+            return
+        held_alias = self._detect_alias(held_plan, held[0])
+        driving_alias = self._detect_alias(driving_plan, first)
+
+        def _rows():
+            yield first
+            yield from driving
+
+        for d in _rows():
+            for h in held:
+                if drive_right:
+                    if self._match(h, d, held_alias, driving_alias):
+                        yield self._combine(h, d)
+                elif self._match(d, h, driving_alias, held_alias):
+                    yield self._combine(d, h)
+
+    def _chosen_strategy(self) -> str:
+        if not self._keyed():
+            return 'nested_loop'
+        return self.strategy or 'hash'
 
     def execute(self):
+        jt = self.join_type
+        strategy = self._chosen_strategy()
+        if strategy == 'hash':
+            yield from self._hash_join()
+            return
+        if strategy == 'merge':
+            yield from self._merge_join()
+            return
+        if strategy == 'index':
+            yield from self._index_join()
+            return
+        if jt == 'inner':
+            yield from self._inner_join()
+            return
+
         left_list = list(self.based_on.execute()) if self.based_on else []
         right_list = list(self.join_query.execute()) if self.join_query else []
 
         la = self._detect_alias(self.based_on, left_list[0] if left_list else None)
         ra = self._detect_alias(self.join_query, right_list[0] if right_list else None)
 
-        jt = self.join_type
         if jt == 'outer':
             # Only side-only, no combined pairs
             for l in left_list:
@@ -1707,14 +3756,7 @@ class JoinPlan(QueryPlan):
                     yield self._combine(None, r)
             return
 
-        # inner/left/right using match
-        if jt == 'inner':
-            for l in left_list:
-                for r in right_list:
-                    if self._match(l, r, la, ra):
-                        yield self._combine(l, r)
-            return
-
+        # left/right using match
         if jt == 'left':
             for l in left_list:
                 matched = False
@@ -1744,19 +3786,82 @@ class JoinPlan(QueryPlan):
                     yield self._combine(l, r)
 
     def optimize(self, *args, **kwargs) -> QueryPlan:
+        join_query = self.join_query.optimize() if self.join_query else None
+        based_on = self.based_on.optimize() if self.based_on else None
+        driving_side = 'left'
+        estimates = {'left': None, 'right': None}
+        if join_query is not None and based_on is not None:
+            try:
+                estimates = {'left': int(based_on.get_cardinality_estimate()),
+                             'right': int(join_query.get_cardinality_estimate())}
+                if estimates['right'] > estimates['left']:
+                    driving_side = 'right'
+            except Exception:
+                pass
+        strategy = self.strategy
+        if strategy is None and self._keyed():
+            strategy = 'hash'
+            if self._sorted_by(based_on) == self.left_key and self._sorted_by(join_query) == self.right_key:
+                strategy = 'merge'
+            # An index on the other side pays off when the driving side is not the larger one
+            sides = [self.join_type] if self.join_type in ('left', 'right') else \
+                sorted(('left', 'right'), key=lambda side: estimates[side] or 0)
+            for side in sides:
+                other, other_key = (join_query, self.right_key) if side == 'left' else (based_on, self.left_key)
+                other_side = 'right' if side == 'left' else 'left'
+                if self._lookup_index(other, other_key) is not None and \
+                        (estimates[side] or 0) <= (estimates[other_side] or 0):
+                    strategy, driving_side = 'index', side
+                    break
         return JoinPlan(
-            join_query=self.join_query.optimize() if self.join_query else None,
+            join_query=join_query,
             join_type=self.join_type,
-            based_on=self.based_on.optimize() if self.based_on else None,
-            transaction=self.transaction
+            based_on=based_on,
+            transaction=self.transaction,
+            driving_side=driving_side,
+            left_key=self.left_key,
+            right_key=self.right_key,
+            strategy=strategy
         )
 
+    def get_cardinality_estimate(self) -> int:
+        """
+        Inner joins on an id are taken to yield about one row per row of the larger side.
+        """
+        left = int(self.based_on.get_cardinality_estimate()) if self.based_on else 0
+        right = int(self.join_query.get_cardinality_estimate()) if self.join_query else 0
+        if self.join_type == 'inner':
+            return max(left, right) if left and right else 0
+        return left + right
+
+    def _explain_children(self) -> list[tuple[str, list[QueryPlan]]]:
+        return super()._explain_children() + ([('join_plan', [self.join_query])] if self.join_query else [])
+
+    def explain(self) -> dict:
+        node = super().explain()
+        node['join_type'] = self.join_type
+        strategy = self._chosen_strategy()
+        node['strategy'] = strategy
+        if self._keyed():
+            node['join_keys'] = [self.left_key, self.right_key]
+        if strategy == 'hash':
+            node['build_side'] = 'left' if self._driving_side() == 'right' else 'right'
+        if self.join_type == 'inner' or strategy == 'index':
+            node['driving_side'] = self._driving_side()
+        if self.join_query is not None:
+            try:
+                node['join_plan'] = self.join_query.explain()
+            except Exception:
+                node['join_plan'] = {'plan_type': type(self.join_query).__name__}
+        return node
+
 
 class RecursivePlan(QueryPlan):
     """
     Executes a recursive traversal starting from the records produced by `based_on`.
     It supports 'up' (single reference attribute) and 'down' (iterable attribute) directions
-    and DFS or BFS strategies. Returns results as a List collection for efficient slicing.
+    and DFS or BFS strategies. Nodes are streamed as the traversal reaches them (see
+    ResultStream), so a consumer taking a few of them stops the traversal there.
     """
     def __init__(self,
                  based_on: QueryPlan,
@@ -1775,11 +3880,12 @@ class RecursivePlan(QueryPlan):
         self.strategy = (strategy or 'dfs').lower()
         self.include_start_node = bool(include_start_node)
 
-    def execute(self) -> DBCollections:
-        # Build a materialized List of results
-        from .lists import List as _List
+    def execute(self) -> ResultStream:
+        # Nodes are yielded as they are reached
+        return ResultStream(self._traverse, transaction=self.transaction)
+
+    def _traverse(self):
         from .common import canonical_hash as _canonical_hash
-        res = _List(transaction=self.transaction)
 
         # Gather start nodes by iterating the base plan directly (avoid assuming as_iterable)
         start_nodes: list = []
@@ -1818,7 +3924,7 @@ class RecursivePlan(QueryPlan):
                         visited.add(h)
                 except Exception:
                     pass
-                res = res.append_last(n)
+                yield n
 
         # Traverse
         while work:
@@ -1852,17 +3958,15 @@ class RecursivePlan(QueryPlan):
                     h = _canonical_hash(nn)
                 except Exception:
                     # If we cannot hash, still emit and continue traversal (best-effort)
-                    res = res.append_last(nn)
+                    yield nn
                     push_fn((nn, depth + 1))
                     continue
                 if h in visited:
                     continue
                 visited.add(h)
-                res = res.append_last(nn)
+                yield nn
                 push_fn((nn, depth + 1))
 
-        return res
-
     def optimize(self) -> 'QueryPlan':
         # Optimize the base plan; if changed, return a new RecursivePlan with optimized base
         optimized_base = self.based_on.optimize() if self.based_on else None
@@ -1890,6 +3994,46 @@ class RecursivePlan(QueryPlan):
         return node
 
 
+def _matching_records(records, match):
+    for rec in records:
+        try:
+            matched = match(rec)
+        except Exception:
+            # Ignore records that error during matching
+            continue
+        if matched:
+            yield rec
+
+
+def _parallel_parts(plan: QueryPlan | None, config: ParallelConfig | None) -> list | None:
+    """
+    Partitions of plan's records to process on the workers of config, or None to run it
+    sequentially. There are several partitions per worker, so idle workers can steal them.
+    """
+    if config is None or config.max_workers <= 1 or plan is None:
+        return None
+    parts = plan.partitions(config.max_workers * 4, min_rows=config.min_chunk_size)
+    return parts if parts is not None and len(parts) > 1 else None
+
+
+def _matching_in_parallel(records, matches, config: ParallelConfig | None):
+    """
+    The records passing matches, in order. With config, the records are collected and
+    checked in partitions on its workers, when there are enough of them to split.
+    """
+    if config is None:
+        yield from filter(matches, records)
+        return
+    rows = list(records)
+    parts = _parallel_parts(ListPlan(base_list=rows), config)
+    if parts is None:
+        yield from filter(matches, rows)
+        return
+    tasks = [lambda part=part: list(filter(matches, part())) for part in parts]
+    for matched in map_partitions(tasks, config=config):
+        yield from matched
+
+
 class WherePlan(QueryPlan):
     """
     Query plan for filtering records based on an expression.
@@ -1910,40 +4054,44 @@ class WherePlan(QueryPlan):
                  based_on: QueryPlan = None,
                  transaction: ObjectTransaction = None,
                  atom_pointer: AtomPointer = None,
+                 parallel: ParallelConfig | None = None,
                  **kwargs):
         super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
         if isinstance(filter_spec, list):
             self.filter = Expression.compile(filter_spec)
         else:
             self.filter = filter
+        # Scan partitions of a large input on the workers of this configuration (by default,
+        # the one of the environment; see default_parallel_config)
+        self.parallel = parallel if parallel is not None else default_parallel_config()
 
-    def execute(self) -> DBCollections:
+    def execute(self) -> ResultStream:
         """
-        Execute the filtering logic over the input records and return a DBCollections.
-        This implementation performs a linear scan over the base records applying the filter,
-        and materializes the result into a List to enable slicing/pagination.
+        Execute the filtering logic over the input records, as a linear scan applying the
+        filter. Matching records are streamed: the scan only advances as they are pulled, so
+        a consumer that needs a few of them stops it early. to_list() of the result gives a
+        List, for slicing or pagination.
         """
-        from .lists import List as _List
-        res = _List(transaction=self.transaction)
-        # Prefer direct Python list if based_on is a ListPlan (common in tests)
-        try:
-            from .queries import ListPlan as _ListPlan
-            if isinstance(self.based_on, _ListPlan):
-                iterable = self.based_on.base_list
-            else:
-                base_coll = self.based_on.execute() if self.based_on else _List(transaction=self.transaction)
-                iterable = base_coll.as_iterable()
-        except Exception:
-            base_coll = self.based_on.execute() if self.based_on else _List(transaction=self.transaction)
-            iterable = base_coll.as_iterable()
-        for rec in iterable:
-            try:
-                if self.filter.match(rec):
-                    res = res.append_last(rec)
-            except Exception:
-                # Ignore records that error during matching
-                continue
-        return res
+        return ResultStream(self._matching, transaction=self.transaction)
+
+    def _matching(self):
+        if self.based_on is None:
+            return
+        match = self.filter.predicate()
+        parts = _parallel_parts(self.based_on, self.parallel)
+        if parts is not None:
+            tasks = [lambda part=part: list(_matching_records(part(), match)) for part in parts]
+            for records in map_partitions(tasks, config=self.parallel):
+                yield from records
+            return
+        yield from _matching_records(self.based_on.execute(), match)
+
+    def partitions(self, count: int, min_rows: int = 1) -> list | None:
+        parts = self.based_on.partitions(count, min_rows) if self.based_on is not None else None
+        if parts is None:
+            return None
+        match = self.filter.predicate()
+        return [lambda part=part: _matching_records(part(), match) for part in parts]
 
     def explain(self) -> dict:
         # Fallback explanation when WherePlan is not optimized into an index-backed plan
@@ -1953,6 +4101,8 @@ class WherePlan(QueryPlan):
             'reason': 'No suitable index found for the filter expression.',
             'filter': str(getattr(self, 'filter', None))
         }
+        if getattr(self, 'parallel', None) is not None:
+            node['parallel_workers'] = self.parallel.max_workers
         try:
             if getattr(self, 'based_on', None) is not None:
                 node['source_plan'] = self.based_on.explain()
@@ -1960,6 +4110,54 @@ class WherePlan(QueryPlan):
             pass
         return node
 
+    def get_cardinality_estimate(self) -> int:
+        """
+        Rows of the source times the selectivity of the filter, from the statistics of the
+        indexes of the source when available.
+        """
+        base = self.based_on
+        if base is None:
+            return 0
+        rows = base.estimated_rows() if isinstance(base, IndexedQueryPlan) else None
+        if rows is None:
+            rows = base.get_cardinality_estimate()
+        return int(round(rows * self._selectivity(self.filter, base)))
+
+    @staticmethod
+    def _selectivity(expr: Expression, base: QueryPlan | None) -> float:
+        """
+        Fraction of the records of base expected to match expr. Terms are estimated from the
+        statistics of the index on their field, or assumed from their operator; terms are
+        taken as independent.
+        """
+        if isinstance(expr, AndExpression):
+            result = 1.0
+            for term in expr.terms:
+                result *= WherePlan._selectivity(term, base)
+            return result
+        if isinstance(expr, OrExpression):
+            missed = 1.0
+            for term in expr.terms:
+                missed *= 1.0 - WherePlan._selectivity(term, base)
+            return 1.0 - missed
+        if isinstance(expr, NotExpression):
+            return 1.0 - WherePlan._selectivity(expr.negated_expression, base)
+        if not isinstance(expr, Term):
+            return 1.0
+        if isinstance(expr.operation, str):
+            try:
+                expr = Term(expr.target_attribute, Operator.get_operator(expr.operation), expr.value)
+            except Exception:
+                return 0.5
+        if isinstance(base, IndexedQueryPlan):
+            statistics = base.column_statistics(expr.target_attribute)
+            rows = base.estimated_rows()
+            if statistics is not None and rows:
+                estimate = _estimate_term_rows(statistics, expr)
+                if estimate is not None:
+                    return min(1.0, estimate / rows)
+        return _DEFAULT_SELECTIVITY.get(type(expr.operation), 0.5)
+
     def optimize(self, *args, **kwargs) -> 'QueryPlan':
         """
         Cooperative optimization: delegate term planning to QueryableIndex.
@@ -2015,22 +4213,29 @@ class WherePlan(QueryPlan):
         index_plans: list[QueryPlan] = []
         residual_filters: list[Expression] = []
         built_plans: list[QueryPlan | None] = []
+        planned_terms: list[tuple[QueryPlan, Term]] = []
+
+        # Conjunctions with an equality term on a unique index resolve to at most one record:
+        # look it up directly and check the remaining terms on it
+        if not isinstance(flt, OrExpression):
+            pk_plan = self._plan_primary_key(terms, indexes)
+            if pk_plan is not None:
+                return pk_plan
+
+        # Conjunctions: a composite index matching a prefix of its fields answers several terms
+        # with one range scan; the rest of the terms are planned one by one below
+        if not isinstance(flt, OrExpression):
+            composite_plan, covered = self._plan_composite(terms, indexes, context)
+            if composite_plan is not None:
+                index_plans.append(composite_plan)
+                terms = [t for t in terms if not any(t is c for c in covered)]
+
         for expr in terms:
             if not isinstance(expr, Term):
                 residual_filters.append(expr)
                 continue
-            field = expr.target_attribute
-            try:
-                has_idx = indexes.has(field)
-            except Exception:
-                has_idx = False
-            if not has_idx:
-                residual_filters.append(expr)
-                continue
-            try:
-                idx = indexes.get_at(field)
-            except Exception:
-                idx = None
+            # Within an OR, a term only implies itself
+            idx = self._term_index(expr, indexes, expr if isinstance(flt, OrExpression) else flt)
             if idx is None or not isinstance(idx, QueryableIndex):
                 residual_filters.append(expr)
                 continue
@@ -2041,12 +4246,15 @@ class WherePlan(QueryPlan):
             built_plans.append(plan)
             if plan is not None:
                 index_plans.append(plan)
+                planned_terms.append((plan, expr))
             else:
                 residual_filters.append(expr)
 
         # 4) If no index-backed plans, decide fallback based on filter type
         if not index_plans:
             self.based_on = base_plan
+            if isinstance(flt, AndExpression):
+                self.filter = self._reorder_and_expression(flt)
             return self
 
         # 5) If the original filter was a single Term and we have a single plan and no residuals → return it directly
@@ -2063,10 +4271,20 @@ class WherePlan(QueryPlan):
                 return self
 
         # 7) AND-path: order by estimated cardinality (more selective first)
+        estimates: dict[int, int] = {}
         try:
-            index_plans.sort(key=lambda p: int(p.get_cardinality_estimate()))
+            for plan in index_plans:
+                estimates[id(plan)] = int(plan.get_cardinality_estimate())
+            index_plans.sort(key=lambda p: estimates[id(p)])
         except Exception:
-            pass
+            estimates = {}
+
+        # Index vs. scan: unselective index terms are checked on the rows of the driving plan
+        if estimates:
+            index_plans, demoted = self._demote_unselective(index_plans, planned_terms, estimates, base_plan)
+            residual_filters.extend(demoted)
+        if len(residual_filters) > 1:
+            residual_filters = self._reorder_and_expression(AndExpression(terms=residual_filters)).terms
 
         # 8) If exactly one index plan and no residuals, return the plan directly
         if len(index_plans) == 1 and not residual_filters:
@@ -2078,15 +4296,133 @@ class WherePlan(QueryPlan):
             residual_filters=residual_filters,
             based_on=base_plan,
             transaction=self.transaction,
+            parallel=self.parallel,
         )
 
+    @staticmethod
+    def _term_index(term: Term, indexes, condition: Expression):
+        """
+        Index to answer term with, in a query filtered by condition: the index registered under
+        the field of term, else a partial or expression index on that field registered under
+        its own name. Partial indexes are only used when condition implies their predicate,
+        expression indexes when term names their very expression.
+        """
+        from .dictionaries import ExpressionIndex, PartialIndex
+        field = canonical_value(term.target_attribute)
+        try:
+            idx = indexes.get_at(field) if indexes.has(field) else None
+        except Exception:
+            idx = None
+        if idx is not None and (not isinstance(idx, PartialIndex) or idx.applies_to(field, condition)):
+            return idx
+        try:
+            entries = list(indexes.items() if isinstance(indexes, dict) else indexes.as_iterable())
+        except Exception:
+            return None
+        for name, candidate in entries:
+            if name != field and isinstance(candidate, (PartialIndex, ExpressionIndex)) and \
+                    candidate.applies_to(field, condition):
+                return candidate
+        return None
+
+    @staticmethod
+    def _demote_unselective(index_plans: list[QueryPlan], planned_terms: list[tuple[QueryPlan, Term]],
+                            estimates: dict[int, int], base_plan: IndexedQueryPlan) -> tuple[list, list]:
+        """
+        Split the index plans of a conjunction (most selective first) into the plans to
+        intersect and the terms to check as residual filters: those of ordered index scans
+        expected to select more than INDEX_SCAN_SELECTIVITY of the rows. Checking them on the
+        few rows of the driving plan is cheaper than collecting their references.
+
+        :return: (kept plans, demoted terms)
+        """
+        rows = base_plan.estimated_rows()
+        if not rows or len(index_plans) < 2 or BitmapScanPlan.combinable(index_plans):
+            return index_plans, []
+        limit = INDEX_SCAN_SELECTIVITY * rows
+        terms = {id(plan): expr for plan, expr in planned_terms}
+        kept, demoted = [index_plans[0]], []
+        for plan in index_plans[1:]:
+            expr = terms.get(id(plan))
+            if expr is not None and isinstance(plan, (IndexedSearchPlan, IndexedRangeSearchPlan)) \
+                    and estimates[id(plan)] > limit:
+                demoted.append(expr)
+            else:
+                kept.append(plan)
+        return kept, demoted
+
+    def _plan_primary_key(self, terms: list[Expression], indexes) -> QueryPlan | None:
+        """
+        PrimaryKeyLookupPlan for the first equality term over a unique index, with every other
+        term as a residual filter; None when there is no such term.
+        """
+        try:
+            from .dictionaries import UniqueIndex
+        except Exception:
+            return None
+        for expr in terms:
+            if not isinstance(expr, Term) or not isinstance(expr.operation, Equal):
+                continue
+            try:
+                idx = indexes.get_at(expr.target_attribute) if indexes.has(expr.target_attribute) else None
+            except Exception:
+                idx = None
+            if not isinstance(idx, UniqueIndex):
+                continue
+            value = expr.value.string if isinstance(expr.value, Literal) else expr.value
+            return PrimaryKeyLookupPlan(
+                field_to_scan=expr.target_attribute,
+                value=value,
+                residual_filters=[t for t in terms if t is not expr],
+                indexes=indexes,
+                transaction=self.transaction,
+            )
+        return None
+
+    @staticmethod
+    def _plan_composite(terms: list[Expression], indexes, context: QueryContext) -> tuple[QueryPlan | None, list]:
+        """
+        Pick the composite index answering the most terms.
+
+        A composite index is only used when it answers at least two terms, or a single term
+        with no index of its own.
+
+        :return: (plan, covered terms), or (None, []) when no composite index applies
+        """
+        try:
+            from .dictionaries import CompositeIndex
+            entries = list(indexes.items() if isinstance(indexes, dict) else indexes.as_iterable())
+        except Exception:
+            return None, []
+        best = None
+        for name, idx in entries:
+            if not isinstance(idx, CompositeIndex):
+                continue
+            try:
+                built = idx.build_prefix_plan(name, terms, context)
+            except Exception:
+                built = None
+            if built is not None and (best is None or len(built[1]) > len(best[1])):
+                best = built
+        if best is None:
+            return None, []
+        plan, covered = best
+        if len(covered) < 2:
+            try:
+                if indexes.has(covered[0].target_attribute) and \
+                        not isinstance(indexes.get_at(covered[0].target_attribute), CompositeIndex):
+                    return None, []
+            except Exception:
+                pass
+        return plan, covered
+
     def _reorder_and_expression(self, and_expression: 'AndExpression') -> 'AndExpression':
         """
-        Sorts terms within an AndExpression based on a cost heuristic.
+        Sorts terms within an AndExpression by estimated selectivity.
 
-        The goal is to place less expensive and more selective terms at the
-        beginning of the terms list. This allows the execution engine to
-        reject non-matching records as early as possible.
+        The goal is to place the most selective terms at the beginning of the
+        terms list. This allows the execution engine to reject non-matching
+        records as early as possible.
 
         Args:
             and_expression: The AndExpression instance to reorder.
@@ -2094,22 +4430,8 @@ class WherePlan(QueryPlan):
         Returns:
             A new AndExpression with the terms sorted according to the cost model.
         """
-
-        def get_term_cost(term):
-            """
-            Calculates a cost for a filter term. A lower cost is better.
-            This heuristic can be expanded to include index availability,
-            cardinality estimates, etc.
-            """
-            # Simple heuristic: equality checks are generally cheaper and more
-            # selective than other operations.
-            if isinstance(term, Term) and term.operation in ['==', 'eq']:
-                # A check on an indexed field would ideally have a cost of 0.
-                return 1
-            return 10  # Represents a higher cost for other operations.
-
-        # Sort the terms, placing the lowest-cost terms first.
-        sorted_terms = sorted(and_expression.terms, key=get_term_cost)
+        base = self.based_on
+        sorted_terms = sorted(and_expression.terms, key=lambda term: self._selectivity(term, base))
         return AndExpression(terms=sorted_terms)
 
 
@@ -2213,6 +4535,61 @@ class AgreggatorSpec:
         self.target_field = target_field
 
 
+def _aggregate_steps(agreggator: AgreggatorFunction) -> tuple:
+    """
+    (start, add, merge, finish) folding the values of a group for agreggator, as GroupByPlan
+    aggregates them: add(state, value, record) takes one more record, merge(state, other) the
+    state of a later part of the group. Sums, averages, counts, minimums and maximums are kept
+    as running values; other aggregators collect the values to compute over all of them.
+    """
+    kind = type(agreggator)
+    if kind is SumAgreggator:
+        return (lambda: 0.0, lambda total, value, record: total + (0 if value is None else value),
+                lambda total, other: total + other, lambda total: total)
+    if kind is AvgAggregator:
+        def add_to_average(state, value, record):
+            state[0] += 0 if value is None else value
+            state[1] += 1
+            return state
+
+        def merge_averages(state, other):
+            state[0] += other[0]
+            state[1] += other[1]
+            return state
+        return (lambda: [0.0, 0], add_to_average, merge_averages,
+                lambda state: state[0] / state[1] if state[1] > 0 else 0.0)
+    if kind is CountAggregator:
+        return lambda: 0, lambda n, value, record: n + 1, lambda n, other: n + other, lambda n: n
+    if kind in (MinAgreggator, MaxAgreggator):
+        if kind is MinAgreggator:
+            def better(value, current):
+                return value is not None and (current is None or value < current)
+        else:
+            def better(value, current):
+                return value is not None and (current is None or value > current)
+        return (lambda: None, lambda current, value, record: value if better(value, current) else current,
+                lambda current, other: other if better(other, current) else current, lambda current: current)
+
+    if isinstance(agreggator, CountAggregator):
+        def collect(values, value, record):
+            values.append(record)
+            return values
+    elif isinstance(agreggator, (MinAgreggator, MaxAgreggator)):
+        def collect(values, value, record):
+            if value is not None:
+                values.append(value)
+            return values
+    else:
+        def collect(values, value, record):
+            values.append(0 if value is None else value)
+            return values
+
+    def merge_values(values, other):
+        values.extend(other)
+        return values
+    return list, collect, merge_values, agreggator.compute
+
+
 class GroupByPlan(QueryPlan):
     def __init__(self,
                  group_fields: list[str],
@@ -2220,51 +4597,89 @@ class GroupByPlan(QueryPlan):
                  based_on: QueryPlan = None,
                  transaction: ObjectTransaction = None,
                  atom_pointer: AtomPointer = None,
+                 parallel: ParallelConfig | None = None,
                  **kwargs):
         super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
         self.group_fields = group_fields or []
         self.agreggated_fields = agreggated_fields or {}
+        # Aggregate partitions of a large input on the workers of this configuration, merging
+        # the partial aggregates of each group
+        self.parallel = parallel if parallel is not None else default_parallel_config()
 
-    def execute(self):
-        groups: dict[tuple, list[DBObject]] = {}
-        for rec in (self.based_on.execute() if self.based_on else []):
+    def _partial(self, records, steps: list) -> dict[tuple, list]:
+        """
+        Aggregation state of each group of records: one state per aggregated field.
+        """
+        groups: dict[tuple, list] = {}
+        fields = [(spec.source_field, add) for spec, (start, add, merge, finish) in steps]
+        for rec in records:
             key = tuple(rec.__dict__.get(f, None) for f in self.group_fields)
-            groups.setdefault(key, []).append(rec)
+            states = groups.get(key)
+            if states is None:
+                states = groups[key] = [start() for spec, (start, add, merge, finish) in steps]
+            for i, (source_field, add) in enumerate(fields):
+                states[i] = add(states[i], rec.__dict__.get(source_field, None), rec)
+        return groups
+
+    def execute(self):
+        steps = [(spec, _aggregate_steps(spec.agreggator)) for spec in self.agreggated_fields.values()]
+        parts = _parallel_parts(self.based_on, self.parallel)
+        if parts is None:
+            groups = self._partial(self.based_on.execute() if self.based_on else [], steps)
+        else:
+            # Partial aggregates are merged in the order of the parts, so groups keep the
+            # order of their first record
+            groups = {}
+            tasks = [lambda part=part: self._partial(part(), steps) for part in parts]
+            for partial_groups in map_partitions(tasks, config=self.parallel):
+                for key, states in partial_groups.items():
+                    merged = groups.get(key)
+                    if merged is None:
+                        groups[key] = states
+                    else:
+                        for i, (spec, (start, add, merge, finish)) in enumerate(steps):
+                            merged[i] = merge(merged[i], states[i])
 
-        for key, records in groups.items():
+        for key, states in groups.items():
             out = DBObject(transaction=self.transaction)
             # Set group fields
             for i, f in enumerate(self.group_fields):
                 out = out.set_at(f, key[i])
-            # Compute aggregations
-            for name, spec in self.agreggated_fields.items():
-                # Extract values; for sums/avgs, treat missing as 0; for min/max skip None
-                values = []
-                for r in records:
-                    v = r.__dict__.get(spec.source_field, None)
-                    values.append(0 if v is None and isinstance(spec.agreggator, (SumAgreggator, AvgAggregator)) else (v if v is not None else 0))
-                # For avg/min/max, better to ignore None: build cleaned list when aggregator is not Count
-                if isinstance(spec.agreggator, AvgAggregator):
-                    clean = [v for v in values if v is not None]
-                    result = spec.agreggator.compute(clean)
-                elif isinstance(spec.agreggator, (MinAgreggator, MaxAgreggator)):
-                    clean = [v for v in (r.__dict__.get(spec.source_field, None) for r in records) if v is not None]
-                    result = spec.agreggator.compute(clean)
-                elif isinstance(spec.agreggator, CountAggregator):
-                    result = spec.agreggator.compute(records)
-                else:
-                    result = spec.agreggator.compute(values)
-                out = out.set_at(spec.target_field, result)
+            for state, (spec, (start, add, merge, finish)) in zip(states, steps):
+                out = out.set_at(spec.target_field, finish(state))
             yield out
 
     def optimize(self, *args, **kwargs) -> QueryPlan:
+        based_on = self.based_on.optimize() if self.based_on else None
+        # Group and aggregate covered fields straight from the index entries
+        referenced = list(self.group_fields) + [spec.source_field for spec in self.agreggated_fields.values()
+                                                if not isinstance(spec.agreggator, CountAggregator)]
+        if based_on is not None and CoveringIndexScanPlan.covers(based_on, referenced):
+            based_on = CoveringIndexScanPlan(source=based_on, fields={field: field for field in referenced},
+                                             as_rows=True, transaction=self.transaction)
         return GroupByPlan(
             group_fields=list(self.group_fields),
             agreggated_fields=dict(self.agreggated_fields),
-            based_on=self.based_on.optimize() if self.based_on else None,
-            transaction=self.transaction
+            based_on=based_on,
+            transaction=self.transaction,
+            parallel=self.parallel
         )
 
+    def explain(self) -> dict:
+        node = {
+            'plan_type': 'GroupByPlan',
+            'group_fields': list(self.group_fields),
+            'aggregates': {name: type(spec.agreggator).__name__ for name, spec in self.agreggated_fields.items()},
+        }
+        if self.parallel is not None:
+            node['parallel_workers'] = self.parallel.max_workers
+        try:
+            if self.based_on is not None:
+                node['source_plan'] = self.based_on.explain()
+        except Exception:
+            pass
+        return node
+
 
 class UnnestPlan(QueryPlan):
     """
@@ -2386,7 +4801,7 @@ class SelectPlan(QueryPlan):
     """
 
     def __init__(self, fields: dict, based_on: QueryPlan = None, transaction: 'ObjectTransaction' = None,
-                 atom_pointer: AtomPointer = None, **kwargs):
+                 atom_pointer: AtomPointer = None, parallel: ParallelConfig | None = None, **kwargs):
         """
         Initialize a SelectPlan with field mappings and a base query plan.
 
@@ -2397,10 +4812,13 @@ class SelectPlan(QueryPlan):
             based_on: The query plan that produces the records to transform
             transaction: The transaction context
             atom_pointer: Pointer to the atom in storage
+            parallel: Project partitions of a large input on the workers of this configuration
+                      (by default, the one of the environment; see default_parallel_config)
             **kwargs: Additional arguments
         """
         super().__init__(based_on=based_on, transaction=transaction, atom_pointer=atom_pointer, **kwargs)
         self.fields = fields
+        self.parallel = parallel if parallel is not None else default_parallel_config()
 
     def execute(self):
         """
@@ -2418,22 +4836,38 @@ class SelectPlan(QueryPlan):
         if not self.based_on:
             return
 
+        parts = _parallel_parts(self.based_on, self.parallel)
+        if parts is not None:
+            tasks = [lambda part=part: list(map(self._project, part())) for part in parts]
+            for rows in map_partitions(tasks, config=self.parallel):
+                yield from rows
+            return
+
         for record in self.based_on.execute():
-            result = {}
+            yield self._project(record)
 
-            for output_field, source_spec in self.fields.items():
-                if callable(source_spec):
-                    # Dynamic field generation through a callable
-                    # Let any exceptions propagate up to the caller
-                    result[output_field] = source_spec(record)
-                else:
-                    # Direct field mapping
-                    # Only include the field if it exists in the source record
-                    value = record.get(source_spec)
-                    if value is not None:
-                        result[output_field] = value
+    def _project(self, record) -> dict:
+        result = {}
+
+        for output_field, source_spec in self.fields.items():
+            if callable(source_spec):
+                # Dynamic field generation through a callable
+                # Let any exceptions propagate up to the caller
+                result[output_field] = source_spec(record)
+            else:
+                # Direct field mapping
+                # Only include the field if it exists in the source record
+                value = record.get(source_spec)
+                if value is not None:
+                    result[output_field] = value
+
+        return result
 
-            yield result
+    def partitions(self, count: int, min_rows: int = 1) -> list | None:
+        parts = self.based_on.partitions(count, min_rows) if self.based_on is not None else None
+        if parts is None:
+            return None
+        return [lambda part=part: map(self._project, part()) for part in parts]
 
     def optimize(self, *args, **kwargs) -> 'QueryPlan':
         """
@@ -2450,13 +4884,18 @@ class SelectPlan(QueryPlan):
 
         optimized_base = self.based_on.optimize()
 
+        # Every projected field is held by a covering index: read rows from the index alone
+        if self.fields and CoveringIndexScanPlan.covers(optimized_base, self.fields.values()):
+            return CoveringIndexScanPlan(source=optimized_base, fields=self.fields, transaction=self.transaction)
+
         if optimized_base is self.based_on:
             return self
 
         return SelectPlan(
             fields=self.fields,
             based_on=optimized_base,
-            transaction=self.transaction
+            transaction=self.transaction,
+            parallel=self.parallel
         )
 
 
@@ -2503,6 +4942,12 @@ class CountPlan(QueryPlan):
         """
         optimized_based_on = self.based_on.optimize()
 
+        # Counts of a covering index lookup come from its stored entries
+        if CoveringIndexScanPlan.covering_index_of(optimized_based_on) is not None:
+            covering = CoveringIndexScanPlan(source=optimized_based_on, transaction=self.transaction)
+            return CountResultPlan(count_value=covering.count(), transaction=self.transaction,
+                                   source_plan=covering)
+
         # Duck-typing: Check if the optimized underlying plan has a fast `count` method.
         # Only delegate if the method is overridden (not the default QueryPlan.count).
         if hasattr(optimized_based_on, 'count'):
@@ -2535,10 +4980,12 @@ class CountResultPlan(QueryPlan):
     This is the result of an optimized CountPlan.
     """
 
-    def __init__(self, count_value: int, transaction: 'ObjectTransaction'):
+    def __init__(self, count_value: int, transaction: 'ObjectTransaction', source_plan: QueryPlan = None):
         super().__init__(based_on=None, transaction=transaction)
         self.count_value = count_value
         self.alias = 'count'
+        # Plan the count was computed from, for explain()
+        self._source_plan = source_plan
 
     def execute(self) -> list[dict]:
         return [{'count': self.count_value}]
@@ -2546,6 +4993,15 @@ class CountResultPlan(QueryPlan):
     def optimize(self, *args, **kwargs) -> 'QueryPlan':
         return self
 
+    def explain(self) -> dict:
+        node = {'plan_type': 'CountResultPlan', 'count': self.count_value}
+        if self._source_plan is not None:
+            try:
+                node['source_plan'] = self._source_plan.explain()
+            except Exception:
+                pass
+        return node
+
 
 class SelectManyPlan(QueryPlan):
     """
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import cast, TYPE_CHECKING, Iterable
-from .common import Atom, QueryPlan, AbstractTransaction, AtomPointer, DBCollections, canonical_hash
+from .common import Atom, QueryPlan, AbstractTransaction, AtomPointer, DBCollections, canonical_hash, \
+    stable_hash, HASH_VERSION, Literal
 from .lists import List
 from .hash_dictionaries import HashDictionary
 from .queries import IndexedQueryPlan
@@ -10,6 +11,10 @@ if TYPE_CHECKING:
     from .dictionaries import Dictionary, RepeatedKeysDictionary
 
 
+# Values hashed directly by stable_hash, without the Atom identity checks
+_PLAIN_KEY_TYPES = frozenset((str, int, float, bool, bytes))
+
+
 class Set(Atom):
     """
     A mathematical set of unique elements with dual ephemeral/persistent behavior.
@@ -32,6 +37,7 @@ class Set(Atom):
        writes, as long as the Set is not stored into a persistent structure or root.
     """
     content: HashDictionary  # The underlying container storing the set elements.
+    hash_version: int | None  # Element hash used for the content keys; None for sets stored before versioning
 
     """
     Initializes a `Set` instance.
@@ -56,8 +62,13 @@ class Set(Atom):
             transaction: AbstractTransaction = None,
             atom_pointer: AtomPointer = None,
             indexes: DBCollections | None = None,
+            hash_version: int | None = None,
             **kwargs):
         super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        # Sets read from storage get their version (or none, if written before versioning) on load
+        if hash_version is None and atom_pointer is None:
+            hash_version = HASH_VERSION
+        self.hash_version = hash_version
         self.content = content if content else HashDictionary(transaction=transaction)
         self._new_objects = new_objects if new_objects else HashDictionary(transaction=transaction)
         self.count = self.content.count + self._new_objects.count
@@ -74,42 +85,49 @@ class Set(Atom):
         """
         Compute a stable identity/code for membership and indexing that minimizes collisions:
         - Atoms: if persisted, use AtomPointer.hash(); else fall back to id(obj) to avoid forcing persistence.
-        - str: use transaction._get_string_hash (sha256-based) for stability and low collision.
-        - Numbers/bool: compute a SHA-256 over a typed string "<type>:<value>" for deterministic hashing.
-        - Other objects: compute SHA-256 over a typed repr to reduce collisions; if repr fails, use built-in hash.
+        - Other values: stable_hash, a type tagged 64-bit digest. Sets stored before hash versioning
+          keep using the legacy SHA-256 based hash until their first update (see _migrated).
         """
+        if type(key) in _PLAIN_KEY_TYPES and self.hash_version == HASH_VERSION:
+            return stable_hash(key)
+        if isinstance(key, Atom):
+            ap = key.__dict__.get('atom_pointer')
+            if ap and getattr(ap, 'transaction_id', None):
+                try:
+                    return ap.hash()
+                except Exception:
+                    pass
+            # Ephemeral atom: avoid persisting just for hashing
+            return id(key)
+        if self.hash_version != HASH_VERSION:
+            return _legacy_hash_of(key)
         try:
-            from .common import Atom as _Atom, AtomPointer as _AtomPointer
-            if isinstance(key, _Atom):
-                ap = getattr(key, 'atom_pointer', None)
-                if ap and getattr(ap, 'transaction_id', None):
-                    try:
-                        return ap.hash()
-                    except Exception:
-                        pass
-                # Ephemeral atom: avoid persisting just for hashing
-                return id(key)
-            if isinstance(key, str):
-                tr = getattr(self, 'transaction', None)
-                if tr and hasattr(tr, '_get_string_hash'):
-                    return tr._get_string_hash(key)
-                # Fallback: stable sha256
-                import hashlib
-                return int(hashlib.sha256(key.encode('utf-8')).hexdigest(), 16)
-            if isinstance(key, (int, float, bool)):
-                import hashlib
-                s = f"{type(key).__name__}:{key}".encode('utf-8')
-                return int(hashlib.sha256(s).hexdigest(), 16)
-            # Generic object: try a typed repr
-            import hashlib
-            try:
-                s = f"{type(key).__name__}:{repr(key)}".encode('utf-8')
-                return int(hashlib.sha256(s).hexdigest(), 16)
-            except Exception:
-                return hash(key)
+            return stable_hash(key)
         except Exception:
             return hash(key)
 
+    def _migrated(self) -> Set:
+        """
+        Return this set keyed with the current hash version. Sets stored with an older version
+        are rehashed once, on their first update; reads keep using the stored keys.
+        """
+        self._load()
+        if self.hash_version == HASH_VERSION:
+            return self
+        return Set(
+            content=self._rehashed(self.content),
+            new_objects=self._rehashed(self._new_objects),
+            transaction=self.transaction,
+            indexes=self.indexes
+        )
+
+    def _rehashed(self, elements: HashDictionary) -> HashDictionary:
+        current = Set(transaction=self.transaction)
+        result = HashDictionary(transaction=self.transaction)
+        for h, element in elements.as_iterable():
+            result = result.set_at(current._hash_of(_hashed_value(element)), element)
+        return result
+
     def _save(self):
         if not self._saved:
             for h, element in self._new_objects.as_iterable():
@@ -171,6 +189,9 @@ class Set(Atom):
         If given an IndexDefinition, uses its index_class and extractor.
         For vector indexes, uses bulk build with an id→object map.
         """
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().add_index(index_def)
+
         from .dictionaries import RepeatedKeysDictionary
         from .indexes import IndexDefinition as _IndexDef
         from .common import canonical_hash as _canonical_hash
@@ -197,12 +218,13 @@ class Set(Atom):
             if not isinstance(index_def, _IndexDef):
                 raise TypeError("add_index expects a field name (str) or IndexDefinition")
             index_name = index_def.name
-            params = index_def.index_params or {}
-            new_index = index_def.index_class(transaction=self.transaction, **params) if 'transaction' in getattr(index_def.index_class.__init__, '__code__', ()).co_varnames else index_def.index_class(**params)
+            new_index = index_def.new_index(self.transaction)
 
             if hasattr(new_index, 'set_at'):
                 if not self.empty:
                     for rec in self.as_iterable():
+                        if not index_def.matches(rec):
+                            continue
                         keys = index_def.extractor(rec)
                         try:
                             it = iter(keys)
@@ -221,7 +243,7 @@ class Set(Atom):
                 id_to_obj = {}
                 if not self.empty:
                     for rec in self.as_iterable():
-                        v = index_def.extractor(rec)
+                        v = index_def.extractor(rec) if index_def.matches(rec) else None
                         if v is None:
                             continue
                         vid = _canonical_hash(rec)
@@ -239,10 +261,19 @@ class Set(Atom):
             else:
                 raise TypeError("Unsupported index type: missing set_at/build")
 
-        new_indexes = self.indexes.set_at(index_name, new_index) if self.indexes else None
+        return self.attach_index(index_name, new_index)
+
+    def attach_index(self, index_name: str, index: object) -> Set:
+        """
+        This Set with an already built index registered under index_name (replacing any index
+        with that name). The index is expected to cover every element of the Set.
+        """
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().attach_index(index_name, index)
+        new_indexes = self.indexes.set_at(index_name, index) if self.indexes else None
         if self.indexes is None:
             from .dictionaries import Dictionary as _Dictionary
-            new_indexes = _Dictionary(transaction=self.transaction).set_at(index_name, new_index)
+            new_indexes = _Dictionary(transaction=self.transaction).set_at(index_name, index)
 
         return Set(
             content=self.content,
@@ -252,6 +283,8 @@ class Set(Atom):
         )
 
     def remove_index(self, field_name: str):
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().remove_index(field_name)
         if self.indexes and self.indexes.has(field_name):
             new_indexes = self.indexes.remove_at(field_name)
 
@@ -270,11 +303,11 @@ class Set(Atom):
         :param key: The object to search for in the set. This can be an instance of `Atom`.
         :return: `True` if the key exists in the set, otherwise `False`.
         """
-        # Calculate the canonical hash of the key
-        item_hash = self._hash_of(key)
+        if not self._loaded:
+            self._load()
 
-        # Check if the computed hash exists in the `HashDictionary`.
-        self._load()
+        # Calculate the canonical hash of the key and check whether it is in the `HashDictionary`.
+        item_hash = self._hash_of(key)
 
         if self._new_objects.has(item_hash):
             return True
@@ -294,6 +327,8 @@ class Set(Atom):
 
         # Create and return a new `Set` with the updated `HashDictionary`.
         self._load()
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().add(key)
 
         # Defensive: avoid adding Set/CountedSet objects as elements (would be unhashable and semantically invalid)
         try:
@@ -314,7 +349,7 @@ class Set(Atom):
 
         new_indexes = self.indexes
         if self.indexes:
-            new_indexes = self.indexes.add2indexes(key)
+            new_indexes = self.indexes.add2indexes(key, self.indexes)
 
         return Set(
             content=self.content,
@@ -332,6 +367,8 @@ class Set(Atom):
         :return: A new `Set` object with the key removed, or unchanged if the key is absent.
         """
         self._load()
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().remove_at(key)
 
         # Calculate the canonical hash of the key for removal
         item_hash = self._hash_of(key)
@@ -349,7 +386,7 @@ class Set(Atom):
         # Create and return a new `Set` with the updated `HashDictionary`.
         new_indexes = self.indexes
         if new_indexes:
-            new_indexes = new_indexes.remove_from_indexes(key)
+            new_indexes = new_indexes.remove_from_indexes(key, new_indexes)
 
         return Set(
             content=new_content,
@@ -362,17 +399,39 @@ class Set(Atom):
         """
         Creates a new set containing all elements from both this set and the other set.
 
+        Both sets are merged tree to tree (see HashDictionary.union), so the cost depends on
+        the smaller set and subtrees shared by both sets are reused as they are.
+
         :param other: Another Set to union with this one.
         :return: A new Set containing all elements from both sets.
         """
         self._load()
         other._load()
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().union(other)
+
+        if not isinstance(other, Set):
+            result = self
+            for item in other.as_iterable():
+                result = result.add(item)
+            return result
 
-        result = self
-        for item in other.as_iterable():
-            result = result.add(item)
+        other = other._migrated()
+        content = self.content.union(other.content)
+        new_objects = self._new_objects.union(other._new_objects).difference(content)
 
-        return result
+        new_indexes = self.indexes
+        if self.indexes is not None and self.indexes.count > 0:
+            added = other._all_elements().difference(self._all_elements())
+            for h, item in added.as_iterable():
+                new_indexes = new_indexes.add2indexes(item, new_indexes)
+
+        return Set(
+            content=content,
+            new_objects=new_objects,
+            transaction=self.transaction,
+            indexes=new_indexes
+        )
 
     def intersection(self, other: Set) -> Set:
         """
@@ -383,15 +442,23 @@ class Set(Atom):
         """
         self._load()
         other._load()
-
-        result = Set(transaction=self.transaction)
-        for item in self.as_iterable():
-            item_hash = self._hash_of(item)
-
-            if other.has(item):
-                result = result.add(item)
-
-        return result
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().intersection(other)
+
+        if not isinstance(other, Set):
+            result = Set(transaction=self.transaction)
+            for item in self.as_iterable():
+                if other.has(item):
+                    result = result.add(item)
+            return result
+
+        other = other._migrated()
+        other_elements = other._all_elements()
+        return Set(
+            content=self.content.intersection(other_elements),
+            new_objects=self._new_objects.intersection(other_elements),
+            transaction=self.transaction
+        )
 
     def difference(self, other: Set) -> Set:
         """
@@ -402,16 +469,29 @@ class Set(Atom):
         """
         self._load()
         other._load()
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().difference(other)
+
+        if not isinstance(other, Set):
+            result = Set(transaction=self.transaction)
+            for item in self.as_iterable():
+                if not other.has(item):
+                    result = result.add(item)
+            return result
+
+        other = other._migrated()
+        other_elements = other._all_elements()
+        return Set(
+            content=self.content.difference(other_elements),
+            new_objects=self._new_objects.difference(other_elements),
+            transaction=self.transaction
+        )
 
-        result = Set(transaction=self.transaction)
-        for item in self.as_iterable():
-            item_hash = self._hash_of(item)
-
-            if not other.has(item):
-                result = result.add(item)
-
-        return result
-
+    def _all_elements(self) -> HashDictionary:
+        """
+        Persisted and staged elements of the set in a single HashDictionary keyed by element hash.
+        """
+        return self.content.union(self._new_objects)
 
 
 class CountedSet(Set):
@@ -455,44 +535,6 @@ class CountedSet(Set):
         # Unique item count equals items.count (items holds unique view; _new_objects are mirrored in items)
         self.count = self.items.count
 
-    # Hashing strategy identical to Set
-    def _hash_of(self, key: object) -> int:
-        """
-        Compute a stable integer identity for membership that minimizes collisions:
-        - Atoms: if persisted, use AtomPointer.hash(); else use id(obj) to avoid forcing persistence.
-        - str: use transaction._get_string_hash (sha256-based) or fallback to sha256 of the string.
-        - Numbers/bool: sha256 over a typed string "<type>:<value>" for deterministic hashing.
-        - Other objects: sha256 over a typed repr; fallback to built-in hash on failure.
-        """
-        try:
-            from .common import Atom as _Atom, AtomPointer as _AtomPointer
-            if isinstance(key, _Atom):
-                ap = getattr(key, 'atom_pointer', None)
-                if ap and getattr(ap, 'transaction_id', None):
-                    try:
-                        return ap.hash()
-                    except Exception:
-                        pass
-                return id(key)
-            if isinstance(key, str):
-                tr = getattr(self, 'transaction', None)
-                if tr and hasattr(tr, '_get_string_hash'):
-                    return tr._get_string_hash(key)
-                import hashlib
-                return int(hashlib.sha256(key.encode('utf-8')).hexdigest(), 16)
-            if isinstance(key, (int, float, bool)):
-                import hashlib
-                s = f"{type(key).__name__}:{key}".encode('utf-8')
-                return int(hashlib.sha256(s).hexdigest(), 16)
-            import hashlib
-            try:
-                s = f"{type(key).__name__}:{repr(key)}".encode('utf-8')
-                return int(hashlib.sha256(s).hexdigest(), 16)
-            except Exception:
-                return hash(key)
-        except Exception:
-            return hash(key)
-
     def _save(self):
         if not self._saved:
             # Persist base Set first (moves _new_objects into items/content)
@@ -502,11 +544,12 @@ class CountedSet(Set):
                 if isinstance(element, Atom):
                     element._save()
                 hash_index = h
-                inc = cast(int, self._new_counts.get_at(hash_index)) or 0
-                base = cast(int, self.counts.get_at(hash_index)) if self.counts.has(hash_index) else 0
-                # Ensure the item exists and set the correct total count
+                # Ensure the item exists. add() already mirrors pending increments into counts,
+                # so the pending count is only taken when counts has no entry yet.
                 self.items = self.items.set_at(hash_index, element)
-                self.counts = self.counts.set_at(hash_index, base + inc)
+                if not self.counts.has(hash_index):
+                    inc = cast(int, self._new_counts.get_at(hash_index)) or 0
+                    self.counts = self.counts.set_at(hash_index, inc)
 
             # Save both dictionaries
             self.items.transaction = self.transaction
@@ -531,16 +574,15 @@ class CountedSet(Set):
         return QueryPlan(base=self)
 
     def has(self, key: object) -> bool:
-        h = self._hash_of(key)
-
         self._load()
+        h = self._hash_of(key)
         if self._new_counts.has(h):
             return True
         return self.counts.has(h)
 
     def get_count(self, key: object) -> int:
-        h = self._hash_of(key)
         self._load()
+        h = self._hash_of(key)
         if self.counts.has(h):
             return cast(int, self.counts.get_at(h))
         elif self._new_counts.has(h):
@@ -570,8 +612,10 @@ class CountedSet(Set):
                 return self
         except Exception:
             pass
-        h = self._hash_of(key)
         self._load()
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().add(key)
+        h = self._hash_of(key)
         if self.counts.has(h):
             # Increment existing persisted count; no index updates for intermediate increments
             new_counts = self.counts.set_at(h, cast(int, self.counts.get_at(h)) + 1)
@@ -603,7 +647,7 @@ class CountedSet(Set):
             new_new_counts = self._new_counts.set_at(h, 1)
             new_counts_persisted = self.counts.set_at(h, 1)
             if self.indexes:
-                new_indexes = self.indexes.add2indexes(key)
+                new_indexes = self.indexes.add2indexes(key, self.indexes)
             else:
                 new_indexes = self.indexes
             return CountedSet(
@@ -616,8 +660,10 @@ class CountedSet(Set):
             )
 
     def remove_at(self, key: object) -> 'CountedSet':
-        h = self._hash_of(key)
         self._load()
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().remove_at(key)
+        h = self._hash_of(key)
         if self.counts.has(h):
             repetition = cast(int, self.counts.get_at(h)) - 1
             new_counts = self.counts
@@ -630,7 +676,7 @@ class CountedSet(Set):
             else:
                 new_counts = new_counts.remove_at(h)
                 new_items = new_items.remove_at(h)
-                new_indexes = new_indexes.remove_from_indexes(key)
+                new_indexes = new_indexes.remove_from_indexes(key, new_indexes)
                 # Also clear staged views for this key (0 -> removal)
                 if new_new_counts.has(h):
                     new_new_counts = new_new_counts.remove_at(h)
@@ -655,7 +701,7 @@ class CountedSet(Set):
             else:
                 new_new_counts = new_new_counts.remove_at(h)
                 new_objects = new_objects.remove_at(h)
-                new_indexes = new_indexes.remove_from_indexes(key)
+                new_indexes = new_indexes.remove_from_indexes(key, new_indexes)
 
             return CountedSet(
                 items=self.items,
@@ -667,3 +713,168 @@ class CountedSet(Set):
             )
         else:
             return self
+
+    def union(self, other: Set) -> 'CountedSet':
+        """
+        Creates a new CountedSet with the elements of both sets. Occurrences of elements present
+        in both are added up. Like Set.union, both sets are merged tree to tree.
+
+        :param other: Another CountedSet (or Set, counting one occurrence per element).
+        :return: A new CountedSet.
+        """
+        self._load()
+        other._load()
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().union(other)
+
+        if not isinstance(other, Set):
+            return super().union(other)
+        other = other._migrated()
+
+        other_counts = other.counts if isinstance(other, CountedSet) else \
+            _counts_of(other._all_elements(), self.transaction)
+        other_new_counts = other._new_counts if isinstance(other, CountedSet) else \
+            _counts_of(other._new_objects, self.transaction)
+
+        items = self.items.union(other.items if isinstance(other, CountedSet) else other._all_elements())
+        new_indexes = self.indexes
+        if self.indexes is not None and self.indexes.count > 0:
+            for h, item in items.difference(self.items).as_iterable():
+                new_indexes = new_indexes.add2indexes(item, new_indexes)
+
+        return CountedSet(
+            items=items,
+            counts=self.counts.union(other_counts, combine=_add_counts),
+            new_objects=self._new_objects.union(other._new_objects),
+            new_counts=self._new_counts.union(other_new_counts, combine=_add_counts),
+            indexes=new_indexes,
+            transaction=self.transaction,
+        )
+
+    def intersection(self, other: Set) -> 'CountedSet':
+        """
+        Creates a new CountedSet with the elements present in both sets, keeping the smaller
+        number of occurrences of each one.
+
+        :param other: Another CountedSet (or Set, counting one occurrence per element).
+        :return: A new CountedSet.
+        """
+        self._load()
+        other._load()
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().intersection(other)
+
+        if not isinstance(other, Set):
+            return super().intersection(other)
+        other = other._migrated()
+
+        if isinstance(other, CountedSet):
+            other_counts = other.counts
+        else:
+            other_counts = _counts_of(other._all_elements(), self.transaction)
+        items = self.items.intersection(other_counts)
+        return CountedSet(
+            items=items,
+            counts=self.counts.intersection(other_counts, combine=min),
+            new_objects=self._new_objects.intersection(other_counts),
+            new_counts=self._new_counts.intersection(other_counts, combine=min),
+            transaction=self.transaction,
+        )
+
+    def difference(self, other: Set) -> 'CountedSet':
+        """
+        Creates a new CountedSet with the elements of this set that are not present in the other
+        one, keeping their number of occurrences.
+
+        :param other: Another Set or CountedSet.
+        :return: A new CountedSet.
+        """
+        self._load()
+        other._load()
+        if self.hash_version != HASH_VERSION:
+            return self._migrated().difference(other)
+
+        if not isinstance(other, Set):
+            return super().difference(other)
+        other = other._migrated()
+
+        other_elements = other.items if isinstance(other, CountedSet) else other._all_elements()
+        return CountedSet(
+            items=self.items.difference(other_elements),
+            counts=self.counts.difference(other_elements),
+            new_objects=self._new_objects.difference(other_elements),
+            new_counts=self._new_counts.difference(other_elements),
+            transaction=self.transaction,
+        )
+
+    def _all_elements(self) -> HashDictionary:
+        # items already mirrors the staged elements
+        return self.items
+
+    def _migrated(self) -> 'CountedSet':
+        """
+        Return this set keyed with the current hash version, carrying over the counters.
+        """
+        self._load()
+        if self.hash_version == HASH_VERSION:
+            return self
+        current = Set(transaction=self.transaction)
+        items = HashDictionary(transaction=self.transaction)
+        counts = HashDictionary(transaction=self.transaction)
+        new_objects = HashDictionary(transaction=self.transaction)
+        new_counts = HashDictionary(transaction=self.transaction)
+        for h, element in self.items.as_iterable():
+            new_hash = current._hash_of(_hashed_value(element))
+            items = items.set_at(new_hash, element)
+            if self.counts.has(h):
+                counts = counts.set_at(new_hash, self.counts.get_at(h))
+            if self._new_objects.has(h):
+                new_objects = new_objects.set_at(new_hash, element)
+            if self._new_counts.has(h):
+                new_counts = new_counts.set_at(new_hash, self._new_counts.get_at(h))
+        return CountedSet(
+            items=items,
+            counts=counts,
+            new_objects=new_objects,
+            new_counts=new_counts,
+            indexes=self.indexes,
+            transaction=self.transaction,
+        )
+
+
+def _hashed_value(element: object) -> object:
+    # Strings are stored as Literals: hash them by their text, as when they were added
+    return element.string if isinstance(element, Literal) else element
+
+
+def _legacy_hash_of(key: object) -> int:
+    """
+    Element hash of sets stored before hash versioning: SHA-256 over the string, or over a typed
+    string for other values, read as a 256-bit int.
+    """
+    import hashlib
+    try:
+        if isinstance(key, str):
+            return int(hashlib.sha256(key.encode('utf-8')).hexdigest(), 16)
+        if isinstance(key, (int, float, bool)):
+            s = f"{type(key).__name__}:{key}".encode('utf-8')
+            return int(hashlib.sha256(s).hexdigest(), 16)
+        try:
+            s = f"{type(key).__name__}:{repr(key)}".encode('utf-8')
+            return int(hashlib.sha256(s).hexdigest(), 16)
+        except Exception:
+            return hash(key)
+    except Exception:
+        return hash(key)
+
+
+def _add_counts(left: int, right: int) -> int:
+    return int(left) + int(right)
+
+
+def _counts_of(elements: HashDictionary, transaction: AbstractTransaction) -> HashDictionary:
+    # One occurrence for each element of a plain Set, keyed by the element hash
+    counts = HashDictionary(transaction=transaction)
+    for h, item in elements.as_iterable():
+        counts = counts.set_at(h, 1)
+    return counts
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import Iterable
+
+from .common import Atom, AtomPointer, AbstractTransaction
+
+# Shape of the statistics built by analyze
+HISTOGRAM_BUCKETS = 32
+MOST_COMMON_VALUES = 16
+
+# Statistics are rebuilt from their index once the rows changed since the last analyze reach
+# ANALYZE_CHANGE_RATIO of the rows analyzed then (and at least ANALYZE_MIN_CHANGES)
+ANALYZE_CHANGE_RATIO = 0.2
+ANALYZE_MIN_CHANGES = 1000
+
+
+def _order(value: object):
+    from .dictionaries import DictionaryItem
+    return DictionaryItem._order_key(value)
+
+
+def _trackable(value: object) -> bool:
+    # Only values that come back unchanged from storage are kept in most_common and bounds
+    return type(value) in (str, int, float, bool)
+
+
+def _numeric(value: object) -> bool:
+    return type(value) in (int, float)
+
+
+def _overlap(low: object, high: object, lo: object, hi: object) -> float:
+    """
+    Fraction of the bucket [low, high] inside [lo, hi] (None is an open side), interpolated
+    linearly for numbers and taken as one half otherwise.
+    """
+    lo = low if lo is None else lo
+    hi = high if hi is None else hi
+    if not all(_numeric(v) for v in (low, high, lo, hi)):
+        return 0.5
+    if high <= low:
+        return 1.0
+    return max(0.0, min(1.0, (min(high, hi) - max(low, lo)) / (high - low)))
+
+
+class ColumnStatistics(Atom):
+    """
+    Statistics of the keys of an index, used by the planner to estimate how many records a
+    term selects.
+
+    - row_count: indexed records (records without a value are not indexed)
+    - distinct_count: distinct keys
+    - most_common: [value, rows] of the most frequent keys, most frequent first
+    - bounds / bucket_rows: equi-depth histogram of the other keys. Bucket i holds the keys
+      in [bounds[i], bounds[i + 1]) (the last one also holds bounds[-1]), and bucket_rows[i]
+      records
+    - analyzed_rows / changed_rows: rows seen by the last analyze and rows inserted or
+      removed since
+
+    Counters and most_common are kept exact on every insertion and removal; the histogram
+    only moves the count of the bucket of the key (widening the first or last bucket for
+    keys outside it). Once too many rows changed they are `stale`, and the owner index
+    rebuilds them with `from_index` on analyze or when it is saved at commit.
+    """
+    row_count: int
+    distinct_count: int
+    most_common: list
+    bounds: list
+    bucket_rows: list
+    analyzed_rows: int
+    changed_rows: int
+
+    def __init__(
+            self,
+            row_count: int = 0,
+            distinct_count: int = 0,
+            most_common: list = None,
+            bounds: list = None,
+            bucket_rows: list = None,
+            analyzed_rows: int = 0,
+            changed_rows: int = 0,
+            transaction: AbstractTransaction = None,
+            atom_pointer: AtomPointer = None,
+            **kwargs):
+        super().__init__(transaction=transaction, atom_pointer=atom_pointer, **kwargs)
+        self.row_count = row_count
+        self.distinct_count = distinct_count
+        self.most_common = most_common if most_common is not None else []
+        self.bounds = bounds if bounds is not None else []
+        self.bucket_rows = bucket_rows if bucket_rows is not None else []
+        self.analyzed_rows = analyzed_rows
+        self.changed_rows = changed_rows
+
+    @classmethod
+    def from_counts(cls, key_rows: Iterable[tuple[object, int]], buckets: int = HISTOGRAM_BUCKETS,
+                    most_common: int = MOST_COMMON_VALUES,
+                    transaction: AbstractTransaction = None) -> ColumnStatistics:
+        """
+        Statistics of (key, rows) pairs given in key order.
+        """
+        pairs = [(key, rows) for key, rows in key_rows if rows > 0]
+        row_count = sum(rows for _, rows in pairs)
+        tracked = [(key, rows) for key, rows in pairs if _trackable(key)]
+
+        common = sorted(tracked, key=lambda pair: -pair[1])[:most_common]
+        common_keys = {key for key, _ in common}
+        rest = [(key, rows) for key, rows in tracked if key not in common_keys]
+
+        bounds: list = []
+        bucket_rows: list[int] = []
+        if rest:
+            depth = sum(rows for _, rows in rest) / buckets
+            for key, rows in rest:
+                # A key never spans two buckets
+                if not bucket_rows or bucket_rows[-1] >= depth:
+                    bounds.append(key)
+                    bucket_rows.append(0)
+                bucket_rows[-1] += rows
+            bounds.append(rest[-1][0])
+
+        return cls(
+            row_count=row_count,
+            distinct_count=len(pairs),
+            most_common=[[key, rows] for key, rows in common],
+            bounds=bounds,
+            bucket_rows=bucket_rows,
+            analyzed_rows=row_count,
+            transaction=transaction
+        )
+
+    @classmethod
+    def from_index(cls, index) -> ColumnStatistics:
+        """
+        Statistics of an index mapping each key to a Set of records, read from its buckets
+        without loading the records.
+        """
+        def _rows(bucket) -> int:
+            # Buckets read from storage only know their size once loaded
+            bucket._load()
+            return bucket.count
+
+        return cls.from_counts(((key, _rows(bucket)) for key, bucket in index.as_iterable()),
+                               transaction=index.transaction)
+
+    @property
+    def stale(self) -> bool:
+        self._load()
+        return self.changed_rows >= max(ANALYZE_MIN_CHANGES, ANALYZE_CHANGE_RATIO * self.analyzed_rows)
+
+    def _bound_keys(self) -> list:
+        keys = self.__dict__.get('_bound_key_cache')
+        if keys is None:
+            keys = [_order(bound) for bound in self.bounds]
+            object.__setattr__(self, '_bound_key_cache', keys)
+        return keys
+
+    def _updated(self, key: object, delta: int, key_rows: int, distinct_delta: int) -> ColumnStatistics:
+        self._load()
+        most_common = [list(pair) for pair in self.most_common]
+        bounds = list(self.bounds)
+        bucket_rows = list(self.bucket_rows)
+        bound_keys = list(self._bound_keys())
+
+        def _histogram_add(value: object, rows: int):
+            nonlocal bounds, bound_keys, bucket_rows
+            value_order = _order(value)
+            if not bounds:
+                if rows > 0:
+                    bounds, bound_keys, bucket_rows = [value, value], [value_order, value_order], [rows]
+                return
+            if rows > 0 and value_order < bound_keys[0]:
+                bounds[0], bound_keys[0] = value, value_order
+            elif rows > 0 and value_order > bound_keys[-1]:
+                bounds[-1], bound_keys[-1] = value, value_order
+            position = min(max(bisect_right(bound_keys, value_order) - 1, 0), len(bucket_rows) - 1)
+            bucket_rows[position] = max(0, bucket_rows[position] + rows)
+
+        if _trackable(key):
+            entry = next((pair for pair in most_common if pair[0] == key), None)
+            if entry is not None:
+                entry[1] = key_rows
+            elif delta > 0 and (len(most_common) < MOST_COMMON_VALUES or key_rows > most_common[-1][1]):
+                # Promoted: its previous rows leave the histogram
+                _histogram_add(key, delta - key_rows)
+                most_common.append([key, key_rows])
+            else:
+                _histogram_add(key, delta)
+            most_common.sort(key=lambda pair: -pair[1])
+            # Keys leaving most_common go (back) to the histogram
+            for value, rows in most_common[MOST_COMMON_VALUES:]:
+                _histogram_add(value, rows)
+            most_common = [pair for pair in most_common[:MOST_COMMON_VALUES] if pair[1] > 0]
+
+        updated = ColumnStatistics(
+            row_count=max(0, self.row_count + delta),
+            distinct_count=max(0, self.distinct_count + distinct_delta),
+            most_common=most_common,
+            bounds=bounds,
+            bucket_rows=bucket_rows,
+            analyzed_rows=self.analyzed_rows,
+            changed_rows=self.changed_rows + abs(delta),
+            transaction=self.transaction
+        )
+        object.__setattr__(updated, '_bound_key_cache', bound_keys)
+        return updated
+
+    def with_added(self, key: object, key_rows: int, added: int = 1) -> ColumnStatistics:
+        """
+        Statistics after indexing `added` records under key, which now has key_rows records.
+        """
+        return self._updated(key, added, key_rows, 1 if key_rows == added else 0)
+
+    def with_removed(self, key: object, key_rows: int, removed: int = 1) -> ColumnStatistics:
+        """
+        Statistics after removing `removed` records from key, which now has key_rows records.
+        """
+        return self._updated(key, -removed, key_rows, -1 if key_rows == 0 else 0)
+
+    def estimate_equal(self, value: object) -> float:
+        """
+        Expected records whose key equals value.
+        """
+        self._load()
+        if not self.row_count:
+            return 0.0
+        for key, rows in self.most_common:
+            if key == value:
+                return float(rows)
+        if self.bounds and _trackable(value):
+            value_order = _order(value)
+            bound_keys = self._bound_keys()
+            if value_order < bound_keys[0] or value_order > bound_keys[-1]:
+                return 0.0
+        others = self.distinct_count - len(self.most_common)
+        rest = self.row_count - sum(rows for _, rows in self.most_common)
+        if others <= 0 or rest <= 0:
+            return 0.0
+        return rest / others
+
+    def estimate_range(self, lo: object = None, hi: object = None,
+                       include_lower: bool = True, include_upper: bool = True) -> float | None:
+        """
+        Expected records whose key is between lo and hi (None is an open side), from the
+        histogram; None when there is no histogram.
+        """
+        self._load()
+        if not self.bucket_rows and not self.most_common:
+            return None
+        lo_order = None if lo is None else _order(lo)
+        hi_order = None if hi is None else _order(hi)
+
+        rows = 0.0
+        for key, key_rows in self.most_common:
+            key_order = _order(key)
+            if lo_order is not None and (key_order < lo_order or (key_order == lo_order and not include_lower)):
+                continue
+            if hi_order is not None and (key_order > hi_order or (key_order == hi_order and not include_upper)):
+                continue
+            rows += key_rows
+
+        bound_keys = self._bound_keys()
+        for position, bucket in enumerate(self.bucket_rows):
+            if not bucket:
+                continue
+            low_order, high_order = bound_keys[position], bound_keys[position + 1]
+            if (hi_order is not None and low_order > hi_order) or (lo_order is not None and high_order < lo_order):
+                continue
+            if (lo_order is None or low_order >= lo_order) and (hi_order is None or high_order <= hi_order):
+                rows += bucket
+            else:
+                rows += bucket * _overlap(self.bounds[position], self.bounds[position + 1], lo, hi)
+        # Bucket overlaps treat bounds as inclusive
+        common_keys = {key for key, _ in self.most_common}
+        if lo is not None and not include_lower and lo not in common_keys:
+            rows -= self.estimate_equal(lo)
+        if hi is not None and not include_upper and hi not in common_keys:
+            rows -= self.estimate_equal(hi)
+        return min(max(rows, 0.0), float(self.row_count))
+
+    def describe(self) -> dict:
+        self._load()
+        return {
+            'row_count': self.row_count,
+            'distinct_count': self.distinct_count,
+            'most_common': [list(pair) for pair in self.most_common],
+            'histogram_buckets': len(self.bucket_rows),
+            'changed_rows': self.changed_rows,
+        }
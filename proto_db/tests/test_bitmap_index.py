@@ -0,0 +1,158 @@
+import random
+import unittest
+from unittest import mock
+
+from proto_db.bitmap_index import BitmapIndex, RoaringBitmap
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    AndMerge, BitmapScanPlan, CountPlan, CountResultPlan, Expression, IndexedQueryPlan, ListPlan, OrMerge, WherePlan
+)
+
+
+class TestRoaringBitmap(unittest.TestCase):
+
+    def test_operations_match_sets(self):
+        rng = random.Random(5)
+        # Sparse and dense chunks, across several chunks
+        left = set(rng.sample(range(300000), 20000)) | set(range(70000, 80000))
+        right = set(rng.sample(range(300000), 9000)) | set(range(75000, 140000, 2))
+        a, b = RoaringBitmap(left), RoaringBitmap(right)
+        self.assertEqual(len(a), len(left))
+        self.assertEqual(list(a & b), sorted(left & right))
+        self.assertEqual(list(a | b), sorted(left | right))
+        self.assertEqual(list(a - b), sorted(left - right))
+        self.assertEqual(list(b - a), sorted(right - left))
+        self.assertIn(75000, a)
+        self.assertNotIn(300001, a)
+        self.assertEqual(RoaringBitmap.from_bytes(a.to_bytes()), a)
+        self.assertEqual(list(a.add(300001).discard(70000)), sorted((left | {300001}) - {70000}))
+        self.assertIs(a.add(75000), a)
+
+
+class TestBitmapIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        self.transaction = self.database.new_transaction()
+        rng = random.Random(11)
+        self.records = []
+        for i in range(600):
+            record = DBObject(transaction=self.transaction)
+            record = record.set_at('id', i)
+            record = record.set_at('status', rng.choice(['new', 'open', 'closed']))
+            record = record.set_at('country', rng.choice(['ar', 'br', 'cl', 'uy']))
+            if i % 7:
+                record = record.set_at('priority', rng.randrange(4))
+            self.records.append(record)
+        base = ListPlan(base_list=self.records, transaction=self.transaction)
+        self.indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction) \
+            .add_bitmap_index('status').add_bitmap_index('country').add_bitmap_index('priority')
+
+    def _plan(self, spec, based_on=None):
+        return WherePlan(filter=Expression.compile(spec), based_on=based_on or self.indexed,
+                         transaction=self.transaction).optimize()
+
+    def _expected(self, spec):
+        flt = Expression.compile(spec)
+
+        def _match(record):
+            try:
+                return flt.match(record)
+            except TypeError:
+                # Range terms on records without a value
+                return False
+
+        return sorted(r.id for r in self.records if _match(r))
+
+    def test_and_or_andnot_use_bitmaps(self):
+        for spec in (
+                ['&', ['status', '==', 'open'], ['country', '==', 'br']],
+                ['&', ['status', '!=', 'closed'], ['country', '==', 'ar'], ['priority', '>=', 2]],
+                ['&', ['priority', '!=', 1], ['country', '!=', 'uy']],
+        ):
+            plan = self._plan(spec)
+            self.assertIsInstance(plan, AndMerge)
+            self.assertEqual(plan.explain()['strategy'], 'Bitmap AND/ANDNOT')
+            self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+            self.assertEqual(plan.count(), len(self._expected(spec)))
+
+        spec = ['|', ['status', '==', 'new'], ['country', '==', 'cl']]
+        plan = self._plan(spec)
+        self.assertIsInstance(plan, OrMerge)
+        self.assertEqual(plan.explain()['strategy'], 'Bitmap OR')
+        # Records matching both terms are yielded once
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+
+        plan = self._plan(['status', '==', 'closed'])
+        self.assertIsInstance(plan, BitmapScanPlan)
+
+    def test_count_does_not_load_records(self):
+        spec = ['&', ['status', '==', 'open'], ['country', '!=', 'ar']]
+        count = CountPlan(based_on=WherePlan(filter=Expression.compile(spec), based_on=self.indexed,
+                                             transaction=self.transaction), transaction=self.transaction)
+        with mock.patch.object(BitmapIndex, 'records_of', side_effect=AssertionError('records loaded')):
+            optimized = count.optimize()
+        self.assertIsInstance(optimized, CountResultPlan)
+        self.assertEqual(list(optimized.execute()), [{'count': len(self._expected(spec))}])
+
+    def test_updates_keep_indexes_aligned(self):
+        record = DBObject(transaction=self.transaction).set_at('id', 1000).set_at('status', 'open') \
+            .set_at('country', 'br')
+        updated = self.indexed.update_indexes_on_add(record).update_indexes_on_remove(self.records[0])
+        spec = ['&', ['status', '==', 'open'], ['country', '==', 'br']]
+        plan = self._plan(spec, based_on=updated)
+        self.assertEqual(plan.explain()['strategy'], 'Bitmap AND/ANDNOT')
+        expected = [r.id for r in self.records[1:] + [record] if r.status == 'open' and r.country == 'br']
+        self.assertEqual(sorted(r.id for r in plan.execute()), sorted(expected))
+
+        # Independently built indexes do not share ordinals: fall back to reference intersection
+        status = BitmapIndex(field_name='status', transaction=self.transaction).add_records(self.records)
+        country = BitmapIndex(field_name='country', transaction=self.transaction).add_records(self.records)
+        indexes = Dictionary(transaction=self.transaction).set_at('status', status).set_at('country', country)
+        base = IndexedQueryPlan(indexes=indexes, based_on=self.indexed.based_on, transaction=self.transaction)
+        plan = self._plan(spec, based_on=base)
+        self.assertEqual(plan.explain()['strategy'], 'Intersecting sorted index plans')
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+
+    def test_index_survives_reload(self):
+        self.transaction.set_root_object('records', List.from_values(self.records, transaction=self.transaction))
+        for field in ('status', 'country'):
+            self.transaction.set_root_object(f'by_{field}', self.indexed.indexes.get_at(field))
+        records = [DBObject(transaction=self.transaction, id=i, status=['new', 'open'][i % 2]) for i in range(20)]
+        by_status = BitmapIndex(field_name='status', transaction=self.transaction).add_records(records)
+        # Building the index does not save the records; they are stored with it at commit
+        self.assertFalse(any(r.__dict__.get('atom_pointer') for r in records))
+        self.transaction.set_root_object('new_by_status', by_status)
+        self.transaction.commit()
+
+        tr = self.database.new_transaction()
+        index = tr.get_root_object('by_country')
+        self.assertEqual(sorted(r.id for r in index.records_of(index.bitmap_at('uy'))),
+                         sorted(r.id for r in self.records if r.country == 'uy'))
+        self.assertEqual(len(index.all_rows()), len(self.records))
+
+        # Reloaded indexes still share their row ordinals
+        indexes = Dictionary(transaction=tr).set_at('status', tr.get_root_object('by_status')) \
+            .set_at('country', index)
+        base = ListPlan(base_list=tr.get_root_object('records'), transaction=tr)
+        indexed = IndexedQueryPlan(indexes=indexes, based_on=base, transaction=tr)
+        spec = ['&', ['status', '!=', 'closed'], ['country', '==', 'ar']]
+        plan = WherePlan(filter=Expression.compile(spec), based_on=indexed, transaction=tr).optimize()
+        self.assertEqual(plan.explain()['strategy'], 'Bitmap AND/ANDNOT')
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+
+        # Reloaded records are found again by their reference
+        by_status = tr.get_root_object('new_by_status')
+        opened = list(by_status.records_of(by_status.bitmap_at('open')))
+        by_status = by_status.remove_record(opened[0])
+        self.assertEqual(len(by_status.bitmap_at('open')), 9)
+        self.assertEqual(by_status.count, 19)
+        tr.abort()
+
+if __name__ == '__main__':
+    unittest.main()
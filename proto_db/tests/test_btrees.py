@@ -0,0 +1,212 @@
+import random
+import unittest
+
+from proto_db.btrees import BTreeList, BTreeDictionary, BTreeQueryPlan
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary, RepeatedKeysDictionary
+from proto_db.exceptions import ProtoValidationException
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import WherePlan, Expression
+
+
+class TestBTreeList(unittest.TestCase):
+
+    def test_random_operations_match_python_list(self):
+        rng = random.Random(28)
+        tree = BTreeList(fanout=4)
+        reference = []
+        for _ in range(1500):
+            op = rng.random()
+            if op < 0.6 or not reference:
+                offset = rng.randint(0, len(reference))
+                value = rng.randint(0, 10_000)
+                tree = tree.insert_at(offset, value)
+                reference.insert(offset, value)
+            elif op < 0.8:
+                offset = rng.randrange(len(reference))
+                tree = tree.set_at(offset, -offset)
+                reference[offset] = -offset
+            else:
+                offset = rng.randrange(len(reference))
+                tree = tree.remove_at(offset)
+                del reference[offset]
+        self.assertEqual(tree.count, len(reference))
+        self.assertEqual(list(tree.as_iterable()), reference)
+        for i in range(0, len(reference), 7):
+            self.assertEqual(tree.get_at(i), reference[i])
+        self.assertEqual(list(tree.iter_from(25)), reference[25:])
+        self.assertIsNone(tree.get_at(len(reference)))
+
+    def test_copy_on_write_keeps_previous_versions(self):
+        base = BTreeList(fanout=4)
+        for i in range(50):
+            base = base.append_last(i)
+        changed = base.set_at(10, 'x').remove_at(0)
+        self.assertEqual(base.get_at(10), 10)
+        self.assertEqual(base.count, 50)
+        self.assertEqual(changed.get_at(9), 'x')
+        self.assertEqual(changed.count, 49)
+
+    def test_wide_nodes_keep_tree_shallow(self):
+        tree = BTreeList(fanout=64)
+        for i in range(5000):
+            tree = tree.append_last(i)
+        self.assertEqual(tree.height(), 3)
+
+    def test_fanout_bounds(self):
+        with self.assertRaises(ProtoValidationException):
+            BTreeList(fanout=2)
+
+    def test_set_at_out_of_range(self):
+        tree = BTreeList().append_last(1)
+        self.assertEqual(tree.set_at(1, 2).count, 2)
+        with self.assertRaises(IndexError):
+            tree.set_at(5, 2)
+
+
+class TestBTreeDictionary(unittest.TestCase):
+
+    def test_random_operations_match_python_dict(self):
+        rng = random.Random(280)
+        tree = BTreeDictionary(fanout=4)
+        reference = {}
+        for i in range(2000):
+            key = rng.choice([rng.randint(0, 300), f"k{rng.randint(0, 300)}"])
+            if rng.random() < 0.3 and key in reference:
+                tree = tree.remove_at(key)
+                del reference[key]
+            else:
+                tree = tree.set_at(key, i)
+                reference[key] = i
+        self.assertEqual(tree.count, len(reference))
+        for key, value in reference.items():
+            self.assertEqual(tree.get_at(key), value)
+        self.assertFalse(tree.has(-1))
+        self.assertEqual([k for k, _ in tree.as_iterable()],
+                         sorted(reference, key=lambda k: (isinstance(k, str), k)))
+
+    def test_keys_sharing_an_order_key(self):
+        # Integers above 2**53 share their float order key; they are still distinct keys
+        rng = random.Random(28)
+        base = 2 ** 53
+        tree = BTreeDictionary(fanout=4)
+        reference = {}
+        for i in range(600):
+            key = rng.choice([base + rng.randint(0, 30), rng.randint(0, 30)])
+            if rng.random() < 0.3 and key in reference:
+                tree = tree.remove_at(key)
+                del reference[key]
+            else:
+                tree = tree.set_at(key, i)
+                reference[key] = i
+        self.assertEqual(tree.count, len(reference))
+        for key, value in reference.items():
+            self.assertEqual(tree.get_at(key), value)
+        self.assertEqual(sorted(k for k, _ in tree.as_iterable()), sorted(reference))
+        self.assertFalse(tree.has(base + 31))
+
+    def test_iter_range_bounds(self):
+        tree = BTreeDictionary(fanout=4)
+        for i in range(100):
+            tree = tree.set_at(i, i * 10)
+        self.assertEqual([k for k, _ in tree.iter_range(10, 14)], [10, 11, 12, 13, 14])
+        self.assertEqual([k for k, _ in tree.iter_range(10, 14, False, False)], [11, 12, 13])
+        self.assertEqual([v for _, v in tree.iter_range(97)], [970, 980, 990])
+        self.assertEqual([k for k, _ in tree.iter_range(hi=2)], [0, 1, 2])
+
+    def test_remove_everything(self):
+        tree = BTreeDictionary(fanout=4)
+        for i in range(60):
+            tree = tree.set_at(i, i)
+        for i in range(60):
+            tree = tree.remove_at(i)
+        self.assertEqual(tree.count, 0)
+        self.assertEqual(list(tree.as_iterable()), [])
+
+    def test_query_plan_scans_values(self):
+        tree = BTreeDictionary(fanout=4)
+        for i in range(20):
+            tree = tree.set_at(i, i)
+        plan = tree.as_query_plan()
+        self.assertIsInstance(plan, BTreeQueryPlan)
+        self.assertEqual(list(plan.execute().as_iterable()), list(range(20)))
+
+
+class TestBTreePersistence(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+
+    def test_round_trip_and_update(self):
+        tr = self.database.new_transaction()
+        items = tr.new_btree_list(fanout=8)
+        index = tr.new_btree_dictionary(fanout=8)
+        for i in range(300):
+            record = tr.new_dictionary().set_at('n', i)
+            items = items.append_last(record)
+            index = index.set_at(f"key{i:03d}", record)
+        tr.set_root_object('items', items)
+        tr.set_root_object('index', index)
+        tr.commit()
+
+        tr = self.database.new_transaction()
+        items = tr.get_root_object('items')
+        index = tr.get_root_object('index')
+        self.assertIsInstance(items, BTreeList)
+        self.assertEqual(items.count, 300)
+        self.assertEqual(items.get_at(123).get_at('n'), 123)
+        self.assertEqual(index.get_at('key250').get_at('n'), 250)
+        self.assertEqual([k for k, _ in index.iter_range('key010', 'key012')], ['key010', 'key011', 'key012'])
+        tr.set_root_object('items', items.remove_at(0).append_last('tail'))
+        tr.commit()
+
+        tr = self.database.new_transaction()
+        items = tr.get_root_object('items')
+        self.assertEqual(items.count, 300)
+        self.assertEqual(items.get_at(0).get_at('n'), 1)
+        self.assertEqual(items.get_at(-1), 'tail')
+        tr.abort()
+
+    def test_where_plan_over_btree(self):
+        tr = self.database.new_transaction()
+        items = tr.new_btree_list(fanout=8)
+        for i in range(40):
+            items = items.append_last(DBObject(transaction=tr).set_at('n', i))
+        plan = WherePlan(filter=Expression.compile(['n', '<', 5]), based_on=items.as_query_plan(), transaction=tr)
+        self.assertEqual(sorted(r.n for r in plan.execute()), [0, 1, 2, 3, 4])
+        tr.abort()
+
+    def test_writes_maintain_indexes(self):
+        tr = self.database.new_transaction()
+        records = [DBObject(transaction=tr).set_at('n', i).set_at('k', i % 3) for i in range(12)]
+        for record in records:
+            record._save()
+        indexes = Dictionary(transaction=tr).set_at('k', RepeatedKeysDictionary(transaction=tr))
+
+        def ids(collection, k):
+            plan = WherePlan(filter=Expression.compile(['k', '==', k]), based_on=collection.as_query_plan(),
+                             transaction=tr).optimize()
+            return sorted(r.n for r in plan.execute())
+
+        items = BTreeList(fanout=4, indexes=indexes, transaction=tr)
+        by_key = BTreeDictionary(fanout=4, indexes=indexes, transaction=tr)
+        for record in records[:6]:
+            items = items.append_last(record)
+            by_key = by_key.set_at(record.n, record)
+
+        items = items.append_last(records[7]).remove_at(0).set_at(1, records[10])
+        self.assertEqual(ids(items, 0), [3])
+        self.assertEqual(ids(items, 1), [1, 4, 7, 10])
+        self.assertEqual(ids(items, 2), [5])
+
+        by_key = by_key.set_at(7, records[7]).remove_at(0).set_at(1, records[10])
+        self.assertEqual(ids(by_key, 0), [3])
+        self.assertEqual(ids(by_key, 1), [4, 7, 10])
+        self.assertEqual(ids(by_key, 2), [2, 5])
+        tr.abort()
+
+
+if __name__ == '__main__':
+    unittest.main()
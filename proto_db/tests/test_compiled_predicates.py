@@ -0,0 +1,106 @@
+import itertools
+import pickle
+import unittest
+from unittest import mock
+
+from proto_db.common import DBObject, Literal
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary, RepeatedKeysDictionary
+from proto_db.linq import F, from_collection
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import AndMerge, Expression, IndexedQueryPlan, ListPlan, Term, WherePlan, path_getter
+
+
+class RowWrap:
+    __slots__ = ('r',)
+
+    def __init__(self, row):
+        self.r = row
+
+
+VALUES = [None, 0, 7, 2.5, True, 'Jo', 'Joan', 'abc', (1, 2), [1, 'Jo'], {'k': 1}]
+
+
+def _outcome(function, record):
+    try:
+        return 'ok', function(record)
+    except Exception as e:
+        return 'error', type(e)
+
+
+class TestCompiledPredicates(unittest.TestCase):
+
+    def setUp(self):
+        self.transaction = ObjectSpace(storage=MemoryStorage()).new_database('TestDB').new_transaction()
+        self.records = [None, RowWrap(None), {'r': None}]
+        for a, c in itertools.product(VALUES, repeat=2):
+            row = {'a': a, 'b': {'c': c}, 'class': c}
+            self.records += [RowWrap(row), {'r': row}, DBObject(transaction=self.transaction, r=row)]
+
+    def _assert_same(self, spec):
+        expression = Expression.compile(spec)
+        predicate = expression.predicate()
+        for record in self.records:
+            self.assertEqual(_outcome(expression.match, record), _outcome(predicate, record), (spec, record))
+
+    def test_terms_answer_as_match(self):
+        for path in ('r.a', 'r.b.c', 'r.class', 'r', 'missing.x'):
+            for op in ('==', '!=', '>', '>=', '<', '<=', 'contains', 'in', 'startswith', 'matches'):
+                for value in VALUES:
+                    self._assert_same([path, op, value])
+            for op in ('?T', '?!T', '?N', '?!N'):
+                self._assert_same([path, op])
+            for op in ('between[]', 'between()', 'between(]', 'between[)'):
+                for lo, hi in ((0, 7), (7, 0), (None, 7), ('Jo', 'Joan'), (0, 'Jo')):
+                    self._assert_same([path, op, lo, hi])
+        self._assert_same(['r.a', '==', Literal(literal='Jo')])
+        self._assert_same(['lower(r.a)', '==', 'joan'])
+        self._assert_same(['r.a', 'within_box', (0, 0, 10, 10)])
+
+    def test_composed_expressions(self):
+        self._assert_same(['|', ['&', ['r.a', '?!N'], ['!', ['r.b.c', '==', 7]]], ['r.class', 'startswith', 'J']])
+        self._assert_same(['&', ['r.a', '>', 0], ['r.b.c', '<', 5]])
+        self._assert_same([])
+        expression = Expression.compile(['&', ['r.a', '==', 7], ['r.b.c', '?N']])
+        self.assertIs(expression.predicate(), expression.predicate())
+        # The generated function is not part of the expression's state
+        copy = pickle.loads(pickle.dumps(expression))
+        self.assertNotIn('_predicate', copy.__dict__)
+        self.assertTrue(copy.predicate()({'r': {'a': 7}}))
+
+        getter = path_getter('r.b.c')
+        self.assertEqual(getter(RowWrap({'b': {'c': 3}})), 3)
+        self.assertIsNone(getter(RowWrap({'b': None})))
+        self.assertEqual(path_getter(())(5), 5)
+
+    def test_plans_use_the_predicate(self):
+        rows = [RowWrap({'id': i, 'tag': 'ab'[i % 2], 'score': i % 10}) for i in range(200)]
+        base = ListPlan(base_list=rows, transaction=self.transaction)
+        with mock.patch.object(Term, 'match', side_effect=AssertionError('interpreted')):
+            where = WherePlan(filter_spec=['&', ['r.tag', '==', 'a'], ['r.score', '<', 4]], based_on=base,
+                              transaction=self.transaction)
+            self.assertEqual([w.r['id'] for w in where.execute()],
+                             [i for i in range(200) if i % 2 == 0 and i % 10 < 4])
+
+            indexes = Dictionary(transaction=self.transaction)
+            for field in ('tag', 'score'):
+                index = RepeatedKeysDictionary.from_pairs(((w.r[field], w) for w in rows), transaction=self.transaction)
+                indexes = indexes.set_at(f'r.{field}', index)
+            plan = IndexedQueryPlan(indexes=indexes, based_on=base, transaction=self.transaction)
+            merged = WherePlan(filter_spec=['&', ['r.tag', '==', 'b'], ['r.score', '==', 3]], based_on=plan,
+                               transaction=self.transaction).optimize()
+            self.assertIsInstance(merged, AndMerge)
+            residual = AndMerge(and_queries=merged.and_queries, transaction=self.transaction,
+                                residual_filters=[Expression.compile(['r.id', '>=', 100])])
+            self.assertEqual(sorted(w.r['id'] for w in residual.execute()), list(range(103, 200, 10)))
+
+    def test_linq_local_filters(self):
+        rows = [{'id': i, 'name': f'n{i % 7}', 'nested': {'v': i % 3}} for i in range(50)]
+        query = from_collection(rows).where(F.nested.v == 1).where(lambda x: x['id'] > 20)
+        self.assertEqual([x['id'] for x in query.to_list()], [i for i in range(21, 50) if i % 3 == 1])
+        query = from_collection(rows).where(F.name.startswith('n1') | (F.nested.v > 1))
+        self.assertEqual([x['id'] for x in query.to_list()], [i for i in range(50) if i % 7 == 1 or i % 3 > 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import random
+import unittest
+
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import CompositeIndex, Dictionary
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    AndMerge, CompositeIndexScanPlan, Expression, IndexedQueryPlan, ListPlan, WherePlan
+)
+
+
+class TestCompositeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        self.transaction = self.database.new_transaction()
+        rng = random.Random(3)
+        self.records = []
+        for i in range(300):
+            record = DBObject(transaction=self.transaction)
+            record = record.set_at('id', i)
+            record = record.set_at('category', f'c{rng.randrange(4)}')
+            record = record.set_at('status', rng.choice(['new', 'open', 'closed']))
+            record = record.set_at('value', rng.randrange(1000))
+            # Stored records, so buckets find them again by their pointer
+            record._save()
+            self.records.append(record)
+        base = ListPlan(base_list=self.records, transaction=self.transaction)
+        self.indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction).add_composite_index(
+            ['category', 'status', 'value'])
+
+    def _query(self, spec):
+        plan = WherePlan(filter=Expression.compile(spec), based_on=self.indexed, transaction=self.transaction)
+        return plan.optimize()
+
+    def _expected(self, spec):
+        flt = Expression.compile(spec)
+        return sorted(r.id for r in self.records if flt.match(r))
+
+    def test_prefix_and_range_use_single_scan(self):
+        spec = ['&', ['category', '==', 'c1'], ['status', '==', 'open'], ['value', 'between[)', 200, 600]]
+        plan = self._query(spec)
+        self.assertIsInstance(plan, CompositeIndexScanPlan)
+        explained = plan.explain()
+        self.assertEqual(explained['fields'], ['category', 'status', 'value'])
+        self.assertEqual(explained['range'], '[200, 600)')
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+        self.assertEqual(plan.count(), len(self._expected(spec)))
+
+        spec = ['&', ['status', '==', 'new'], ['category', '==', 'c2'], ['value', '>', 900]]
+        plan = self._query(spec)
+        self.assertIsInstance(plan, CompositeIndexScanPlan)
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+
+    def test_partial_prefix_keeps_residual_terms(self):
+        # value does not follow category in the index: it is checked as a residual filter
+        spec = ['&', ['category', '==', 'c3'], ['value', '<', 100]]
+        plan = self._query(spec)
+        self.assertIsInstance(plan, AndMerge)
+        self.assertIsInstance(plan.and_queries[0], CompositeIndexScanPlan)
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+
+        # No equality on the first field: the index cannot be used
+        spec = ['&', ['status', '==', 'open'], ['value', '<', 100]]
+        plan = self._query(spec)
+        self.assertIsInstance(plan, WherePlan)
+
+    def test_plan_maintains_index(self):
+        added = DBObject(transaction=self.transaction).set_at('id', 900).set_at('category', 'c1') \
+            .set_at('status', 'open').set_at('value', 300)
+        removed = next(r for r in self.records if r.category == 'c1' and r.status == 'open')
+        updated = self.indexed.update_indexes_on_add(added).update_indexes_on_remove(removed)
+        records = [r for r in self.records if r is not removed] + [added]
+
+        spec = ['&', ['category', '==', 'c1'], ['status', '==', 'open']]
+        plan = WherePlan(filter=Expression.compile(spec), based_on=updated, transaction=self.transaction).optimize()
+        self.assertIsInstance(plan, CompositeIndexScanPlan)
+        expected = sorted(r.id for r in records if r.category == 'c1' and r.status == 'open')
+        self.assertEqual(sorted(r.id for r in plan.execute()), expected)
+        self.assertIn(900, expected)
+
+    def test_index_survives_reload(self):
+        index = CompositeIndex(fields=('category', 'value'), transaction=self.transaction)
+        for record in self.records:
+            index = index.add_record(record)
+        self.transaction.set_root_object('records', List.from_values(self.records, transaction=self.transaction))
+        self.transaction.set_root_object('by_category_value', index)
+        self.transaction.commit()
+
+        tr = self.database.new_transaction()
+        index = tr.get_root_object('by_category_value')
+        indexes = Dictionary(transaction=tr).set_at('by_category_value', index)
+        plan = CompositeIndexScanPlan(index_name='by_category_value', prefix=('c0',), lo=100, hi=300,
+                                      include_lower=True, include_upper=True, indexes=indexes, transaction=tr)
+        expected = sorted(r.id for r in self.records if r.category == 'c0' and 100 <= r.value <= 300)
+        self.assertEqual(sorted(r.id for r in plan.execute()), expected)
+        self.assertEqual(index.fields, ('category', 'value'))
+
+        # The planner still finds the reloaded index
+        base = ListPlan(base_list=tr.get_root_object('records'), transaction=tr)
+        indexed = IndexedQueryPlan(indexes=indexes, based_on=base, transaction=tr)
+        spec = ['&', ['category', '==', 'c0'], ['value', 'between[]', 100, 300]]
+        plan = WherePlan(filter=Expression.compile(spec), based_on=indexed, transaction=tr).optimize()
+        self.assertIsInstance(plan, CompositeIndexScanPlan)
+        self.assertEqual(sorted(r.id for r in plan.execute()), expected)
+        tr.abort()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -128,5 +128,31 @@ class TestCountedSet(unittest.TestCase):
         self.assertTrue(bucket.has(rec))
 
 
+    def test_010_set_algebra_counts(self):
+        left = CountedSet().add('a').add('a').add('b')
+        right = CountedSet().add('a').add('c').add('c')
+        union = left.union(right)
+        self.assertEqual(union.count, 3)
+        self.assertEqual(union.get_count('a'), 3)
+        self.assertEqual(union.get_count('c'), 2)
+        intersection = left.intersection(right)
+        self.assertEqual(list(intersection.as_iterable()), ['a'])
+        self.assertEqual(intersection.get_count('a'), 1)
+        difference = left.difference(right)
+        self.assertEqual(list(difference.as_iterable()), ['b'])
+        self.assertEqual(difference.total_count, 1)
+
+    def test_011_save_keeps_counts(self):
+        from proto_db.db_access import ObjectSpace
+        from proto_db.memory_storage import MemoryStorage
+        tr = ObjectSpace(storage=MemoryStorage()).new_database('TestDB').new_transaction()
+        cs = CountedSet(transaction=tr).add('a').add('a').add('b')
+        cs._save()
+        # Pending increments are already part of counts: saving must not add them again
+        self.assertEqual(cs.get_count('a'), 2)
+        self.assertEqual(cs.get_count('b'), 1)
+        self.assertEqual(cs.remove_at('b').count, 1)
+        tr.abort()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+from unittest import mock
+
+from proto_db.common import Atom, DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import CoveringIndex, Dictionary
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    AgreggatorSpec, CountPlan, CountResultPlan, CoveringIndexScanPlan, Expression, GroupByPlan,
+    IndexedQueryPlan, ListPlan, SelectPlan, SumAgreggator, CountAggregator, WherePlan
+)
+
+
+class TestCoveringIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        self.transaction = self.database.new_transaction()
+        self.records = []
+        for i in range(120):
+            record = DBObject(transaction=self.transaction)
+            record = record.set_at('id', i)
+            record = record.set_at('status', ['new', 'open', 'closed'][i % 3])
+            record = record.set_at('amount', i * 10)
+            record = record.set_at('note', f'note {i}')
+            self.records.append(record)
+        base = ListPlan(base_list=self.records, transaction=self.transaction)
+        self.indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction).add_index(
+            'status', covering=['id', 'amount'])
+
+    def _where(self, spec):
+        return WherePlan(filter=Expression.compile(spec), based_on=self.indexed, transaction=self.transaction)
+
+    def test_select_is_answered_from_index(self):
+        select = SelectPlan(fields={'id': 'id', 'total': 'amount'}, based_on=self._where(['status', '==', 'open']),
+                            transaction=self.transaction)
+        plan = select.optimize()
+        self.assertIsInstance(plan, CoveringIndexScanPlan)
+        explained = plan.explain()
+        self.assertTrue(explained['covering'])
+        self.assertIn('not loaded', explained['strategy'])
+
+        with mock.patch.object(Atom, '_load', side_effect=AssertionError('record loaded')):
+            rows = sorted(plan.execute(), key=lambda row: row['id'])
+        self.assertEqual(rows, [{'id': r.id, 'total': r.amount} for r in self.records if r.status == 'open'])
+
+        # A field outside the index needs the records
+        select = SelectPlan(fields={'note': 'note'}, based_on=self._where(['status', '==', 'open']),
+                            transaction=self.transaction)
+        self.assertNotIsInstance(select.optimize(), CoveringIndexScanPlan)
+
+    def test_count_and_group_by_from_index(self):
+        count = CountPlan(based_on=self._where(['status', '==', 'new']), transaction=self.transaction).optimize()
+        self.assertIsInstance(count, CountResultPlan)
+        self.assertEqual(count.explain()['source_plan']['plan_type'], 'CoveringIndexScanPlan')
+        self.assertEqual(list(count.execute()), [{'count': 40}])
+
+        group = GroupByPlan(
+            group_fields=['status'],
+            agreggated_fields={
+                'total': AgreggatorSpec(SumAgreggator(), 'amount', 'total'),
+                'n': AgreggatorSpec(CountAggregator(), 'id', 'n'),
+            },
+            based_on=self._where(['status', 'between[]', 'closed', 'new']),
+            transaction=self.transaction).optimize()
+        self.assertEqual(group.explain()['source_plan']['plan_type'], 'CoveringIndexScanPlan')
+        with mock.patch.object(Atom, '_load', side_effect=AssertionError('record loaded')):
+            result = {row.status: (row.total, row.n) for row in group.execute()}
+        expected = {}
+        for r in self.records:
+            if r.status in ('closed', 'new'):
+                total, n = expected.get(r.status, (0, 0))
+                expected[r.status] = (total + r.amount, n + 1)
+        self.assertEqual(result, expected)
+
+    def test_index_survives_reload_and_removal(self):
+        index = CoveringIndex(covered_fields=['amount'], transaction=self.transaction)
+        for record in self.records[:30]:
+            index = index.set_at(record.status, record)
+        index = index.remove_record_at('open', self.records[1])
+        self.transaction.set_root_object('by_status', index)
+        self.transaction.commit()
+
+        tr = self.database.new_transaction()
+        index = tr.get_root_object('by_status')
+        self.assertEqual(index.covered_fields, ('amount',))
+        indexes = Dictionary(transaction=tr).set_at('status', index)
+        base = IndexedQueryPlan(indexes=indexes, based_on=ListPlan(base_list=[], transaction=tr), transaction=tr)
+        plan = SelectPlan(fields={'amount': 'amount'},
+                          based_on=WherePlan(filter=Expression.compile(['status', '==', 'open']), based_on=base,
+                                             transaction=tr),
+                          transaction=tr).optimize()
+        self.assertIsInstance(plan, CoveringIndexScanPlan)
+        expected = sorted(r.amount for r in self.records[:30] if r.status == 'open' and r.id != 1)
+        self.assertEqual(sorted(row['amount'] for row in plan.execute()), expected)
+        tr.abort()
+
+
+    def test_removal_after_reload_drops_projection(self):
+        index = CoveringIndex(covered_fields=['id'], transaction=self.transaction)
+        for record in self.records[:30]:
+            index = index.set_at(record.status, record)
+        self.transaction.set_root_object('by_status', index)
+        self.transaction.commit()
+
+        tr = self.database.new_transaction()
+        index = tr.get_root_object('by_status')
+        # Projections are found by the reference of the records read back
+        for key, bucket in index.projections.as_iterable():
+            self.assertEqual({ref for ref, _ in bucket.as_iterable()},
+                             {r.atom_pointer.hash() for r in index.get_at(key).as_iterable()})
+        removed = next(r for r in index.get_at('open').as_iterable() if r.id == 4)
+        index = index.remove_record_at('open', removed)
+        indexes = Dictionary(transaction=tr).set_at('status', index)
+        base = IndexedQueryPlan(indexes=indexes, based_on=ListPlan(base_list=[], transaction=tr), transaction=tr)
+        plan = SelectPlan(fields={'id': 'id'},
+                          based_on=WherePlan(filter=Expression.compile(['status', '==', 'open']), based_on=base,
+                                             transaction=tr),
+                          transaction=tr).optimize()
+        self.assertIsInstance(plan, CoveringIndexScanPlan)
+        self.assertEqual(sorted(row['id'] for row in plan.execute()), [1, 7, 10, 13, 16, 19, 22, 25, 28])
+        tr.abort()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 
+from proto_db.common import DBObject
 from proto_db.dictionaries import Dictionary, RepeatedKeysDictionary, Atom  # Using absolute import for unittest discover
+from proto_db.queries import IndexedQueryPlan, ListPlan
 
 
 class TestDictionary(unittest.TestCase):
@@ -134,6 +136,39 @@ class TestDictionary(unittest.TestCase):
         # This test demonstrates the expected behavior when handling concurrent modifications
         # by applying operations in the correct order.
 
+    def test_keyed_descent_matches_python_dict(self):
+        """Point operations and ordered iteration over mixed-type keys agree with a dict."""
+        import random
+        rng = random.Random(27)
+        reference = {}
+        d = Dictionary()
+        for _ in range(400):
+            key = rng.choice([rng.randint(0, 150), f"k{rng.randint(0, 150)}"])
+            if rng.random() < 0.25 and key in reference:
+                d = d.remove_at(key)
+                del reference[key]
+            else:
+                d = d.set_at(key, key)
+                reference[key] = key
+        self.assertEqual(d.count, len(reference))
+        for key in list(reference)[:50] + [-1, "missing"]:
+            self.assertEqual(d.has(key), key in reference)
+            self.assertEqual(d.get_at(key), reference.get(key))
+        keys = [k for k, _ in d.as_iterable()]
+        self.assertEqual(keys, sorted(reference, key=lambda k: (isinstance(k, str), k)))
+
+    def test_lower_bound_and_items_from(self):
+        d = Dictionary()
+        for i in range(0, 40, 2):
+            d = d.set_at(i, i)
+        self.assertEqual(d.lower_bound(10), 5)
+        self.assertEqual(d.lower_bound(11), 6)
+        self.assertEqual(d.lower_bound(100), d.count)
+        self.assertEqual([item.key for item in d.items_from(d.lower_bound(31))], [32, 34, 36, 38])
+        self.assertEqual(list(d.items_from(d.count)), [])
+        self.assertEqual([item.key for item in d.items_reversed(d.lower_bound(7) - 1)], [6, 4, 2, 0])
+        self.assertEqual([item.key for item in d.items_reversed()][:2], [38, 36])
+
 
 class TestRepeatedKeysDictionary(unittest.TestCase):
     """Test cases for the RepeatedKeysDictionary class."""
@@ -203,6 +238,16 @@ class TestRepeatedKeysDictionary(unittest.TestCase):
         self.assertEqual(len(result), 1, "Should still have one value.")
         self.assertEqual(result[0], self.atom_a, "Should still contain the original value.")
 
+    def test_remove_record_of_missing_key(self):
+        """Removing a record under a key that is not indexed leaves the index unchanged."""
+        index = self.empty_dict.set_at("key1", self.atom_a)
+        self.assertIs(index.remove_record_at("missing", self.atom_a), index)
+
+        ghost = DBObject().set_at('city', 'nowhere')
+        plan = IndexedQueryPlan(based_on=ListPlan(base_list=[]), indexes=Dictionary().set_at('city', index))
+        updated = plan.update_indexes_on_remove(ghost)
+        self.assertIs(updated.indexes.get_at('city'), index)
+
     def test_concurrent_optimized(self):
         """Test concurrent optimization with repeated keys."""
         # Create a base dictionary with repeated keys
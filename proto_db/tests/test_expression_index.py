@@ -0,0 +1,138 @@
+import unittest
+
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary, ExpressionIndex
+from proto_db.exceptions import ProtoValidationException
+from proto_db.linq import F, from_collection
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    Expression, IndexedQueryPlan, IndexedRangeSearchPlan, IndexedSearchPlan, ListPlan, WherePlan, canonical_value,
+    evaluate_value, register_value_function
+)
+
+
+class TestDerivedValues(unittest.TestCase):
+
+    def test_fingerprints(self):
+        self.assertEqual(F.email.lower().fingerprint, 'lower(email)')
+        self.assertEqual((F.price * 2).fingerprint, 'mul(price, 2)')
+        self.assertEqual(F.name.upper().length().fingerprint, 'length(upper(name))')
+        self.assertEqual((F.email.lower() == 'a').pb_tokens, ['lower(r.email)', '==', 'a'])
+        self.assertEqual(canonical_value('mul( price ,2)'), 'mul(price, 2)')
+        self.assertEqual(canonical_value('price'), 'price')
+
+    def test_evaluation(self):
+        record = {'email': 'Ann@Example.com', 'price': 4, 'tags': ['a', 'b']}
+        self.assertEqual(evaluate_value(record, 'lower(email)'), 'ann@example.com')
+        self.assertEqual(evaluate_value(record, 'add(mul(price, 2), 1)'), 9)
+        self.assertEqual(evaluate_value(record, 'length(tags)'), 2)
+        self.assertTrue(Expression.compile(['lower(email)', '==', 'ann@example.com']).match(record))
+        # Derived values are still plain selectors
+        self.assertEqual(F.email.lower()(record), 'ann@example.com')
+        self.assertEqual((F.price * 2)(record), 8)
+        self.assertEqual(from_collection([record]).select(F.email.upper()).to_list(), ['ANN@EXAMPLE.COM'])
+
+
+class TestExpressionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        self.transaction = self.database.new_transaction()
+        self.records = []
+        for i in range(120):
+            record = DBObject(transaction=self.transaction)
+            record = record.set_at('id', i)
+            record = record.set_at('email', f'User{i % 40}@{"Example" if i % 2 else "Mail"}.com')
+            record = record.set_at('price', i % 13)
+            record._save()
+            self.records.append(record)
+        base = ListPlan(base_list=self.records, transaction=self.transaction)
+        self.indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction) \
+            .add_expression_index(F.email.lower()) \
+            .add_expression_index('mul(price, 2)')
+
+    def _plan(self, spec, based_on=None):
+        return WherePlan(filter=Expression.compile(spec), based_on=based_on or self.indexed,
+                         transaction=self.transaction).optimize()
+
+    def _expected(self, spec, records=None):
+        flt = Expression.compile(spec)
+        return sorted(r.id for r in (records or self.records) if flt.match(r))
+
+    def test_identical_expression_uses_index(self):
+        spec = ['lower(email)', '==', 'user7@example.com']
+        plan = self._plan(spec)
+        self.assertIsInstance(plan, IndexedSearchPlan)
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+        self.assertEqual(len(self._expected(spec)), 3)
+
+        spec = ['mul(price,2)', '>', 20]
+        plan = self._plan(spec)
+        self.assertIsInstance(plan, IndexedRangeSearchPlan)
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+
+    def test_other_expressions_are_scanned(self):
+        for spec in (
+                ['upper(email)', '==', 'USER7@EXAMPLE.COM'],
+                ['email', '==', 'user7@example.com'],
+                ['mul(price, 3)', '>', 20],
+        ):
+            plan = self._plan(spec)
+            self.assertNotIsInstance(plan, (IndexedSearchPlan, IndexedRangeSearchPlan))
+            self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+
+    def test_linq_where_uses_index(self):
+        query = from_collection(self.indexed).where(F.email.lower() == 'user8@mail.com')
+        self.assertEqual(query.explain('json')['optimized_node'], 'IndexedSearchPlan')
+        self.assertEqual(sorted(r.id for r in query.to_list()), [8, 48, 88])
+
+    def test_registered_function(self):
+        register_value_function('domain', lambda email: email.split('@')[1].lower())
+        indexed = self.indexed.add_expression_index(F.email.apply('domain'))
+        spec = ['domain(email)', '==', 'mail.com']
+        plan = self._plan(spec, indexed)
+        self.assertIsInstance(plan, IndexedSearchPlan)
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+        with self.assertRaises(ProtoValidationException):
+            register_value_function('lower', str.lower)
+        with self.assertRaises(ProtoValidationException):
+            self.indexed.add_expression_index('unknown(email)')
+
+    def test_updates_keep_index_aligned(self):
+        added = DBObject(transaction=self.transaction).set_at('id', 500).set_at('email', 'USER7@example.COM') \
+            .set_at('price', 1)
+        updated = self.indexed.update_indexes_on_add(added).update_indexes_on_remove(self.records[7])
+        records = [r for r in self.records if r is not self.records[7]] + [added]
+        spec = ['lower(email)', '==', 'user7@example.com']
+        self.assertEqual(sorted(r.id for r in self._plan(spec, updated).execute()), self._expected(spec, records))
+
+    def test_index_survives_reload(self):
+        self.transaction.set_root_object('records', List.from_values(self.records, transaction=self.transaction))
+        self.transaction.set_root_object('by_email', self.indexed.indexes.get_at('lower(email)'))
+        self.transaction.set_root_object('by_double_price', self.indexed.indexes.get_at('mul(price, 2)'))
+        self.transaction.commit()
+
+        tr = self.database.new_transaction()
+        index = tr.get_root_object('by_email')
+        self.assertIsInstance(index, ExpressionIndex)
+        self.assertTrue(index.applies_to('lower(r.email)'))
+        self.assertFalse(index.applies_to('upper(email)'))
+        self.assertEqual(sorted(r.id for r in index.get_at('user3@example.com').as_iterable()), [3, 43, 83])
+
+        # The planner still matches the reloaded indexes by fingerprint
+        indexes = Dictionary(transaction=tr).set_at('lower(email)', index) \
+            .set_at('mul(price, 2)', tr.get_root_object('by_double_price'))
+        base = ListPlan(base_list=tr.get_root_object('records'), transaction=tr)
+        indexed = IndexedQueryPlan(indexes=indexes, based_on=base, transaction=tr)
+        for spec, plan_type in ((['lower(email)', '==', 'user3@example.com'], IndexedSearchPlan),
+                                (['mul(price, 2)', '<=', 6], IndexedRangeSearchPlan)):
+            plan = WherePlan(filter=Expression.compile(spec), based_on=indexed, transaction=tr).optimize()
+            self.assertIsInstance(plan, plan_type)
+            self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+        tr.abort()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary
+from proto_db.fulltext_index import FullTextIndex, register_normalizer
+from proto_db.lists import List
+from proto_db.linq import from_collection, F
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    AndMerge, Expression, FullTextMatchPlan, FullTextSearchPlan, IndexedQueryPlan, ListPlan, WherePlan
+)
+
+TEXTS = [
+    'The quick brown fox jumps over the lazy dog',
+    'A quick brown dog outpaces a quick fox',
+    'Lazy afternoons and brown leaves',
+    'Foxes are quick and clever animals',
+    'Dogs and cats living together',
+    'Café au lait with a quick croissant',
+]
+
+
+class TestFullTextIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        self.transaction = self.database.new_transaction()
+        self.records = []
+        for i, text in enumerate(TEXTS):
+            record = DBObject(transaction=self.transaction)
+            record = record.set_at('id', i)
+            record = record.set_at('body', text)
+            self.records.append(record)
+        base = ListPlan(base_list=self.records, transaction=self.transaction)
+        self.indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction).add_fulltext_index('body')
+
+    def _ids(self, plan):
+        return sorted(r.id for r in plan.execute())
+
+    def test_matches_uses_posting_lists(self):
+        plan = WherePlan(filter=Expression.compile(['body', 'matches', 'Quick FOX']), based_on=self.indexed,
+                         transaction=self.transaction).optimize()
+        self.assertIsInstance(plan, FullTextMatchPlan)
+        self.assertEqual(plan.explain()['tokens'], ['fox', 'quick'])
+        self.assertEqual(self._ids(plan), [0, 1])
+        self.assertEqual(plan.count(), 2)
+        # Without the index, the operator gives the same answer
+        scan = WherePlan(filter=Expression.compile(['body', 'matches', 'Quick FOX']), transaction=self.transaction,
+                         based_on=ListPlan(base_list=self.records, transaction=self.transaction))
+        self.assertEqual(self._ids(scan), [0, 1])
+
+        # Combined with other terms the match takes part in the intersection
+        plan = WherePlan(filter=Expression.compile(['&', ['body', 'matches', 'brown'], ['id', '>', 0]]),
+                         based_on=self.indexed, transaction=self.transaction).optimize()
+        self.assertIsInstance(plan, AndMerge)
+        self.assertEqual(self._ids(plan), [1, 2])
+
+        # Unknown tokens match nothing
+        plan = WherePlan(filter=Expression.compile(['body', 'matches', 'quick zebra']), based_on=self.indexed,
+                         transaction=self.transaction).optimize()
+        self.assertEqual(list(plan.execute()), [])
+
+    def test_contains_stays_exact(self):
+        for text, expected in (('Quick FOX', []), ('quick brown', [0, 1]), ('Fox', [3]), ('fox j', [0])):
+            plan = WherePlan(filter=Expression.compile(['body', 'contains', text]), based_on=self.indexed,
+                             transaction=self.transaction).optimize()
+            self.assertNotIsInstance(plan, FullTextMatchPlan)
+            self.assertEqual(self._ids(plan), expected, text)
+
+    def test_bm25_ranking(self):
+        plan = self.indexed.search_text('body', 'quick fox', k=3)
+        self.assertIsInstance(plan, FullTextSearchPlan)
+        ranked = plan.ranked()
+        self.assertEqual(len(ranked), 3)
+        # Record 1 has "quick" twice and "fox" once
+        self.assertEqual(ranked[0][0].id, 1)
+        scores = [score for _, score in ranked]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual([r.id for r in plan.execute()], [r.id for r, _ in ranked])
+        self.assertEqual(plan.explain()['lookup_type'], 'BM25 top-k')
+
+    def test_incremental_maintenance_and_normalizers(self):
+        register_normalizer('test_stem', lambda token: token.casefold().rstrip('s'))
+        index = FullTextIndex(field_name='body', normalizer='accent_fold', transaction=self.transaction)
+        collection = List(transaction=self.transaction, indexes=Dictionary(transaction=self.transaction)
+                          .set_at('body', index))
+        for record in self.records:
+            collection = collection.append_last(record)
+        index = collection.indexes.get_at('body')
+        self.assertEqual([r.id for r in index.match('cafe')], [5])
+        self.assertEqual(index.count, len(TEXTS))
+
+        collection = collection.remove_at(0)
+        index = collection.indexes.get_at('body')
+        self.assertEqual(sorted(r.id for r in index.match('lazy')), [2])
+        self.assertEqual(index.count, len(TEXTS) - 1)
+
+        stemmed = FullTextIndex(field_name='body', normalizer='test_stem', transaction=self.transaction)
+        for record in self.records:
+            stemmed = stemmed.add_record(record)
+        self.assertEqual(sorted(r.id for r in stemmed.match('fox dog')), [0, 1])
+
+    def test_plan_maintains_index(self):
+        added = DBObject(transaction=self.transaction).set_at('id', 50).set_at('body', 'A clever brown fox')
+        updated = self.indexed.update_indexes_on_add(added).update_indexes_on_remove(self.records[3])
+        plan = WherePlan(filter=Expression.compile(['body', 'matches', 'clever fox']), based_on=updated,
+                         transaction=self.transaction).optimize()
+        self.assertIsInstance(plan, FullTextMatchPlan)
+        self.assertEqual(self._ids(plan), [50])
+        self.assertEqual(updated.indexes.get_at('body').count, len(TEXTS))
+
+    def test_index_survives_reload(self):
+        records = [DBObject(transaction=self.transaction, id=i, body=text) for i, text in enumerate(TEXTS)]
+        index = FullTextIndex(field_name='body', transaction=self.transaction).add_records(records)
+        # Building the index does not save the records; they are stored with it at commit
+        self.assertFalse(any(r.__dict__.get('atom_pointer') for r in records))
+        self.transaction.set_root_object('body_text', index)
+        self.transaction.commit()
+
+        tr = self.database.new_transaction()
+        index = tr.get_root_object('body_text')
+        self.assertEqual(sorted(r.id for r in index.match('brown')), [0, 1, 2])
+        self.assertEqual(index.search('lazy dog', k=1)[0][0].id, 0)
+        index = index.remove_record(index.match('clever')[0])
+        self.assertEqual(index.match('clever'), [])
+        tr.abort()
+
+    def test_linq_matches(self):
+        class Row:
+            def __init__(self, body):
+                self.body = body
+
+        rows = [Row(text) for text in TEXTS]
+        index = FullTextIndex(field_name='body', transaction=self.transaction)
+        for row in rows:
+            index = index.add_record(row)
+        indexes = Dictionary(transaction=self.transaction).set_at('r.body', index)
+        plan = IndexedQueryPlan(indexes=indexes, based_on=ListPlan(base_list=rows, transaction=self.transaction),
+                                transaction=self.transaction)
+        query = from_collection(plan).where(F.r.body.matches('Clever'))
+        self.assertEqual(query.explain('json').get('optimized_node'), 'FullTextMatchPlan')
+        self.assertEqual([row.body for row in query.to_list()], [TEXTS[3]])
+        self.assertEqual(from_collection(plan).where(F.r.body.contains('Clever')).to_list(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import random
+import unittest
+
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary
+from proto_db.geo_index import GeoIndex, cell_of, cover, distance_m
+from proto_db.linq import F, from_collection
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    Expression, GeoNearestPlan, GeoScanPlan, IndexedQueryPlan, ListPlan, Operator, WherePlan, WithinBox, WithinRadius
+)
+
+
+class TestGeoOperators(unittest.TestCase):
+
+    def test_box_and_radius(self):
+        box = Operator.get_operator('within_box')
+        self.assertIsInstance(box, WithinBox)
+        self.assertTrue(box.match((40.4, -3.7), (40.0, -4.0, 41.0, -3.0)))
+        self.assertTrue(box.match({'lat': 40.4, 'lon': -3.7}, (40.0, -4.0, 41.0, -3.0)))
+        self.assertFalse(box.match((42.0, -3.7), (40.0, -4.0, 41.0, -3.0)))
+        # West > east crosses the antimeridian
+        self.assertTrue(box.match((0.0, 179.5), (-1.0, 179.0, 1.0, -179.0)))
+        self.assertTrue(box.match((0.0, -179.5), (-1.0, 179.0, 1.0, -179.0)))
+        self.assertFalse(box.match((0.0, 0.0), (-1.0, 179.0, 1.0, -179.0)))
+        self.assertFalse(box.match(None, (-1.0, 179.0, 1.0, -179.0)))
+
+        radius = Operator.get_operator('within_radius')
+        self.assertIsInstance(radius, WithinRadius)
+        # Madrid - Barcelona is about 505 km
+        self.assertAlmostEqual(distance_m(40.4168, -3.7038, 41.3874, 2.1686) / 1000, 505, delta=5)
+        self.assertTrue(radius.match((41.3874, 2.1686), (40.4168, -3.7038, 510000)))
+        self.assertFalse(radius.match((41.3874, 2.1686), (40.4168, -3.7038, 500000)))
+
+        term = Expression.compile(['location', 'within_box', (40.0, -4.0, 41.0, -3.0)])
+        self.assertTrue(term.match({'location': (40.5, -3.5)}))
+
+    def test_cover_contains_box(self):
+        rng = random.Random(5)
+        box = (10.0, 20.0, 10.5, 21.0)
+        ranges = cover(box)
+        self.assertLessEqual(len(ranges), 64)
+        for _ in range(500):
+            lat, lon = rng.uniform(10.0, 10.5), rng.uniform(20.0, 21.0)
+            cell = cell_of(lat, lon)
+            self.assertTrue(any(low <= cell <= high for low, high in ranges))
+
+
+class TestGeoIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        self.transaction = self.database.new_transaction()
+        rng = random.Random(11)
+        self.records = []
+        for i in range(400):
+            # Clustered around a few cities, plus some across the antimeridian
+            lat, lon = rng.choice([(40.4, -3.7), (48.85, 2.35), (-33.9, 151.2), (0.0, 179.9), (0.0, -179.9)])
+            record = DBObject(transaction=self.transaction)
+            record = record.set_at('id', i)
+            record = record.set_at('location', (lat + rng.uniform(-1, 1), lon + rng.uniform(-0.09, 0.09)))
+            record._save()
+            self.records.append(record)
+        base = ListPlan(base_list=self.records, transaction=self.transaction)
+        self.indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction).add_geo_index('location')
+
+    def _plan(self, spec, based_on=None):
+        return WherePlan(filter=Expression.compile(spec), based_on=based_on or self.indexed,
+                         transaction=self.transaction).optimize()
+
+    def _expected(self, spec, records=None):
+        flt = Expression.compile(spec)
+        return sorted(r.id for r in (records or self.records) if flt.match(r))
+
+    def test_box_query_uses_index(self):
+        for area in ((40.0, -4.0, 41.0, -3.5), (-1.0, 179.95, 1.0, -179.95), (-90.0, -180.0, 90.0, 180.0)):
+            spec = ['location', 'within_box', area]
+            plan = self._plan(spec)
+            self.assertIsInstance(plan, GeoScanPlan)
+            self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+        self.assertTrue(self._expected(['location', 'within_box', (-1.0, 179.95, 1.0, -179.95)]))
+
+    def test_radius_query_uses_index(self):
+        for area in ((48.85, 2.35, 50000), (0.0, 180.0, 20000), (-33.9, 151.2, 0)):
+            spec = ['location', 'within_radius', area]
+            plan = self._plan(spec)
+            self.assertIsInstance(plan, GeoScanPlan)
+            self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+        self.assertEqual(plan.explain()['plan_type'], 'GeoScanPlan')
+
+    def test_nearest(self):
+        plan = self.indexed.nearest('location', 48.0, 2.0, k=7)
+        self.assertIsInstance(plan, GeoNearestPlan)
+        ranked = plan.ranked()
+        expected = sorted(distance_m(48.0, 2.0, *r.location) for r in self.records)[:7]
+        self.assertEqual([round(d, 3) for _, d in ranked], [round(d, 3) for d in expected])
+        self.assertEqual(len(self.indexed.nearest('location', 0.0, 0.0, k=1000).ranked()), len(self.records))
+
+    def test_linq_within(self):
+        # LINQ predicates name fields through the row alias
+        indexes = Dictionary(transaction=self.transaction).set_at('r.location', self.indexed.indexes.get_at('location'))
+        plan = IndexedQueryPlan(indexes=indexes, based_on=self.indexed.based_on, transaction=self.transaction)
+        query = from_collection(plan).where(F.location.within(40.0, -4.0, 41.0, -3.5))
+        self.assertEqual(query.explain('json')['optimized_node'], 'GeoScanPlan')
+        self.assertEqual(sorted(r.id for r in query.to_list()),
+                         self._expected(['location', 'within_box', (40.0, -4.0, 41.0, -3.5)]))
+        query = from_collection(plan).where(F.location.within(48.85, 2.35, 30000))
+        self.assertEqual(sorted(r.id for r in query.to_list()),
+                         self._expected(['location', 'within_radius', (48.85, 2.35, 30000)]))
+        # Local evaluation gives the same answer
+        self.assertTrue(F.location.within(40.0, -4.0, 41.0, -3.5)({'location': (40.5, -3.7)}))
+        with self.assertRaises(TypeError):
+            F.location.within(1, 2)
+
+    def test_updates_keep_index_aligned(self):
+        added = DBObject(transaction=self.transaction).set_at('id', 900).set_at('location', (40.5, -3.7))
+        added._save()
+        updated = self.indexed.update_indexes_on_add(added).update_indexes_on_remove(self.records[0])
+        records = self.records[1:] + [added]
+        spec = ['location', 'within_radius', (40.4, -3.7, 150000)]
+        self.assertEqual(sorted(r.id for r in self._plan(spec, updated).execute()), self._expected(spec, records))
+        self.assertIn(900, self._expected(spec, records))
+
+    def test_index_survives_reload(self):
+        self.transaction.set_root_object('records', List.from_values(self.records, transaction=self.transaction))
+        self.transaction.set_root_object('by_location', self.indexed.indexes.get_at('location'))
+        self.transaction.commit()
+
+        tr = self.database.new_transaction()
+        index = tr.get_root_object('by_location')
+        self.assertIsInstance(index, GeoIndex)
+        self.assertEqual(index.indexed_field(), 'location')
+        self.assertEqual(sorted(r.id for r in index.records_in_box(-35.0, 151.0, -32.0, 152.0)),
+                         self._expected(['location', 'within_box', (-35.0, 151.0, -32.0, 152.0)]))
+
+        # The planner still answers from the reloaded index
+        indexes = Dictionary(transaction=tr).set_at('location', index)
+        base = ListPlan(base_list=tr.get_root_object('records'), transaction=tr)
+        indexed = IndexedQueryPlan(indexes=indexes, based_on=base, transaction=tr)
+        spec = ['location', 'within_radius', (48.85, 2.35, 50000)]
+        plan = WherePlan(filter=Expression.compile(spec), based_on=indexed, transaction=tr).optimize()
+        self.assertIsInstance(plan, GeoScanPlan)
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+        tr.abort()
+
+if __name__ == '__main__':
+    unittest.main()
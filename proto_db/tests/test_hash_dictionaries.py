@@ -160,3 +160,49 @@ class TestHashDictionary(unittest.TestCase):
         # Check for non-existing keys
         self.assertFalse(test_dict.has(30), "Should return False for a non-existing key.")
         self.assertFalse(self.empty_dictionary.has(10), "Empty dictionary should return False for any key.")
+
+    # --- Test split/join set algebra ---
+    def test_union_intersection_difference(self):
+        """Test the tree merge set operations against Python sets, checking AVL invariants."""
+        import random
+        from unittest import mock
+        from proto_db import hash_dictionaries
+
+        def build(keys):
+            d = HashDictionary()
+            for k in keys:
+                d = d.set_at(k, k * 10)
+            return d
+
+        def check_balanced(node):
+            if node is None or node.key is None:
+                return 0, 0
+            left_count, left_height = check_balanced(node.previous)
+            right_count, right_height = check_balanced(node.next)
+            self.assertLessEqual(abs(left_height - right_height), 1)
+            self.assertEqual(node.count, 1 + left_count + right_count)
+            self.assertEqual(node.height, 1 + max(left_height, right_height))
+            return node.count, node.height
+
+        rng = random.Random(31)
+        for _ in range(50):
+            a = set(rng.sample(range(400), rng.randint(0, 150)))
+            b = set(rng.sample(range(400), rng.randint(0, 150)))
+            tree_a, tree_b = build(a), build(b)
+            for result, expected in ((tree_a.union(tree_b), a | b),
+                                     (tree_a.intersection(tree_b), a & b),
+                                     (tree_a.difference(tree_b), a - b)):
+                check_balanced(result)
+                self.assertEqual([k for k, _ in result.as_iterable()], sorted(expected))
+
+        counts = build([1, 2]).union(build([2, 3]), combine=lambda x, y: x + y)
+        self.assertEqual(list(counts.as_iterable()), [(1, 10), (2, 40), (3, 30)])
+
+        # Derived versions share almost every subtree: those branches are skipped
+        base = build(range(1000))
+        derived = base.set_at(5000, 0)
+        with mock.patch.object(hash_dictionaries, '_node', wraps=hash_dictionaries._node) as new_nodes:
+            self.assertEqual(derived.difference(base).count, 1)
+            self.assertEqual(base.intersection(derived).count, 1000)
+            self.assertIs(base.union(base), base)
+        self.assertLess(new_nodes.call_count, 200)
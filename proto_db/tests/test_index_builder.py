@@ -0,0 +1,234 @@
+import threading
+import unittest
+from unittest import mock
+
+from proto_db import index_builder as builder_module
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import RepeatedKeysDictionary
+from proto_db.index_builder import OnlineIndexBuilder, collection_changes
+from proto_db.indexes import IndexDefinition
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import WherePlan
+from proto_db.sets import Set
+
+
+class TestBulkConstruction(unittest.TestCase):
+
+    def test_from_pairs_matches_incremental_index(self):
+        records = [DBObject().set_at('age', (i * 7) % 13) for i in range(100)]
+        bulk = RepeatedKeysDictionary.from_pairs([(r.age, r) for r in records] + [(None, records[0])])
+        incremental = RepeatedKeysDictionary()
+        for record in records:
+            incremental = incremental.set_at(record.age, record)
+        self.assertEqual([(k, v.count) for k, v in bulk.as_iterable()],
+                         [(k, v.count) for k, v in incremental.as_iterable()])
+        self.assertEqual(bulk.statistics.row_count, 100)
+        self.assertEqual(bulk.statistics.distinct_count, 13)
+        self.assertLessEqual(bulk.content.height, 4)
+        self.assertEqual(bulk.set_at(99, records[1]).get_at(99).count, 1)
+
+    def test_list_from_values_is_balanced(self):
+        values = List.from_values(list(range(1000)))
+        self.assertEqual(values.count, 1000)
+        self.assertEqual(list(values.as_iterable()), list(range(1000)))
+        self.assertLessEqual(values.height, 10)
+        self.assertEqual(values.insert_at(500, -1).get_at(500), -1)
+
+
+class TestOnlineIndexBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        tr = self.database.new_transaction()
+        people = List(transaction=tr)
+        for i in range(300):
+            people = people.append_last(DBObject(transaction=tr).set_at('id', i).set_at('age', i % 50))
+        tr.set_root_object('people', people)
+        tr.commit()
+
+    def _ages(self, collection) -> dict:
+        index = collection.indexes.get_at('age')
+        return {key: sorted(r.id for r in bucket.as_iterable()) for key, bucket in index.as_iterable()}
+
+    def _expected_ages(self, collection) -> dict:
+        expected = {}
+        for record in collection.as_iterable():
+            expected.setdefault(record.age, []).append(record.id)
+        return {key: sorted(ids) for key, ids in expected.items()}
+
+    def test_build_and_publish(self):
+        # Keys are sorted in several runs, merged to build the index
+        with mock.patch.object(builder_module, 'SCAN_BATCH', 20), mock.patch.object(builder_module, 'SORT_RUN', 50):
+            builder = OnlineIndexBuilder(self.database, 'people', 'age').start()
+            builder.wait(30)
+        self.assertEqual(builder.progress()['state'], 'done')
+        self.assertEqual(builder.progress()['records_scanned'], 300)
+
+        tr = self.database.new_transaction()
+        people = tr.get_root_object('people')
+        self.assertEqual(self._ages(people), self._expected_ages(people))
+        young = people.as_query_plan().indexes.get_at('age').get_at(7)
+        self.assertEqual(young.count, 6)
+        tr.abort()
+
+    def test_writes_after_publication_maintain_the_index(self):
+        OnlineIndexBuilder(self.database, 'people', 'age').run()
+
+        writer = self.database.new_transaction()
+        people = writer.get_root_object('people')
+        people = people.remove_at(0).append_last(DBObject(transaction=writer).set_at('id', 1000).set_at('age', 7))
+        writer.set_root_object('people', people)
+        writer.commit()
+
+        tr = self.database.new_transaction()
+        people = tr.get_root_object('people')
+        self.assertEqual(self._ages(people), self._expected_ages(people))
+        plan = WherePlan(filter_spec=['age', '==', 7], based_on=people.as_query_plan(), transaction=tr).optimize()
+        self.assertEqual(sorted(r.id for r in plan.execute()), [7, 57, 107, 157, 207, 257, 1000])
+        plan = WherePlan(filter_spec=['age', '==', 0], based_on=people.as_query_plan(), transaction=tr).optimize()
+        self.assertEqual(sorted(r.id for r in plan.execute()), [50, 100, 150, 200, 250])
+        tr.abort()
+
+    def test_catches_up_with_concurrent_commits(self):
+        builder = OnlineIndexBuilder(self.database, 'people', 'age')
+        original_build = builder._build
+
+        def build_then_write(collection, transaction):
+            index = original_build(collection, transaction)
+            # A writer commits while the index is being built
+            writer = self.database.new_transaction()
+            people = writer.get_root_object('people')
+            people = people.remove_at(0).append_last(DBObject(transaction=writer).set_at('id', 1000).set_at('age', 7))
+            writer.set_root_object('people', people)
+            writer.commit()
+            return index
+
+        with mock.patch.object(builder, '_build', build_then_write):
+            builder.run()
+        self.assertEqual(builder.progress()['records_caught_up'], 2)
+
+        tr = self.database.new_transaction()
+        people = tr.get_root_object('people')
+        self.assertEqual(people.count, 300)
+        ages = self._ages(people)
+        self.assertEqual(ages, self._expected_ages(people))
+        self.assertIn(1000, ages[7])
+        self.assertNotIn(0, ages[0])
+        tr.abort()
+
+    def test_publication_retries_after_a_racing_commit(self):
+        builder = OnlineIndexBuilder(self.database, 'people', 'age')
+        original_caught_up = builder._caught_up
+        raced = []
+
+        def caught_up_then_race(index, base, current):
+            index = original_caught_up(index, base, current)
+            if not raced:
+                raced.append(True)
+                writer = self.database.new_transaction()
+                people = writer.get_root_object('people')
+                writer.set_root_object('people', people.append_last(
+                    DBObject(transaction=writer).set_at('id', 2000).set_at('age', 3)))
+                writer.commit()
+            return index
+
+        with mock.patch.object(builder, '_caught_up', caught_up_then_race):
+            builder.run()
+        self.assertEqual(builder.progress()['publish_attempts'], 2)
+
+        tr = self.database.new_transaction()
+        people = tr.get_root_object('people')
+        self.assertEqual(self._ages(people), self._expected_ages(people))
+        tr.abort()
+
+    def test_cancel_publishes_nothing(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_keys(index_def, record):
+            started.set()
+            release.wait(10)
+            return [record.age]
+
+        with mock.patch.object(builder_module, 'SCAN_BATCH', 10), \
+                mock.patch.object(builder_module, 'record_index_keys', blocking_keys):
+            builder = OnlineIndexBuilder(self.database, 'people', 'age').start()
+            started.wait(10)
+            builder.cancel()
+            release.set()
+            self.assertIsNone(builder.wait(10))
+        self.assertEqual(builder.progress()['state'], 'cancelled')
+
+        tr = self.database.new_transaction()
+        people = tr.get_root_object('people')
+        self.assertFalse(people.indexes and people.indexes.has('age'))
+        tr.abort()
+
+    def test_index_definition_on_a_set(self):
+        tr = self.database.new_transaction()
+        tags = Set(transaction=tr)
+        for i in range(40):
+            tags = tags.add(DBObject(transaction=tr).set_at('name', f'tag{i}').set_at('group', i % 4))
+        tr.set_root_object('tags', tags)
+        tr.commit()
+
+        definition = IndexDefinition(name='by_group', extractor=lambda r: r.group,
+                                     index_class=RepeatedKeysDictionary)
+        OnlineIndexBuilder(self.database, 'tags', definition).run()
+
+        tr = self.database.new_transaction()
+        tags = tr.get_root_object('tags')
+        index = tags.indexes.get_at('by_group')
+        self.assertEqual(sorted((k, len(list(v.as_iterable()))) for k, v in index.as_iterable()),
+                         [(0, 10), (1, 10), (2, 10), (3, 10)])
+        tr.abort()
+
+    def test_list_changes_skip_shared_subtrees(self):
+        tr = self.database.new_transaction()
+        people = tr.get_root_object('people')
+        for i in range(300, 2000):
+            people = people.append_last(DBObject(transaction=tr).set_at('id', i).set_at('age', i % 50))
+        tr.set_root_object('people', people)
+        tr.commit()
+        snapshot = self.database.new_transaction()
+        writer = self.database.new_transaction()
+        people = writer.get_root_object('people')
+        writer.set_root_object('people', people.remove_at(700).insert_at(1500, DBObject(
+            transaction=writer).set_at('id', 5000).set_at('age', 1)))
+        writer.commit()
+
+        tr = self.database.new_transaction()
+        loaded = []
+        original_load = List._load
+
+        def counting_load(node):
+            if not node._loaded:
+                loaded.append(node)
+            original_load(node)
+
+        with mock.patch.object(List, '_load', counting_load):
+            removed, added = collection_changes(snapshot.get_root_object('people'), tr.get_root_object('people'))
+        self.assertEqual([r.id for r in removed], [700])
+        self.assertEqual([r.id for r in added], [5000])
+        # Only the paths to the changes are read, not the 2000 nodes of each version
+        self.assertLess(len(loaded), 120)
+        snapshot.abort()
+        tr.abort()
+
+    def test_set_changes_from_merge_walk(self):
+        records = [DBObject().set_at('n', i) for i in range(10)]
+        old = Set()
+        for record in records[:6]:
+            old = old.add(record)
+        new = old.remove_at(records[0]).add(records[8])
+        removed, added = collection_changes(old, new)
+        self.assertEqual([r.n for r in removed], [0])
+        self.assertEqual([r.n for r in added], [8])
+        self.assertEqual(collection_changes(new, new), ([], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
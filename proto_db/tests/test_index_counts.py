@@ -0,0 +1,165 @@
+import random
+import unittest
+from unittest import mock
+
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary, RepeatedKeysDictionary, UniqueIndex
+from proto_db.linq import F, from_collection
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    AndMerge, CountPlan, Expression, IndexedQueryPlan, IndexedRangeSearchPlan, ListPlan, OrMerge, WherePlan,
+    range_count
+)
+from proto_db.sets import CountedSet
+
+
+class RowWrap:
+    __slots__ = ('r',)
+
+    def __init__(self, row: dict):
+        self.r = row
+
+
+class TestIndexCounts(unittest.TestCase):
+
+    def setUp(self):
+        space = ObjectSpace(storage=MemoryStorage())
+        self.transaction = space.new_database('TestDB').new_transaction()
+        rng = random.Random(23)
+        self.rows = [{'id': i, 'score': rng.randrange(100), 'tag': rng.choice(['a', 'b', 'c', 'd'])}
+                     for i in range(800)]
+        # Keys of other types share the score index
+        self.rows += [{'id': 800 + i, 'score': s, 'tag': 'a'} for i, s in enumerate(['x', 'y', 'y', True])]
+        self.wrapped = [RowWrap(row) for row in self.rows]
+        self.base = ListPlan(base_list=self.wrapped, transaction=self.transaction)
+        indexes = Dictionary(transaction=self.transaction)
+        for field in ('score', 'tag'):
+            index = RepeatedKeysDictionary.from_pairs(((w.r[field], w) for w in self.wrapped),
+                                                      transaction=self.transaction)
+            indexes = indexes.set_at(f'r.{field}', index)
+        self.plan = IndexedQueryPlan(indexes=indexes, based_on=self.base, transaction=self.transaction)
+
+    def _where(self, spec):
+        return WherePlan(filter=Expression.compile(spec), based_on=self.plan, transaction=self.transaction)
+
+    def _expected(self, spec):
+        flt = Expression.compile(spec)
+
+        def matches(w):
+            # Keys of another type are never in range
+            try:
+                return flt.match(w)
+            except TypeError:
+                return False
+        return sum(1 for w in self.wrapped if matches(w))
+
+    def test_range_count(self):
+        index = self.plan.indexes.get_at('r.score')
+        numbers = [row['score'] for row in self.rows if type(row['score']) is int]
+        cases = [
+            ((10, 20, True, True), lambda v: 10 <= v <= 20),
+            ((10, 20, False, False), lambda v: 10 < v < 20),
+            ((None, 5, True, False), lambda v: v < 5),
+            ((90, None, False, True), lambda v: v > 90),
+            ((200, 300, True, True), lambda v: False),
+        ]
+        for args, predicate in cases:
+            self.assertEqual(range_count(index, *args), sum(1 for v in numbers if predicate(v)))
+        self.assertEqual(range_count(index, 'x', None, True, True), 3)
+        self.assertEqual(range_count(index, None, 'x', True, False), 0)
+        self.assertEqual(range_count(index, None, None), len(self.rows))
+
+        # One record per key: counted from key positions only
+        unique = UniqueIndex(transaction=self.transaction)
+        for key in [3, 1, 4, 15, 9, 26, 'e', 'pi']:
+            unique = unique.set_at(key, RowWrap({'id': key}))
+        self.assertEqual(range_count(unique, 3, 15, True, False), 3)
+        self.assertEqual(range_count(unique, 4, None, False, True), 3)
+        self.assertEqual(range_count(unique, None, 'm', True, True), 1)
+
+    def test_stored_index_counts(self):
+        database = ObjectSpace(storage=MemoryStorage()).new_database('StoredDB')
+        tr = database.new_transaction()
+        records = [DBObject(transaction=tr, id=i, score=i % 30) for i in range(300)]
+        bulk = RepeatedKeysDictionary.from_pairs(((r.score, r) for r in records), transaction=tr)
+        incremental = RepeatedKeysDictionary(transaction=tr)
+        for record in records:
+            incremental = incremental.set_at(record.score, record)
+        incremental = incremental.remove_at(3)
+        tr.set_root_object('records', List.from_values(records, transaction=tr))
+        tr.set_root_object('bulk', bulk)
+        tr.set_root_object('incremental', incremental)
+        tr.commit()
+
+        tr = database.new_transaction()
+        for name, removed in (('bulk', 0), ('incremental', 10)):
+            index = tr.get_root_object(name)
+            # Totals of the key tree answer without visiting the buckets in range
+            with mock.patch.object(RepeatedKeysDictionary, 'items_from', side_effect=AssertionError('walked')):
+                self.assertEqual(range_count(index, 15, None, False, True), 140)
+                self.assertEqual(range_count(index, 0, 5, True, False), 50 - removed)
+                self.assertEqual(range_count(index, None, None), 300 - removed)
+            plan = IndexedQueryPlan(indexes=Dictionary(transaction=tr).set_at('score', index),
+                                    based_on=tr.get_root_object('records').as_query_plan(), transaction=tr)
+            where = WherePlan(filter=Expression.compile(['score', '>', 15]), based_on=plan, transaction=tr)
+            self.assertEqual(where.optimize().count(), 140)
+        tr.abort()
+
+    def test_counts_do_not_read_records(self):
+        specs = [
+            ['r.score', '==', 42],
+            ['r.score', 'between()', 30, 60],
+            ['r.score', '>=', 95],
+            ['r.score', '<', 'y'],
+        ]
+        for spec in specs:
+            count = CountPlan(based_on=self._where(spec), transaction=self.transaction).optimize()
+            with mock.patch.object(IndexedQueryPlan, 'get_range', side_effect=AssertionError('records read')), \
+                    mock.patch.object(CountedSet, 'as_iterable', side_effect=AssertionError('records read')):
+                self.assertEqual(count.execute(), [{'count': self._expected(spec)}])
+        self.assertIsInstance(self._where(['r.score', '>=', 95]).optimize(), IndexedRangeSearchPlan)
+
+    def test_merged_counts(self):
+        spec = ['&', ['r.tag', '==', 'b'], ['r.score', '<', 30]]
+        plan = self._where(spec).optimize()
+        self.assertIsInstance(plan, AndMerge)
+        self.assertEqual(plan.count(), self._expected(spec))
+
+        # Residual filters are applied to the intersection before counting
+        residual = AndMerge(and_queries=plan.and_queries, residual_filters=[Expression.compile(['r.id', '<', 400])],
+                            transaction=self.transaction)
+        self.assertEqual(residual.count(), self._expected(['&', spec, ['r.id', '<', 400]]))
+
+        # A sub-query without references of its own still contributes to the union
+        spec = ['|', ['r.tag', '==', 'd'], ['r.score', '>', 97]]
+        plan = self._where(spec).optimize()
+        self.assertIsInstance(plan, OrMerge)
+        self.assertEqual(plan.count(), self._expected(spec))
+        extra = OrMerge(or_queries=plan.or_queries + [ListPlan(base_list=self.wrapped[:3], transaction=self.transaction)],
+                        transaction=self.transaction)
+        self.assertEqual(extra.count(), self._expected(['|', spec, ['r.id', '<', 3]]))
+        self.assertTrue(extra.exists())
+
+    def test_linq_count_and_any(self):
+        query = from_collection(self.plan)
+        for predicate, spec in (
+                (F.r.tag == 'c', ['r.tag', '==', 'c']),
+                (F.r.score.between(10, 12), ['r.score', 'between[]', 10, 12]),
+                ((F.r.tag == 'a') & (F.r.score >= 50), ['&', ['r.tag', '==', 'a'], ['r.score', '>=', 50]]),
+        ):
+            self.assertEqual(from_collection(self.plan).count(predicate), self._expected(spec))
+        self.assertEqual(query.where(F.r.score > 1000).count(), 0)
+
+        with mock.patch.object(IndexedQueryPlan, 'get_range', side_effect=AssertionError('records read')):
+            self.assertTrue(from_collection(self.plan).any(F.r.score >= 99))
+            self.assertFalse(from_collection(self.plan).any(F.r.score.between(100, 200)))
+        self.assertTrue(from_collection(self.plan).where(F.r.tag == 'd').any())
+        self.assertFalse(from_collection(self.plan).any(F.r.tag == 'zz'))
+        # Local predicates are still counted row by row
+        self.assertEqual(from_collection(self.plan).count(lambda w: w.r['id'] % 2 == 0), len(self.rows) // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
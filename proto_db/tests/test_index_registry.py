@@ -0,0 +1,121 @@
+import random
+import unittest
+
+from proto_db.indexes import IndexDefinition, IndexRegistry, PersistentMap, PersistentSet
+
+
+class CollidingKey:
+    """
+    Key whose hash is shared by every key of the same group.
+    """
+
+    def __init__(self, value, group):
+        self.value = value
+        self.group = group
+
+    def __hash__(self):
+        return self.group
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and other.value == self.value
+
+    def __repr__(self):
+        return f'CollidingKey({self.value}, {self.group})'
+
+
+class TestPersistentMap(unittest.TestCase):
+
+    def test_random_updates_match_dict(self):
+        rng = random.Random(7)
+        model = {}
+        persistent = PersistentMap()
+        versions = []
+        for _ in range(5000):
+            key = rng.randrange(800)
+            if rng.random() < 0.3:
+                model.pop(key, None)
+                persistent = persistent.remove(key)
+            else:
+                model[key] = rng.random()
+                persistent = persistent.set(key, model[key])
+            if rng.random() < 0.01:
+                versions.append((dict(model), persistent))
+        self.assertEqual(len(persistent), len(model))
+        self.assertEqual(dict(persistent.items()), model)
+        # Older versions are not affected by later updates
+        for expected, version in versions:
+            self.assertEqual(dict(version.items()), expected)
+
+    def test_hash_collisions(self):
+        keys = [CollidingKey(i, i % 3) for i in range(30)]
+        persistent = PersistentMap()
+        for key in keys:
+            persistent = persistent.set(key, key.value)
+        self.assertEqual(len(persistent), 30)
+        self.assertEqual(persistent[CollidingKey(13, 1)], 13)
+        for key in keys[::2]:
+            persistent = persistent.remove(key)
+        self.assertEqual(sorted(persistent[key] for key in persistent), list(range(1, 30, 2)))
+        self.assertNotIn(CollidingKey(12, 0), persistent)
+        with self.assertRaises(KeyError):
+            persistent[CollidingKey(12, 0)]
+
+    def test_unchanged_updates_return_same_instance(self):
+        persistent = PersistentMap().set('a', 1)
+        value = persistent['a']
+        self.assertIs(persistent.set('a', value), persistent)
+        self.assertIs(persistent.remove('missing'), persistent)
+        elements = PersistentSet([1, 2])
+        self.assertIs(elements.add(1), elements)
+        self.assertEqual(elements, frozenset({1, 2}))
+        self.assertEqual(elements | {3}, {1, 2, 3})
+
+
+class TestIndexRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = IndexRegistry(defs=(
+            IndexDefinition('city', lambda item: [item['city']], dict),
+            IndexDefinition('tag', lambda item: item['tags'], dict),
+        ))
+
+    def test_add_many_and_remove_many(self):
+        items = {i: {'city': f'c{i % 5}', 'tags': [f't{i % 3}', 'all']} for i in range(100)}
+        registry = self.registry.with_add_many(items.items())
+        self.assertEqual(registry.get('city')['c2'], frozenset(i for i in items if i % 5 == 2))
+        self.assertEqual(len(registry.get('tag')['all']), 100)
+
+        one_by_one = self.registry
+        for obj_id, item in items.items():
+            one_by_one = one_by_one.with_add(obj_id, item)
+        self.assertEqual(dict(one_by_one.get('tag').items()), dict(registry.get('tag').items()))
+
+        removed = registry.with_remove_many((i, items[i]) for i in range(100) if i % 5 == 2)
+        self.assertNotIn('c2', removed.get('city'))
+        self.assertEqual(len(removed.get('tag')['all']), 80)
+        # The registry the batch was applied to is unchanged
+        self.assertEqual(len(registry.get('tag')['all']), 100)
+
+    def test_replace_and_noop(self):
+        registry = self.registry.with_add(1, {'city': 'Paris', 'tags': ['a']})
+        moved = registry.with_replace(1, {'city': 'Paris', 'tags': ['a']}, {'city': 'Rome', 'tags': ['a']})
+        self.assertEqual(moved.get('city')['Rome'], {1})
+        self.assertNotIn('Paris', moved.get('city'))
+        self.assertIs(moved.get('tag'), registry.get('tag'))
+        self.assertIs(registry.with_remove(2, {'city': 'Oslo', 'tags': []}), registry)
+
+    def test_string_keys_are_single_keys(self):
+        registry = IndexRegistry(defs=(IndexDefinition('city', lambda item: item['city'], dict),))
+        registry = registry.with_add_many([(1, {'city': 'Paris'}), (2, {'city': 'Rome'})])
+        self.assertEqual(sorted(registry.get('city')), ['Paris', 'Rome'])
+        self.assertEqual(registry.get('city')['Paris'], {1})
+
+    def test_plain_dict_data_is_accepted(self):
+        registry = IndexRegistry(data={'city': {'Paris': frozenset({1, 2})}}, defs=self.registry.defs)
+        registry = registry.with_add(3, {'city': 'Paris', 'tags': []})
+        self.assertEqual(registry.get('city')['Paris'], {1, 2, 3})
+        self.assertEqual(len(registry.get('missing')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,13 @@
+import random
 import unittest
 from unittest.mock import MagicMock
 
 from proto_db.common import AtomPointer, DBObject
 from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary, PartialIndex, RepeatedKeysDictionary, UniqueIndex
+from proto_db.exceptions import ProtoValidationException
 from proto_db.memory_storage import MemoryStorage
-from proto_db.queries import JoinPlan, ListPlan, FromPlan
+from proto_db.queries import IndexedQueryPlan, JoinPlan, ListPlan, FromPlan, OrderedIndexScanPlan
 
 
 class TestJoinPlan(unittest.TestCase):
@@ -344,5 +347,130 @@ class TestJoinPlan(unittest.TestCase):
         self.departments_from.optimize.assert_called_once()
 
 
+class TestKeyedJoins(unittest.TestCase):
+    """
+    Joins on explicit keys: hash, merge and index nested-loop strategies.
+    """
+
+    def setUp(self):
+        self.transaction = ObjectSpace(storage=MemoryStorage()).new_database('TestDB').new_transaction()
+        rng = random.Random(3)
+        # A few employees without a department, or with one that does not exist
+        self.employees = [
+            DBObject(transaction=self.transaction, emp_id=i,
+                     dept=None if i % 50 == 0 else (99 if i % 45 == 0 else rng.randrange(20)))
+            for i in range(300)
+        ]
+        self.departments = [DBObject(transaction=self.transaction, dept_no=d, dept_name=f'D{d}') for d in range(25)]
+        # Two rows for department 3
+        self.departments.append(DBObject(transaction=self.transaction, dept_no=3, dept_name='D3b'))
+        self.employees_plan = ListPlan(base_list=self.employees, transaction=self.transaction)
+        self.departments_plan = ListPlan(base_list=self.departments, transaction=self.transaction)
+
+    def _join(self, join_type='inner', left=None, right=None, **kwargs):
+        return JoinPlan(based_on=left or self.employees_plan, join_query=right or self.departments_plan,
+                        join_type=join_type, left_key='dept', right_key='dept_no',
+                        transaction=self.transaction, **kwargs)
+
+    def _expected(self, join_type):
+        pairs = [(e.emp_id, d.dept_name) for e in self.employees for d in self.departments if e.dept == d.dept_no]
+        if join_type == 'left':
+            matched = {emp_id for emp_id, _ in pairs}
+            pairs += [(e.emp_id, None) for e in self.employees if e.emp_id not in matched]
+        if join_type == 'right':
+            matched = {name for _, name in pairs}
+            pairs += [(None, d.dept_name) for d in self.departments if d.dept_name not in matched]
+        return sorted(pairs, key=repr)
+
+    def _pairs(self, plan):
+        return sorted(((getattr(r, 'emp_id', None), getattr(r, 'dept_name', None)) for r in plan.execute()), key=repr)
+
+    def _indexed(self, records, field):
+        index = RepeatedKeysDictionary.from_pairs(((getattr(r, field), r) for r in records), transaction=self.transaction)
+        return IndexedQueryPlan(indexes=Dictionary(transaction=self.transaction).set_at(field, index),
+                                based_on=ListPlan(base_list=records, transaction=self.transaction),
+                                transaction=self.transaction), index
+
+    def test_hash_join_builds_on_smaller_side(self):
+        for join_type in ('inner', 'left', 'right'):
+            plan = self._join(join_type).optimize()
+            explained = plan.explain()
+            self.assertEqual(explained['strategy'], 'hash')
+            self.assertEqual(explained['join_keys'], ['dept', 'dept_no'])
+            self.assertEqual(self._pairs(plan), self._expected(join_type))
+        self.assertEqual(self._join().optimize().explain()['build_side'], 'right')
+        # Without optimize, keyed joins still hash
+        self.assertEqual(self._pairs(self._join()), self._expected('inner'))
+        row = next(iter(self._join().execute()))
+        self.assertEqual((row.emp_id, row.dept), (self.employees[1].emp_id, self.employees[1].dept))
+
+    def test_merge_join_on_index_ordered_inputs(self):
+        plans = []
+        for records, field in ((self.employees, 'dept'), (self.departments, 'dept_no')):
+            indexed, index = self._indexed(records, field)
+            plans.append(OrderedIndexScanPlan(index=index, field=field, based_on=indexed.based_on,
+                                              transaction=self.transaction))
+        for join_type in ('inner', 'left', 'right'):
+            plan = self._join(join_type, left=plans[0], right=plans[1]).optimize()
+            self.assertEqual(plan.explain()['strategy'], 'merge')
+            self.assertEqual(self._pairs(plan), self._expected(join_type))
+
+        # Unsorted inputs are rejected instead of giving a wrong answer
+        with self.assertRaises(ProtoValidationException):
+            list(self._join(strategy='merge').execute())
+
+    def test_index_nested_loop_join(self):
+        departments, _ = self._indexed(self.departments, 'dept_no')
+        few = ListPlan(base_list=self.employees[:10], transaction=self.transaction)
+        plan = self._join('inner', left=few, right=departments).optimize()
+        explained = plan.explain()
+        self.assertEqual((explained['strategy'], explained['driving_side']), ('index', 'left'))
+        self.employees = self.employees[:10]
+        self.assertEqual(self._pairs(plan), self._expected('inner'))
+
+        plan = self._join('left', left=few, right=departments).optimize()
+        self.assertEqual(plan.explain()['strategy'], 'index')
+        self.assertEqual(self._pairs(plan), self._expected('left'))
+
+        # The indexed side may be the left one of an inner join
+        employees, _ = self._indexed(self.employees, 'dept')
+        plan = self._join('inner', left=employees, right=ListPlan(base_list=self.departments[:4],
+                                                                   transaction=self.transaction)).optimize()
+        self.assertEqual((plan.explain()['strategy'], plan.explain()['driving_side']), ('index', 'right'))
+        self.departments = self.departments[:4]
+        self.assertEqual(self._pairs(plan), self._expected('inner'))
+
+    def test_index_join_needs_a_complete_index(self):
+        few = ListPlan(base_list=self.employees[:10], transaction=self.transaction)
+        self.employees = self.employees[:10]
+        # A partial index only holds some departments: the join hashes the whole side instead
+        partial = PartialIndex(field_name='dept_no', predicate=['dept_no', '<', 5], transaction=self.transaction)
+        for department in self.departments:
+            partial = partial.add_record(department)
+        departments = IndexedQueryPlan(indexes=Dictionary(transaction=self.transaction).set_at('dept_no', partial),
+                                       based_on=self.departments_plan, transaction=self.transaction)
+        plan = self._join('inner', left=few, right=departments).optimize()
+        self.assertEqual(plan.explain()['strategy'], 'hash')
+        self.assertEqual(self._pairs(plan), self._expected('inner'))
+
+        unique = UniqueIndex(field_name='dept_no', transaction=self.transaction)
+        for department in self.departments[:25]:
+            unique = unique.set_at(department.dept_no, department)
+        self.departments = self.departments[:25]
+        departments = IndexedQueryPlan(indexes=Dictionary(transaction=self.transaction).set_at('dept_no', unique),
+                                       based_on=ListPlan(base_list=self.departments, transaction=self.transaction),
+                                       transaction=self.transaction)
+        plan = self._join('left', left=few, right=departments).optimize()
+        self.assertEqual(plan.explain()['strategy'], 'index')
+        self.assertEqual(self._pairs(plan), self._expected('left'))
+
+    def test_keys_are_validated(self):
+        with self.assertRaises(ProtoValidationException):
+            JoinPlan(join_query=self.departments_plan, based_on=self.employees_plan, left_key='dept',
+                     transaction=self.transaction)
+        with self.assertRaises(ProtoValidationException):
+            self._join(strategy='sideways')
+
+
 if __name__ == "__main__":
     unittest.main()
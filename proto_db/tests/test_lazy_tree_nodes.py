@@ -0,0 +1,90 @@
+import unittest
+
+from proto_db.db_access import ObjectSpace
+from proto_db.memory_storage import MemoryStorage
+
+
+class TestLazyTreeNodes(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+
+    def _reload(self, name):
+        tr = self.database.new_transaction()
+        root = tr.get_root_object(name)
+        root._load()
+        return tr, root
+
+    def test_list_update_does_not_load_untouched_siblings(self):
+        tr = self.database.new_transaction()
+        items = tr.new_list()
+        for i in range(200):
+            items = items.append_last(i)
+        tr.set_root_object('items', items)
+        tr.commit()
+
+        tr, items = self._reload('items')
+        self.assertEqual(items.count, 200)
+        untouched = items.previous
+        updated = items.append_last(200).set_at(199, 'x')
+        self.assertFalse(untouched._loaded)
+        self.assertEqual(updated.count, 201)
+        self.assertEqual(updated.height, items.height)
+        tr.set_root_object('items', updated)
+        tr.commit()
+
+        tr, items = self._reload('items')
+        self.assertEqual(list(items.as_iterable()), list(range(199)) + ['x', 200])
+        self.assertEqual(items.get_at(57), 57)
+        tr.abort()
+
+    def test_list_remove_keeps_counts_consistent(self):
+        tr = self.database.new_transaction()
+        items = tr.new_list()
+        for i in range(100):
+            items = items.append_last(i)
+        tr.set_root_object('items', items)
+        tr.commit()
+
+        tr, items = self._reload('items')
+        for offset in (0, 50, 97):
+            items = items.remove_at(offset)
+        tr.set_root_object('items', items)
+        tr.commit()
+
+        tr, items = self._reload('items')
+        expected = list(range(100))
+        for offset in (0, 50, 97):
+            del expected[offset]
+        self.assertEqual(items.count, len(expected))
+        self.assertEqual(list(items.as_iterable()), expected)
+        self.assertEqual([items.get_at(i) for i in range(len(expected))], expected)
+        tr.abort()
+
+    def test_hash_dictionary_update_does_not_load_untouched_siblings(self):
+        tr = self.database.new_transaction()
+        table = tr.new_hash_dictionary()
+        for i in range(200):
+            table = table.set_at(i, tr.new_dictionary().set_at('n', i))
+        tr.set_root_object('table', table)
+        tr.commit()
+
+        tr, table = self._reload('table')
+        untouched = table.previous
+        updated = table.set_at(1000, tr.new_dictionary().set_at('n', 1000)).remove_at(199)
+        self.assertFalse(untouched._loaded)
+        self.assertEqual(updated.count, 200)
+        tr.set_root_object('table', updated)
+        tr.commit()
+
+        tr, table = self._reload('table')
+        self.assertEqual(table.count, 200)
+        self.assertEqual(table.get_at(1000).get_at('n'), 1000)
+        self.assertEqual(table.get_at(3).get_at('n'), 3)
+        self.assertFalse(table.has(199))
+        tr.abort()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 
-from proto_db.common import Atom
+from proto_db.common import Atom, DBObject
 from proto_db.lists import List, ListQueryPlan  # Importamos las clases que queremos probar
+from proto_db.queries import WherePlan
 
 
 class TestList(unittest.TestCase):
@@ -203,3 +204,41 @@ class TestList(unittest.TestCase):
         # Probar con un límite mayor que la longitud de la lista
         full_tail = test_list.tail(0)
         self.assertEqual(full_tail.count, 10, "Si el límite es 0, debería devolver toda la lista.")
+
+    def test_iter_from(self):
+        """iter_from yields the items in order starting at any offset."""
+        test_list = List(empty=True)
+        for i in range(50):
+            test_list = test_list.insert_at(i, i)
+        for start in (0, 1, 17, 49):
+            self.assertEqual(list(test_list.iter_from(start)), list(range(start, 50)))
+        self.assertEqual(list(test_list.iter_from(50)), [])
+        self.assertEqual(list(test_list.iter_from(-3)), [47, 48, 49])
+
+    def test_iter_reversed(self):
+        """iter_reversed yields the items in reverse order from any offset back to the first."""
+        test_list = List(empty=True)
+        for i in range(50):
+            test_list = test_list.insert_at(i, i)
+        self.assertEqual(list(test_list.iter_reversed()), list(range(49, -1, -1)))
+        for start in (0, 1, 17, 49):
+            self.assertEqual(list(test_list.iter_reversed(start)), list(range(start, -1, -1)))
+        self.assertEqual(list(List(empty=True).iter_reversed()), [])
+
+    def test_writes_maintain_field_indexes(self):
+        rows = List()
+        for i in range(6):
+            rows = rows.append_last(DBObject().set_at('id', i).set_at('k', i % 3))
+        rows = rows.add_index('k')
+
+        def ids(collection, k):
+            plan = WherePlan(filter_spec=['k', '==', k], based_on=collection.as_query_plan()).optimize()
+            return sorted(row.id for row in plan.execute())
+
+        rows = rows.append_last(DBObject().set_at('id', 100).set_at('k', 1))
+        self.assertEqual(rows.indexes.get_at('k').get_at(1).count, 3)
+        self.assertEqual(ids(rows, 1), [1, 4, 100])
+
+        rows = rows.remove_at(0)
+        self.assertEqual(rows.indexes.get_at('k').get_at(0).count, 1)
+        self.assertEqual(ids(rows, 0), [3])
@@ -0,0 +1,89 @@
+import unittest
+
+from proto_db.db_access import ObjectSpace, literal_intern_table
+from proto_db.memory_storage import MemoryStorage
+
+
+class TestLiteralInterning(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = MemoryStorage()
+        self.space = ObjectSpace(storage=self.storage)
+        self.database = self.space.new_database('TestDB')
+
+    def tearDown(self):
+        literal_intern_table.clear(self.storage)
+
+    def _store(self, name, value):
+        tr = self.database.new_transaction()
+        d = tr.new_dictionary().set_at('name', value)
+        tr.set_root_object(name, d)
+        tr.commit()
+
+    def test_literal_pointer_reused_across_transactions(self):
+        self._store('a', 'interned string')
+        tr = self.database.new_transaction()
+        first = tr.get_literal('interned string')
+        self.assertIsNotNone(first.atom_pointer)
+        tr.abort()
+
+        tr2 = self.database.new_transaction()
+        second = tr2.get_literal('interned string')
+        self.assertEqual(first.atom_pointer, second.atom_pointer)
+        self.assertEqual(second.string, 'interned string')
+        tr2.abort()
+
+    def test_commit_folds_literals_into_catalog_with_one_root_write(self):
+        history_before = self.space.get_space_history().count
+        self._store('b', 'catalogued string')
+        history_after = self.space.get_space_history().count
+        self.assertEqual(history_after, history_before + 1)
+
+        literal_root = self.space.get_space_root().literal_root
+        self.assertIsNotNone(literal_root.get_at('catalogued string'))
+
+    def test_catalog_resolves_after_intern_table_is_cleared(self):
+        self._store('c', 'persisted string')
+        tr = self.database.new_transaction()
+        pointer = tr.get_literal('persisted string').atom_pointer
+        tr.abort()
+
+        literal_intern_table.clear(self.storage)
+        tr2 = self.database.new_transaction()
+        literal = tr2.get_literal('persisted string')
+        self.assertEqual(literal.atom_pointer, pointer)
+        self.assertEqual(tr2.new_literals.count, 0)
+        self.assertEqual(tr2.get_root_object('c').get_at('name'), 'persisted string')
+        tr2.abort()
+
+    def test_aborted_transaction_leaves_no_interned_pointer(self):
+        tr = self.database.new_transaction()
+        d = tr.new_dictionary().set_at('name', 'aborted string')
+        # Setting a root object saves the transaction's new literals
+        tr.set_root_object('d', d)
+        self.assertIsNotNone(tr.get_literal('aborted string').atom_pointer)
+        tr.abort()
+
+        self.assertIsNone(literal_intern_table.lookup(self.storage, 'aborted string'))
+        tr2 = self.database.new_transaction()
+        tr2.get_literal('aborted string')
+        # Not resolved from the aborted transaction: staged again as a new literal
+        self.assertEqual(tr2.new_literals.count, 1)
+        tr2.abort()
+
+    def test_update_literals_catalogs_with_one_root_write(self):
+        tr = self.database.new_transaction()
+        tr.get_literal('space string')
+        history_before = self.space.get_space_history().count
+        self.database.update_literals(tr.new_literals)
+        tr.abort()
+
+        self.assertEqual(self.space.get_space_history().count, history_before + 1)
+        literal_root = self.space.get_space_root().literal_root
+        cataloged = literal_root.get_at('space string')
+        self.assertIsNotNone(cataloged)
+        self.assertEqual(literal_intern_table.lookup(self.storage, 'space string'), cataloged.atom_pointer)
+
+
+if __name__ == '__main__':
+    unittest.main()
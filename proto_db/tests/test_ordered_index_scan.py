@@ -0,0 +1,107 @@
+import random
+import unittest
+
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary, RepeatedKeysDictionary
+from proto_db.linq import F, from_collection
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import IndexedQueryPlan, ListPlan
+
+
+class RowWrap:
+    __slots__ = ('r',)
+
+    def __init__(self, row: dict):
+        self.r = row
+
+
+class TestOrderedIndexScan(unittest.TestCase):
+
+    def setUp(self):
+        space = ObjectSpace(storage=MemoryStorage())
+        self.transaction = space.new_database('TestDB').new_transaction()
+        rng = random.Random(17)
+        self.rows = [
+            {
+                'id': i,
+                'status': rng.choice(['open', 'closed', 'closed']),
+                # A few rows without a value, which sort last
+                'value': rng.randrange(500) if i % 40 else None,
+                'name': rng.choice(['Ann', 'bob', 'Carl', 'dora']) + str(i % 7),
+            }
+            for i in range(1200)
+        ]
+        self.wrapped = [RowWrap(row) for row in self.rows]
+        self.base = ListPlan(base_list=self.wrapped, transaction=self.transaction)
+        indexes = Dictionary(transaction=self.transaction)
+        for field in ('id', 'value'):
+            index = RepeatedKeysDictionary.from_pairs(((w.r[field], w) for w in self.wrapped),
+                                                      transaction=self.transaction)
+            indexes = indexes.set_at(f'r.{field}', index)
+        self.plan = IndexedQueryPlan(indexes=indexes, based_on=self.base, transaction=self.transaction)
+
+    def _sorted(self, rows, key, reverse=False):
+        present = sorted((row for row in rows if row[key] is not None), key=lambda row: row[key], reverse=reverse)
+        return present + [row for row in rows if row[key] is None]
+
+    def test_top_n_walks_index(self):
+        for ascending in (True, False):
+            query = from_collection(self.plan).order_by(F.r.value, ascending=ascending).skip(7).take(15)
+            self.assertEqual(query.explain('json')['optimized_node'], 'OrderedIndexScanPlan')
+            expected = self._sorted(self.rows, 'value', reverse=not ascending)[7:22]
+            self.assertEqual([w.r['value'] for w in query.to_list()], [row['value'] for row in expected])
+
+    def test_rows_without_value_come_last(self):
+        query = from_collection(self.plan).order_by(F.r.value).skip(len(self.rows) - 35).take(50)
+        values = [w.r['value'] for w in query.to_list()]
+        self.assertEqual(len(values), 35)
+        self.assertEqual(values[-30:], [None] * 30)
+        self.assertEqual(values[:5], [row['value'] for row in self._sorted(self.rows, 'value')][-35:-30])
+
+    def test_filters_applied_during_walk(self):
+        query = from_collection(self.plan).where(F.r.status == 'open').order_by(F.r.value, ascending=False).take(10)
+        self.assertEqual(query.explain('json')['optimized_node'], 'OrderedIndexScanPlan')
+        open_rows = [row for row in self.rows if row['status'] == 'open']
+        self.assertEqual([w.r['value'] for w in query.to_list()],
+                         [row['value'] for row in self._sorted(open_rows, 'value', reverse=True)[:10]])
+
+    def test_selective_indexed_filter_is_not_walked(self):
+        query = from_collection(self.plan).where(F.r.id == 25).order_by(F.r.value).take(10)
+        self.assertNotEqual(query.explain('json')['optimized_node'], 'OrderedIndexScanPlan')
+        self.assertEqual([w.r['id'] for w in query.to_list()], [25])
+
+    def test_without_index_uses_bounded_sort(self):
+        # No index on status or name: same result as a full stable sort
+        query = from_collection(self.plan).order_by(F.r.name).then_by(F.r.id, ascending=False).skip(3).take(12)
+        self.assertNotEqual(query.explain('json')['optimized_node'], 'OrderedIndexScanPlan')
+        expected = sorted(self.rows, key=lambda row: -row['id'])
+        expected = sorted(expected, key=lambda row: row['name'])[3:15]
+        self.assertEqual([w.r['id'] for w in query.to_list()], [row['id'] for row in expected])
+
+        rows = [{'k': i % 5, 'id': i} for i in range(100)]
+        query = from_collection(rows).order_by(F.k).take(8)
+        self.assertEqual([row['id'] for row in query.to_list()], [0, 5, 10, 15, 20, 25, 30, 35])
+
+    def test_expression_index(self):
+        plan = self.plan.add_expression_index(F.r.name.lower())
+        query = from_collection(plan).order_by(F.r.name.lower()).take(5)
+        self.assertEqual(query.explain('json')['optimized_node'], 'OrderedIndexScanPlan')
+        self.assertEqual([w.r['name'].lower() for w in query.to_list()],
+                         sorted(row['name'].lower() for row in self.rows)[:5])
+
+    def test_partial_index_needs_implied_predicate(self):
+        indexes = Dictionary(transaction=self.transaction).set_at('r.id', self.plan.indexes.get_at('r.id'))
+        plan = IndexedQueryPlan(indexes=indexes, based_on=self.base, transaction=self.transaction) \
+            .add_partial_index('r.value', ['r.status', '==', 'closed'], index_name='closed_by_value')
+        for status, walked in (('closed', True), ('open', False)):
+            query = from_collection(plan).where(F.r.status == status).order_by(F.r.value).take(10)
+            self.assertEqual(query.explain('json')['optimized_node'] == 'OrderedIndexScanPlan', walked)
+            selected = [row for row in self.rows if row['status'] == status]
+            self.assertEqual([w.r['value'] for w in query.to_list()],
+                             [row['value'] for row in self._sorted(selected, 'value')[:10]])
+        query = from_collection(plan).order_by(F.r.value).take(10)
+        self.assertNotEqual(query.explain('json')['optimized_node'], 'OrderedIndexScanPlan')
+
+
+if __name__ == '__main__':
+    unittest.main()
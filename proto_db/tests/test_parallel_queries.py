@@ -0,0 +1,157 @@
+import itertools
+import os
+import random
+import time
+import unittest
+from unittest import mock
+
+from proto_db import queries as queries_module
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.linq import F, from_collection
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.parallel import ParallelConfig, map_partitions
+from proto_db.queries import (
+    AgreggatorFunction, AgreggatorSpec, AndMerge, ArrayAgg, AvgAggregator, CountAggregator, GroupByPlan,
+    IndexedQueryPlan, ListPlan, MaxAgreggator, MinAgreggator, SelectPlan, SumAgreggator, WherePlan
+)
+
+
+class Median(AgreggatorFunction):
+    def compute(self, values: list):
+        ordered = sorted(values)
+        return ordered[len(ordered) // 2] if ordered else None
+
+
+class TestParallelQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.transaction = ObjectSpace(storage=MemoryStorage()).new_database('TestDB').new_transaction()
+        rng = random.Random(5)
+        self.rows = [DBObject(transaction=self.transaction, id=i, group=rng.choice('abcde'),
+                              amount=rng.choice([None, 1, 2.5, 4, 10]), active=rng.random() < 0.6)
+                     for i in range(3000)]
+        self.config = ParallelConfig(max_workers=4, min_chunk_size=64)
+
+    def _bases(self):
+        yield ListPlan(base_list=self.rows, transaction=self.transaction)
+        yield ListPlan(base_list=List.from_values(self.rows, transaction=self.transaction),
+                       transaction=self.transaction)
+
+    def test_list_partitions(self):
+        for base in self._bases():
+            parts = base.partitions(7, min_rows=100)
+            self.assertEqual(len(parts), 7)
+            self.assertEqual([row.id for part in parts for row in part()], list(range(3000)))
+            self.assertEqual(len(base.partitions(100, min_rows=1000)), 3)
+            self.assertEqual(len(base.partitions(4, min_rows=5000)), 1)
+        self.assertIsNone(WherePlan(filter_spec=['active', '?T']).partitions(4))
+
+    def test_filter_and_projection_keep_order(self):
+        for base in self._bases():
+            spec = ['&', ['active', '?T'], ['amount', '>', 2]]
+            expected = [row.id for row in WherePlan(filter_spec=spec, based_on=base).execute()]
+            where = WherePlan(filter_spec=spec, based_on=base, parallel=self.config, transaction=self.transaction)
+            self.assertEqual([row.id for row in where.execute()], expected)
+            self.assertEqual(where.optimize().explain()['parallel_workers'], 4)
+            select = SelectPlan(fields={'twice': lambda row: row.id * 2}, based_on=where, parallel=self.config)
+            self.assertEqual([row['twice'] for row in select.execute()], [i * 2 for i in expected])
+
+            unordered = ParallelConfig(max_workers=4, min_chunk_size=64, ordered=False)
+            where = WherePlan(filter_spec=spec, based_on=base, parallel=unordered)
+            self.assertEqual(sorted(row.id for row in where.execute()), expected)
+
+        # Errors of a worker reach the caller
+        failing = SelectPlan(fields={'x': lambda row: 1 / (row.id - 2500)}, parallel=self.config,
+                             based_on=ListPlan(base_list=self.rows))
+        with self.assertRaises(ZeroDivisionError):
+            list(failing.execute())
+
+    def test_partial_aggregates_are_merged(self):
+        aggregates = {name: AgreggatorSpec(agreggator, source, name) for name, agreggator, source in (
+            ('total', SumAgreggator(), 'amount'), ('average', AvgAggregator(), 'amount'),
+            ('n', CountAggregator(), 'amount'), ('low', MinAgreggator(), 'amount'),
+            ('high', MaxAgreggator(), 'amount'), ('ids', ArrayAgg(), 'id'), ('median', Median(), 'amount'))}
+
+        def run(parallel):
+            where = WherePlan(filter_spec=['id', '>=', 100], based_on=ListPlan(base_list=self.rows))
+            plan = GroupByPlan(['group'], aggregates, based_on=where, parallel=parallel,
+                               transaction=self.transaction).optimize()
+            return [(row.group, row.total, row.average, row.n, row.low, row.high, row.ids, row.median)
+                    for row in plan.execute()]
+
+        sequential = run(None)
+        self.assertEqual(len(sequential), 5)
+        self.assertEqual(run(self.config), sequential)
+        # A single worker (or a small input) runs sequentially
+        self.assertEqual(run(ParallelConfig(max_workers=1)), sequential)
+        self.assertEqual(run(ParallelConfig(max_workers=4, min_chunk_size=10_000)), sequential)
+
+    def _counting_partitions(self):
+        calls = []
+
+        def counting(tasks, **kwargs):
+            calls.append(len(tasks))
+            return map_partitions(tasks, **kwargs)
+        return calls, mock.patch.object(queries_module, 'map_partitions', counting)
+
+    def test_configuration_from_environment(self):
+        with mock.patch.dict(os.environ, {'PROTODB_PARALLEL_QUERIES': '0'}):
+            self.assertIsNone(WherePlan(filter_spec=['active', '?T']).parallel)
+        with mock.patch.dict(os.environ, {'PROTODB_PARALLEL_QUERIES': '1', 'PROTO_PARALLEL_MAX_WORKERS': '3',
+                                          'PROTO_PARALLEL_MIN_CHUNK': '64'}):
+            where = WherePlan(filter_spec=['active', '?T'], based_on=ListPlan(base_list=self.rows))
+            self.assertEqual(where.parallel.max_workers, 3)
+            self.assertEqual(SelectPlan(fields={'id': 'id'}).parallel.max_workers, 3)
+            self.assertEqual(GroupByPlan(['group'], {}).parallel.max_workers, 3)
+            calls, counting = self._counting_partitions()
+            with counting:
+                self.assertEqual([row.id for row in where.execute()], [row.id for row in self.rows if row.active])
+            self.assertEqual(len(calls), 1)
+
+    def test_index_plans_keep_the_configuration(self):
+        rows = self.rows[:300]
+        base = ListPlan(base_list=rows, transaction=self.transaction)
+        indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction).add_index('group')
+        spec = ['&', ['group', '==', 'a'], ['amount', '>', 2]]
+        config = ParallelConfig(max_workers=4, min_chunk_size=8)
+        plan = WherePlan(filter_spec=spec, based_on=indexed, parallel=config,
+                         transaction=self.transaction).optimize()
+        self.assertIsInstance(plan, AndMerge)
+        self.assertEqual(plan.optimize().explain()['parallel_workers'], 4)
+
+        expected = sorted(row.id for row in rows if row.group == 'a' and row.amount is not None
+                          and row.amount > 2)
+        calls, counting = self._counting_partitions()
+        with counting:
+            self.assertEqual(sorted(row.id for row in plan.execute()), expected)
+        self.assertEqual(len(calls), 1)
+
+    def test_queryable_runs_in_parallel(self):
+        query = from_collection(ListPlan(base_list=self.rows, transaction=self.transaction))
+        calls, counting = self._counting_partitions()
+        with counting:
+            ids = query.with_parallel(self.config).where(F.r.active == True).select({'id': F.r.id}).to_list()
+        self.assertEqual([row['id'] for row in ids], [row.id for row in self.rows if row.active])
+        # The projection runs the filter inside each of its partitions
+        self.assertEqual(len(calls), 1)
+        self.assertGreater(calls[0], 1)
+
+    def test_map_partitions(self):
+        def task(i):
+            def run():
+                time.sleep(0.001 * (8 - i))
+                return [i]
+            return run
+        tasks = [task(i) for i in range(8)]
+        self.assertEqual(list(map_partitions(tasks, config=self.config)), [[i] for i in range(8)])
+        self.assertEqual(sorted(map_partitions(tasks, config=self.config, ordered=False)), [[i] for i in range(8)])
+        # Stopping early does not wait for the remaining partitions
+        results = map_partitions(tasks, config=self.config)
+        self.assertEqual(list(itertools.islice(results, 2)), [[0], [1]])
+        results.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
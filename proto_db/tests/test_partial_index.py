@@ -0,0 +1,170 @@
+import random
+import unittest
+
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary, PartialIndex, RepeatedKeysDictionary
+from proto_db.indexes import IndexDefinition
+from proto_db.linq import F
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    Expression, IndexedQueryPlan, IndexedRangeSearchPlan, IndexedSearchPlan, ListPlan, WherePlan, expression_implies
+)
+
+
+class TestExpressionImplies(unittest.TestCase):
+
+    def _implies(self, condition, predicate):
+        return expression_implies(Expression.compile(condition), Expression.compile(predicate))
+
+    def test_implications(self):
+        self.assertTrue(self._implies(['status', '==', 'open'], ['status', '==', 'open']))
+        self.assertTrue(self._implies(['&', ['status', '==', 'open'], ['age', '>', 3]], ['status', '==', 'open']))
+        self.assertTrue(self._implies(['age', '>', 30], ['age', '>=', 18]))
+        self.assertTrue(self._implies(['age', 'between[]', 20, 30], ['age', '>', 10]))
+        self.assertTrue(self._implies(['&', ['age', '>', 10], ['age', '<', 20]], ['age', 'between()', 5, 25]))
+        self.assertTrue(self._implies(['status', 'in', ['open', 'new']], ['status', '!=', 'closed']))
+        self.assertTrue(self._implies(['status', '==', 'open'], ['|', ['status', '==', 'open'], ['age', '>', 3]]))
+        self.assertTrue(self._implies(['|', ['age', '>', 40], ['age', '==', 35]], ['age', '>', 30]))
+        self.assertTrue(self._implies(['age', '>', 30], ['age', '?!N']))
+
+        self.assertFalse(self._implies(['age', '>=', 18], ['age', '>', 18]))
+        self.assertFalse(self._implies(['status', '==', 'new'], ['status', '==', 'open']))
+        self.assertFalse(self._implies(['status', 'in', ['open', 'closed']], ['status', '!=', 'closed']))
+        self.assertFalse(self._implies(['|', ['status', '==', 'open'], ['age', '>', 3]], ['status', '==', 'open']))
+        self.assertFalse(self._implies(['age', '>', 3], ['status', '==', 'open']))
+        # Values that do not compare prove nothing
+        self.assertFalse(self._implies(['age', '>', 'x'], ['age', '>', 3]))
+
+
+class TestPartialIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        self.transaction = self.database.new_transaction()
+        rng = random.Random(3)
+        self.records = []
+        for i in range(300):
+            record = DBObject(transaction=self.transaction)
+            record = record.set_at('id', i)
+            record = record.set_at('status', rng.choice(['open', 'closed', 'closed', 'closed']))
+            record = record.set_at('priority', rng.randrange(5))
+            # Stored records, so buckets find them again by their pointer
+            record._save()
+            self.records.append(record)
+        base = ListPlan(base_list=self.records, transaction=self.transaction)
+        self.indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction) \
+            .add_partial_index('priority', ['status', '==', 'open'])
+
+    def _plan(self, spec, based_on=None):
+        return WherePlan(filter=Expression.compile(spec), based_on=based_on or self.indexed,
+                         transaction=self.transaction).optimize()
+
+    def _expected(self, spec, records=None):
+        flt = Expression.compile(spec)
+        return sorted(r.id for r in (records or self.records) if flt.match(r))
+
+    def test_only_matching_records_are_indexed(self):
+        index = self.indexed.indexes.get_at('priority')
+        self.assertIsInstance(index, PartialIndex)
+        indexed = sorted(r.id for _, bucket in index.as_iterable() for r in bucket.as_iterable())
+        self.assertEqual(indexed, self._expected(['status', '==', 'open']))
+
+    def test_planner_uses_index_when_filter_implies_predicate(self):
+        spec = ['&', ['status', '==', 'open'], ['priority', '==', 2]]
+        plan = self._plan(spec)
+        self.assertIn('IndexedSearchPlan', repr(plan.explain()))
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+
+        spec = ['&', ['status', '==', 'open'], ['priority', '>=', 3]]
+        self.assertEqual(sorted(r.id for r in self._plan(spec).execute()), self._expected(spec))
+
+    def test_planner_scans_when_filter_does_not_imply_predicate(self):
+        for spec in (
+                ['priority', '==', 2],
+                ['&', ['status', '!=', 'open'], ['priority', '==', 2]],
+                ['|', ['status', '==', 'open'], ['priority', '==', 2]],
+        ):
+            plan = self._plan(spec)
+            self.assertNotIsInstance(plan, (IndexedSearchPlan, IndexedRangeSearchPlan))
+            self.assertNotIn('IndexedSearchPlan', repr(plan.explain()))
+            self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+
+    def test_index_under_its_own_name(self):
+        indexed = IndexedQueryPlan(based_on=self.indexed.based_on, transaction=self.transaction) \
+            .add_index('priority') \
+            .add_partial_index('priority', F.status == 'open', index_name='open_by_priority')
+        self.assertEqual(indexed.indexes.get_at('open_by_priority').predicate, ['status', '==', 'open'])
+        spec = ['&', ['status', '==', 'open'], ['priority', '==', 4]]
+        self.assertEqual(sorted(r.id for r in self._plan(spec, indexed).execute()), self._expected(spec))
+        spec = ['priority', '==', 4]
+        self.assertEqual(sorted(r.id for r in self._plan(spec, indexed).execute()), self._expected(spec))
+
+    def test_updates_move_records_in_and_out(self):
+        closed = next(r for r in self.records if r.status == 'closed')
+        opened = next(r for r in self.records if r.status == 'open')
+        reopened = closed.set_at('status', 'open')
+        reclosed = opened.set_at('status', 'closed')
+        updated = self.indexed.update_indexes_on_update(closed, reopened) \
+            .update_indexes_on_update(opened, reclosed)
+        records = [reopened if r is closed else reclosed if r is opened else r for r in self.records]
+
+        index = updated.indexes.get_at('priority')
+        indexed = sorted(r.id for _, bucket in index.as_iterable() for r in bucket.as_iterable())
+        self.assertEqual(indexed, self._expected(['status', '==', 'open'], records))
+        self.assertIn(closed.id, indexed)
+        self.assertNotIn(opened.id, indexed)
+
+    def test_collection_indexes_follow_predicate(self):
+        index = PartialIndex(field_name='priority', predicate=['status', '==', 'open'], transaction=self.transaction)
+        collection = List(transaction=self.transaction)
+        collection = collection.attach_index('open_by_priority', index)
+        for record in self.records[:40]:
+            collection = collection.append_last(record)
+        collection = collection.remove_first()
+        index = collection.indexes.get_at('open_by_priority')
+        indexed = sorted(r.id for _, bucket in index.as_iterable() for r in bucket.as_iterable())
+        self.assertEqual(indexed, self._expected(['status', '==', 'open'], self.records[1:40]))
+
+    def test_index_definition_predicate(self):
+        collection = List(transaction=self.transaction)
+        for record in self.records:
+            collection = collection.append_last(record)
+        definition = IndexDefinition(name='open_priority', extractor=lambda r: r.priority,
+                                     index_class=RepeatedKeysDictionary, predicate=F.status == 'open')
+        collection = collection.add_index(definition)
+        index = collection.indexes.get_at('open_priority')
+        indexed = sorted(r.id for _, bucket in index.as_iterable() for r in bucket.as_iterable())
+        self.assertEqual(indexed, self._expected(['status', '==', 'open']))
+
+        definition = IndexDefinition(name='open_priority', extractor=lambda r: r.priority,
+                                     index_class=RepeatedKeysDictionary, predicate=['status', '==', 'open'])
+        self.assertEqual([r.id for r in self.records if definition.matches(r)],
+                         self._expected(['status', '==', 'open']))
+
+    def test_index_survives_reload(self):
+        self.transaction.set_root_object('records', List.from_values(self.records, transaction=self.transaction))
+        self.transaction.set_root_object('open_by_priority', self.indexed.indexes.get_at('priority'))
+        self.transaction.commit()
+
+        tr = self.database.new_transaction()
+        index = tr.get_root_object('open_by_priority')
+        self.assertIsInstance(index, PartialIndex)
+        self.assertEqual(index.indexed_field(), 'priority')
+        self.assertTrue(index.applies_to('priority', Expression.compile(['status', '==', 'open'])))
+        self.assertFalse(index.applies_to('priority', Expression.compile(['status', '==', 'closed'])))
+
+        # The planner still answers from the reloaded index
+        indexes = Dictionary(transaction=tr).set_at('priority', index)
+        base = ListPlan(base_list=tr.get_root_object('records'), transaction=tr)
+        indexed = IndexedQueryPlan(indexes=indexes, based_on=base, transaction=tr)
+        spec = ['&', ['status', '==', 'open'], ['priority', '==', 1]]
+        plan = WherePlan(filter=Expression.compile(spec), based_on=indexed, transaction=tr).optimize()
+        self.assertIn('IndexedSearchPlan', repr(plan.explain()))
+        self.assertEqual(sorted(r.id for r in plan.execute()), self._expected(spec))
+        tr.abort()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
 import unittest
 
-from proto_db.sets import Set  # Import the Set class
+from proto_db.common import DBObject, HASH_VERSION, stable_hash
+from proto_db.db_access import ObjectSpace
+from proto_db.hash_dictionaries import HashDictionary
+from proto_db.memory_storage import MemoryStorage
+from proto_db.sets import Set, CountedSet, _legacy_hash_of  # Import the Set class
 
 
 class TestSet(unittest.TestCase):
@@ -59,5 +63,96 @@ class TestSet(unittest.TestCase):
         self.assertEqual(set_content, {1, 2, 3}, "Fail as_iterable, wrong content")
 
 
+    def test_set_algebra(self):
+        """Test union, intersection and difference, including staged and persisted elements."""
+        left = Set()
+        right = Set()
+        for i in range(0, 60):
+            left = left.add(i)
+        for i in range(40, 100):
+            right = right.add(i)
+        # Move part of left into its persisted content, as a commit would
+        left = Set(content=left._all_elements(), transaction=None).add('only left')
+
+        union = left.union(right)
+        self.assertEqual(union.count, 101)
+        self.assertEqual(set(union.as_iterable()), set(range(100)) | {'only left'})
+
+        intersection = left.intersection(right)
+        self.assertEqual(intersection.count, 20)
+        self.assertEqual(set(intersection.as_iterable()), set(range(40, 60)))
+
+        difference = left.difference(right)
+        self.assertEqual(difference.count, 41)
+        self.assertEqual(set(difference.as_iterable()), set(range(40)) | {'only left'})
+
+    def test_writes_maintain_field_indexes(self):
+        """Adding and removing elements keeps the field indexes of Set and CountedSet current."""
+        rows = [DBObject().set_at('id', i).set_at('k', i % 3) for i in range(6)]
+        for empty in (Set(), CountedSet()):
+            collection = empty
+            for row in rows[:3]:
+                collection = collection.add(row)
+            collection = collection.add_index('k')
+            collection = collection.add(rows[4]).remove_at(rows[0])
+
+            index = collection.indexes.get_at('k')
+            self.assertFalse(index.has(0))
+            self.assertEqual({row.id for row in index.get_at(1).as_iterable()}, {1, 4})
+
+
+class TestSetHashVersions(unittest.TestCase):
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+
+    def test_stable_hash_is_typed_and_64_bit(self):
+        hashes = {stable_hash(v) for v in ('1', 1, 1.0, True, b'1')}
+        self.assertEqual(len(hashes), 5)
+        self.assertTrue(all(0 <= h < 2 ** 64 for h in hashes))
+        self.assertEqual(stable_hash('abc'), stable_hash('abc'))
+
+    def test_legacy_set_is_read_then_migrated_on_update(self):
+        tr = self.database.new_transaction()
+        content = HashDictionary(transaction=tr)
+        for value in ('a', 'b', 7):
+            content = content.set_at(_legacy_hash_of(value), value)
+        legacy = Set(content=content, transaction=tr)
+        legacy.hash_version = None  # as written before the field existed
+        counted = CountedSet(transaction=tr).add('x').add('x')
+        counted.hash_version = None
+        counted.items = counted.content = HashDictionary(transaction=tr).set_at(_legacy_hash_of('x'), 'x')
+        counted.counts = HashDictionary(transaction=tr).set_at(_legacy_hash_of('x'), 2)
+        counted._new_objects = counted._new_counts = HashDictionary(transaction=tr)
+        tr.set_root_object('legacy', legacy)
+        tr.set_root_object('counted', counted)
+        tr.commit()
+
+        tr = self.database.new_transaction()
+        legacy = tr.get_root_object('legacy')
+        self.assertTrue(legacy.has('a'))
+        self.assertTrue(legacy.has(7))
+        self.assertIsNone(legacy.hash_version)
+        updated = legacy.add('c').remove_at('b')
+        self.assertEqual(updated.hash_version, HASH_VERSION)
+        self.assertEqual({str(v) for v in updated.as_iterable()}, {'a', 'c', '7'})
+        self.assertTrue(updated.has('a'))
+        counted = tr.get_root_object('counted')
+        self.assertEqual(counted.get_count('x'), 2)
+        counted = counted.add('x')
+        self.assertEqual(counted.hash_version, HASH_VERSION)
+        self.assertEqual(counted.get_count('x'), 3)
+        tr.set_root_object('legacy', updated)
+        tr.set_root_object('counted', counted)
+        tr.commit()
+
+        tr = self.database.new_transaction()
+        stored = tr.get_root_object('legacy')
+        self.assertEqual(stored.hash_version, HASH_VERSION)
+        self.assertTrue(stored.has('c'))
+        self.assertFalse(stored.has('b'))
+        self.assertEqual(tr.get_root_object('counted').get_count('x'), 3)
+        tr.abort()
+
 if __name__ == '__main__':
     unittest.main()
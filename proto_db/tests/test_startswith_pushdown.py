@@ -0,0 +1,117 @@
+import random
+import unittest
+
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary, RepeatedKeysDictionary
+from proto_db.linq import F, from_collection
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    Expression, IndexedQueryPlan, IndexedRangeSearchPlan, ListPlan, Operator, StartsWith,
+    WherePlan, prefix_successor
+)
+
+
+class RowWrap:
+    __slots__ = ('r',)
+
+    def __init__(self, row: dict):
+        self.r = row
+
+
+class TestStartsWith(unittest.TestCase):
+
+    def test_operator(self):
+        op = Operator.get_operator('startswith')
+        self.assertIsInstance(op, StartsWith)
+        self.assertTrue(op.match('abcd', 'abc'))
+        self.assertFalse(op.match('ab', 'abc'))
+        self.assertFalse(op.match(12, '1'))
+        self.assertTrue(Expression.compile(['name', 'startswith', 'Jo']).match({'name': 'Joan'}))
+
+    def test_prefix_successor(self):
+        self.assertEqual(prefix_successor('abc'), 'abd')
+        self.assertEqual(prefix_successor('a\U0010FFFF'), 'b')
+        self.assertIsNone(prefix_successor(''))
+        self.assertIsNone(prefix_successor('\U0010FFFF'))
+
+
+class TestStartsWithPushdown(unittest.TestCase):
+
+    def setUp(self):
+        space = ObjectSpace(storage=MemoryStorage())
+        self.transaction = space.new_database('TestDB').new_transaction()
+        rng = random.Random(9)
+        names = ['Ann', 'Anna', 'annie', 'Bob', 'Carl', 'Carla', 'carlos', 'Dora', 'Zoe', 'Ab', 'B']
+        self.rows = [{'id': i, 'name': rng.choice(names) + ('' if i % 3 else str(i % 10)),
+                      'city': rng.choice(['Madrid', 'Malaga', 'Bilbao'])} for i in range(600)]
+        # A few keys of other types share the index
+        self.rows += [{'id': 600 + i, 'name': i, 'city': 'Madrid'} for i in range(10)]
+        self.wrapped = [RowWrap(row) for row in self.rows]
+        self.base = ListPlan(base_list=self.wrapped, transaction=self.transaction)
+        indexes = Dictionary(transaction=self.transaction)
+        for field in ('id', 'name'):
+            index = RepeatedKeysDictionary.from_pairs(((w.r[field], w) for w in self.wrapped),
+                                                      transaction=self.transaction)
+            indexes = indexes.set_at(f'r.{field}', index)
+        self.plan = IndexedQueryPlan(indexes=indexes, based_on=self.base, transaction=self.transaction)
+
+    def _where(self, spec, plan=None):
+        return WherePlan(filter=Expression.compile(spec), based_on=plan or self.plan,
+                         transaction=self.transaction).optimize()
+
+    def _ids(self, records):
+        return sorted(w.r['id'] for w in records)
+
+    def _expected(self, predicate):
+        return sorted(row['id'] for row in self.rows if predicate(row['name']))
+
+    def test_prefix_is_a_range_scan(self):
+        for prefix in ('Carl', 'A', 'annie', 'Zz', ''):
+            plan = self._where(['r.name', 'startswith', prefix])
+            self.assertIsInstance(plan, IndexedRangeSearchPlan)
+            self.assertEqual(self._ids(plan.execute()),
+                             self._expected(lambda name: isinstance(name, str) and name.startswith(prefix)))
+        self.assertEqual(len(self._where(['r.name', 'startswith', 'Carl']).get_references()),
+                         len(self._expected(lambda name: isinstance(name, str) and name.startswith('Carl'))))
+
+    def test_open_ranges_on_text_keys(self):
+        for spec, predicate in (
+                (['r.name', '>', 'Carl'], lambda name: name > 'Carl'),
+                (['r.name', '<=', 'B'], lambda name: name <= 'B'),
+                (['r.name', 'between[)', 'Anna', 'Carla'], lambda name: 'Anna' <= name < 'Carla'),
+                (['r.name', '>=', 5], lambda name: name >= 5),
+        ):
+            plan = self._where(spec)
+            self.assertIsInstance(plan, IndexedRangeSearchPlan)
+            expected = self._expected(lambda name: isinstance(name, type(spec[-1])) and predicate(name))
+            self.assertTrue(expected)
+            self.assertEqual(self._ids(plan.execute()), expected)
+
+    def test_linq_startswith(self):
+        query = from_collection(self.plan).where(F.r.name.startswith('Car'))
+        self.assertEqual(query.explain('json')['optimized_node'], 'IndexedRangeSearchPlan')
+        self.assertEqual(self._ids(query.to_list()),
+                         self._expected(lambda name: isinstance(name, str) and name.startswith('Car')))
+        # Local evaluation agrees
+        self.assertTrue(F.name.startswith('Car')({'name': 'Carla'}))
+        self.assertFalse(F.name.startswith('Car')({'name': 7}))
+
+    def test_case_insensitive_prefix_over_expression_index(self):
+        plan = self.plan.add_expression_index(F.r.name.lower())
+        query = from_collection(plan).where(F.r.name.startswith('CAR', ignore_case=True))
+        self.assertEqual(query.explain('json')['optimized_node'], 'IndexedRangeSearchPlan')
+        self.assertEqual(self._ids(query.to_list()),
+                         self._expected(lambda name: isinstance(name, str) and name.lower().startswith('car')))
+
+    def test_composite_index_prefix(self):
+        plan = self.plan.add_composite_index(['r.city', 'r.name'])
+        spec = ['&', ['r.city', '==', 'Malaga'], ['r.name', 'startswith', 'An']]
+        optimized = self._where(spec, plan)
+        self.assertIn('CompositeIndexScanPlan', repr(optimized.explain()))
+        expected = sorted(row['id'] for row in self.rows
+                          if row['city'] == 'Malaga' and isinstance(row['name'], str) and row['name'].startswith('An'))
+        self.assertEqual(self._ids(optimized.execute()), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
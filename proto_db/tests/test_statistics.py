@@ -0,0 +1,155 @@
+import random
+import unittest
+from unittest import mock
+
+from proto_db import statistics as stats_module
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import RepeatedKeysDictionary
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    AndMerge, Expression, IndexedQueryPlan, IndexedRangeSearchPlan, JoinPlan, ListPlan, WherePlan
+)
+from proto_db.statistics import ColumnStatistics
+
+
+class TestColumnStatistics(unittest.TestCase):
+
+    def test_histogram_and_most_common_values(self):
+        counts = [(value, 10) for value in range(1000)] + [(1000, 5000)]
+        statistics = ColumnStatistics.from_counts(counts)
+        self.assertEqual(statistics.row_count, 15000)
+        self.assertEqual(statistics.distinct_count, 1001)
+        self.assertEqual(statistics.most_common[0], [1000, 5000])
+        self.assertEqual(statistics.estimate_equal(1000), 5000)
+        self.assertAlmostEqual(statistics.estimate_equal(17), 10, delta=1)
+        self.assertEqual(statistics.estimate_equal(5000), 0)
+        self.assertAlmostEqual(statistics.estimate_range(100, 299), 2000, delta=400)
+        self.assertAlmostEqual(statistics.estimate_range(None, 499), 5000, delta=400)
+        self.assertAlmostEqual(statistics.estimate_range(999, None, include_lower=False), 5000, delta=100)
+
+    def test_incremental_updates(self):
+        statistics = ColumnStatistics.from_counts([('a', 3), ('b', 1)])
+        statistics = statistics.with_added('c', 1).with_added('a', 4).with_removed('b', 0)
+        self.assertEqual(statistics.row_count, 5)
+        self.assertEqual(statistics.distinct_count, 2)
+        self.assertEqual(statistics.most_common[0], ['a', 4])
+        self.assertEqual(statistics.estimate_equal('b'), 0)
+        self.assertEqual(statistics.estimate_range('a', 'c'), 5)
+        self.assertEqual(statistics.changed_rows, 3)
+
+
+class TestIndexStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        self.transaction = self.database.new_transaction()
+        rng = random.Random(3)
+        self.records = []
+        for i in range(200):
+            record = DBObject(transaction=self.transaction).set_at('id', i).set_at('age', rng.randrange(18, 80))
+            record = record.set_at('city', 'rome' if i % 10 else rng.choice(['oslo', 'lima']))
+            self.records.append(record)
+        base = ListPlan(base_list=self.records, transaction=self.transaction)
+        self.indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction) \
+            .add_index('id').add_index('age').add_index('city').analyze()
+
+    def test_index_keeps_statistics(self):
+        index = self.indexed.indexes.get_at('city')
+        self.assertEqual(index.statistics.row_count, 200)
+        self.assertEqual(index.statistics.distinct_count, 3)
+        self.assertEqual(index.statistics.estimate_equal('rome'), 180)
+
+        index = index.set_at('paris', self.records[0]).remove_record_at('rome', self.records[1])
+        self.assertEqual(index.statistics.row_count, 200)
+        self.assertEqual(index.statistics.distinct_count, 4)
+        self.assertEqual(index.statistics.estimate_equal('rome'), 179)
+        self.assertEqual(index.analyze().statistics.changed_rows, 0)
+
+    def test_stale_statistics_are_rebuilt(self):
+        with mock.patch.object(stats_module, 'ANALYZE_MIN_CHANGES', 50):
+            index = RepeatedKeysDictionary(transaction=self.transaction)
+            # Updates keep the statistics up to date without reading the buckets
+            with mock.patch.object(ColumnStatistics, 'from_index', side_effect=AssertionError('rebuilt')):
+                for record in self.records[:120]:
+                    index = index.set_at(record.age, record)
+            self.assertEqual(index.statistics.row_count, 120)
+            self.assertTrue(index.statistics.stale)
+            self.assertFalse(index.analyze().statistics.stale)
+            self.assertTrue(index.statistics.stale)
+
+            # Stale statistics are rebuilt when the index is written at commit
+            self.transaction.set_root_object('by_age', index)
+            self.transaction.commit()
+            loaded = self.database.new_transaction().get_root_object('by_age')
+            self.assertEqual(loaded.statistics.row_count, 120)
+            self.assertEqual(loaded.statistics.changed_rows, 0)
+            self.assertGreater(len(loaded.statistics.bucket_rows), 1)
+
+    def test_statistics_survive_reload(self):
+        index = self.indexed.indexes.get_at('age')
+        expected = index.statistics.estimate_range(30, 40)
+        self.transaction.set_root_object('by_age', index)
+        self.transaction.commit()
+
+        tr = self.database.new_transaction()
+        loaded = tr.get_root_object('by_age')
+        self.assertEqual(loaded.statistics.row_count, 200)
+        self.assertEqual(loaded.statistics.estimate_range(30, 40), expected)
+        self.assertEqual(loaded.set_at(50, self.records[0]).statistics.row_count, 201)
+        self.assertEqual(loaded.analyze().statistics.row_count, 200)
+        tr.abort()
+
+    def test_range_estimate_uses_histogram(self):
+        plan = WherePlan(filter=Expression.compile(['age', '>=', 70]), based_on=self.indexed,
+                         transaction=self.transaction).optimize()
+        self.assertIsInstance(plan, IndexedRangeSearchPlan)
+        actual = sum(1 for r in self.records if r.age >= 70)
+        self.assertAlmostEqual(plan.get_cardinality_estimate(), actual, delta=actual * 0.3)
+
+    def test_unselective_index_terms_become_residual_filters(self):
+        spec = ['&', ['age', '>', 20], ['city', '==', 'oslo']]
+        plan = WherePlan(filter=Expression.compile(spec), based_on=self.indexed,
+                         transaction=self.transaction).optimize()
+        self.assertIsInstance(plan, AndMerge)
+        self.assertEqual(len(plan.and_queries), 1)
+        self.assertEqual(plan.explain()['residual_filters'], [str(plan.residual_filters[0])])
+        expected = sorted(r.id for r in self.records if r.age > 20 and r.city == 'oslo')
+        self.assertEqual(sorted(r.id for r in plan.execute()), expected)
+
+    def test_linear_filter_terms_ordered_by_selectivity(self):
+        where = WherePlan(filter=Expression.compile(['&', ['city', '==', 'rome'], ['id', '==', 7]]),
+                          based_on=self.indexed, transaction=self.transaction)
+        self.assertEqual(where._reorder_and_expression(where.filter).terms[0].target_attribute, 'id')
+        self.assertAlmostEqual(where.get_cardinality_estimate(), 1, delta=1)
+
+    def test_explain_analyze_reports_estimated_and_actual_rows(self):
+        spec = ['&', ['city', '==', 'lima'], ['age', '<', 30]]
+        plan = WherePlan(filter=Expression.compile(spec), based_on=self.indexed,
+                         transaction=self.transaction).optimize()
+        report = plan.explain_analyze()
+        self.assertEqual(report['actual_rows'],
+                         sum(1 for r in self.records if r.city == 'lima' and r.age < 30))
+        self.assertIn('estimated_rows', report)
+        for child in report['child_plans']:
+            self.assertIn('actual_rows', child)
+
+    def test_join_drives_from_larger_side(self):
+        owners = [DBObject(transaction=self.transaction).set_at('id', i).set_at('name', f'n{i}') for i in range(5)]
+        pets = [DBObject(transaction=self.transaction).set_at('owner_id', i % 5).set_at('pet', i) for i in range(40)]
+        join = JoinPlan(
+            based_on=ListPlan(base_list=[DBObject(transaction=self.transaction).set_at('owner', o) for o in owners],
+                              transaction=self.transaction),
+            join_query=ListPlan(base_list=[DBObject(transaction=self.transaction).set_at('pet', p) for p in pets],
+                                transaction=self.transaction),
+            transaction=self.transaction)
+        optimized = join.optimize()
+        self.assertEqual(optimized.driving_side, 'right')
+        self.assertEqual(optimized.explain()['driving_side'], 'right')
+        self.assertEqual(sorted((r.owner.id, r.pet.pet) for r in optimized.execute()),
+                         sorted((r.owner.id, r.pet.pet) for r in join.execute()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import itertools
+import unittest
+
+from proto_db.common import DBObject, QueryPlan
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import Dictionary, RepeatedKeysDictionary
+from proto_db.linq import F, from_collection
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import (
+    Expression, FromPlan, IndexedQueryPlan, ListPlan, RecursivePlan, ResultStream, SelectPlan, WherePlan
+)
+
+
+class RowWrap:
+    __slots__ = ('r',)
+
+    def __init__(self, row: dict):
+        self.r = row
+
+
+class CountingPlan(QueryPlan):
+    """
+    Source yielding `size` rows, remembering how many were pulled.
+    """
+
+    def __init__(self, size: int, transaction=None):
+        super().__init__(transaction=transaction)
+        self.size = size
+        self.pulled = 0
+
+    def execute(self):
+        for i in range(self.size):
+            self.pulled += 1
+            yield RowWrap({'id': i, 'even': i % 2 == 0})
+
+    def optimize(self, *args, **kwargs):
+        return self
+
+
+class TestStreamingExecution(unittest.TestCase):
+
+    def setUp(self):
+        self.transaction = ObjectSpace(storage=MemoryStorage()).new_database('TestDB').new_transaction()
+
+    def test_filter_stops_when_consumer_stops(self):
+        source = CountingPlan(1_000_000, transaction=self.transaction)
+        where = WherePlan(filter_spec=['r.id', '>=', 100], based_on=source, transaction=self.transaction)
+        result = where.execute()
+        self.assertIsInstance(result, ResultStream)
+        self.assertEqual(source.pulled, 0)
+        self.assertEqual([w.r['id'] for w in itertools.islice(result, 10)], list(range(100, 110)))
+        self.assertEqual(source.pulled, 110)
+
+        # Through a projection, and through the LINQ take()
+        source.pulled = 0
+        select = SelectPlan(fields={'n': lambda w: w.r['id']}, based_on=where, transaction=self.transaction)
+        self.assertEqual([row['n'] for row in itertools.islice(select.execute(), 3)], [100, 101, 102])
+        self.assertEqual(source.pulled, 103)
+
+        source.pulled = 0
+        indexes = Dictionary(transaction=self.transaction).set_at(
+            'r.other', RepeatedKeysDictionary(transaction=self.transaction))
+        indexed = IndexedQueryPlan(indexes=indexes, based_on=source, transaction=self.transaction)
+        rows = from_collection(indexed).where(F.r.even == True).take(10).to_list()
+        self.assertEqual([w.r['id'] for w in rows], list(range(0, 20, 2)))
+        self.assertLess(source.pulled, 25)
+
+    def test_stream_offsets_and_materialization(self):
+        source = CountingPlan(50, transaction=self.transaction)
+        result = WherePlan(filter_spec=['r.even', '?T'], based_on=source, transaction=self.transaction).execute()
+        self.assertEqual(result.get_at(3).r['id'], 6)
+        self.assertEqual(source.pulled, 7)
+        self.assertIsNone(result.get_at(100))
+        page = result.slice(5, 8)
+        self.assertIsInstance(page, List)
+        self.assertEqual([w.r['id'] for w in page.as_iterable()], [10, 12, 14])
+        everything = result.to_list()
+        self.assertEqual(everything.count, 25)
+        self.assertEqual(result.get_at(-1).r['id'], 48)
+        # Every iteration runs the plan again
+        self.assertEqual(sum(1 for _ in result), sum(1 for _ in result))
+
+    def test_streamed_inputs_are_filtered(self):
+        people = [DBObject(transaction=self.transaction, name=f'p{i}', age=20 + i) for i in range(10)]
+        source = FromPlan(alias='person', based_on=ListPlan(base_list=people, transaction=self.transaction),
+                          transaction=self.transaction)
+        where = WherePlan(filter=Expression.compile(['person.age', '>', 26]), based_on=source,
+                          transaction=self.transaction)
+        self.assertEqual([row.person.name for row in where.execute()], ['p7', 'p8', 'p9'])
+        self.assertEqual(ListPlan(base_list=people, transaction=self.transaction).count(), 10)
+
+    def test_traversal_is_streamed(self):
+        node = None
+        for i in range(200):
+            node = DBObject(transaction=self.transaction, level=i, parent=node)
+        plan = RecursivePlan(based_on=ListPlan(base_list=[node], transaction=self.transaction),
+                             relation_attr='parent', transaction=self.transaction)
+        self.assertEqual([n.level for n in itertools.islice(plan.execute(), 3)], [198, 197, 196])
+        self.assertEqual(sum(1 for _ in plan.execute()), 199)
+
+
+if __name__ == '__main__':
+    unittest.main()
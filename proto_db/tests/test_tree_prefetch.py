@@ -0,0 +1,106 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from proto_db.common import iter_tree_nodes
+from proto_db.db_access import ObjectSpace
+from proto_db.memory_storage import MemoryStorage
+
+
+class SlowMemoryStorage(MemoryStorage):
+    """
+    MemoryStorage whose reads complete asynchronously after a small delay, recording how
+    many of them are in flight at the same time.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.slow = False
+        self._counter_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=16)
+
+    def get_atom(self, atom_pointer):
+        if not self.slow:
+            return super().get_atom(atom_pointer)
+        with self._counter_lock:
+            self.reads += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        def read():
+            time.sleep(0.001)
+            try:
+                return super(SlowMemoryStorage, self).get_atom(atom_pointer).result()
+            finally:
+                with self._counter_lock:
+                    self.in_flight -= 1
+
+        return self._executor.submit(read)
+
+    def reset_counters(self):
+        self.reads = 0
+        self.max_in_flight = 0
+
+
+class TestTreePrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = SlowMemoryStorage()
+        self.space = ObjectSpace(storage=self.storage)
+        self.database = self.space.new_database('TestDB')
+        tr = self.database.new_transaction()
+        items = tr.new_list()
+        table = tr.new_hash_dictionary()
+        for i in range(150):
+            items = items.append_last(tr.new_dictionary().set_at('n', i))
+            table = table.set_at(i, f'value {i}')
+        tr.set_root_object('items', items)
+        tr.set_root_object('table', table)
+        tr.commit()
+        self.storage.slow = True
+
+    def tearDown(self):
+        self.storage._executor.shutdown(wait=True)
+
+    def _scan_items(self, prefetch_depth):
+        tr = self.database.new_transaction()
+        items = tr.get_root_object('items')
+        self.storage.reset_counters()
+        values = [record.get_at('n') for record in items.as_iterable(prefetch_depth=prefetch_depth)]
+        tr.abort()
+        return values
+
+    def test_prefetching_scan_keeps_reads_in_flight(self):
+        self.assertEqual(self._scan_items(prefetch_depth=8), list(range(150)))
+        prefetched_reads = self.storage.reads
+        self.assertGreater(self.storage.max_in_flight, 1)
+
+        self.assertEqual(self._scan_items(prefetch_depth=0), list(range(150)))
+        self.assertEqual(self.storage.max_in_flight, 1)
+        # Every prefetched read is consumed by the scan: nothing is read twice
+        self.assertEqual(self.storage.reads, prefetched_reads)
+
+    def test_hash_dictionary_scan_in_key_order(self):
+        tr = self.database.new_transaction()
+        table = tr.get_root_object('table')
+        pairs = list(table.as_iterable(prefetch_depth=4))
+        self.assertEqual([k for k, _ in pairs], list(range(150)))
+        self.assertEqual(pairs[42][1], 'value 42')
+        tr.abort()
+
+    def test_iter_tree_nodes_on_transient_tree(self):
+        tr = self.database.new_transaction()
+        items = tr.new_list()
+        for i in range(20):
+            items = items.insert_at(0, i)
+        self.assertEqual([node.value for node in iter_tree_nodes(items)], list(range(19, -1, -1)))
+        self.assertEqual(list(iter_tree_nodes(None)), [])
+        tr.abort()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+
+from proto_db.common import DBObject
+from proto_db.db_access import ObjectSpace
+from proto_db.dictionaries import UniqueIndex, Dictionary
+from proto_db.exceptions import ProtoLockingException, ProtoUniqueConstraintException
+from proto_db.linq import from_collection, F
+from proto_db.lists import List
+from proto_db.memory_storage import MemoryStorage
+from proto_db.queries import Expression, IndexedQueryPlan, ListPlan, PrimaryKeyLookupPlan, WherePlan
+
+
+class RowWrap:
+    __slots__ = ('r', '_h')
+
+    def __init__(self, row: dict):
+        self.r = row
+        self._h = hash(id(row))
+
+    def __hash__(self):
+        return self._h
+
+
+class TestUniqueIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ObjectSpace(storage=MemoryStorage())
+        self.database = self.space.new_database('TestDB')
+        self.transaction = self.database.new_transaction()
+        self.records = []
+        for i in range(50):
+            record = DBObject(transaction=self.transaction)
+            record = record.set_at('id', i)
+            record = record.set_at('kind', 'even' if i % 2 == 0 else 'odd')
+            self.records.append(record)
+        base = ListPlan(base_list=self.records, transaction=self.transaction)
+        self.indexed = IndexedQueryPlan(based_on=base, transaction=self.transaction).add_unique_index('id')
+
+    def _optimized(self, spec):
+        plan = WherePlan(filter=Expression.compile(spec), based_on=self.indexed, transaction=self.transaction)
+        return plan.optimize()
+
+    def test_equality_uses_primary_key_lookup(self):
+        plan = self._optimized(['id', '==', 17])
+        self.assertIsInstance(plan, PrimaryKeyLookupPlan)
+        self.assertEqual([r.id for r in plan.execute()], [17])
+        self.assertEqual(plan.explain()['lookup_type'], 'Unique (Primary Key)')
+        self.assertEqual(list(self._optimized(['id', '==', 500]).execute()), [])
+        self.assertIs(self.indexed.get_unique('id', 3), self.records[3])
+
+        # The rest of a conjunction is checked on the single candidate
+        plan = self._optimized(['&', ['kind', '==', 'odd'], ['id', '==', 17]])
+        self.assertIsInstance(plan, PrimaryKeyLookupPlan)
+        self.assertEqual(plan.count(), 1)
+        self.assertEqual(self._optimized(['&', ['kind', '==', 'even'], ['id', '==', 17]]).count(), 0)
+
+    def test_duplicate_key_is_rejected(self):
+        duplicate = DBObject(transaction=self.transaction).set_at('id', 3)
+        index = self.indexed.indexes.get_at('id')
+        with self.assertRaises(ProtoUniqueConstraintException):
+            index.set_at(3, duplicate)
+        # Re-adding the same record is a no-op, and a key can be reused once removed
+        self.assertIs(index.set_at(3, self.records[3]), index)
+        self.assertIs(index.remove_record_at(3, duplicate), index)
+        index = index.remove_record_at(3, self.records[3]).set_at(3, duplicate)
+        self.assertIs(index.get_at(3), duplicate)
+
+    def test_collection_maintains_index(self):
+        indexes = Dictionary(transaction=self.transaction).set_at(
+            'id', UniqueIndex(field_name='id', transaction=self.transaction))
+        records = List(indexes=indexes, transaction=self.transaction)
+        for record in self.records[:5]:
+            records = records.append_last(record)
+        self.assertIs(records.indexes.get_at('id').get_at(3), self.records[3])
+        duplicate = DBObject(transaction=self.transaction).set_at('id', 3)
+        with self.assertRaises(ProtoUniqueConstraintException):
+            records.append_last(duplicate)
+        # Once its record is removed, the key is free again
+        records = records.remove_at(3).append_last(duplicate)
+        self.assertIs(records.indexes.get_at('id').get_at(3), duplicate)
+        self.assertEqual(records.indexes.get_at('id').count, 5)
+
+    def test_plan_maintains_index(self):
+        record = DBObject(transaction=self.transaction).set_at('id', 50).set_at('kind', 'even')
+        updated = self.indexed.update_indexes_on_add(record).update_indexes_on_remove(self.records[3])
+        index = updated.indexes.get_at('id')
+        self.assertIs(index.get_at(50), record)
+        self.assertIsNone(index.get_at(3))
+        with self.assertRaises(ProtoUniqueConstraintException):
+            updated.update_indexes_on_add(DBObject(transaction=self.transaction).set_at('id', 7))
+        # Records without the field are left out
+        self.assertEqual(updated.update_indexes_on_add(DBObject(transaction=self.transaction)).indexes
+                         .get_at('id').count, 50)
+
+    def test_linq_point_lookup(self):
+        rows = [RowWrap({'id': i, 'name': f'n{i}'}) for i in range(200)]
+        index = UniqueIndex(transaction=self.transaction)
+        for row in rows:
+            index = index.set_at(row.r['id'], row)
+        indexes = Dictionary(transaction=self.transaction).set_at('r.id', index)
+        plan = IndexedQueryPlan(indexes=indexes, based_on=ListPlan(base_list=rows, transaction=self.transaction),
+                                transaction=self.transaction)
+        query = from_collection(plan).where(F.r.id == 120)
+        self.assertEqual(query.explain('json').get('optimized_node'), 'PrimaryKeyLookupPlan')
+        self.assertEqual([row.r['name'] for row in query.to_list()], ['n120'])
+
+    def _store_user(self, key, n):
+        """
+        Add a user under key, retrying on concurrent modifications of the index.
+        """
+        while True:
+            tr = self.database.new_transaction()
+            try:
+                index = tr.get_root_object('users_pk').set_at(key, tr.new_dictionary().set_at('n', n))
+                tr.set_root_object('users_pk', index)
+                tr.commit()
+                return
+            except ProtoLockingException:
+                continue
+
+    def test_concurrent_duplicate_fails_at_commit(self):
+        tr = self.database.new_transaction()
+        base = UniqueIndex(transaction=tr).set_at('a', tr.new_dictionary().set_at('n', 1))
+        tr.set_root_object('users_pk', base)
+        tr.commit()
+
+        first = self.database.new_transaction()
+        second = self.database.new_transaction()
+        first.set_root_object('users_pk', first.get_root_object('users_pk').set_at(
+            'b', first.new_dictionary().set_at('n', 2)))
+        second.set_root_object('users_pk', second.get_root_object('users_pk').set_at(
+            'b', second.new_dictionary().set_at('n', 3)))
+        first.commit()
+        # The stale index is refused at commit; its retry sees the committed key
+        with self.assertRaises(ProtoLockingException):
+            second.commit()
+        with self.assertRaises(ProtoUniqueConstraintException):
+            self._store_user('b', 3)
+        self._store_user('c', 4)
+
+        tr = self.database.new_transaction()
+        index = tr.get_root_object('users_pk')
+        self.assertEqual(index.get_at('b').get_at('n'), 2)
+        self.assertEqual(index.get_at('c').get_at('n'), 4)
+        self.assertEqual(index.count, 3)
+
+        # Staged changes rebased on a concurrently committed index keep keys unique
+        staged = base.set_at('c', tr.new_dictionary().set_at('n', 5))
+        with self.assertRaises(ProtoUniqueConstraintException):
+            staged._rebase_on_concurrent_update(index)
+        merged = base.set_at('d', tr.new_dictionary().set_at('n', 6))._rebase_on_concurrent_update(index)
+        self.assertEqual(merged.count, 4)
+        tr.abort()
+
+
+if __name__ == '__main__':
+    unittest.main()